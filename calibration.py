@@ -0,0 +1,320 @@
+"""Calibration of the car model against a measured velocity trace.
+
+The drag coefficient, the rolling resistance (wheel pressure) and the effective motor
+efficiency are fitted to measured velocities and accelerations, e.g. the vx_mps and
+ax_mps2 columns of a raceline file or a lap aligned from telemetry (telemetry.py).
+
+Only the segments where the car accelerates are used: there the car drives with full
+power, so the physics of the segment is known up to the fitted parameters. The
+segments are calculated with the vectorized kernel of a full power segment, starting
+at the measured velocity, and the residual of a segment is the predicted minus the
+measured acceleration.
+
+The fit is a damped Gauss-Newton (Levenberg-Marquardt) least squares in the logarithm
+of the parameters, kept within CALIBRATION_BOUNDS. Segments that are not at full power
+after all (e.g. the car leaves a corner with part throttle) would pull the fit away, the
+residuals are weighted with the Huber loss, residuals above HUBER_ACCELERATION count
+linearly instead of squared. The residuals of the nominal parameters and of the
+perturbed parameters for the finite difference jacobian are one batch of variants of
+the vectorized kernel, an iteration costs one kernel call over all segments and a fit
+takes milliseconds.
+
+Usage:
+    calibration = calibrate_track_data(track_data, car, air_density)
+    car = calibration.calibrated_car(car)
+"""
+import logging
+import numpy
+from physics_equations import max_positive_power_physics_simulation_vectorized
+from raceline_geometry import (DISTANCE_COLUMN, VELOCITY_COLUMN, ACCELERATION_COLUMN,
+                               ELEVATION_COLUMN)
+
+logger = logging.getLogger(__name__)
+
+# motor_efficiency is the effective efficiency from the motor power to the power that
+# accelerates the car, the physics kernels put the full motor power on the road
+CALIBRATION_PARAMETERS = ('drag_coefficient', 'wheel_pressure_bar', 'motor_efficiency')
+# range of the fitted parameters, the drag coefficient range is the one of
+# ElectricCarProperties, the rolling resistance is only a small part of the driving
+# resistance and the wheel pressure drifts off without limits on noisy data
+CALIBRATION_BOUNDS = {'drag_coefficient': (0.05, 1.0),
+                      'wheel_pressure_bar': (0.5, 10.0),
+                      'motor_efficiency': (0.3, 1.0)}
+# residuals above this count linearly in the fit (m/s^2)
+HUBER_ACCELERATION = 0.2
+# segments with a lower measured acceleration are not at full power (m/s^2)
+FULL_POWER_MIN_ACCELERATION = 0.05
+# number of sectors of equal length the fit quality is reported for
+CALIBRATION_SECTORS = 3
+CALIBRATION_MAX_ITERATIONS = 50
+CALIBRATION_TOLERANCE = 1e-10
+# finite difference step of the logarithm of a parameter
+_LOG_STEP = 1e-4
+
+
+class SectorFit:
+    """Class that contains the fit quality of one sector.
+
+    Args:
+        start_index (int): index of the first segment of the sector
+        end_index (int): index after the last segment of the sector
+        segments (int): number of full power segments in the sector that were fitted
+        rms (float): root mean square of the acceleration residuals (m/s^2)
+        bias (float): mean of the acceleration residuals (m/s^2), positive when the
+                      model accelerates faster than the car
+        r_squared (float): share of the variance of the measured acceleration that the
+                           model explains
+    """
+    def __init__(self, start_index, end_index, segments, rms, bias, r_squared):
+        self.start_index = start_index
+        self.end_index = end_index
+        self.segments = segments
+        self.rms = rms
+        self.bias = bias
+        self.r_squared = r_squared
+
+    def __repr__(self):
+        return ("SectorFit(segments {}-{}, fitted {}, rms {:.4f}, bias {:.4f}, r2 {:.4f})"
+                .format(self.start_index, self.end_index, self.segments, self.rms, self.bias,
+                        self.r_squared))
+
+
+class CalibrationResults:
+    """Class that contains the results of a calibration.
+
+    Args:
+        parameters (dict): fitted value of every calibrated parameter
+        initial_parameters (dict): value of every calibrated parameter before the fit
+        rms (float): root mean square of all acceleration residuals (m/s^2)
+        sector_fits (list): SectorFit of every sector
+        residuals (numpy array): acceleration residual of every segment (m/s^2), nan for
+                                 the segments that were not fitted
+        iterations (int): number of iterations of the fit
+    """
+    def __init__(self, parameters, initial_parameters, rms, sector_fits, residuals, iterations):
+        self.parameters = parameters
+        self.initial_parameters = initial_parameters
+        self.rms = rms
+        self.sector_fits = sector_fits
+        self.residuals = residuals
+        self.iterations = iterations
+
+    def calibrated_car(self, car):
+        """Copy of the car with the fitted parameters. The motor power is scaled by
+        the fitted motor efficiency, that is the power the lap solver puts on the road.
+
+        Args:
+            car (dict): car parameters the calibration started from
+
+        Returns:
+            car (dict): calibrated car parameters
+        """
+        calibrated = dict(car)
+        calibrated.update(self.parameters)
+        if 'motor_efficiency' in self.parameters:
+            calibrated['motor_power'] = car['motor_power'] * self.parameters['motor_efficiency']
+        return calibrated
+
+
+def _acceleration_residuals(batch, air_density, initial_velocity, distance, elevation_change,
+                            measured_acceleration):
+    # residuals of every segment (rows) for every variant of the batch (columns)
+    results = max_positive_power_physics_simulation_vectorized(
+        initial_velocity[:, None], distance[:, None], batch, air_density,
+        elevation_change[:, None])
+    predicted_acceleration = ((results.final_velocity ** 2 - initial_velocity[:, None] ** 2) /
+                              (2 * distance[:, None]))
+    return predicted_acceleration - measured_acceleration[:, None]
+
+
+def _variant_batch(car, parameters, log_values):
+    # car parameters of a batch, one variant per row of log_values
+    batch = dict(car)
+    batch.pop('powertrain', None)
+    values = numpy.exp(log_values)
+    for number, name in enumerate(parameters):
+        if name == 'motor_efficiency':
+            batch['motor_power'] = car['motor_power'] * values[:, number]
+        else:
+            batch[name] = values[:, number]
+    return batch
+
+
+def sector_fit_calculation(residuals, measured_acceleration, start_index, end_index):
+    """Function that calculates the fit quality of the segments from start_index to
+    end_index, segments with a nan residual are left out.
+
+    Args:
+        residuals (numpy array): acceleration residual of every segment (m/s^2)
+        measured_acceleration (numpy array): measured acceleration of every segment (m/s^2)
+        start_index (int): index of the first segment
+        end_index (int): index after the last segment
+
+    Returns:
+        sector_fit (SectorFit): fit quality of the segments
+    """
+    sector_residuals = residuals[start_index:end_index]
+    fitted = ~numpy.isnan(sector_residuals)
+    sector_residuals = sector_residuals[fitted]
+    if not len(sector_residuals):
+        return SectorFit(start_index, end_index, 0, numpy.nan, numpy.nan, numpy.nan)
+    measured = measured_acceleration[start_index:end_index][fitted]
+    variance = numpy.sum((measured - measured.mean()) ** 2)
+    r_squared = 1 - numpy.sum(sector_residuals ** 2) / variance if variance > 0 else numpy.nan
+    return SectorFit(start_index, end_index, len(sector_residuals),
+                     float(numpy.sqrt(numpy.mean(sector_residuals ** 2))),
+                     float(sector_residuals.mean()), float(r_squared))
+
+
+def calibrate(distance, velocity, car, air_density, acceleration=None, elevation=None,
+              sector_start_indices=None, parameters=CALIBRATION_PARAMETERS):
+    """Function that fits car parameters to a measured velocity trace.
+
+    Segment i goes from point i to point (i + 1) of the trace.
+
+    Args:
+        distance (list): distance of every point of the trace (meters), increasing
+        velocity (list): measured velocity at every point (m/s)
+        car (dict): Characteristics of car being simulated, the start of the fit
+        air_density (float): density of air that the car is traveling through
+        acceleration (list): measured acceleration at every point (m/s^2), constant
+                             until the next point. Calculated from the velocity if not given
+        elevation (list): elevation at every point (meters)
+        sector_start_indices (list): index of the first segment of every sector, by
+                                     default CALIBRATION_SECTORS sectors of equal length
+        parameters (tuple): parameters to fit, out of CALIBRATION_PARAMETERS
+
+    Returns:
+        results (CalibrationResults): fitted parameters and fit quality
+    """
+    for name in parameters:
+        if name not in CALIBRATION_PARAMETERS:
+            raise Exception("Invalid calibration parameter {}".format(name))
+    distance = numpy.asarray(distance, dtype=float)
+    velocity = numpy.asarray(velocity, dtype=float)
+    segment_distance = numpy.diff(distance)
+    if numpy.any(segment_distance <= 0):
+        raise Exception("calibration trace distances are not increasing")
+    if acceleration is None:
+        measured_acceleration = numpy.diff(velocity ** 2) / (2 * segment_distance)
+    else:
+        measured_acceleration = numpy.asarray(acceleration, dtype=float)[:-1]
+    if elevation is None:
+        elevation_change = numpy.zeros(len(segment_distance))
+    else:
+        elevation_change = numpy.diff(numpy.asarray(elevation, dtype=float))
+    if sector_start_indices is None:
+        sector_start_indices = numpy.searchsorted(
+            distance[:-1], distance[0] + (distance[-1] - distance[0]) *
+            numpy.arange(CALIBRATION_SECTORS) / CALIBRATION_SECTORS).tolist()
+
+    full_power = (measured_acceleration > FULL_POWER_MIN_ACCELERATION) & (velocity[:-1] > 0)
+    if full_power.sum() < len(parameters):
+        raise Exception("{} full power segments are not enough to fit {} parameters"
+                        .format(full_power.sum(), len(parameters)))
+    initial_velocity = velocity[:-1][full_power]
+    fit_distance = segment_distance[full_power]
+    fit_elevation_change = elevation_change[full_power]
+    fit_acceleration = measured_acceleration[full_power]
+
+    initial_parameters = {name: (1.0 if name == 'motor_efficiency' else float(car[name]))
+                          for name in parameters}
+    log_lower_bounds = numpy.log([CALIBRATION_BOUNDS[name][0] for name in parameters])
+    log_upper_bounds = numpy.log([CALIBRATION_BOUNDS[name][1] for name in parameters])
+    log_values = numpy.clip(numpy.log([initial_parameters[name] for name in parameters]),
+                            log_lower_bounds, log_upper_bounds)
+    # variant 0 is the nominal parameters, then one up and one down variant per parameter
+    steps = numpy.zeros((1 + 2 * len(parameters), len(parameters)))
+    for number in range(len(parameters)):
+        steps[1 + 2 * number, number] = _LOG_STEP
+        steps[2 + 2 * number, number] = -_LOG_STEP
+
+    def cost(values):
+        residuals = _acceleration_residuals(_variant_batch(car, parameters, values[None, :]),
+                                            air_density, initial_velocity, fit_distance,
+                                            fit_elevation_change, fit_acceleration)[:, 0]
+        absolute = numpy.abs(residuals)
+        huber = numpy.where(absolute <= HUBER_ACCELERATION, 0.5 * residuals ** 2,
+                            HUBER_ACCELERATION * (absolute - 0.5 * HUBER_ACCELERATION))
+        return residuals, numpy.sum(huber)
+
+    damping = 1e-3
+    iterations = 0
+    residuals, current_cost = cost(log_values)
+    for iterations in range(1, CALIBRATION_MAX_ITERATIONS + 1):
+        batch_residuals = _acceleration_residuals(
+            _variant_batch(car, parameters, log_values + steps), air_density, initial_velocity,
+            fit_distance, fit_elevation_change, fit_acceleration)
+        jacobian = (batch_residuals[:, 1::2] - batch_residuals[:, 2::2]) / (2 * _LOG_STEP)
+        # iteratively reweighted least squares step of the Huber loss
+        weights = numpy.sqrt(numpy.minimum(1.0, HUBER_ACCELERATION /
+                                           numpy.maximum(numpy.abs(residuals), 1e-12)))
+        jacobian = jacobian * weights[:, None]
+        scale = numpy.sqrt(numpy.sum(jacobian ** 2, axis=0)) + 1e-12
+
+        improved = False
+        while damping < 1e12:
+            system = numpy.vstack((jacobian, numpy.diag(numpy.sqrt(damping) * scale)))
+            step = numpy.linalg.lstsq(system, numpy.concatenate(
+                (-weights * residuals, numpy.zeros(len(parameters)))), rcond=None)[0]
+            new_log_values = numpy.clip(log_values + step, log_lower_bounds, log_upper_bounds)
+            new_residuals, new_cost = cost(new_log_values)
+            if new_cost < current_cost:
+                improved = True
+                break
+            damping *= 10
+        if not improved:
+            break
+        cost_change = current_cost - new_cost
+        log_values, residuals, current_cost = new_log_values, new_residuals, new_cost
+        damping = max(damping / 10, 1e-9)
+        if cost_change <= CALIBRATION_TOLERANCE * current_cost:
+            break
+
+    fitted_parameters = {name: float(value)
+                         for name, value in zip(parameters, numpy.exp(log_values))}
+    for name, value in fitted_parameters.items():
+        if not CALIBRATION_BOUNDS[name][0] < value < CALIBRATION_BOUNDS[name][1]:
+            logger.warning("calibrated {} is at its bound {}, the trace does not determine it"
+                           .format(name, value), extra={'sim_index': 'N/A'})
+    all_residuals = numpy.full(len(segment_distance), numpy.nan)
+    all_residuals[full_power] = residuals
+    sector_end_indices = list(sector_start_indices[1:]) + [len(segment_distance)]
+    sector_fits = [sector_fit_calculation(all_residuals, measured_acceleration,
+                                          start_index, end_index)
+                   for start_index, end_index in zip(sector_start_indices, sector_end_indices)]
+    results = CalibrationResults(fitted_parameters, initial_parameters,
+                                 float(numpy.sqrt(numpy.mean(residuals ** 2))), sector_fits,
+                                 all_residuals, iterations)
+    logger.info("calibration, {} full power segments, {} iterations, parameters: {}, "
+                "rms: {} m/s^2".format(len(fit_distance), iterations, fitted_parameters,
+                                       results.rms),
+                extra={'sim_index': 'N/A'})
+    return results
+
+
+def calibrate_track_data(track_data, car, air_density, sector_start_indices=None,
+                         parameters=CALIBRATION_PARAMETERS):
+    """Function that fits car parameters to the vx_mps and ax_mps2 columns of a
+    raceline file, see calibrate.
+
+    Args:
+        track_data (list): rows of the raceline file as read by
+                           project_argparser SingleArg.open_track_dict
+        car (dict): Characteristics of car being simulated, the start of the fit
+        air_density (float): density of air that the car is traveling through
+        sector_start_indices (list): index of the first segment of every sector
+        parameters (tuple): parameters to fit, out of CALIBRATION_PARAMETERS
+
+    Returns:
+        results (CalibrationResults): fitted parameters and fit quality
+    """
+    elevation = None
+    if all(len(row) > ELEVATION_COLUMN and isinstance(row[ELEVATION_COLUMN], (int, float))
+           for row in track_data):
+        elevation = [row[ELEVATION_COLUMN] for row in track_data]
+    return calibrate([row[DISTANCE_COLUMN] for row in track_data],
+                     [row[VELOCITY_COLUMN] for row in track_data], car, air_density,
+                     acceleration=[row[ACCELERATION_COLUMN] for row in track_data],
+                     elevation=elevation, sector_start_indices=sector_start_indices,
+                     parameters=parameters)
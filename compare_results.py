@@ -11,6 +11,17 @@ import cProfile
 import tkinter as tk
 from tkinter import filedialog as fd
 import os
+from run_file import (RunFile, RUN_FILE_EXTENSION)
+
+
+def read_results_file(filename):
+    """Open a results file written by the simulation. Run files are memory mapped
+    and their columns are only read when they are used, csv files are parsed with pandas.
+    Both support selecting a column by name (e.g. data['Time']).
+    """
+    if filename.endswith(RUN_FILE_EXTENSION):
+        return RunFile(filename)
+    return pd.read_csv(filename, delimiter=',')
 
 
 class ResultsWindow(QWidget):
@@ -250,7 +261,8 @@ class ResultsWindow(QWidget):
 
     def openPlotDataFile(self, plot_number):
 
-        path_and_name = fd.askopenfilename(filetypes=[("Comma Sep Values", ".csv")])
+        path_and_name = fd.askopenfilename(filetypes=[("Comma Sep Values", ".csv"),
+                                                         ("Race Run Files", RUN_FILE_EXTENSION)])
         if not path_and_name:
             print("path_and_name not selected ={}".format(path_and_name))
             # self.root.destroy()
@@ -279,7 +291,7 @@ class ResultsWindow(QWidget):
                 self.p6.removeItem(self.battery_energy_data_line)
 
             # Read in the new data file for plot #1
-            self.data_frame = pd.read_csv(name+ext, delimiter=',')
+            self.data_frame = read_results_file(name+ext)
 
             # use the dictionary property to select out and assign to our private variables
             # the file's data values
@@ -337,7 +349,7 @@ class ResultsWindow(QWidget):
                 self.p6.removeItem(self.battery_energy_data_line2)
 
             # Read in the new data file for plot #2
-            self.data_frame2 = pd.read_csv(name+ext, delimiter=',')
+            self.data_frame2 = read_results_file(name+ext)
             self._sim_index2 = self.data_frame2['SimulationIndex']
             self._time2 = self.data_frame2['Time']
             self._distance2 = self.data_frame2['Distance']
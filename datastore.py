@@ -4,9 +4,11 @@ import threading
 import track_properties
 import electric_car_properties
 from copy import deepcopy
+from itertools import accumulate
 from PyQt5.QtCore import QReadWriteLock
 
-from physics_equations import PhysicsCalculationOutput
+from physics_equations import PhysicsResultsColumns
+from sector_analytics import SectorAnalytics
 
 logger = logging.getLogger(__name__)
 
@@ -204,11 +206,15 @@ class DataStore:
     def get_final_velocity_at_index(self, index):
         self._lock.lockForRead()
         try:
-            _velocity = self._lap_simulation_results.physics_results_profile[index].final_velocity
+            _velocity = self._lap_simulation_results.physics_results_profile.final_velocity[index]
+        except DiscardedIndexError:
+            # streaming mode, the last velocity held is not the velocity at index
+            self._lock.unlock()
+            raise
         except IndexError:
             logger.error("index out of range: {}, returning last velocity",
                          extra={'sim_index': index})
-            _velocity = self._lap_simulation_results.physics_results_profile[-1].final_velocity
+            _velocity = self._lap_simulation_results.physics_results_profile.final_velocity[-1]
         temp = deepcopy(_velocity)
         self._lock.unlock()
         return temp
@@ -216,11 +222,16 @@ class DataStore:
     def get_initial_velocity_at_index(self, index):
         self._lock.lockForRead()
         try:
-            _velocity = self._lap_simulation_results.physics_results_profile[index].initial_velocity
+            _velocity = \
+                self._lap_simulation_results.physics_results_profile.initial_velocity[index]
+        except DiscardedIndexError:
+            # streaming mode, the first velocity held is not the velocity at index
+            self._lock.unlock()
+            raise
         except IndexError:
             logger.error("index out of range: {}, returning first velocity",
                          extra={'sim_index': index})
-            _velocity = self._lap_simulation_results.physics_results_profile[0].initial_velocity
+            _velocity = self._lap_simulation_results.physics_results_profile.initial_velocity[0]
         temp = deepcopy(_velocity)
         self._lock.unlock()
         return temp
@@ -271,8 +282,14 @@ class DataStore:
             tmp_be - same as above
         """
         self._lock.lockForWrite()
+        # in streaming mode results before the live window are gone, only report what is left
+        # (the first index held is final and only the base of the cumulative lists)
+        first_available_index = self._lap_simulation_results.first_available_index
+        if first_available_index > 0:
+            self._refresh_index = max(self._refresh_index, first_available_index + 1)
         try:
-            self._lap_simulation_results.regenerate_cumulative_lists(self._refresh_index, self._simulation_index)
+            self._lap_simulation_results.regenerate_cumulative_lists(self._refresh_index,
+                                                                     self._simulation_index)
 
             _time = self._lap_simulation_results.time_cumulative_list[self._refresh_index:
                                                            self._simulation_index-1]
@@ -578,24 +595,184 @@ class DataStore:
         self._lock.unlock()
         return temp
 
-    def initialize_lap_lists(self, length):
+    def initialize_lap_lists(self, length, window_length=None, energy_flow=False):
         self._lock.lockForWrite()
-        self._lap_simulation_results.initialize_lists(length)
+        self._lap_simulation_results.initialize_lists(length, window_length, energy_flow)
+        self._lock.unlock()
+
+    def get_energy_flow_totals(self):
+        """Totals of the motor energy and every energy flow term over the results
+        calculated so far, see LapVelocitySimulationResults.energy_flow_totals"""
+        self._lock.lockForRead()
+        try:
+            temp = self._lap_simulation_results.energy_flow_totals()
+        finally:
+            self._lock.unlock()
+        return temp
+
+    def get_window_length(self):
+        """Number of indexes the lap lists keep in memory in streaming mode,
+        None when the whole lap is kept"""
+        self._lock.lockForRead()
+        window_length = self._lap_simulation_results.window_length
+        self._lock.unlock()
+        return window_length
+
+    def set_sector_analytics(self, distance_list, sector_start_indices):
+        """Keep the aggregates of every sector while the lap results are added,
+        see sector_analytics.py. Call after initialize_lap_lists.
+
+        Args:
+            distance_list (list): distance at every index of the track (track.distance_list)
+            sector_start_indices (list): index of the first segment of every sector
+        """
+        self._lock.lockForWrite()
+        self._lap_simulation_results.sector_analytics = SectorAnalytics(distance_list,
+                                                                        sector_start_indices)
+        self._lock.unlock()
+
+    def get_sector_results(self):
+        """Return the aggregates of every sector (list of SectorResults) of the results
+        added so far, empty without sector analytics"""
+        # write lock, stale sectors are updated while reading
+        self._lock.lockForWrite()
+        temp = self._lap_simulation_results.sector_results()
+        self._lock.unlock()
+        return temp
+
+    def discard_lap_results_before(self, begin_index, end_index):
+        """Streaming mode only: finalize the results from begin_index to end_index
+        and drop everything before end_index - 1 from the live window. The dropped
+        segments are reduced to the aggregates of the lap results, the last finalized
+        index is kept as the base of the cumulative lists.
+
+        Args:
+            begin_index (int): first index that was not finalized before
+            end_index (int): index after the last finalized index
+        """
+        self._lock.lockForWrite()
+        self._lap_simulation_results.regenerate_cumulative_lists(begin_index, end_index)
+        self._lap_simulation_results.discard_results_before(end_index - 1)
         self._lock.unlock()
 
     def add_physics_results_to_lap_results(self, physics_results, index):
         self._lock.lockForWrite()
         self._lap_simulation_results.add_physics_results(physics_results, index)
         self._lock.unlock()
-        
+
+    def calculate_lap_results(self, physics_calculation, index, *args):
+        """Calculate the results of the segment at index straight into the lap results,
+        no PhysicsCalculationOutput is created.
+
+        Args:
+            physics_calculation (function): physics calculation of a segment
+                (physics_equations.py), called with args and out, index
+            index (int): index of the segment
+            args: arguments of physics_calculation before out
+        """
+        self._lock.lockForWrite()
+        self._lap_simulation_results.calculate_physics_results(physics_calculation, index, args)
+        self._lock.unlock()
+
+    def get_results_rows_in_range(self, begin_index, end_index):
+        """Return the results from begin_index to end_index as rows for exporting,
+        the columns are in the order of results_writer.RESULTS_HEADER.
+        The cumulative lists are regenerated for the range first, so all indexes
+        before begin_index must already hold their final values.
+
+        Args:
+            begin_index (int): first index of the rows
+            end_index (int): index after the last row
+
+        Returns:
+            rows (list): list of rows, one per simulation index
+        """
+        self._lock.lockForWrite()
+        results = self._lap_simulation_results
+        results.regenerate_cumulative_lists(begin_index, end_index)
+        rows = [[i, results.time_cumulative_list[i], results.distance_cumulative_list[i],
+                 results.velocity_list[i], self._track_properties.max_velocity_list[i],
+                 results.acceleration_list[i], results.motor_power_list[i],
+                 results.battery_power_list[i], results.battery_energy_cumulative_list[i]]
+                for i in range(begin_index, end_index)]
+        self._lock.unlock()
+        return rows
+
+
+
+
+class DiscardedIndexError(IndexError):
+    """Raised by a SlidingWindowList for an index that was discarded from the window"""
 
 
+class SlidingWindowList:
+    """List like container for the streaming simulation mode that only keeps
+    a window of the most recent items in memory. Items are addressed with their
+    index over the whole simulation (like a regular list), items before
+    first_index have been discarded. Setting an item past the end grows the list.
+
+    Negative indexes keep the meaning they have for a regular list (counted
+    back from the last item held in memory).
+
+    Args:
+        fill (object): value of items that have not been set yet
+        window_length (int): number of items allocated up front
+    """
+    def __init__(self, fill, window_length):
+        self._fill = fill
+        self._data = [fill] * window_length
+        self.first_index = 0
+
+    def __len__(self):
+        return self.first_index + len(self._data)
+
+    def _position(self, index):
+        if index < 0:
+            return index
+        position = index - self.first_index
+        if position < 0:
+            raise DiscardedIndexError(
+                "index {} was discarded from the window (first index {})"
+                .format(index, self.first_index))
+        return position
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start = self.first_index if index.start is None else index.start
+            stop = len(self) if index.stop is None else index.stop
+            if start < self.first_index:
+                logger.warning("slice start {} discarded, starting at {}"
+                               .format(start, self.first_index),
+                               extra={'sim_index': start})
+                start = self.first_index
+            return self._data[start - self.first_index:max(stop - self.first_index, 0)]
+        return self._data[self._position(index)]
+
+    def __setitem__(self, index, value):
+        position = self._position(index)
+        if position >= len(self._data):
+            self._data.extend([self._fill] * (position + 1 - len(self._data)))
+        self._data[position] = value
+
+    def discard_before(self, index):
+        """Drop all items before index from memory"""
+        count = min(index - self.first_index, len(self._data))
+        if count > 0:
+            del self._data[:count]
+            self.first_index += count
+
 
 class RacingSimulationResults():
     def __init__(self):
         self.laps_per_pit_stop = 0
         self.lap_time = 0
         self.lap_results = 0
+        # aggregates of every sector of the lap (SectorResults), see sector_analytics.py
+        self.sector_results = []
+        # multi lap races (see race_simulation.py), the fastest feasible strategy
+        # and all evaluated pit stop strategies
+        self.race_results = None
+        self.pit_strategies = []
 
 
 class LapVelocitySimulationResults():
@@ -620,26 +797,58 @@ class LapVelocitySimulationResults():
         self.battery_energy_cumulative_list = []
         self.physics_results_profile = []
 
-    def initialize_lists(self, length):
+        # streaming mode: results before first_available_index were discarded from
+        # the lists and are only kept as aggregates
+        self.first_available_index = 0
+        self.window_length = None
+        self.discarded_aggregates = {'segments': 0,
+                                     'max_velocity': 0,
+                                     'min_velocity': float('inf'),
+                                     'max_motor_power': 0,
+                                     'min_motor_power': 0,
+                                     'energy_flow': None}
+
+        # aggregates of every sector (SectorAnalytics), updated with every added result
+        self.sector_analytics = None
+
+    def initialize_lists(self, length, window_length=None, energy_flow=False):
         """Function to initialize the profile lists after after
         the initialization of the datastore.
+
+        Args:
+            length (int): number of simulation indexes
+            window_length (int): streaming mode, only keep a window of window_length
+                                 indexes in memory (see discard_results_before)
+            energy_flow (bool): the physics results hold the energy flow of every segment
         """
 
-        physics_result_filler = PhysicsCalculationOutput(1, 1, 1, 1, 1, 1)
-
-        # length - 1 is for the because the first element is added above
-        for i in range(length):
-            self.time_cumulative_list.append(0)
-            self.distance_cumulative_list.append(0)
-            self.motor_power_list.append(0)
-            self.battery_power_list.append(0)
-            self.motor_energy_cumulative_list.append(0)
-            self.acceleration_list.append(0)
-            self.velocity_list.append(0)
-            self.battery_energy_list.append(0)
-            self.battery_power_list.append(0)
-            self.battery_energy_cumulative_list.append(0)
-            self.physics_results_profile.append(physics_result_filler)
+        self.window_length = window_length
+        if window_length is not None:
+            window_length = min(length, window_length)
+            self.window_length = window_length
+            self.time_cumulative_list = SlidingWindowList(0, window_length)
+            self.distance_cumulative_list = SlidingWindowList(0, window_length)
+            self.motor_energy_cumulative_list = SlidingWindowList(0, window_length)
+            self.battery_energy_cumulative_list = SlidingWindowList(0, window_length)
+            self.physics_results_profile = PhysicsResultsColumns(0, energy_flow)
+            for attribute in self.physics_results_profile.attributes:
+                setattr(self.physics_results_profile, attribute,
+                        SlidingWindowList(0.0, window_length))
+        else:
+            self.time_cumulative_list = [0] * length
+            self.distance_cumulative_list = [0] * length
+            self.motor_energy_cumulative_list = [0] * length
+            self.battery_energy_cumulative_list = [0] * length
+            self.physics_results_profile = PhysicsResultsColumns(length, energy_flow)
+        self._set_result_lists()
+
+    def _set_result_lists(self):
+        # the result lists are the columns of the physics results
+        self.motor_power_list = self.physics_results_profile.motor_power
+        self.acceleration_list = self.physics_results_profile.acceleration
+        self.velocity_list = self.physics_results_profile.final_velocity
+        self.battery_energy_list = self.physics_results_profile.battery_energy
+        self.battery_power_list = self.physics_results_profile.battery_power
 
     def add_physics_results(self, physics_results, index):
         """Function that inserts physics results at index: index
@@ -651,13 +860,78 @@ class LapVelocitySimulationResults():
             index (int): index at which the physics results should be inserted
 
         """
+        if self.sector_analytics is not None:
+            self.sector_analytics.add_physics_results(physics_results, index,
+                                                      self.physics_results_profile)
         self.physics_results_profile[index] = physics_results
-        self.motor_power_list[index] = physics_results.motor_power
-        self.acceleration_list[index] = physics_results.acceleration
-        self.velocity_list[index] = physics_results.final_velocity
-        self.battery_energy_list[index] = physics_results.battery_energy
-        self.battery_power_list[index] = physics_results.battery_power
-    
+
+    def calculate_physics_results(self, physics_calculation, index, args):
+        """Function that calculates the physics results at index straight into
+        the result lists, see DataStore.calculate_lap_results.
+
+        Args:
+            physics_calculation (function): physics calculation of a segment
+            index (int): index at which the physics results should be calculated
+            args (tuple): arguments of physics_calculation before out
+        """
+        if self.sector_analytics is None:
+            physics_calculation(*args, out=self.physics_results_profile, index=index)
+            return
+        self.sector_analytics.remove_physics_results_row(index, self.physics_results_profile)
+        physics_calculation(*args, out=self.physics_results_profile, index=index)
+        self.sector_analytics.add_physics_results_row(index, self.physics_results_profile)
+
+    def set_physics_results_columns(self, physics_results):
+        """Function that sets the results of a whole lap at once from the physics
+        results of every segment, the cumulative lists included. The result lists
+        are the columns of physics_results, no data is copied.
+
+        Args:
+            physics_results (PhysicsResultsColumns): physics results of every segment
+        """
+        self.physics_results_profile = physics_results
+        self._set_result_lists()
+        self.distance_cumulative_list = list(accumulate(physics_results.distance_traveled))
+        self.time_cumulative_list = list(accumulate(physics_results.time_of_segment))
+        self.motor_energy_cumulative_list = \
+            list(accumulate(physics_results.energy_differential_of_motor))
+        self.battery_energy_cumulative_list = list(accumulate(physics_results.battery_energy))
+
+    def sector_results(self):
+        """Aggregates of every sector (list of SectorResults), empty without
+        sector analytics"""
+        if self.sector_analytics is None:
+            return []
+        return self.sector_analytics.sector_results(self)
+
+    def energy_flow_totals(self, sector_start_indices=None):
+        """Totals of the motor energy and every energy flow term over the lap, or
+        over every sector, see PhysicsResultsColumns.energy_flow_totals. Only for
+        laps calculated with energy_flow (lap solver, driver tracking, SimulationThread).
+        In streaming mode the totals of the discarded results are added, there are
+        no sector totals.
+
+        Args:
+            sector_start_indices (list): first index of every sector
+
+        Returns:
+            totals (dict): attribute -> total (J), or list of the totals of every sector
+        """
+        if not isinstance(self.physics_results_profile, PhysicsResultsColumns):
+            raise Exception("lap results without physics results columns, no energy flow")
+        if self.window_length is None:
+            return self.physics_results_profile.energy_flow_totals(sector_start_indices)
+        if sector_start_indices is not None:
+            raise Exception("sector totals of the energy flow need the whole lap, "
+                            "not available in streaming mode")
+        totals = self.physics_results_profile.slice(
+            self.first_available_index, len(self.physics_results_profile)).energy_flow_totals()
+        discarded_totals = self.discarded_aggregates['energy_flow']
+        if discarded_totals is not None:
+            for attribute, total in discarded_totals.items():
+                totals[attribute] += total
+        return totals
+
     def regenerate_cumulative_lists(self, start_index, end_index):
         """Function that regenerates the cumulaltive lists of data for display from
         start_index to end_index. This is necessary because when the simulation
@@ -675,13 +949,51 @@ class LapVelocitySimulationResults():
 
         """
 
+        physics_results = self.physics_results_profile
         for i in range(start_index, end_index):
-            physics_results = self.physics_results_profile[i]
             self.distance_cumulative_list[i] = (self.distance_cumulative_list[i - 1] +
-                                                physics_results.distance_traveled)
+                                                physics_results.distance_traveled[i])
             self.time_cumulative_list[i] = (self.time_cumulative_list[i - 1] +
-                                            physics_results.time_of_segment)       
+                                            physics_results.time_of_segment[i])
             self.motor_energy_cumulative_list[i] = (self.motor_energy_cumulative_list[i - 1] +
-                                                    physics_results.energy_differential_of_motor)
+                                                    physics_results.energy_differential_of_motor[i])
             self.battery_energy_cumulative_list[i] = (self.battery_energy_cumulative_list[i - 1] +
-                                                      physics_results.battery_energy)
\ No newline at end of file
+                                                      physics_results.battery_energy[i])
+
+    def discard_results_before(self, index):
+        """Streaming mode only: reduce the results before index to aggregates
+        and drop them from the window lists. The cumulative lists must be
+        regenerated up to index before, they carry the totals of the discarded part.
+
+        Args:
+            index (int): first index to keep
+        """
+        begin_index = self.first_available_index
+        if index <= begin_index:
+            return
+        velocities = self.velocity_list[begin_index:index]
+        motor_powers = self.motor_power_list[begin_index:index]
+        if self.sector_analytics is not None:
+            self.sector_analytics.discard_before(index, self)
+        aggregates = self.discarded_aggregates
+        aggregates['segments'] += len(velocities)
+        aggregates['max_velocity'] = max(aggregates['max_velocity'], max(velocities))
+        aggregates['min_velocity'] = min(aggregates['min_velocity'], min(velocities))
+        aggregates['max_motor_power'] = max(aggregates['max_motor_power'], max(motor_powers))
+        aggregates['min_motor_power'] = min(aggregates['min_motor_power'], min(motor_powers))
+        if self.physics_results_profile.energy_flow:
+            discarded_totals = \
+                self.physics_results_profile.slice(begin_index, index).energy_flow_totals()
+            if aggregates['energy_flow'] is not None:
+                for attribute, total in aggregates['energy_flow'].items():
+                    discarded_totals[attribute] += total
+            aggregates['energy_flow'] = discarded_totals
+
+        for results_list in (self.time_cumulative_list, self.distance_cumulative_list,
+                             self.motor_energy_cumulative_list,
+                             self.battery_energy_cumulative_list):
+            results_list.discard_before(index)
+        # the other result lists are columns of the physics results
+        for attribute in self.physics_results_profile.attributes:
+            getattr(self.physics_results_profile, attribute).discard_before(index)
+        self.first_available_index = index
\ No newline at end of file
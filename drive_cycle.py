@@ -0,0 +1,272 @@
+"""Drive cycles from the simulation results and a local FASTSim style energy model.
+
+The simulation is validated against NREL FASTSim with a drive cycle made from the
+results: the velocity over time at a fixed time step (FASTSim cycle columns cycSecs,
+cycMps, cycGrade). DriveCycle resamples the distance indexed results of a lap to
+such a cycle, write_csv writes it for FASTSim.
+
+cycle_energy_calculation replays cycles without FASTSim. It follows the BEV path of
+FASTSim's sim_drive with the variables of the FASTSim car file (the same car file the
+simulation reads), every time step:
+
+    - power at the wheels: drag, acceleration, ascent and rolling resistance at the
+      mean velocity of the step (wheelRrCoef) and the wheel inertia (numWheels)
+    - transmission (transEff), motor efficiency map (see powertrain.Powertrain)
+      and regenerative braking (maxRegen)
+    - auxiliary load (auxKw) and battery losses (essRoundTripEff)
+    - the trace is missed where the motor (maxMotorKw) or the battery (maxEssKw)
+      can not deliver the power
+
+All cycles and cars of a batch are calculated together as arrays of shape
+(scenarios, time steps), so hundreds of validation scenarios are one batch, see
+drive_cycle_validation.
+"""
+import csv
+import logging
+import math
+import numpy
+from physics_equations import GRAVITY
+from powertrain import Powertrain
+
+logger = logging.getLogger(__name__)
+
+CYCLE_TIME_STEP = 1.0
+DRIVE_CYCLE_HEADER = ['cycSecs', 'cycMps', 'cycGrade']
+# default air density of FASTSim (kg/m^3)
+FASTSIM_AIR_DENSITY = 1.2
+
+
+class DriveCycle:
+    """Class that holds a drive cycle: velocity and grade over time.
+
+    Args:
+        time (list): time of every point of the cycle (seconds), increasing
+        velocity (list): velocity at every point (m/s)
+        grade (list): grade of the road at every point (rise over run), 0 if not given
+    """
+    def __init__(self, time, velocity, grade=None):
+        self.time = numpy.asarray(time, dtype=float)
+        self.velocity = numpy.asarray(velocity, dtype=float)
+        self.grade = (numpy.zeros(len(self.time)) if grade is None
+                      else numpy.asarray(grade, dtype=float))
+        if not len(self.time) == len(self.velocity) == len(self.grade):
+            raise Exception("drive cycle columns of different lengths: {}, {}, {}"
+                            .format(len(self.time), len(self.velocity), len(self.grade)))
+        elif len(self.time) < 2:
+            raise Exception("a drive cycle needs at least 2 points, got {}".format(len(self.time)))
+
+    def __len__(self):
+        return len(self.time)
+
+    @classmethod
+    def from_lap_results(cls, lap_results, time_step=CYCLE_TIME_STEP, track=None):
+        """Drive cycle of a lap, the results are interpolated at every time_step.
+        The last point is the end of the lap, the last time step is shorter if the
+        lap time is not a multiple of time_step.
+
+        Args:
+            lap_results (LapVelocitySimulationResults): results of the lap
+            time_step (float): time between the points of the cycle (seconds)
+            track (TrackProperties): track of the lap for the grade, flat if not given
+        """
+        time = numpy.concatenate(([0.0], lap_results.time_cumulative_list))
+        velocity = numpy.concatenate(([lap_results.physics_results_profile[0].initial_velocity],
+                                      lap_results.velocity_list))
+        cycle_time = numpy.arange(0.0, time[-1], time_step)
+        cycle_time = numpy.append(cycle_time, time[-1])
+        cycle_velocity = numpy.interp(cycle_time, time, velocity)
+
+        grade = None
+        if track is not None:
+            distance = numpy.concatenate(([0.0], lap_results.distance_cumulative_list))
+            cycle_distance = numpy.interp(cycle_time, time, distance)
+            track_distance = numpy.asarray(track.distance_list) - track.distance_list[0]
+            segment = numpy.clip(numpy.searchsorted(track_distance, cycle_distance,
+                                                    side='right') - 1,
+                                 0, len(track_distance) - 1)
+            grade = numpy.asarray(track.grade_list)[segment]
+        return cls(cycle_time, cycle_velocity, grade)
+
+    def write_csv(self, filename):
+        """Write the cycle as a FASTSim drive cycle csv file (DRIVE_CYCLE_HEADER)"""
+        with open(filename, 'w', newline='') as csvfile:
+            writer = csv.writer(csvfile, delimiter=',', quoting=csv.QUOTE_MINIMAL)
+            writer.writerow(DRIVE_CYCLE_HEADER)
+            writer.writerows(zip(self.time.tolist(), self.velocity.tolist(), self.grade.tolist()))
+        logger.info("drive cycle written: {}, {} points".format(filename, len(self)),
+                    extra={'sim_index': 'N/A'})
+
+
+class CycleEnergyResults:
+    """Class that contains the results of a batch of drive cycles.
+
+    Args:
+        battery_power (numpy array): power drawn from the battery in every time step
+                                     (Watts), shape (scenarios, time steps), nan after
+                                     the end of a cycle
+        battery_energy (numpy array): energy drawn from the battery over every cycle (joules)
+        trace_missed (numpy array): number of time steps of every cycle the car can not
+                                    drive with its motor and battery power
+        final_state_of_charge (numpy array): state of charge at the end of every cycle,
+                                             starting at maxSoc
+    """
+    def __init__(self, battery_power, battery_energy, trace_missed, final_state_of_charge):
+        self.battery_power = battery_power
+        self.battery_energy = battery_energy
+        self.trace_missed = trace_missed
+        self.final_state_of_charge = final_state_of_charge
+
+
+def _interp_rows(x, x_points, y_points):
+    # numpy.interp with other points on every row, x is (rows, n), the points (rows, k)
+    index = numpy.clip((x[:, :, None] >= x_points[:, None, :]).sum(axis=2) - 1,
+                       0, x_points.shape[1] - 2)
+    x_low = numpy.take_along_axis(x_points, index, axis=1)
+    x_high = numpy.take_along_axis(x_points, index + 1, axis=1)
+    y_low = numpy.take_along_axis(y_points, index, axis=1)
+    y_high = numpy.take_along_axis(y_points, index + 1, axis=1)
+    weight = numpy.clip((x - x_low) / (x_high - x_low), 0.0, 1.0)
+    return y_low + weight * (y_high - y_low)
+
+
+def _car_data_column(car_data_list, name):
+    # one row per scenario, so it broadcasts over the time steps
+    return numpy.array([[float(car_data[name])] for car_data in car_data_list])
+
+
+def cycle_energy_calculation(cycles, car_data_list, air_density=FASTSIM_AIR_DENSITY):
+    """Function that replays a batch of drive cycles with a FASTSim style energy model.
+
+    Args:
+        cycles (list): DriveCycle of every scenario
+        car_data_list (list or dict): car data of every scenario as read by
+                                      project_argparser SingleArg.open_car_dict, or one
+                                      car data for all scenarios
+        air_density (float): density of the air (kg/m^3)
+
+    Returns:
+        results (CycleEnergyResults): battery power and energy of every scenario
+    """
+    if isinstance(car_data_list, dict):
+        car_data_list = [car_data_list] * len(cycles)
+    if len(car_data_list) != len(cycles):
+        raise Exception("{} cars for {} drive cycles".format(len(car_data_list), len(cycles)))
+
+    # cycles of different lengths are padded with their last point, steps after the
+    # end of a cycle do not count
+    steps = max(len(cycle) for cycle in cycles)
+    time = numpy.empty((len(cycles), steps))
+    velocity = numpy.empty((len(cycles), steps))
+    grade = numpy.zeros((len(cycles), steps))
+    for number, cycle in enumerate(cycles):
+        length = len(cycle)
+        time[number, :length] = cycle.time
+        time[number, length:] = cycle.time[-1] + numpy.arange(1, steps - length + 1)
+        velocity[number, :length] = cycle.velocity
+        velocity[number, length:] = cycle.velocity[-1]
+        grade[number, :length] = cycle.grade
+    in_cycle = numpy.arange(1, steps)[None, :] < numpy.array([[len(cycle)] for cycle in cycles])
+
+    mass = _car_data_column(car_data_list, "vehKg")
+    wheel_radius = _car_data_column(car_data_list, "wheelRadiusM")
+    wheel_inertia = (_car_data_column(car_data_list, "wheelInertiaKgM2") *
+                     _car_data_column(car_data_list, "numWheels"))
+    max_motor_power = _car_data_column(car_data_list, "maxMotorKw") * 1000
+    max_battery_power = _car_data_column(car_data_list, "maxEssKw") * 1000
+    transmission_efficiency = _car_data_column(car_data_list, "transEff")
+    battery_efficiency = numpy.sqrt(_car_data_column(car_data_list, "essRoundTripEff"))
+    powertrains = [Powertrain.from_car_data(car_data) for car_data in car_data_list]
+
+    time_step = numpy.diff(time, axis=1)
+    initial_velocity = velocity[:, :-1]
+    final_velocity = velocity[:, 1:]
+    mean_velocity = (initial_velocity + final_velocity) / 2
+    angle = numpy.arctan(grade[:, 1:])
+
+    drag_power = (0.5 * air_density * _car_data_column(car_data_list, "dragCoef") *
+                  _car_data_column(car_data_list, "frontalAreaM2") * mean_velocity ** 3)
+    acceleration_power = mass / (2 * time_step) * (final_velocity ** 2 - initial_velocity ** 2)
+    ascent_power = GRAVITY * numpy.sin(angle) * mass * mean_velocity
+    rolling_resistance_power = (GRAVITY * _car_data_column(car_data_list, "wheelRrCoef") *
+                                numpy.cos(angle) * mass * mean_velocity)
+    wheel_inertia_power = (0.5 * wheel_inertia * ((final_velocity / wheel_radius) ** 2 -
+                                                  (initial_velocity / wheel_radius) ** 2) /
+                           time_step)
+    wheel_power = (drag_power + acceleration_power + ascent_power + rolling_resistance_power +
+                   wheel_inertia_power)
+
+    motor_power = numpy.where(wheel_power > 0, wheel_power / transmission_efficiency,
+                              wheel_power * transmission_efficiency)
+    efficiency = _interp_rows(numpy.minimum(numpy.abs(motor_power) / max_motor_power, 1.0),
+                              numpy.array([powertrain.power_fractions
+                                           for powertrain in powertrains]),
+                              numpy.array([powertrain.efficiencies
+                                           for powertrain in powertrains]))
+    electric_power = numpy.where(motor_power >= 0, motor_power / efficiency,
+                                 motor_power * efficiency *
+                                 _car_data_column(car_data_list, "maxRegen"))
+    electric_power = electric_power + _car_data_column(car_data_list, "auxKw") * 1000
+    battery_power = numpy.where(electric_power >= 0, electric_power / battery_efficiency,
+                                electric_power * battery_efficiency)
+    battery_power = numpy.maximum(battery_power, -max_battery_power)
+
+    missed = ((motor_power > max_motor_power) | (battery_power > max_battery_power)) & in_cycle
+    battery_power = numpy.where(in_cycle, battery_power, numpy.nan)
+    battery_energy = numpy.nansum(battery_power * time_step, axis=1)
+    battery_capacity = numpy.array([car_data["maxEssKwh"] * 3600 * 1000
+                                    for car_data in car_data_list])
+    final_state_of_charge = (numpy.array([car_data["maxSoc"] for car_data in car_data_list]) -
+                             battery_energy / battery_capacity)
+
+    results = CycleEnergyResults(battery_power, battery_energy, missed.sum(axis=1),
+                                 final_state_of_charge)
+    if results.trace_missed.any():
+        logger.warning("trace missed in {} of {} drive cycles".format(
+            int(numpy.count_nonzero(results.trace_missed)), len(cycles)),
+            extra={'sim_index': 'N/A'})
+    return results
+
+
+class DriveCycleValidation:
+    """Class that contains the comparison of simulated laps with their drive cycles.
+
+    Args:
+        simulated_energy (numpy array): battery energy of every simulated lap (joules)
+        cycle_results (CycleEnergyResults): results of the drive cycles of the laps
+    """
+    def __init__(self, simulated_energy, cycle_results):
+        self.simulated_energy = simulated_energy
+        self.cycle_results = cycle_results
+        self.cycle_energy = cycle_results.battery_energy
+        self.relative_error = (simulated_energy - self.cycle_energy) / numpy.abs(self.cycle_energy)
+
+
+def drive_cycle_validation(lap_results_list, car_data_list, tracks=None,
+                           time_step=CYCLE_TIME_STEP, air_density=FASTSIM_AIR_DENSITY):
+    """Function that validates simulated laps: the drive cycle of every lap is replayed
+    with cycle_energy_calculation, all laps in one batch, and the battery energies
+    are compared.
+
+    Args:
+        lap_results_list (list): LapVelocitySimulationResults of every scenario
+        car_data_list (list or dict): car data of every scenario, or one for all scenarios
+        tracks (list): TrackProperties of every scenario for the grade, flat if not given
+        time_step (float): time step of the drive cycles (seconds)
+        air_density (float): density of the air of the drive cycles (kg/m^3)
+
+    Returns:
+        validation (DriveCycleValidation): energies of the laps and the drive cycles
+    """
+    if tracks is None:
+        tracks = [None] * len(lap_results_list)
+    cycles = [DriveCycle.from_lap_results(lap_results, time_step, track)
+              for lap_results, track in zip(lap_results_list, tracks)]
+    cycle_results = cycle_energy_calculation(cycles, car_data_list, air_density)
+    simulated_energy = numpy.array([lap_results.battery_energy_cumulative_list[-1]
+                                    for lap_results in lap_results_list])
+    validation = DriveCycleValidation(simulated_energy, cycle_results)
+    logger.info("drive cycle validation of {} laps, relative energy error: mean {}, max {}"
+                .format(len(cycles), float(numpy.mean(validation.relative_error)),
+                        float(numpy.max(numpy.abs(validation.relative_error)))),
+                extra={'sim_index': 'N/A'})
+    return validation
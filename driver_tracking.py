@@ -0,0 +1,149 @@
+"""Driver tracking: the car follows a given velocity profile.
+
+Instead of full power and full braking, the car drives the velocity of a real driver
+(an aligned telemetry lap, see telemetry.py, or the vx_mps column of the raceline).
+The initial and final velocity of every segment are known up front, so the motor
+power the car needs on every segment is one call of the vectorized constrained
+velocity kernel over the whole track, no pass segment by segment.
+
+A segment of the profile is infeasible when the car can not drive it, checked with
+the same vectorized kernels the lap solver uses, also one call each:
+
+    - the final velocity is above the one of full power from the initial velocity
+      (motor power, drive limits)
+    - the initial velocity is above the one full braking ends at the final velocity
+      with (the braking of the braking envelope)
+    - the final velocity is above the max velocity of the track (cornering limit)
+
+Infeasible segments are flagged, their energy is the energy the profile would need.
+"""
+import logging
+import numpy
+from lap_solver import lap_results_calculation
+from physics_equations import (PhysicsResultsColumns,
+                               constrained_velocity_physics_simulation_vectorized,
+                               max_positive_power_physics_simulation_vectorized,
+                               reverse_max_negative_power_physics_simulation_vectorized)
+from raceline_geometry import (DISTANCE_COLUMN, VELOCITY_COLUMN)
+
+logger = logging.getLogger(__name__)
+
+# relative margin on the velocity limits of a segment, for rounding errors
+FEASIBILITY_TOLERANCE = 1e-9
+
+
+class DriverTrackingResults:
+    """Class that contains the results of a lap that follows a velocity profile.
+
+    Args:
+        lap_results (LapVelocitySimulationResults): results of the lap, comparable with
+                                                    the results of the lap solver
+        over_drive_power (numpy array): segments that need more than the drive power
+        over_braking_power (numpy array): segments that need more than the braking power
+        over_max_velocity (numpy array): segments above the max velocity of the track
+    """
+    def __init__(self, lap_results, over_drive_power, over_braking_power, over_max_velocity):
+        self.lap_results = lap_results
+        self.over_drive_power = over_drive_power
+        self.over_braking_power = over_braking_power
+        self.over_max_velocity = over_max_velocity
+        self.feasible = ~(over_drive_power | over_braking_power | over_max_velocity)
+
+    def infeasible_segments(self):
+        """Indexes of the segments the car can not drive"""
+        return numpy.flatnonzero(~self.feasible).tolist()
+
+
+def velocity_profile_calculation(track, distance, velocity):
+    """Function that interpolates a velocity trace at the distances of the track lists.
+
+    Args:
+        track (TrackProperties): track with generated track lists
+        distance (list): distance of every point of the trace (meters), increasing
+        velocity (list): velocity at every point of the trace (m/s)
+
+    Returns:
+        velocity_list (numpy array): velocity at every distance of track.distance_list
+    """
+    return numpy.interp(track.distance_list, distance, velocity)
+
+
+def velocity_profile_from_track_data(track, track_data):
+    """Function that interpolates the vx_mps column of a raceline file at the
+    distances of the track lists.
+
+    Args:
+        track (TrackProperties): track with generated track lists
+        track_data (list): rows of the raceline file as read by
+                           project_argparser SingleArg.open_track_dict
+
+    Returns:
+        velocity_list (numpy array): velocity at every distance of track.distance_list
+    """
+    return velocity_profile_calculation(track, [row[DISTANCE_COLUMN] for row in track_data],
+                                        [row[VELOCITY_COLUMN] for row in track_data])
+
+
+def driver_tracking_calculation(track, car, air_density, velocity_list, energy_flow=False):
+    """Function that calculates a lap of car on track following a velocity profile.
+
+    Args:
+        track (TrackProperties): track with generated track lists
+        car (dict): Characteristics of car being simulated
+        air_density (float): density of air that the car is traveling through
+        velocity_list (list): velocity at every distance of track.distance_list (m/s),
+                              see velocity_profile_calculation
+        energy_flow (bool): the lap results hold the energy flow of every segment
+
+    Returns:
+        results (DriverTrackingResults): results of the lap and feasibility of every segment
+    """
+    distance = numpy.asarray(track.distance_list, dtype=float)
+    velocity = numpy.asarray(velocity_list, dtype=float)
+    if velocity.shape != distance.shape:
+        raise Exception("velocity profile of length {} for {} track distances"
+                        .format(len(velocity), len(distance)))
+    if numpy.any(velocity <= 0):
+        raise Exception("velocity profile stops the car, the time of a segment is infinite")
+    segments = len(distance) - 1
+    initial_velocity = velocity[:-1]
+    final_velocity = velocity[1:]
+
+    # every segment is a variant of the vectorized kernels
+    segment_arguments = (air_density * numpy.asarray(track.air_density_factor_list[:segments]),
+                         numpy.asarray(track.elevation_change_list[:segments]),
+                         numpy.asarray(track.headwind_list[:segments]),
+                         numpy.asarray(track.rolling_resistance_factor_list[:segments]))
+    distance_of_travel = numpy.diff(distance)
+    physics_results = constrained_velocity_physics_simulation_vectorized(
+        initial_velocity, final_velocity, distance_of_travel, car, *segment_arguments,
+        energy_flow=energy_flow)
+
+    full_power = max_positive_power_physics_simulation_vectorized(
+        initial_velocity, distance_of_travel, car, *segment_arguments)
+    full_braking = reverse_max_negative_power_physics_simulation_vectorized(
+        final_velocity, distance_of_travel, car, *segment_arguments)
+    limit = 1 + FEASIBILITY_TOLERANCE
+    over_drive_power = final_velocity > full_power.final_velocity * limit
+    over_braking_power = initial_velocity > full_braking.initial_velocity * limit
+    over_max_velocity = final_velocity > numpy.asarray(track.max_velocity_list[:segments]) * limit
+
+    columns = PhysicsResultsColumns(0, energy_flow)
+    for attribute in columns.attributes:
+        setattr(columns, attribute, numpy.broadcast_to(getattr(physics_results, attribute),
+                                                       (segments,)).tolist())
+    results = DriverTrackingResults(lap_results_calculation(columns), over_drive_power,
+                                    over_braking_power, over_max_velocity)
+
+    infeasible = segments - int(results.feasible.sum())
+    if infeasible:
+        logger.warning("velocity profile infeasible on {} of {} segments: {} over the drive "
+                       "power, {} over the braking power, {} over the max velocity"
+                       .format(infeasible, segments, int(over_drive_power.sum()),
+                               int(over_braking_power.sum()), int(over_max_velocity.sum())),
+                       extra={'sim_index': 'N/A'})
+    logger.info("driver tracking lap: {} s, battery energy: {} J"
+                .format(results.lap_results.lap_time,
+                        results.lap_results.battery_energy_cumulative_list[-1]),
+                extra={'sim_index': 'N/A'})
+    return results
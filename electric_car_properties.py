@@ -1,7 +1,13 @@
 import logging
+from physics_equations import CarModel
+from powertrain import (Powertrain, DriveLimits)
 
 logger = logging.getLogger(__name__)
 
+# highest tire pressure (bar) a rolling resistance coefficient of a car file is converted to,
+# the rolling resistance calculation has no pressure for coefficients of 0.005 and below
+MAX_WHEEL_PRESSURE_BAR = 10.0
+
 
 # rotational inertia estimation: http://www.hpwizard.com/rotational-inertia.html
 # Make sure all units match! All units should be SI
@@ -49,8 +55,66 @@ class ElectricCarProperties:
 
             self._properties_set = True
 
+    def set_powertrain(self, powertrain):
+        """Set the powertrain that maps the motor power to the battery power
+        (powertrain.Powertrain), without a powertrain the battery power is the motor power."""
+        if not self._properties_set:
+            raise Exception("Car parameters have to be set before the powertrain")
+        self._car_parameters["powertrain"] = powertrain
+
+    def set_drive_limits(self, drive_limits):
+        """Set the torque and traction limits of the motor power (powertrain.DriveLimits),
+        without drive limits the full motor power is available at any velocity."""
+        if not self._properties_set:
+            raise Exception("Car parameters have to be set before the drive limits")
+        self._car_parameters["drive_limits"] = drive_limits
+
     def get_car_parameters(self):
         if self._properties_set:
             return self._car_parameters
         else:
             logger.error("Properties Not Set Yet!", extra={'sim_index': 'N/A'})
+
+    def get_car_model(self):
+        """The car parameters as a CarModel (physics_equations) for the physics
+        calculations, build it once and reuse it for every segment."""
+        if self._properties_set:
+            return CarModel(self._car_parameters)
+        else:
+            logger.error("Properties Not Set Yet!", extra={'sim_index': 'N/A'})
+
+
+def car_properties_from_car_data(car_data, wheel_radius=0.25, friction_factor=1):
+    """Function that creates the car properties from the car data of a FASTSim car file.
+
+    Args:
+        car_data (dict): car data as read by project_argparser SingleArg.open_car_dict
+        wheel_radius (float): radius of the wheels (meters), ~20 in OD on tires by default
+        friction_factor (float): tire friction relative to a dry track for the traction
+                                 limit (environment.Environment.friction_factor)
+
+    Returns:
+        car (ElectricCarProperties): properties of the car
+    """
+    # wheelRrCoef is a rolling resistance coefficient, the rolling resistance calculation
+    # takes the tire pressure: coefficient = 0.005 + 0.01 / pressure at low velocity
+    if car_data["wheelRrCoef"] > 0.005 + 0.01 / MAX_WHEEL_PRESSURE_BAR:
+        wheel_pressure_bar = 0.01 / (car_data["wheelRrCoef"] - 0.005)
+    else:
+        wheel_pressure_bar = MAX_WHEEL_PRESSURE_BAR
+        logger.warning("rolling resistance coefficient {} is below the lowest one of the "
+                       "rolling resistance calculation, using a tire pressure of {} bar"
+                       .format(car_data["wheelRrCoef"], wheel_pressure_bar),
+                       extra={'sim_index': 'N/A'})
+
+    car = ElectricCarProperties()
+    car.set_car_parameters(mass=car_data["vehKg"], rotational_inertia=car_data["wheelInertiaKgM2"],
+                           motor_power=(car_data["maxMotorKw"] * 1000),
+                           motor_efficiency=car_data["motorPeakEff"],
+                           battery_capacity=(car_data["maxEssKwh"] * 3600 * 1000),
+                           drag_coefficient=car_data["dragCoef"],
+                           frontal_area=car_data["frontalAreaM2"], wheel_radius=wheel_radius,
+                           wheel_pressure_bar=wheel_pressure_bar)
+    car.set_powertrain(Powertrain.from_car_data(car_data))
+    car.set_drive_limits(DriveLimits.from_car_data(car_data, friction_factor))
+    return car
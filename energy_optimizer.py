@@ -0,0 +1,306 @@
+"""Energy limited lap optimizer.
+
+Finds the fastest lap that stays within a battery energy budget by limiting the
+drive power of the motor. Braking is not limited, so the braking envelope of the
+car on the track is calculated once and shared by every lap of the search, an
+iteration is one forward pass of the lap solver.
+
+Two strategies are available:
+    - optimize_power_cap(): one power cap for the whole lap, found with bisection.
+    - optimize_sector_power_caps(): a power cap per sector. The track is split into
+      sectors at the anchors of the braking envelope (corner apexes), where the car
+      is back on the envelope and the sectors do not depend on each other. The time
+      and energy of every sector are tabulated once for a set of power caps, the
+      caps are then chosen by bisection on the price of energy (minimize
+      time + price * energy per sector), which only needs table lookups. The caps
+      of the sectors that change at the final price are interpolated between the
+      tabulated ones to use the rest of the budget, and the lap with one power cap
+      is returned instead when it is faster.
+"""
+import logging
+from lap_solver import (braking_envelope_calculation, envelope_anchor_indices,
+                        forward_pass_calculation, lap_results_calculation,
+                        STANDING_START_VELOCITY)
+from physics_equations import PhysicsResultsColumns
+
+logger = logging.getLogger(__name__)
+
+# fractions of the motor power tabulated for every sector, with lower drive power
+# the rolling resistance can stop the car at low velocity
+DEFAULT_POWER_FRACTIONS = (1.0, 0.9, 0.8, 0.7, 0.6, 0.5, 0.4, 0.3)
+
+
+class EnergyLimitedLapResults:
+    """Class that contains the result of an energy limited lap optimization.
+
+    Args:
+        energy_budget (float): battery energy allowed for the lap (joules)
+        sector_start_indices (list): index of the first segment of every sector
+        power_caps (list): drive power cap of every sector (watts)
+        lap_results (LapVelocitySimulationResults): results of the lap with the power caps
+        iterations (int): number of iterations of the search
+    """
+    def __init__(self, energy_budget, sector_start_indices, power_caps, lap_results, iterations):
+        self.energy_budget = energy_budget
+        self.sector_start_indices = list(sector_start_indices)
+        self.power_caps = list(power_caps)
+        self.lap_results = lap_results
+        self.iterations = iterations
+        self.lap_time = lap_results.lap_time
+        self.battery_energy = lap_results.battery_energy_cumulative_list[-1]
+        self.feasible = self.battery_energy <= energy_budget
+
+
+class EnergyLimitedLapOptimizer:
+    """Optimizes the drive power of a car on a track for a lap with an energy budget.
+
+    Args:
+        track (TrackProperties): track with generated track lists
+        car (dict): Characteristics of car being simulated
+        air_density (float): density of air that the car is traveling through
+        initial_velocity (float): velocity at the start line (m/s)
+        power_fractions (tuple): fractions of the motor power that are tabulated for
+                                 the sector power caps, the lowest fraction is also the
+                                 lower bound of the power cap bisection
+        envelope (BrakingEnvelope): braking envelope of car on track, it is calculated
+                                    if not given
+        closed_track (bool): the lap is followed by another lap, see
+                             lap_solver.braking_envelope_calculation (only if envelope
+                             is not given)
+    """
+    def __init__(self, track, car, air_density, initial_velocity=STANDING_START_VELOCITY,
+                 power_fractions=DEFAULT_POWER_FRACTIONS, envelope=None, closed_track=False):
+        self.track = track
+        self.car = car
+        self.air_density = air_density
+        self.initial_velocity = initial_velocity
+        self.power_fractions = sorted(power_fractions, reverse=True)
+        if self.power_fractions[-1] <= 0 or self.power_fractions[0] > 1:
+            raise Exception("Invalid power fractions {}".format(power_fractions))
+
+        if envelope is None:
+            envelope = braking_envelope_calculation(track, car, air_density,
+                                                    closed_track=closed_track)
+        self._envelope = envelope
+        self.sector_start_indices = [0] + envelope_anchor_indices(envelope)
+        self._sector_tables = None
+        self.laps_calculated = 0
+
+    def _capped_car(self, power_cap):
+        car = dict(self.car)
+        car["motor_power"] = power_cap
+        return car
+
+    def _sector_bounds(self, sector):
+        begin_index = self.sector_start_indices[sector]
+        if sector + 1 < len(self.sector_start_indices):
+            end_index = self.sector_start_indices[sector + 1]
+        else:
+            end_index = len(self.track.distance_list) - 1
+        return begin_index, end_index
+
+    def lap(self, power_caps):
+        """Calculate a lap with a drive power cap per sector.
+
+        Args:
+            power_caps (list): drive power cap of every sector (watts)
+
+        Returns:
+            lap_results (LapVelocitySimulationResults): results of the lap
+        """
+        physics_results = PhysicsResultsColumns(len(self.track.distance_list) - 1)
+        velocity = self.initial_velocity
+        for sector, power_cap in enumerate(power_caps):
+            begin_index, end_index = self._sector_bounds(sector)
+            forward_pass_calculation(self.track, self._capped_car(power_cap), self.air_density,
+                                     velocity, self._envelope, begin_index, end_index,
+                                     physics_results)
+            velocity = physics_results.final_velocity[end_index - 1]
+        self.laps_calculated += 1
+        return lap_results_calculation(physics_results)
+
+    def optimize_power_cap(self, energy_budget, tolerance=0.001):
+        """Find the highest drive power cap for the whole lap that stays within
+        energy_budget with bisection.
+
+        Args:
+            energy_budget (float): battery energy allowed for the lap (joules)
+            tolerance (float): stop when the power cap is known to within this
+                               fraction of the motor power
+
+        Returns:
+            results (EnergyLimitedLapResults): the optimized lap, not feasible if
+                                               even the lowest power cap uses too much energy
+        """
+        sectors = len(self.sector_start_indices)
+        motor_power = self.car["motor_power"]
+
+        def lap_with_fraction(fraction):
+            lap_results = self.lap([fraction * motor_power] * sectors)
+            return lap_results, lap_results.battery_energy_cumulative_list[-1]
+
+        iterations = 1
+        high_fraction = self.power_fractions[0]
+        lap_results, energy = lap_with_fraction(high_fraction)
+        if energy <= energy_budget:
+            return EnergyLimitedLapResults(energy_budget, self.sector_start_indices,
+                                           [high_fraction * motor_power] * sectors,
+                                           lap_results, iterations)
+
+        iterations += 1
+        low_fraction = self.power_fractions[-1]
+        low_lap_results, energy = lap_with_fraction(low_fraction)
+        if energy > energy_budget:
+            logger.warning("energy budget {} can not be met, lowest power cap uses {}"
+                           .format(energy_budget, energy),
+                           extra={'sim_index': 'N/A'})
+            return EnergyLimitedLapResults(energy_budget, self.sector_start_indices,
+                                           [low_fraction * motor_power] * sectors,
+                                           low_lap_results, iterations)
+
+        while high_fraction - low_fraction > tolerance:
+            iterations += 1
+            fraction = (high_fraction + low_fraction) / 2
+            lap_results, energy = lap_with_fraction(fraction)
+            if energy <= energy_budget:
+                low_fraction = fraction
+                low_lap_results = lap_results
+            else:
+                high_fraction = fraction
+
+        logger.info("power cap optimized, cap: {}, iterations: {}"
+                    .format(low_fraction * motor_power, iterations),
+                    extra={'sim_index': 'N/A'})
+        return EnergyLimitedLapResults(energy_budget, self.sector_start_indices,
+                                       [low_fraction * motor_power] * sectors,
+                                       low_lap_results, iterations)
+
+    def sector_tables(self):
+        """Time and battery energy of every sector for every power fraction. The
+        tables are calculated on first use and shared by all later optimizations.
+
+        A sector after the first starts at the envelope velocity of its anchor,
+        the velocity of a car that braked for the corner.
+
+        Returns:
+            sector_tables (list): per sector a list of (time, battery energy) tuples,
+                                  one per power fraction
+        """
+        if self._sector_tables is not None:
+            return self._sector_tables
+
+        motor_power = self.car["motor_power"]
+        # every sector is calculated into the same columns
+        physics_results = PhysicsResultsColumns(len(self.track.distance_list) - 1)
+        self._sector_tables = []
+        for sector in range(len(self.sector_start_indices)):
+            begin_index, end_index = self._sector_bounds(sector)
+            if begin_index == 0:
+                velocity = self.initial_velocity
+            else:
+                velocity = self._envelope.velocity_list[begin_index - 1]
+            table = []
+            for fraction in self.power_fractions:
+                forward_pass_calculation(
+                    self.track, self._capped_car(fraction * motor_power), self.air_density,
+                    velocity, self._envelope, begin_index, end_index, physics_results)
+                table.append((sum(physics_results.time_of_segment[begin_index:end_index]),
+                              sum(physics_results.battery_energy[begin_index:end_index])))
+            self._sector_tables.append(table)
+        return self._sector_tables
+
+    def _sector_choices(self, energy_price):
+        """Index of the power fraction of every sector that minimizes
+        time + energy_price * energy, and the total tabulated energy."""
+        choices = []
+        energy = 0
+        for table in self.sector_tables():
+            choice = min(range(len(table)),
+                         key=lambda i: table[i][0] + energy_price * table[i][1])
+            choices.append(choice)
+            energy += table[choice][1]
+        return choices, energy
+
+    def optimize_sector_power_caps(self, energy_budget, iterations=60, corrections=3):
+        """Find a drive power cap for every sector that minimizes the lap time
+        within energy_budget.
+
+        The caps are chosen from the sector tables, the lap with those caps is then
+        calculated. The choices just below and just above the budget differ in the
+        sectors that change at the final energy price, their caps are interpolated
+        linearly between the two choices by the budget left. When the calculated
+        lap uses more energy than the tables predicted (a sector did not start on
+        the envelope, or the interpolation), the tabulated budget is reduced by the
+        difference and the caps are chosen again. The lap with one power cap for
+        the whole lap (optimize_power_cap) is returned instead when it is faster.
+
+        Args:
+            energy_budget (float): battery energy allowed for the lap (joules)
+            iterations (int): number of bisection steps on the energy price
+            corrections (int): maximum number of budget corrections
+
+        Returns:
+            results (EnergyLimitedLapResults): the optimized lap, not feasible if
+                                               the budget could not be met
+        """
+        motor_power = self.car["motor_power"]
+        tabulated_budget = energy_budget
+        total_iterations = 0
+        for _ in range(corrections + 1):
+            choices, energy = self._sector_choices(0)
+            power_fractions = [self.power_fractions[choice] for choice in choices]
+            if energy > tabulated_budget:
+                # find an energy price high enough to meet the budget
+                high_price = 1e-9
+                choices, energy = self._sector_choices(high_price)
+                while energy > tabulated_budget and high_price < 1e9:
+                    high_price *= 4
+                    choices, energy = self._sector_choices(high_price)
+                low_price = 0
+                over_choices, over_energy = self._sector_choices(low_price)
+                for _ in range(iterations):
+                    total_iterations += 1
+                    price = (low_price + high_price) / 2
+                    price_choices, price_energy = self._sector_choices(price)
+                    if price_energy <= tabulated_budget:
+                        high_price = price
+                        choices = price_choices
+                        energy = price_energy
+                    else:
+                        low_price = price
+                        over_choices = price_choices
+                        over_energy = price_energy
+
+                # the budget left is spent on the sectors that change at the final price
+                weight = 0
+                if over_energy > energy:
+                    weight = float(min(max((tabulated_budget - energy) /
+                                           (over_energy - energy), 0), 1))
+                power_fractions = [self.power_fractions[choice] + weight *
+                                   (self.power_fractions[over_choice] -
+                                    self.power_fractions[choice])
+                                   for choice, over_choice in zip(choices, over_choices)]
+
+            power_caps = [fraction * motor_power for fraction in power_fractions]
+            lap_results = self.lap(power_caps)
+            lap_energy = lap_results.battery_energy_cumulative_list[-1]
+            if lap_energy <= energy_budget:
+                break
+            tabulated_budget -= lap_energy - energy_budget
+
+        results = EnergyLimitedLapResults(energy_budget, self.sector_start_indices,
+                                          power_caps, lap_results, total_iterations)
+        # the sector tables only hold a few power caps, one cap for the whole lap may
+        # use the budget better
+        power_cap_results = self.optimize_power_cap(energy_budget)
+        if power_cap_results.feasible and (not results.feasible or
+                                           power_cap_results.lap_time < results.lap_time):
+            logger.info("one power cap for the whole lap is faster than the sector power caps, "
+                        "{} s against {} s".format(power_cap_results.lap_time, results.lap_time),
+                        extra={'sim_index': 'N/A'})
+            power_cap_results.iterations += total_iterations
+            return power_cap_results
+        logger.info("sector power caps optimized, caps: {}, lap time: {}, energy: {}, feasible: {}"
+                    .format(power_caps, results.lap_time, results.battery_energy, results.feasible),
+                    extra={'sim_index': 'N/A'})
+        return results
@@ -0,0 +1,175 @@
+"""Weather of a race: air density, wind and precipitation.
+
+The Environment is read from the ENVIRONMENT section of race_init.ini and applied to a
+track with generated track lists. Everything is calculated once with numpy for the
+whole track list:
+
+    - air density at the elevation of every segment from the ambient temperature
+    - headwind of every segment from the wind and the heading of the raceline
+    - rolling resistance of a wet or snowy track
+
+The physics calculations only look up the values of a segment. Precipitation also
+lowers the tire friction, see friction_factor, which is used for the curvature
+velocity constraints.
+"""
+import logging
+import math
+import numpy
+from physics_equations import GRAVITY
+
+logger = logging.getLogger(__name__)
+
+GAS_CONSTANT_DRY_AIR = 287.05  # J/(kg*K)
+ZERO_CELSIUS = 273.15  # K
+# international standard atmosphere at sea level
+STANDARD_PRESSURE = 101325  # Pa
+STANDARD_TEMPERATURE = 288.15  # K
+TEMPERATURE_LAPSE_RATE = 0.0065  # K/m
+
+# effect of precipitation at full intensity (rain_amount or snow_amount of 1)
+RAIN_FRICTION_REDUCTION = 0.3
+SNOW_FRICTION_REDUCTION = 0.7
+RAIN_ROLLING_RESISTANCE_INCREASE = 0.2
+SNOW_ROLLING_RESISTANCE_INCREASE = 1.0
+
+
+def air_density_calculation(temperature, elevation):
+    """Function that calculates the density of dry air, the pressure is the pressure
+    of the standard atmosphere at the elevation.
+
+    Args:
+        temperature (float): air temperature (celsius)
+        elevation (float or numpy array): elevation above sea level (meters)
+
+    Returns:
+        air_density (float or numpy array): density of the air (kg/meters^3)
+    """
+    pressure = STANDARD_PRESSURE * (1 - TEMPERATURE_LAPSE_RATE * numpy.asarray(elevation) /
+                                    STANDARD_TEMPERATURE) ** \
+        (GRAVITY / (GAS_CONSTANT_DRY_AIR * TEMPERATURE_LAPSE_RATE))
+    return pressure / (GAS_CONSTANT_DRY_AIR * (temperature + ZERO_CELSIUS))
+
+
+def headwind_calculation(heading, wind_speed, wind_direction):
+    """Function that calculates the wind velocity against the direction of travel.
+
+    Args:
+        heading (float or numpy array): heading of the car (radians, zero is north,
+                                        counterclockwise as psi_rad of the raceline)
+        wind_speed (float): speed of the wind (m/s)
+        wind_direction (float): direction the wind comes from (radians, pi/2 is north)
+
+    Returns:
+        headwind (float or numpy array): headwind (m/s), negative for a tailwind
+    """
+    # the direction of travel in the same angle convention as the wind direction
+    return wind_speed * numpy.cos(wind_direction - (numpy.asarray(heading) + math.pi / 2))
+
+
+class Environment:
+    """Class that holds the weather of a race.
+
+    Args:
+        air_density (float): density of the air at the start line (kg/meters^3), it is
+                             calculated from the ambient temperature and the elevation
+                             of the start line if not given
+        ambient_temperature (float): air temperature (celsius)
+        wind_speed (float): speed of the wind (m/s)
+        wind_direction (float): direction the wind comes from (radians, pi/2 is north),
+                                None for no wind
+        rain (bool): it is raining
+        rain_amount (float): intensity of the rain, 0 to 1
+        snow (bool): it is snowing
+        snow_amount (float): intensity of the snow, 0 to 1
+    """
+    def __init__(self, air_density=None, ambient_temperature=STANDARD_TEMPERATURE - ZERO_CELSIUS,
+                 wind_speed=0, wind_direction=None, rain=False, rain_amount=0, snow=False,
+                 snow_amount=0):
+        if not 0 <= rain_amount <= 1:
+            raise Exception("Invalid rain_amount {}, must be 0 to 1".format(rain_amount))
+        elif not 0 <= snow_amount <= 1:
+            raise Exception("Invalid snow_amount {}, must be 0 to 1".format(snow_amount))
+        elif air_density is not None and air_density < 0:
+            raise Exception("Invalid air_density {}".format(air_density))
+        self.air_density = air_density
+        self.ambient_temperature = ambient_temperature
+        self.wind_speed = wind_speed
+        self.wind_direction = wind_direction
+        self.rain = rain
+        self.rain_amount = rain_amount
+        self.snow = snow
+        self.snow_amount = snow_amount
+
+    @classmethod
+    def from_ini(cls, init_vals):
+        """Create the environment from the ENVIRONMENT section of race_init.ini,
+        air_density = auto calculates the air density.
+
+        Args:
+            init_vals (ConfigParser): contents of race_init.ini
+        """
+        air_density = init_vals.get("ENVIRONMENT", "air_density", fallback="auto")
+        wind_direction = init_vals.get("ENVIRONMENT", "wind_direction", fallback="None")
+        return cls(air_density=None if air_density == "auto" else float(air_density),
+                   ambient_temperature=init_vals.getfloat("ENVIRONMENT", "ambient_temp",
+                                                          fallback=15),
+                   wind_speed=init_vals.getfloat("ENVIRONMENT", "wind_speed", fallback=0),
+                   wind_direction=None if wind_direction == "None" else float(wind_direction),
+                   rain=init_vals.getboolean("ENVIRONMENT", "rain", fallback=False),
+                   rain_amount=init_vals.getfloat("ENVIRONMENT", "rain_amount", fallback=0),
+                   snow=init_vals.getboolean("ENVIRONMENT", "snow", fallback=False),
+                   snow_amount=init_vals.getfloat("ENVIRONMENT", "snow_amount", fallback=0))
+
+    @property
+    def friction_factor(self):
+        """Tire friction relative to a dry track"""
+        factor = 1
+        if self.rain:
+            factor *= 1 - RAIN_FRICTION_REDUCTION * self.rain_amount
+        if self.snow:
+            factor *= 1 - SNOW_FRICTION_REDUCTION * self.snow_amount
+        return factor
+
+    @property
+    def rolling_resistance_factor(self):
+        """Rolling resistance relative to a dry track"""
+        factor = 1
+        if self.rain:
+            factor *= 1 + RAIN_ROLLING_RESISTANCE_INCREASE * self.rain_amount
+        if self.snow:
+            factor *= 1 + SNOW_ROLLING_RESISTANCE_INCREASE * self.snow_amount
+        return factor
+
+    def apply(self, track):
+        """Function that sets the air density and the environment lists of the track,
+        it has to be called after generate_track_list.
+
+        Args:
+            track (TrackProperties): track with generated track lists
+
+        Returns:
+            Nothing
+        """
+        elevation = numpy.asarray(track.elevation_list, dtype=float)
+        # the ambient temperature is the temperature at the track, the air density
+        # only changes with the pressure along the track
+        air_density = air_density_calculation(self.ambient_temperature, elevation)
+        if self.air_density is not None:
+            track.set_air_density(self.air_density)
+        else:
+            track.set_air_density(float(air_density[0]))
+        air_density_factor = air_density / air_density[0]
+
+        if self.wind_direction is None or self.wind_speed == 0:
+            headwind = numpy.zeros(len(elevation))
+        else:
+            headwind = headwind_calculation(numpy.asarray(track.heading_list, dtype=float),
+                                            self.wind_speed, self.wind_direction)
+
+        track.set_environment_lists(air_density_factor.tolist(), headwind.tolist(),
+                                    [self.rolling_resistance_factor] * len(elevation))
+        logger.info("environment, air density: {}, headwind: {} to {}, friction factor: {}, "
+                    "rolling resistance factor: {}"
+                    .format(track.get_air_density(), headwind.min(), headwind.max(),
+                            self.friction_factor, self.rolling_resistance_factor),
+                    extra={'sim_index': 'N/A'})
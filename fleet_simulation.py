@@ -0,0 +1,194 @@
+"""Fleet simulation: many cars on one track at the same time.
+
+The cars of the fleet are the variants of a batch of the vectorized lap solver, their
+states are advanced as arrays segment by segment, so the python overhead of a segment
+is paid once for the whole fleet. Comparing a car against a field of FASTSim vehicles
+costs about one lap instead of one lap per car.
+
+The results are kept in a car indexed columnar store: one array of shape
+(cars, segments) per result column (same column names as the results export), the
+row of a car is contiguous.
+"""
+import logging
+import numbers
+import numpy
+from electric_car_properties import car_properties_from_car_data
+from lap_solver import (lap_velocity_calculation_vectorized, STANDING_START_VELOCITY)
+from powertrain import DriveLimits
+from results_writer import RESULTS_HEADER
+from run_file import write_run_file
+
+logger = logging.getLogger(__name__)
+
+# car parameters that are used by the physics kernels
+_CAR_PARAMETERS = ('mass', 'rotational_inertia', 'motor_power', 'motor_efficiency',
+                   'battery_capacity', 'drag_coefficient', 'frontal_area',
+                   'wheel_radius', 'wheel_pressure_bar')
+
+
+class FleetResults:
+    """Car indexed columnar results of a fleet simulation.
+
+    Args:
+        car_names (list): name of every car, in car index order
+        columns (dict): column name -> array of shape (cars, segments)
+    """
+    def __init__(self, car_names, columns):
+        self.car_names = list(car_names)
+        self.columns = columns
+        self.lap_time = columns['Time'][:, -1]
+        self.battery_energy = columns['Battery Energy'][:, -1]
+
+    def __len__(self):
+        return len(self.car_names)
+
+    def __getitem__(self, column_name):
+        return self.columns[column_name]
+
+    def car_results(self, car):
+        """Results of one car.
+
+        Args:
+            car (int or string): index or name of the car
+
+        Returns:
+            columns (dict): column name -> array of the car's segments
+        """
+        # also numpy integers, e.g. an index from numpy.argmin of the lap times
+        if not isinstance(car, numbers.Integral):
+            car = self.car_names.index(car)
+        return {name: values[car] for name, values in self.columns.items()}
+
+    def ranking(self):
+        """Cars sorted by lap time, cars that could not finish the lap last.
+
+        Returns:
+            ranking (list): (car name, lap time, battery energy) tuples
+        """
+        order = sorted(range(len(self.car_names)),
+                       key=lambda car: (numpy.isnan(self.lap_time[car]), self.lap_time[car]))
+        return [(self.car_names[car], float(self.lap_time[car]), float(self.battery_energy[car]))
+                for car in order]
+
+    def write_run_file(self, filename, metadata=None, compress=False):
+        """Write the results to a run file in long format, one row per car and
+        segment with an additional CarIndex column. The car names are stored
+        in the metadata.
+
+        Args:
+            filename (string): name of the run file
+            metadata (dict): metadata of the run
+            compress (bool): compress the columns with zlib
+        """
+        cars, segments = self.columns['Velocity'].shape
+        columns = {'CarIndex': numpy.repeat(numpy.arange(cars, dtype='int64'), segments)}
+        columns.update((name, values.ravel()) for name, values in self.columns.items())
+        metadata = dict(metadata) if metadata is not None else {}
+        metadata['fleet'] = {'car_names': self.car_names}
+        write_run_file(filename, columns, metadata, compress)
+
+
+class FleetSimulation:
+    """Simulates a fleet of cars on one track.
+
+    Args:
+        track (TrackProperties): track with generated track lists
+        cars (list): Characteristics of every car being simulated (car parameter dicts)
+        air_density (float): density of air that the cars are traveling through
+        car_names (list): name of every car, defaults to "car <index>"
+    """
+    def __init__(self, track, cars, air_density, car_names=None):
+        if not cars:
+            raise Exception("Fleet without cars")
+        if car_names is None:
+            car_names = ["car {}".format(index) for index in range(len(cars))]
+        elif len(car_names) != len(cars):
+            raise Exception("{} car names for {} cars".format(len(car_names), len(cars)))
+        self.track = track
+        self.cars = cars
+        self.air_density = air_density
+        self.car_names = list(car_names)
+
+    @classmethod
+    def from_car_data(cls, track, car_data_list, air_density, friction_factor=1):
+        """Create the fleet from the car data of FASTSim car files.
+
+        Args:
+            track (TrackProperties): track with generated track lists
+            car_data_list (list): car data dicts as read by project_argparser
+                                  SingleArg.open_car_dict
+            air_density (float): density of air that the cars are traveling through
+            friction_factor (float): tire friction relative to a dry track
+                                     (environment.Environment.friction_factor)
+        """
+        cars = [car_properties_from_car_data(car_data, friction_factor=friction_factor)
+                .get_car_parameters()
+                for car_data in car_data_list]
+        car_names = [car_data.get("Scenario name", "car {}".format(index))
+                     for index, car_data in enumerate(car_data_list)]
+        return cls(track, cars, air_density, car_names)
+
+    def run(self, initial_velocity=STANDING_START_VELOCITY, closed_track=False):
+        """Simulate one lap of every car of the fleet.
+
+        Args:
+            initial_velocity (float): velocity at the start line (m/s), at most the
+                                      velocity every car can enter the lap with
+            closed_track (bool): the lap is followed by another lap, see
+                                 lap_solver.braking_envelope_calculation
+
+        Returns:
+            results (FleetResults): results of the fleet
+        """
+        batch = {name: numpy.array([car[name] for car in self.cars], dtype=float)
+                 for name in _CAR_PARAMETERS}
+        if any(car.get("drive_limits") is not None for car in self.cars):
+            # one table row per car, a car without drive limits only has its motor power
+            batch["drive_limits"] = DriveLimits.stack(
+                [car["drive_limits"] if car.get("drive_limits") is not None
+                 else DriveLimits.unlimited(car["motor_power"]) for car in self.cars])
+        lap_results = lap_velocity_calculation_vectorized(self.track, batch, self.air_density,
+                                                          initial_velocity,
+                                                          closed_track=closed_track)
+
+        # segments x cars -> cars x segments, the batch has no powertrain so the
+        # battery energy of the lap results is the motor energy
+        velocity = numpy.ascontiguousarray(lap_results.velocity_array.T)
+        time_of_segment = numpy.ascontiguousarray(lap_results.time_array.T)
+        motor_power = numpy.ascontiguousarray(lap_results.battery_energy_array.T) / time_of_segment
+        # every car has its own powertrain, applied to all segments of the car at once
+        battery_power = motor_power.copy()
+        for car_index, car in enumerate(self.cars):
+            if car.get("powertrain") is not None:
+                battery_power[car_index] = \
+                    car["powertrain"].battery_power_vectorized(motor_power[car_index])
+        initial_velocities = numpy.empty_like(velocity)
+        initial_velocities[:, 0] = initial_velocity
+        initial_velocities[:, 1:] = velocity[:, :-1]
+        distance = numpy.asarray(self.track.distance_list, dtype=float)[1:velocity.shape[1] + 1]
+        segments = velocity.shape[1]
+
+        columns = {
+            'SimulationIndex': numpy.broadcast_to(numpy.arange(segments, dtype='int64'),
+                                                  velocity.shape),
+            'Time': numpy.cumsum(time_of_segment, axis=1),
+            'Distance': numpy.broadcast_to(distance, velocity.shape),
+            'Velocity': velocity,
+            'Max Velocity': numpy.broadcast_to(
+                numpy.asarray(self.track.max_velocity_list, dtype=float)[:segments],
+                velocity.shape),
+            'Acceleration': (velocity - initial_velocities) / time_of_segment,
+            'Motor Power': motor_power,
+            'Battery Power': battery_power,
+            'Battery Energy': numpy.cumsum(battery_power * time_of_segment, axis=1),
+        }
+        results = FleetResults(self.car_names, {name: columns[name] for name in RESULTS_HEADER})
+
+        for name, lap_time in zip(self.car_names, results.lap_time):
+            if numpy.isnan(lap_time):
+                logger.warning("car {} could not finish the lap".format(name),
+                               extra={'sim_index': 'N/A'})
+        logger.info("fleet simulated, {} cars, ranking: {}"
+                    .format(len(self.cars), results.ranking()),
+                    extra={'sim_index': 'N/A'})
+        return results
@@ -0,0 +1,614 @@
+"""Headless lap solver.
+
+Calculates the velocity profile of one lap without the DataStore and GUI machinery
+of the SimulationThread, for the parts of the simulation that need many laps
+(races, optimizers, sweeps).
+
+Instead of walking back every time a velocity constraint is violated, the braking
+envelope of the track is calculated first with one backward pass: the highest
+velocity at every index from which the car can still brake for all constraints
+ahead. The forward pass then accelerates with maximum power and follows the
+braking envelope where the acceleration profile runs into it, which gives the
+same profile as the walk back. The envelope only depends on the track and the car,
+so it can be calculated once and reused for every lap.
+
+For laps that follow each other (races) the envelope is calculated with closed_track:
+the backward pass wraps around the finish line, so the end of a lap is also limited by
+braking for the first constraints of the next lap and every lap ends with a velocity
+the next lap can be entered with. A lap can not be entered above the braking envelope,
+the forward passes raise an Exception for such an initial velocity.
+
+The vectorized functions solve a batch of variants of the car (e.g. perturbed
+parameters) in one pass over the track, every car parameter and the air density
+can be an array with one element per variant.
+
+The scalar passes write the results of every segment into preallocated
+PhysicsResultsColumns (one list per result) instead of creating a
+PhysicsCalculationOutput per segment.
+
+With energy_flow the results also hold the energy flow of every segment (drag,
+rolling resistance, kinetic, rotational and potential energy, see
+physics_equations.ENERGY_FLOW_ATTRIBUTES), calculated by the kernels in the same
+calls. The totals per lap and per sector come from energy_flow_totals.
+
+For the big data lists, the data at index i represents the data going between the
+distance at index i and the distance at index (i + 1), same as in the DataStore.
+
+lap_time_domain_calculation steps through the lap in time instead of distance: every
+row of its results is one time step, with the same result columns. The braking
+envelope is still calculated on the distance segments of the track, a time step
+follows it where full power would go above it.
+"""
+import logging
+import math
+from bisect import bisect_right
+import numpy
+from datastore import LapVelocitySimulationResults
+from physics_equations import (CarModel, PhysicsResultsColumns, ENERGY_FLOW_ATTRIBUTES,
+                               max_positive_power_physics_simulation,
+                               constrained_velocity_physics_simulation,
+                               reverse_max_negative_power_physics_simulation,
+                               max_positive_power_physics_simulation_vectorized,
+                               constrained_velocity_physics_simulation_vectorized,
+                               reverse_max_negative_power_physics_simulation_vectorized)
+
+logger = logging.getLogger(__name__)
+
+# m/s, free acceleration can not start at a stand still (zero time of travel), this is
+# also the velocity the SimulationThread starts a lap with
+STANDING_START_VELOCITY = 1
+
+# relative margin on the envelope velocity a lap is entered with, for rounding errors
+# (e.g. the end velocity of a lap of the scalar solver entering a vectorized envelope)
+ENTRY_VELOCITY_TOLERANCE = 1e-9
+
+
+class BrakingEnvelope:
+    """Braking envelope of a car on a track.
+
+    Args:
+        velocity_list (list): highest allowed velocity at the end of every segment (m/s)
+        braking_results (PhysicsResultsColumns): results of a maximum braking calculation
+                                                 ending at the envelope velocity of every
+                                                 segment (a list of PhysicsCalculationOutput
+                                                 for the vectorized envelope)
+    """
+    def __init__(self, velocity_list, braking_results):
+        self.velocity_list = velocity_list
+        self.braking_results = braking_results
+
+
+def braking_envelope_calculation(track, car, air_density, energy_flow=False,
+                                 closed_track=False):
+    """Function that calculates the braking envelope of car on track with a
+    backward pass from the end of the track.
+
+    Args:
+        track (TrackProperties): track with generated track lists
+        car (CarModel or dict): Characteristics of car being simulated
+        air_density (float): density of air that the car is traveling through
+        energy_flow (bool): the braking results hold the energy flow, needed for the
+                            energy flow of the laps calculated with the envelope
+        closed_track (bool): the lap is followed by another lap, the end of the lap is
+                             also limited by braking for the start of the next lap
+
+    Returns:
+        envelope (BrakingEnvelope): braking envelope of the track
+    """
+    car = CarModel.from_car(car)
+    distance_list = track.distance_list
+    max_velocity_list = track.max_velocity_list
+    elevation_change_list = track.elevation_change_list
+    air_density_factor_list = track.air_density_factor_list
+    headwind_list = track.headwind_list
+    rolling_resistance_factor_list = track.rolling_resistance_factor_list
+    segments = len(distance_list) - 1
+
+    velocity_list = [math.inf] * segments
+    braking_results = PhysicsResultsColumns(segments, energy_flow)
+    braking_initial_velocity_list = braking_results.initial_velocity
+
+    def backward_pass(velocity):
+        # walk back from the end of the track as long as the envelope is lowered,
+        # returns True if the pass lowered the envelope up to the start line
+        for i in range(segments - 1, -1, -1):
+            # velocity at the end of segment i is limited by the constraint at i and by
+            # the velocity segment i + 1 can be entered with
+            velocity = min(velocity, max_velocity_list[i])
+            if velocity >= velocity_list[i]:
+                return False
+            velocity_list[i] = velocity
+            reverse_max_negative_power_physics_simulation(
+                velocity, distance_list[i + 1] - distance_list[i], car,
+                air_density * air_density_factor_list[i], elevation_change_list[i],
+                headwind_list[i], rolling_resistance_factor_list[i], braking_results, i)
+            velocity = braking_initial_velocity_list[i]
+        return True
+
+    lowered_to_start = backward_pass(max_velocity_list[segments - 1])
+    # the next lap is entered with the velocity at the end of this lap, only the braking
+    # zones in front of the finish line are calculated again
+    while closed_track and lowered_to_start:
+        lowered_to_start = backward_pass(braking_initial_velocity_list[0])
+
+    return BrakingEnvelope(velocity_list, braking_results)
+
+
+def _check_entry_velocity(initial_velocity, entry_velocity, index):
+    # a car that is faster than the braking envelope can not brake for the constraints
+    # ahead, the forward passes would jump down to the envelope without a braking zone
+    if initial_velocity > entry_velocity * (1 + ENTRY_VELOCITY_TOLERANCE):
+        raise Exception("initial velocity {} m/s of segment {} is above the braking envelope "
+                        "({} m/s), laps that follow another lap need a closed_track envelope"
+                        .format(initial_velocity, index, entry_velocity))
+
+
+def envelope_anchor_indices(envelope):
+    """Function that finds the anchors of the braking envelope: the indexes where
+    a segment starts at a local minimum of the envelope (the apex of a corner).
+    A car that brakes for the corner enters the segment at exactly the envelope
+    velocity, so the track can be split into sectors at the anchors.
+
+    Args:
+        envelope (BrakingEnvelope): braking envelope of the track
+
+    Returns:
+        anchor_indices (list): indexes of the segments that start at an anchor
+    """
+    velocity_list = envelope.velocity_list
+    anchor_indices = []
+    for i in range(2, len(velocity_list)):
+        # first index of a (possibly flat) minimum, velocity_list[i - 1] is the
+        # velocity at the start of segment i
+        if velocity_list[i - 1] < velocity_list[i - 2] and velocity_list[i - 1] <= velocity_list[i]:
+            anchor_indices.append(i)
+    return anchor_indices
+
+
+def forward_pass_calculation(track, car, air_density, initial_velocity, envelope,
+                             begin_index, end_index, out=None):
+    """Function that calculates the segments from begin_index to end_index with
+    maximum power, following the braking envelope where the car runs into it.
+
+    Args:
+        track (TrackProperties): track with generated track lists
+        car (CarModel or dict): Characteristics of car being simulated (motor_power is
+                                used for driving, braking comes from the envelope)
+        air_density (float): density of air that the car is traveling through
+        initial_velocity (float): velocity at the start of segment begin_index (m/s), at
+                                  most the envelope velocity the segment can be entered with
+        envelope (BrakingEnvelope): braking envelope of the track
+        begin_index (int): first segment to calculate
+        end_index (int): segment after the last segment to calculate
+        out (PhysicsResultsColumns): columns to write the results into, segment i is
+                                     written into row i, new columns for all segments
+                                     of the track if not given (with energy flow if the
+                                     braking results of the envelope have it)
+
+    Returns:
+        out (PhysicsResultsColumns): results of the track, rows begin_index to end_index
+                                     are calculated
+
+    Raises:
+        Exception: initial_velocity is above the braking envelope
+    """
+    car = CarModel.from_car(car)
+    distance_list = track.distance_list
+    elevation_change_list = track.elevation_change_list
+    air_density_factor_list = track.air_density_factor_list
+    headwind_list = track.headwind_list
+    rolling_resistance_factor_list = track.rolling_resistance_factor_list
+    envelope_velocity_list = envelope.velocity_list
+    braking_results = envelope.braking_results
+    braking_initial_velocity_list = braking_results.initial_velocity
+    if begin_index < end_index:
+        _check_entry_velocity(initial_velocity, braking_initial_velocity_list[begin_index],
+                              begin_index)
+    if out is None:
+        out = PhysicsResultsColumns(len(distance_list) - 1, braking_results.energy_flow)
+    final_velocity_list = out.final_velocity
+
+    velocity = initial_velocity
+    for i in range(begin_index, end_index):
+        distance_of_travel = distance_list[i + 1] - distance_list[i]
+        segment_air_density = air_density * air_density_factor_list[i]
+        max_positive_power_physics_simulation(velocity,
+                                              distance_of_travel,
+                                              car,
+                                              segment_air_density,
+                                              elevation_change_list[i],
+                                              headwind_list[i],
+                                              rolling_resistance_factor_list[i],
+                                              out,
+                                              i)
+        if final_velocity_list[i] > envelope_velocity_list[i]:
+            if velocity < braking_initial_velocity_list[i]:
+                # the acceleration profile meets the braking profile in this segment
+                constrained_velocity_physics_simulation(
+                    velocity, envelope_velocity_list[i], distance_of_travel, car,
+                    segment_air_density, elevation_change_list[i], headwind_list[i],
+                    rolling_resistance_factor_list[i], out, i)
+            else:
+                # on the braking profile, the segment is entered with the envelope velocity
+                out.copy_row(i, braking_results, i)
+        velocity = final_velocity_list[i]
+
+    return out
+
+
+def lap_results_calculation(physics_results):
+    """Function that puts the physics results of all segments of a lap together
+    into lap results.
+
+    Args:
+        physics_results (PhysicsResultsColumns): results of every segment of the lap,
+                                                 the lap results take over the columns
+
+    Returns:
+        results (LapVelocitySimulationResults): results of the lap, end_velocity and
+                                                lap_time are set
+    """
+    results = LapVelocitySimulationResults()
+    results.set_physics_results_columns(physics_results)
+    results.end_velocity = results.velocity_list[-1]
+    results.lap_time = results.time_cumulative_list[-1]
+    return results
+
+
+def _envelope_with_energy_flow(envelope, energy_flow):
+    # an envelope without energy flow can not give the energy flow of the braking segments
+    if energy_flow and not envelope.braking_results.energy_flow:
+        raise Exception("energy flow asked for with a braking envelope without energy flow, "
+                        "see braking_envelope_calculation")
+    return envelope
+
+
+def lap_velocity_calculation(track, car, air_density,
+                             initial_velocity=STANDING_START_VELOCITY,
+                             envelope=None, energy_flow=False, closed_track=False):
+    """Function that calculates the velocity profile of a car on a track over one lap
+    starting with initial_velocity.
+
+    Args:
+        track (TrackProperties): track with generated track lists
+        car (CarModel or dict): Characteristics of car being simulated
+        air_density (float): density of air that the car is traveling through
+        initial_velocity (float): velocity at the start line (m/s)
+        envelope (BrakingEnvelope): braking envelope of car on track, it is calculated
+                                    if not given
+        energy_flow (bool): the results hold the energy flow of every segment, the lap
+                            results then have energy_flow_totals
+        closed_track (bool): the lap is followed by another lap, see
+                             braking_envelope_calculation (only if envelope is not given)
+
+    Returns:
+        results (LapVelocitySimulationResults): results of the lap, end_velocity and
+                                                lap_time are set
+
+    Raises:
+        Exception: initial_velocity is above the braking envelope
+    """
+    car = CarModel.from_car(car)
+    if envelope is None:
+        envelope = braking_envelope_calculation(track, car, air_density, energy_flow,
+                                                closed_track)
+    _envelope_with_energy_flow(envelope, energy_flow)
+
+    physics_results = forward_pass_calculation(track, car, air_density, initial_velocity,
+                                               envelope, 0, len(track.distance_list) - 1)
+    return lap_results_calculation(physics_results)
+
+
+# seconds, time step of lap_time_domain_calculation
+TIME_DOMAIN_TIME_STEP = 0.1
+
+
+def lap_time_domain_calculation(track, car, air_density, time_step=TIME_DOMAIN_TIME_STEP,
+                                initial_velocity=STANDING_START_VELOCITY, envelope=None,
+                                energy_flow=False, closed_track=False):
+    """Function that calculates one lap of a car on a track in time steps.
+
+    With full power a step is exactly time_step long, the distance of the step is the
+    initial velocity times time_step. Where full power would go above the braking
+    envelope, the car follows the envelope with a step of time_step at the mean
+    velocity, the time of such a step is close to time_step (adaptive). A step ends at
+    the next minimum of the envelope, so a corner shorter than a step is not stepped
+    over, and the last step at the end of the track, those steps are shorter.
+
+    Args:
+        track (TrackProperties): track with generated track lists
+        car (CarModel or dict): Characteristics of car being simulated
+        air_density (float): density of air that the car is traveling through
+        time_step (float): time of a step (seconds)
+        initial_velocity (float): velocity at the start line (m/s)
+        envelope (BrakingEnvelope): braking envelope of car on track, it is calculated
+                                    if not given
+        energy_flow (bool): the results hold the energy flow of every time step
+        closed_track (bool): the lap is followed by another lap, see
+                             braking_envelope_calculation (only if envelope is not given)
+
+    Returns:
+        results (LapVelocitySimulationResults): results of the lap, one index per time step
+
+    Raises:
+        Exception: initial_velocity is above the braking envelope
+    """
+    car = CarModel.from_car(car)
+    if envelope is None:
+        envelope = braking_envelope_calculation(track, car, air_density,
+                                                closed_track=closed_track)
+    _check_entry_velocity(initial_velocity, envelope.braking_results.initial_velocity[0], 0)
+    distance_list = track.distance_list
+    grade_list = track.grade_list
+    air_density_factor_list = track.air_density_factor_list
+    headwind_list = track.headwind_list
+    rolling_resistance_factor_list = track.rolling_resistance_factor_list
+    last_segment = len(distance_list) - 2
+    end_distance = distance_list[-1]
+    # envelope velocity at every distance of the track list
+    envelope_velocity_list = ([envelope.braking_results.initial_velocity[0]] +
+                              list(envelope.velocity_list))
+    # distances where the envelope goes up again, the corners a step does not go past
+    envelope_minimum_distances = [
+        distance_list[i] for i in range(1, len(envelope_velocity_list) - 1)
+        if envelope_velocity_list[i - 1] >= envelope_velocity_list[i] <
+        envelope_velocity_list[i + 1]] + [end_distance]
+
+    def segment_index(distance):
+        return min(max(bisect_right(distance_list, distance) - 1, 0), last_segment)
+
+    def step_end_distance(distance):
+        # the next minimum of the envelope or the end of the track
+        return envelope_minimum_distances[bisect_right(envelope_minimum_distances,
+                                                       distance + 1e-9)]
+
+    def envelope_velocity(distance):
+        i = segment_index(distance)
+        fraction = (distance - distance_list[i]) / (distance_list[i + 1] - distance_list[i])
+        return (envelope_velocity_list[i] +
+                min(fraction, 1.0) * (envelope_velocity_list[i + 1] - envelope_velocity_list[i]))
+
+    out = PhysicsResultsColumns(math.ceil((end_distance - distance_list[0]) /
+                                          (initial_velocity * time_step)) + 1, energy_flow)
+    final_velocity_list = out.final_velocity
+    velocity = initial_velocity
+    distance = distance_list[0]
+    step = 0
+    while end_distance - distance > 1e-9:
+        if step == len(out):
+            out.extend(len(out))
+        i = segment_index(distance)
+        segment_air_density = air_density * air_density_factor_list[i]
+        max_distance_of_travel = step_end_distance(distance) - distance
+        distance_of_travel = min(velocity * time_step, max_distance_of_travel)
+        max_positive_power_physics_simulation(velocity,
+                                              distance_of_travel,
+                                              car,
+                                              segment_air_density,
+                                              grade_list[i] * distance_of_travel,
+                                              headwind_list[i],
+                                              rolling_resistance_factor_list[i],
+                                              out,
+                                              step)
+        if final_velocity_list[step] > envelope_velocity(distance + distance_of_travel):
+            # follow the envelope, the length of the step at the mean velocity
+            final_velocity = envelope_velocity(distance + distance_of_travel)
+            for _ in range(2):
+                distance_of_travel = min(time_step * (velocity + final_velocity) / 2,
+                                         max_distance_of_travel)
+                final_velocity = envelope_velocity(distance + distance_of_travel)
+            constrained_velocity_physics_simulation(
+                velocity, final_velocity, distance_of_travel, car, segment_air_density,
+                grade_list[i] * distance_of_travel, headwind_list[i],
+                rolling_resistance_factor_list[i], out, step)
+        velocity = final_velocity_list[step]
+        distance += distance_of_travel
+        step += 1
+
+    return lap_results_calculation(out.slice(0, step))
+
+
+class LapBatchResults:
+    """Class that contains the results of a batch of laps, one lap per variant.
+
+    Args:
+        velocity_array (numpy.ndarray): velocity at the end of every segment,
+                                        shape (segments, variants)
+        time_array (numpy.ndarray): time of every segment, shape (segments, variants)
+        battery_energy_array (numpy.ndarray): battery energy of every segment,
+                                              shape (segments, variants)
+        energy_flow_arrays (dict): attribute of ENERGY_FLOW_ATTRIBUTES -> energy of every
+                                   segment, shape (segments, variants), None without
+                                   energy flow
+    """
+    def __init__(self, velocity_array, time_array, battery_energy_array,
+                 energy_flow_arrays=None):
+        self.velocity_array = velocity_array
+        self.time_array = time_array
+        self.battery_energy_array = battery_energy_array
+        self.energy_flow_arrays = energy_flow_arrays
+        self.lap_time = time_array.sum(axis=0)
+        self.battery_energy = battery_energy_array.sum(axis=0)
+        self.end_velocity = velocity_array[-1]
+
+    def energy_flow_totals(self, sector_start_indices=None):
+        """Totals of every energy flow term over the lap, or over every sector.
+
+        Args:
+            sector_start_indices (list): first segment of every sector, the first sector
+                                         starts at 0 (see sector_analytics.py)
+
+        Returns:
+            totals (dict): attribute of ENERGY_FLOW_ATTRIBUTES -> total of every variant,
+                           shape (variants,), or (sectors, variants) with sector_start_indices
+        """
+        if self.energy_flow_arrays is None:
+            raise Exception("laps calculated without energy flow")
+        if sector_start_indices is None:
+            return {attribute: energy.sum(axis=0)
+                    for attribute, energy in self.energy_flow_arrays.items()}
+        return {attribute: numpy.add.reduceat(energy, sector_start_indices, axis=0)
+                for attribute, energy in self.energy_flow_arrays.items()}
+
+
+def variant_count(cars, air_density):
+    """Number of variants of a batch, the length of the longest parameter array"""
+    return max(numpy.size(value) for value in list(cars.values()) + [air_density])
+
+
+def braking_envelope_calculation_vectorized(track, cars, air_density, energy_flow=False,
+                                            closed_track=False):
+    """Vectorized braking_envelope_calculation for a batch of variants.
+
+    Args:
+        track (TrackProperties): track with generated track lists
+        cars (dict): Characteristics of car being simulated, every value is an array with
+                     one element per variant or a float shared by all variants
+        air_density (float or numpy.ndarray): density of air that the car is traveling through
+        energy_flow (bool): the braking results hold the energy flow
+        closed_track (bool): the lap is followed by another lap, see
+                             braking_envelope_calculation
+
+    Returns:
+        envelope (BrakingEnvelope): braking envelope of the track, velocity_list is an array
+                                    of shape (segments, variants) and the attributes of the
+                                    braking results are arrays with one element per variant
+    """
+    distance_list = track.distance_list
+    max_velocity_list = track.max_velocity_list
+    elevation_change_list = track.elevation_change_list
+    air_density_factor_list = track.air_density_factor_list
+    headwind_list = track.headwind_list
+    rolling_resistance_factor_list = track.rolling_resistance_factor_list
+    segments = len(distance_list) - 1
+
+    velocity_array = numpy.full((segments, variant_count(cars, air_density)), numpy.inf)
+    braking_results = [None] * segments
+
+    def backward_pass(velocity):
+        # same as in braking_envelope_calculation, a segment is calculated again as long
+        # as the envelope of any variant is lowered (a variant that could not be
+        # calculated is nan and does not keep the pass going)
+        for i in range(segments - 1, -1, -1):
+            velocity = numpy.minimum(velocity, max_velocity_list[i])
+            if numpy.all((velocity >= velocity_array[i]) | numpy.isnan(velocity)):
+                return False
+            velocity = numpy.minimum(velocity, velocity_array[i])
+            velocity_array[i] = velocity
+            physics_results = reverse_max_negative_power_physics_simulation_vectorized(
+                velocity, distance_list[i + 1] - distance_list[i], cars,
+                air_density * air_density_factor_list[i], elevation_change_list[i],
+                headwind_list[i], rolling_resistance_factor_list[i], energy_flow)
+            braking_results[i] = physics_results
+            velocity = physics_results.initial_velocity
+        return True
+
+    lowered_to_start = backward_pass(numpy.full(velocity_array.shape[1],
+                                                float(max_velocity_list[segments - 1])))
+    while closed_track and lowered_to_start:
+        lowered_to_start = backward_pass(braking_results[0].initial_velocity)
+
+    return BrakingEnvelope(velocity_array, braking_results)
+
+
+def lap_velocity_calculation_vectorized(track, cars, air_density,
+                                        initial_velocity=STANDING_START_VELOCITY,
+                                        envelope=None, energy_flow=False, closed_track=False):
+    """Vectorized lap_velocity_calculation, calculates one lap for every variant
+    in a single pass over the track.
+
+    Args:
+        track (TrackProperties): track with generated track lists
+        cars (dict): Characteristics of car being simulated, every value is an array with
+                     one element per variant or a float shared by all variants (the
+                     powertrain is one shared Powertrain or a list of one per variant)
+        air_density (float or numpy.ndarray): density of air that the car is traveling through
+        initial_velocity (float or numpy.ndarray): velocity at the start line (m/s)
+        envelope (BrakingEnvelope): vectorized braking envelope of the batch, it is
+                                    calculated if not given (with energy_flow it must
+                                    have been calculated with energy_flow)
+        energy_flow (bool): the results hold the energy flow of every segment and variant
+        closed_track (bool): the lap is followed by another lap, see
+                             braking_envelope_calculation (only if envelope is not given)
+
+    Returns:
+        results (LapBatchResults): results of the laps, a variant that could not be
+                                   calculated has nan values
+
+    Raises:
+        Exception: the initial velocity of a variant is above the braking envelope
+    """
+    if envelope is None:
+        envelope = braking_envelope_calculation_vectorized(track, cars, air_density,
+                                                           energy_flow, closed_track)
+    distance_list = track.distance_list
+    elevation_change_list = track.elevation_change_list
+    air_density_factor_list = track.air_density_factor_list
+    headwind_list = track.headwind_list
+    rolling_resistance_factor_list = track.rolling_resistance_factor_list
+    envelope_velocity_array = envelope.velocity_list
+    braking_results = envelope.braking_results
+    segments, variants = envelope_velocity_array.shape
+
+    velocity_array = numpy.empty((segments, variants))
+    time_array = numpy.empty((segments, variants))
+    battery_energy_array = numpy.empty((segments, variants))
+    energy_flow_arrays = None
+    if energy_flow:
+        energy_flow_arrays = {attribute: numpy.empty((segments, variants))
+                              for attribute in ENERGY_FLOW_ATTRIBUTES}
+
+    velocity = numpy.zeros(variants) + initial_velocity
+    entry_velocity = numpy.broadcast_to(braking_results[0].initial_velocity, velocity.shape)
+    over_entry = velocity > entry_velocity * (1 + ENTRY_VELOCITY_TOLERANCE)
+    if over_entry.any():
+        variant = int(numpy.argmax(over_entry))
+        _check_entry_velocity(velocity[variant], entry_velocity[variant], 0)
+    for i in range(segments):
+        distance_of_travel = distance_list[i + 1] - distance_list[i]
+        segment_air_density = air_density * air_density_factor_list[i]
+        physics_results = max_positive_power_physics_simulation_vectorized(
+            velocity, distance_of_travel, cars, segment_air_density, elevation_change_list[i],
+            headwind_list[i], rolling_resistance_factor_list[i], energy_flow)
+        final_velocity = physics_results.final_velocity
+        time_of_segment = physics_results.time_of_segment
+        battery_energy = physics_results.battery_energy
+
+        over_envelope = final_velocity > envelope_velocity_array[i]
+        any_over_envelope = over_envelope.any()
+        constrained = None
+        if any_over_envelope:
+            # same cases as forward_pass_calculation, on the braking profile by default
+            # (entered with the envelope velocity)
+            braking = braking_results[i]
+            final_velocity = numpy.where(over_envelope, braking.final_velocity, final_velocity)
+            time_of_segment = numpy.where(over_envelope, braking.time_of_segment, time_of_segment)
+            battery_energy = numpy.where(over_envelope, braking.battery_energy, battery_energy)
+
+            meets_envelope = over_envelope & (velocity < braking.initial_velocity)
+            if meets_envelope.any():
+                constrained = constrained_velocity_physics_simulation_vectorized(
+                    velocity, envelope_velocity_array[i], distance_of_travel, cars,
+                    segment_air_density, elevation_change_list[i], headwind_list[i],
+                    rolling_resistance_factor_list[i], energy_flow)
+                time_of_segment = numpy.where(meets_envelope, constrained.time_of_segment,
+                                              time_of_segment)
+                battery_energy = numpy.where(meets_envelope, constrained.battery_energy,
+                                             battery_energy)
+
+        if energy_flow:
+            for attribute, energy_array in energy_flow_arrays.items():
+                energy = getattr(physics_results, attribute)
+                if any_over_envelope:
+                    energy = numpy.where(over_envelope, getattr(braking, attribute), energy)
+                    if constrained is not None:
+                        energy = numpy.where(meets_envelope, getattr(constrained, attribute),
+                                             energy)
+                energy_array[i] = energy
+
+        velocity_array[i] = final_velocity
+        time_array[i] = time_of_segment
+        battery_energy_array[i] = battery_energy
+        velocity = final_velocity
+
+    return LapBatchResults(velocity_array, time_array, battery_energy_array, energy_flow_arrays)
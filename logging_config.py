@@ -14,7 +14,8 @@ def configure_logging():
     logger = logging.getLogger()
     logger.setLevel(logging.DEBUG)
 
-    formatter = logging.Formatter('{levelname:.1s}, {sim_index}, {message}, {funcName}, {module}', style='{',)
+    formatter = logging.Formatter('{levelname:.1s}, {sim_index}, {message}, {funcName}, {module}',
+                                  style='{',)
 
     consoleHandler = logging.StreamHandler()
     consoleHandler.setLevel(logging.INFO)
@@ -1,7 +1,11 @@
-#This is the driver code that launches the GUI (MainWindow), which in turn begins the simulation (SimulationThread). 
-#Arguments, for options including logging, csv file loading and csv file output are taken care of here, as well. 
+#This is the driver code that launches the GUI (MainWindow), which in turn begins the simulation
+#(SimulationThread).
+#Arguments, for options including logging, csv file loading and csv file output are taken care of
+#here, as well.
 #
-#To launch: python3 main.py -l [on|off] -c [car csv file name -- defaults to included file] -t [track csv file name -- defaults to included file] -o [desired output file name]
+#To launch: python3 main.py -l [on|off] -c [car csv file name -- defaults to included file]
+#           -t [track csv file name -- defaults to included file] -o [desired output file name]
+#           -p [on|off, simulation in a separate process]
 #
 
 import sys
@@ -11,6 +15,7 @@ import cProfile
 from project_argparser import (SingleArg, call_args, call_ini)
 from visualization import MainWindow
 from simulation import SimulationThread
+from simulation_process import SimulationProcess
 from datastore import DataStore
 from logging_config import configure_logging
 from PyQt5.QtWidgets import (QApplication, QGridLayout, QGroupBox, QDoubleSpinBox)
@@ -21,21 +26,34 @@ if __name__ == "__main__":
 
     args = call_args()
     init_vals = call_ini()
-    if args["logging_arg"].arg_check(args["parsed_args"].logging):
+    logging_enabled = args["logging_arg"].arg_check(args["parsed_args"].logging)
+    if logging_enabled:
         configure_logging()
 
     output_filename = args["parsed_args"].output
+    compress_output = args["compress_arg"].arg_check(args["parsed_args"].compress)
 
     car_data = args["car_arg"].open_car_dict(args["parsed_args"].car)
     track_data = args["track_arg"].open_track_dict(args["parsed_args"].track)
 
-    data_store = DataStore()
-    logger.info("MainWindow: DataStore initialized",
-                    extra={'sim_index': data_store.get_simulation_index()})
-    simulation_thread = SimulationThread(data_store, logger, track_data, car_data, init_vals)
+    input_files = {"car": args["parsed_args"].car, "track": args["parsed_args"].track}
 
     MainApp = QApplication(sys.argv)
-    window = MainWindow(data_store, simulation_thread, logger, output_filename)
+    if args["process_arg"].arg_check(args["parsed_args"].process):
+        # the simulation runs in its own process, results are read from shared memory
+        simulation_thread = SimulationProcess(track_data, car_data, init_vals, output_filename,
+                                              input_files, compress_output, logging_enabled)
+        data_store = simulation_thread.results
+        MainApp.aboutToQuit.connect(simulation_thread.stop)
+    else:
+        data_store = DataStore()
+        logger.info("MainWindow: DataStore initialized",
+                        extra={'sim_index': data_store.get_simulation_index()})
+        simulation_thread = SimulationThread(data_store, logger, track_data, car_data, init_vals,
+                                             output_filename, input_files, compress_output)
+
+    window = MainWindow(data_store, simulation_thread, logger)
     window.show()
 
-    sys.exit(cProfile.runctx("MainApp.exec_()", globals(), locals(), './results/cProfile-results/profile-display.out'))
+    sys.exit(cProfile.runctx("MainApp.exec_()", globals(), locals(),
+                             './results/cProfile-results/profile-display.out'))
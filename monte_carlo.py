@@ -0,0 +1,333 @@
+"""Monte Carlo sensitivity analysis of lap time and battery energy.
+
+Uncertain inputs of the car (drag_coefficient, frontal_area, mass, wheel_pressure_bar,
+motor_efficiency) and the air density are sampled from user specified distributions,
+every sample is one lap calculated with the headless lap solver. The motor efficiency
+is the peak efficiency of the powertrain, its efficiency map is scaled to every sample
+(Powertrain.with_peak_efficiency), so it needs a car with a powertrain.
+
+Samples are calculated in tasks of samples_per_task samples by a pool of worker
+processes. Every task draws its samples from its own random generator seeded with a
+child of one numpy SeedSequence, so a run with the same seed gives the same samples
+no matter how many workers there are or in which order tasks finish.
+
+Statistics are updated as tasks finish, run() hands the partial results to a callback
+and iter_run() yields them, so long runs can be watched while they are calculated.
+
+Usage:
+    analysis = MonteCarloAnalysis(track, car, air_density,
+                                  {"mass": ParameterDistribution("normal", 1000, 20),
+                                   "air_density": ParameterDistribution("uniform", 1.1, 1.3)},
+                                  seed=42)
+    results = analysis.run(2000)
+    print(results.summary())
+"""
+import logging
+import math
+import multiprocessing
+import statistics
+import numpy
+from lap_solver import (lap_velocity_calculation, STANDING_START_VELOCITY)
+
+logger = logging.getLogger(__name__)
+
+UNCERTAIN_CAR_PARAMETERS = ('drag_coefficient', 'frontal_area', 'mass',
+                            'wheel_pressure_bar', 'motor_efficiency')
+UNCERTAIN_PARAMETERS = UNCERTAIN_CAR_PARAMETERS + ('air_density',)
+
+
+class ParameterDistribution:
+    """Distribution of an uncertain input.
+
+    Args:
+        kind (string): "normal" (mean, standard deviation), "uniform" (low, high),
+                       "triangular" (low, mode, high) or "lognormal" (mean and
+                       standard deviation of the underlying normal distribution)
+        *parameters (float): parameters of the distribution
+    """
+    KINDS = {"normal": 2, "uniform": 2, "triangular": 3, "lognormal": 2}
+
+    def __init__(self, kind, *parameters):
+        if kind not in self.KINDS:
+            raise Exception("Invalid distribution {}".format(kind))
+        elif len(parameters) != self.KINDS[kind]:
+            raise Exception("Distribution {} takes {} parameters, {} given"
+                            .format(kind, self.KINDS[kind], len(parameters)))
+        self.kind = kind
+        self.parameters = parameters
+
+    def sample(self, generator, size):
+        """Draw size samples with the numpy random generator."""
+        return getattr(generator, self.kind)(*self.parameters, size=size)
+
+
+class RunningStatistics:
+    """Statistics of a value that are updated one sample at a time
+    (Welford's algorithm for mean and variance). The samples are kept
+    for percentiles.
+    """
+    def __init__(self):
+        self.count = 0
+        self.mean = 0
+        self._sum_of_squares = 0
+        self.values = []
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._sum_of_squares += delta * (value - self.mean)
+        self.values.append(value)
+
+    @property
+    def variance(self):
+        if self.count < 2:
+            return 0
+        return self._sum_of_squares / (self.count - 1)
+
+    @property
+    def standard_deviation(self):
+        return math.sqrt(self.variance)
+
+    def confidence_interval(self, confidence=0.95):
+        """Confidence interval of the mean (normal approximation).
+
+        Args:
+            confidence (float): confidence level, 0 to 1
+
+        Returns:
+            interval (tuple): (low, high)
+        """
+        if self.count == 0:
+            return (math.nan, math.nan)
+        z = statistics.NormalDist().inv_cdf(0.5 + confidence / 2)
+        half_width = z * self.standard_deviation / math.sqrt(self.count)
+        return (self.mean - half_width, self.mean + half_width)
+
+    def percentiles(self, percentiles):
+        """Percentiles (0 to 100) of the samples, e.g. (5, 50, 95) for a 90% band"""
+        if self.count == 0:
+            return [math.nan] * len(percentiles)
+        return list(numpy.percentile(self.values, percentiles))
+
+
+class MonteCarloSample:
+    """One sample of a Monte Carlo run.
+
+    Args:
+        sample_index (int): index of the sample in the run
+        parameters (dict): sampled value of every uncertain parameter
+        lap_time (float): time of the lap (seconds), None if the lap failed
+        battery_energy (float): battery energy used over the lap (joules), None if the lap failed
+    """
+    def __init__(self, sample_index, parameters, lap_time, battery_energy):
+        self.sample_index = sample_index
+        self.parameters = parameters
+        self.lap_time = lap_time
+        self.battery_energy = battery_energy
+
+
+class MonteCarloResults:
+    """Results of a (possibly unfinished) Monte Carlo run.
+
+    Args:
+        requested_samples (int): number of samples of the run
+    """
+    def __init__(self, requested_samples):
+        self.requested_samples = requested_samples
+        self.samples = []
+        self.lap_time = RunningStatistics()
+        self.battery_energy = RunningStatistics()
+        # samples for which the lap could not be calculated (e.g. invalid parameters)
+        self.failed_samples = 0
+
+    def add_sample(self, sample):
+        self.samples.append(sample)
+        if sample.lap_time is None:
+            self.failed_samples += 1
+        else:
+            self.lap_time.add(sample.lap_time)
+            self.battery_energy.add(sample.battery_energy)
+
+    @property
+    def complete(self):
+        return len(self.samples) == self.requested_samples
+
+    def summary(self, confidence=0.95, percentiles=(5, 50, 95)):
+        """Text summary of lap time and battery energy"""
+        lines = ["{} of {} samples, {} failed".format(len(self.samples), self.requested_samples,
+                                                     self.failed_samples)]
+        for name, values in (("lap time (s)", self.lap_time),
+                             ("battery energy (J)", self.battery_energy)):
+            low, high = values.confidence_interval(confidence)
+            lines.append("{}: mean {:.6g}, std {:.6g}, {:.0f}% CI of mean [{:.6g}, {:.6g}], "
+                         "percentiles {}: {}"
+                         .format(name, values.mean, values.standard_deviation, confidence * 100,
+                                 low, high, list(percentiles),
+                                 ["{:.6g}".format(value)
+                                  for value in values.percentiles(percentiles)]))
+        return "\n".join(lines)
+
+
+# state of a worker process, set once by _initialize_worker so the track is not
+# sent with every task
+_worker_state = {}
+
+
+def _initialize_worker(track, car, air_density, distributions, initial_velocity):
+    _worker_state['track'] = track
+    _worker_state['car'] = car
+    _worker_state['air_density'] = air_density
+    _worker_state['distributions'] = distributions
+    _worker_state['initial_velocity'] = initial_velocity
+
+
+def _run_task(task):
+    """Draw and calculate the samples of one task.
+
+    Args:
+        task (tuple): (index of the first sample, number of samples, SeedSequence of the task)
+
+    Returns:
+        samples (list): MonteCarloSample of every sample of the task
+    """
+    first_sample_index, sample_count, seed_sequence = task
+    generator = numpy.random.default_rng(seed_sequence)
+    # sample parameter by parameter in a fixed order, so the samples only depend on the seed
+    sampled_values = {name: distribution.sample(generator, sample_count)
+                      for name, distribution in sorted(_worker_state['distributions'].items())}
+
+    samples = []
+    for i in range(sample_count):
+        parameters = {name: float(values[i]) for name, values in sampled_values.items()}
+        car = dict(_worker_state['car'])
+        car.update((name, value) for name, value in parameters.items()
+                   if name in UNCERTAIN_CAR_PARAMETERS)
+        air_density = parameters.get('air_density', _worker_state['air_density'])
+        lap_time = None
+        battery_energy = None
+        if _valid_sample(car, air_density):
+            if 'motor_efficiency' in parameters:
+                car['powertrain'] = car['powertrain'].with_peak_efficiency(
+                    car['motor_efficiency'])
+            try:
+                lap_results = lap_velocity_calculation(_worker_state['track'], car, air_density,
+                                                       _worker_state['initial_velocity'])
+                lap_time = float(lap_results.lap_time)
+                battery_energy = float(lap_results.battery_energy_cumulative_list[-1])
+            except (ValueError, TypeError, ZeroDivisionError) as error:
+                logger.warning("sample {} failed: {}".format(first_sample_index + i, error),
+                               extra={'sim_index': 'N/A'})
+        samples.append(MonteCarloSample(first_sample_index + i, parameters, lap_time,
+                                        battery_energy))
+    return samples
+
+
+def _valid_sample(car, air_density):
+    """Same limits as ElectricCarProperties.set_car_parameters, the efficiency map of a
+    powertrain can not be scaled to a motor efficiency of 0"""
+    return (car["mass"] > 0 and 0 < car["motor_efficiency"] <= 1 and
+            0 <= car["drag_coefficient"] <= 1 and car["frontal_area"] > 0 and
+            car["wheel_pressure_bar"] > 0 and air_density >= 0)
+
+
+class MonteCarloAnalysis:
+    """Monte Carlo run of laps with uncertain car parameters and air density.
+
+    Args:
+        track (TrackProperties): track with generated track lists
+        car (dict): Characteristics of car being simulated, the nominal values
+        air_density (float): nominal density of air that the car is traveling through
+        distributions (dict): parameter name (one of UNCERTAIN_PARAMETERS) ->
+                              ParameterDistribution, other parameters keep their nominal value
+        seed (int): seed of the run, None for a random seed (logged for reruns)
+        workers (int): number of worker processes, defaults to the number of cpus,
+                       1 calculates in this process
+        samples_per_task (int): number of samples a worker calculates per task
+        initial_velocity (float): velocity at the start line (m/s)
+    """
+    def __init__(self, track, car, air_density, distributions, seed=None, workers=None,
+                 samples_per_task=8, initial_velocity=STANDING_START_VELOCITY):
+        for name in distributions:
+            if name not in UNCERTAIN_PARAMETERS:
+                raise Exception("Invalid uncertain parameter {}".format(name))
+        if 'motor_efficiency' in distributions and car.get('powertrain') is None:
+            raise Exception("Uncertain motor efficiency but the car has no powertrain, "
+                            "the battery power does not depend on it")
+        self.track = track
+        self.car = car
+        self.air_density = air_density
+        self.distributions = dict(distributions)
+        # a random seed is drawn here, so reruns of this analysis give the same samples
+        self.seed = numpy.random.SeedSequence(seed).entropy
+        self.workers = workers if workers is not None else multiprocessing.cpu_count()
+        self.samples_per_task = samples_per_task
+        self.initial_velocity = initial_velocity
+
+    def _tasks(self, samples):
+        task_count = math.ceil(samples / self.samples_per_task)
+        seed_sequences = numpy.random.SeedSequence(self.seed).spawn(task_count)
+        return [(task * self.samples_per_task,
+                 min(self.samples_per_task, samples - task * self.samples_per_task),
+                 seed_sequences[task])
+                for task in range(task_count)]
+
+    def iter_run(self, samples):
+        """Run samples laps, yield the partial results every time a task finished.
+
+        Args:
+            samples (int): number of samples
+
+        Yields:
+            results (MonteCarloResults): results so far, the same object is updated
+                                         and yielded again
+
+        Raises:
+            Exception: samples is below 1
+        """
+        if samples < 1:
+            raise Exception("Invalid number of samples {}".format(samples))
+        logger.info("monte carlo run, {} samples, seed {}, {} workers"
+                    .format(samples, self.seed, self.workers),
+                    extra={'sim_index': 'N/A'})
+        results = MonteCarloResults(samples)
+        tasks = self._tasks(samples)
+        initializer_args = (self.track, self.car, self.air_density, self.distributions,
+                            self.initial_velocity)
+        if self.workers == 1:
+            _initialize_worker(*initializer_args)
+            for task in tasks:
+                for sample in _run_task(task):
+                    results.add_sample(sample)
+                yield results
+        else:
+            with multiprocessing.Pool(self.workers, _initialize_worker, initializer_args) as pool:
+                for task_samples in pool.imap_unordered(_run_task, tasks):
+                    for sample in task_samples:
+                        results.add_sample(sample)
+                    yield results
+        results.samples.sort(key=lambda sample: sample.sample_index)
+
+    def run(self, samples, callback=None):
+        """Run samples laps.
+
+        Args:
+            samples (int): number of samples
+            callback (function): called with the partial MonteCarloResults every
+                                 time a task finished
+
+        Returns:
+            results (MonteCarloResults): results of the run
+
+        Raises:
+            Exception: samples is below 1
+        """
+        if samples < 1:
+            raise Exception("Invalid number of samples {}".format(samples))
+        results = None
+        for results in self.iter_run(samples):
+            if callback is not None:
+                callback(results)
+        logger.info("monte carlo run complete\n{}".format(results.summary()),
+                    extra={'sim_index': 'N/A'})
+        return results
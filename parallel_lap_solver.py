@@ -0,0 +1,186 @@
+"""Sector parallel lap solver.
+
+A lap is serial: every segment starts with the final velocity of the segment before.
+At the anchors of the braking envelope (corner apexes, see
+lap_solver.envelope_anchor_indices) the car is back at its maximum velocity, it
+braked for the corner and enters the next segment at exactly the envelope velocity.
+The sectors between anchors can therefore be solved independently, each starting
+at the envelope velocity of its anchor.
+
+The anchors are grouped into chunks of about the same number of segments, the chunks
+are solved by a pool of worker processes and stitched together in order. A car that
+does not reach the envelope velocity at the start of a chunk (e.g. it is still
+accelerating out of a slower corner) starts the chunk slower than assumed, such a
+chunk is solved again in this process from the real velocity. The stitched lap is
+the same as the lap of lap_solver.lap_velocity_calculation.
+"""
+import logging
+import multiprocessing
+from lap_solver import (braking_envelope_calculation, envelope_anchor_indices,
+                        forward_pass_calculation, lap_results_calculation,
+                        STANDING_START_VELOCITY)
+from physics_equations import PhysicsResultsColumns
+
+logger = logging.getLogger(__name__)
+
+# state of a worker process, set once by _initialize_worker so the track and the
+# envelope are not sent with every chunk
+_worker_state = {}
+
+
+def _initialize_worker(track, car, air_density, envelope):
+    _worker_state['track'] = track
+    _worker_state['car'] = car
+    _worker_state['air_density'] = air_density
+    _worker_state['envelope'] = envelope
+    # results columns of the worker, reused by every chunk
+    _worker_state['physics_results'] = PhysicsResultsColumns(len(track.distance_list) - 1)
+
+
+def _solve_chunk(chunk):
+    """Solve the segments of a chunk.
+
+    Args:
+        chunk (tuple): (first segment, segment after the last segment, initial velocity)
+
+    Returns:
+        physics_results (PhysicsResultsColumns): results of the segments of the chunk
+    """
+    begin_index, end_index, initial_velocity = chunk
+    physics_results = forward_pass_calculation(_worker_state['track'], _worker_state['car'],
+                                               _worker_state['air_density'], initial_velocity,
+                                               _worker_state['envelope'], begin_index, end_index,
+                                               _worker_state['physics_results'])
+    return physics_results.slice(begin_index, end_index)
+
+
+class SectorParallelLapSolver:
+    """Solves laps of a car on a track with the sectors split over a process pool.
+
+    The pool is started on the first solve() and kept for later laps, use the solver
+    as a context manager or call close() when done.
+
+    Args:
+        track (TrackProperties): track with generated track lists
+        car (dict): Characteristics of car being simulated
+        air_density (float): density of air that the car is traveling through
+        workers (int): number of worker processes, defaults to the number of cpus,
+                       1 solves in this process
+        chunks_per_worker (int): number of chunks per worker, more chunks balance the
+                                 load better but cost more stitching
+        envelope (BrakingEnvelope): braking envelope of car on track, it is calculated
+                                    if not given
+        closed_track (bool): the laps follow each other, see
+                             lap_solver.braking_envelope_calculation (only if envelope
+                             is not given)
+    """
+    def __init__(self, track, car, air_density, workers=None, chunks_per_worker=4,
+                 envelope=None, closed_track=False):
+        self.track = track
+        self.car = car
+        self.air_density = air_density
+        self.workers = workers if workers is not None else multiprocessing.cpu_count()
+        if envelope is None:
+            envelope = braking_envelope_calculation(track, car, air_density,
+                                                    closed_track=closed_track)
+        self.envelope = envelope
+        self.chunk_start_indices = self._chunk_start_indices(self.workers * chunks_per_worker)
+        # number of chunks that were solved again because the car did not start
+        # them at the envelope velocity
+        self.chunks_resolved = 0
+        self._pool = None
+
+    def _chunk_start_indices(self, chunks):
+        segments = len(self.track.distance_list) - 1
+        target_length = segments / chunks
+        chunk_start_indices = [0]
+        for anchor in envelope_anchor_indices(self.envelope):
+            if anchor - chunk_start_indices[-1] >= target_length:
+                chunk_start_indices.append(anchor)
+        return chunk_start_indices
+
+    def _chunk_bounds(self, chunk):
+        begin_index = self.chunk_start_indices[chunk]
+        if chunk + 1 < len(self.chunk_start_indices):
+            end_index = self.chunk_start_indices[chunk + 1]
+        else:
+            end_index = len(self.track.distance_list) - 1
+        return begin_index, end_index
+
+    def solve(self, initial_velocity=STANDING_START_VELOCITY):
+        """Solve one lap starting with initial_velocity.
+
+        Args:
+            initial_velocity (float): velocity at the start line (m/s)
+
+        Returns:
+            results (LapVelocitySimulationResults): results of the lap, end_velocity and
+                                                    lap_time are set
+        """
+        chunks = []
+        for chunk in range(len(self.chunk_start_indices)):
+            begin_index, end_index = self._chunk_bounds(chunk)
+            if begin_index == 0:
+                velocity = initial_velocity
+            else:
+                velocity = self.envelope.velocity_list[begin_index - 1]
+            chunks.append((begin_index, end_index, velocity))
+
+        if self.workers == 1 or len(chunks) == 1:
+            _initialize_worker(self.track, self.car, self.air_density, self.envelope)
+            chunk_results = map(_solve_chunk, chunks)
+        else:
+            if self._pool is None:
+                self._pool = multiprocessing.Pool(self.workers, _initialize_worker,
+                                                  (self.track, self.car, self.air_density,
+                                                   self.envelope))
+            chunk_results = self._pool.imap(_solve_chunk, chunks)
+
+        # stitch the chunks together in order
+        physics_results = PhysicsResultsColumns(len(self.track.distance_list) - 1)
+        velocity = initial_velocity
+        for (begin_index, end_index, chunk_velocity), chunk_physics_results in zip(chunks,
+                                                                                   chunk_results):
+            if velocity != chunk_velocity:
+                forward_pass_calculation(self.track, self.car, self.air_density, velocity,
+                                         self.envelope, begin_index, end_index, physics_results)
+                self.chunks_resolved += 1
+                logger.debug("chunk {} to {} solved again, start velocity {} instead of {}"
+                             .format(begin_index, end_index, velocity, chunk_velocity),
+                             extra={'sim_index': begin_index})
+            else:
+                physics_results.set_slice(begin_index, chunk_physics_results)
+            velocity = physics_results.final_velocity[end_index - 1]
+
+        return lap_results_calculation(physics_results)
+
+    def close(self):
+        """Stop the worker processes"""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def lap_velocity_calculation_parallel(track, car, air_density,
+                                      initial_velocity=STANDING_START_VELOCITY,
+                                      workers=None, envelope=None, closed_track=False):
+    """Function that solves one lap with the sector parallel solver, see
+    lap_solver.lap_velocity_calculation for the arguments.
+
+    Args:
+        workers (int): number of worker processes, defaults to the number of cpus
+
+    Returns:
+        results (LapVelocitySimulationResults): results of the lap, end_velocity and
+                                                lap_time are set
+    """
+    with SectorParallelLapSolver(track, car, air_density, workers, envelope=envelope,
+                                 closed_track=closed_track) as solver:
+        return solver.solve(initial_velocity)
@@ -0,0 +1,145 @@
+"""Sensitivity of lap time and battery energy to the car parameters and the air density.
+
+The gradients are calculated with finite differences: every parameter is perturbed
+up and down by a small relative step (central differences) and all perturbed
+variants, together with the nominal car, are solved as one batch with the
+vectorized lap solver. The cost of the batch is close to the cost of one lap,
+instead of one lap per variant.
+
+The motor efficiency is the peak efficiency of the powertrain: its variants get a copy
+of the powertrain with the efficiency map scaled to it (Powertrain.with_peak_efficiency),
+so it needs a car with a powertrain. It changes the battery energy, not the lap time.
+
+Usage:
+    gradients = parameter_gradients(track, car, air_density)
+    for name, elasticity in gradients.ranking("lap_time"):
+        print(name, elasticity)
+"""
+import logging
+import numpy
+from lap_solver import (lap_velocity_calculation_vectorized, STANDING_START_VELOCITY)
+
+logger = logging.getLogger(__name__)
+
+# parameters of ElectricCarProperties and the air density
+GRADIENT_PARAMETERS = ('mass', 'rotational_inertia', 'motor_power', 'motor_efficiency',
+                       'battery_capacity', 'drag_coefficient', 'frontal_area',
+                       'wheel_radius', 'wheel_pressure_bar', 'air_density')
+
+
+class ParameterGradients:
+    """Class that contains the gradients of lap time and battery energy.
+
+    Args:
+        parameters (dict): nominal value of every parameter
+        lap_time (float): nominal lap time (seconds)
+        battery_energy (float): nominal battery energy of the lap (joules)
+        lap_time_gradients (dict): parameter -> d lap time / d parameter
+        battery_energy_gradients (dict): parameter -> d battery energy / d parameter
+    """
+    def __init__(self, parameters, lap_time, battery_energy, lap_time_gradients,
+                 battery_energy_gradients):
+        self.parameters = parameters
+        self.lap_time = lap_time
+        self.battery_energy = battery_energy
+        self.lap_time_gradients = lap_time_gradients
+        self.battery_energy_gradients = battery_energy_gradients
+
+    def elasticities(self, output="lap_time"):
+        """Relative sensitivities: percent change of the output per percent change
+        of the parameter, comparable between parameters with different units.
+
+        Args:
+            output (string): "lap_time" or "battery_energy"
+
+        Returns:
+            elasticities (dict): parameter -> elasticity
+        """
+        if output == "lap_time":
+            gradients, nominal = self.lap_time_gradients, self.lap_time
+        elif output == "battery_energy":
+            gradients, nominal = self.battery_energy_gradients, self.battery_energy
+        else:
+            raise Exception("Invalid output {}".format(output))
+        return {name: gradient * self.parameters[name] / nominal
+                for name, gradient in gradients.items()}
+
+    def ranking(self, output="lap_time"):
+        """Parameters sorted by the magnitude of their elasticity, largest first.
+
+        Returns:
+            ranking (list): (parameter, elasticity) tuples
+        """
+        return sorted(self.elasticities(output).items(),
+                      key=lambda item: abs(item[1]), reverse=True)
+
+
+def parameter_gradients(track, car, air_density, parameters=GRADIENT_PARAMETERS,
+                        relative_step=1e-3, initial_velocity=STANDING_START_VELOCITY):
+    """Function that calculates the gradients of lap time and battery energy with
+    central finite differences, all variants are solved in one batch.
+
+    Args:
+        track (TrackProperties): track with generated track lists
+        car (dict): Characteristics of car being simulated
+        air_density (float): density of air that the car is traveling through
+        parameters (tuple): parameters to calculate the gradients for
+        relative_step (float): perturbation of a parameter relative to its value
+        initial_velocity (float): velocity at the start line (m/s)
+
+    Returns:
+        gradients (ParameterGradients): gradients of the lap
+
+    Raises:
+        Exception: a parameter is invalid, or the gradient of the motor efficiency is
+                   asked for and the car has no powertrain
+    """
+    nominal = dict(car)
+    nominal['air_density'] = air_density
+    for name in parameters:
+        if name not in nominal:
+            raise Exception("Invalid parameter {}".format(name))
+    if 'motor_efficiency' in parameters and car.get('powertrain') is None:
+        raise Exception("Gradient of the motor efficiency but the car has no powertrain, "
+                        "the battery power does not depend on it")
+
+    # variant 0 is the nominal car, then one up and one down variant per parameter
+    variants = 1 + 2 * len(parameters)
+    batch = dict(nominal)
+    steps = {}
+    for number, name in enumerate(parameters):
+        batch[name] = numpy.full(variants, float(nominal[name]))
+        steps[name] = relative_step * abs(nominal[name]) or relative_step
+        batch[name][1 + 2 * number] += steps[name]
+        batch[name][2 + 2 * number] -= steps[name]
+    if 'motor_efficiency' in parameters:
+        # the battery power of a variant depends on its efficiency through its powertrain
+        batch['powertrain'] = [car['powertrain']] * variants
+        number = parameters.index('motor_efficiency')
+        for variant in (1 + 2 * number, 2 + 2 * number):
+            batch['powertrain'][variant] = car['powertrain'].with_peak_efficiency(
+                batch['motor_efficiency'][variant])
+
+    batch_air_density = batch.pop('air_density')
+    results = lap_velocity_calculation_vectorized(track, batch, batch_air_density,
+                                                  initial_velocity)
+
+    lap_time_gradients = {}
+    battery_energy_gradients = {}
+    for number, name in enumerate(parameters):
+        up, down = 1 + 2 * number, 2 + 2 * number
+        lap_time_gradients[name] = float((results.lap_time[up] - results.lap_time[down]) /
+                                         (2 * steps[name]))
+        battery_energy_gradients[name] = float((results.battery_energy[up] -
+                                                results.battery_energy[down]) /
+                                               (2 * steps[name]))
+        if numpy.isnan(lap_time_gradients[name]):
+            logger.warning("gradient of {} could not be calculated".format(name),
+                           extra={'sim_index': 'N/A'})
+
+    gradients = ParameterGradients({name: nominal[name] for name in parameters},
+                                   float(results.lap_time[0]), float(results.battery_energy[0]),
+                                   lap_time_gradients, battery_energy_gradients)
+    logger.info("parameter gradients, lap time ranking: {}".format(gradients.ranking("lap_time")),
+                extra={'sim_index': 'N/A'})
+    return gradients
@@ -2,11 +2,24 @@
 # USE ONLY SI UNITS
 from math import sqrt
 import logging
+import numpy
 
 logger = logging.getLogger(__name__)
 
 GRAVITY = 9.81  # m/s^2
 
+# attributes of the output data of a segment
+PHYSICS_RESULTS_ATTRIBUTES = ("initial_velocity", "final_velocity", "distance_traveled",
+                              "time_of_segment", "energy_differential_of_motor", "acceleration",
+                              "motor_power", "battery_power", "battery_energy")
+
+# optional energy flow of a segment (joules): where the energy of the motor goes. For the
+# acceleration and constrained velocity calculations the terms add up to
+# energy_differential_of_motor: kinetic + rotational + potential energy change plus the
+# energy lost to drag and rolling resistance
+ENERGY_FLOW_ATTRIBUTES = ("drag_energy", "rolling_resistance_energy", "kinetic_energy_change",
+                          "rotational_energy_change", "potential_energy_change")
+
 
 class PhysicsCalculationOutput():
     """Class that contains the data
@@ -22,6 +35,8 @@ class PhysicsCalculationOutput():
       - maybe other things later
     TODO: add checks on output data
     """
+    __slots__ = PHYSICS_RESULTS_ATTRIBUTES
+
     def __init__(self, initial_velocity, final_velocity, distance_traveled,
                  time_of_segment, energy_differential_of_motor, acceleration):
         self.initial_velocity = initial_velocity
@@ -35,6 +50,269 @@ class PhysicsCalculationOutput():
         self.battery_energy = self.energy_differential_of_motor
 
 
+class EnergyFlowCalculationOutput(PhysicsCalculationOutput):
+    """PhysicsCalculationOutput with the energy flow of the segment
+    (ENERGY_FLOW_ATTRIBUTES), returned by the calculations that are asked for it.
+
+    Args:
+        energy_flow (tuple): the terms in the order of ENERGY_FLOW_ATTRIBUTES
+        others: see PhysicsCalculationOutput
+    """
+    __slots__ = ENERGY_FLOW_ATTRIBUTES
+
+    def __init__(self, initial_velocity, final_velocity, distance_traveled,
+                 time_of_segment, energy_differential_of_motor, acceleration, energy_flow):
+        PhysicsCalculationOutput.__init__(self, initial_velocity, final_velocity,
+                                          distance_traveled, time_of_segment,
+                                          energy_differential_of_motor, acceleration)
+        (self.drag_energy, self.rolling_resistance_energy, self.kinetic_energy_change,
+         self.rotational_energy_change, self.potential_energy_change) = energy_flow
+
+
+class PhysicsResultsColumns:
+    """Class that contains the output data of many segments, one preallocated list
+    (column) per attribute of PhysicsCalculationOutput, e.g. final_velocity[i] is
+    the final velocity of row i.
+
+    The physics calculations write the results of a segment into a row when they are
+    given out and index, no PhysicsCalculationOutput is created for the segment.
+    Indexing returns the row as a (new) PhysicsCalculationOutput.
+
+    With energy_flow there is also a column per attribute of ENERGY_FLOW_ATTRIBUTES,
+    the calculations fill them in the same call, indexing returns an
+    EnergyFlowCalculationOutput. Without, the energy flow columns are None.
+
+    Args:
+        length (int): number of rows
+        energy_flow (bool): add the energy flow columns
+    """
+    __slots__ = PHYSICS_RESULTS_ATTRIBUTES + ENERGY_FLOW_ATTRIBUTES + ("attributes",)
+
+    def __init__(self, length, energy_flow=False):
+        self._set_attributes(energy_flow)
+        for attribute in self.attributes:
+            setattr(self, attribute, [0.0] * length)
+
+    def _set_attributes(self, energy_flow):
+        # attributes with a column, the energy flow columns are None without energy flow
+        if energy_flow:
+            self.attributes = PHYSICS_RESULTS_ATTRIBUTES + ENERGY_FLOW_ATTRIBUTES
+        else:
+            self.attributes = PHYSICS_RESULTS_ATTRIBUTES
+            for attribute in ENERGY_FLOW_ATTRIBUTES:
+                setattr(self, attribute, None)
+
+    @property
+    def energy_flow(self):
+        return self.drag_energy is not None
+
+    def __len__(self):
+        return len(self.final_velocity)
+
+    def __getitem__(self, index):
+        if self.drag_energy is None:
+            physics_results = PhysicsCalculationOutput.__new__(PhysicsCalculationOutput)
+        else:
+            physics_results = EnergyFlowCalculationOutput.__new__(EnergyFlowCalculationOutput)
+        for attribute in self.attributes:
+            setattr(physics_results, attribute, getattr(self, attribute)[index])
+        return physics_results
+
+    def __setitem__(self, index, physics_results):
+        for attribute in self.attributes:
+            getattr(self, attribute)[index] = getattr(physics_results, attribute)
+
+    def set_row(self, index, initial_velocity, final_velocity, distance_traveled,
+                time_of_segment, energy_differential_of_motor, acceleration):
+        """Write the results of a segment into row index, same arguments as
+        PhysicsCalculationOutput"""
+        self.initial_velocity[index] = initial_velocity
+        self.final_velocity[index] = final_velocity
+        self.distance_traveled[index] = distance_traveled
+        self.time_of_segment[index] = time_of_segment
+        self.energy_differential_of_motor[index] = energy_differential_of_motor
+        self.acceleration[index] = acceleration
+        motor_power = energy_differential_of_motor / time_of_segment
+        self.motor_power[index] = motor_power
+        self.battery_power[index] = motor_power
+        self.battery_energy[index] = energy_differential_of_motor
+
+    def set_energy_flow_row(self, index, drag_energy, rolling_resistance_energy,
+                            kinetic_energy_change, rotational_energy_change,
+                            potential_energy_change):
+        """Write the energy flow of a segment into row index, the columns must have
+        energy flow"""
+        self.drag_energy[index] = drag_energy
+        self.rolling_resistance_energy[index] = rolling_resistance_energy
+        self.kinetic_energy_change[index] = kinetic_energy_change
+        self.rotational_energy_change[index] = rotational_energy_change
+        self.potential_energy_change[index] = potential_energy_change
+
+    def copy_row(self, index, source, source_index):
+        """Copy row source_index of the columns source into row index"""
+        for attribute in self.attributes:
+            getattr(self, attribute)[index] = getattr(source, attribute)[source_index]
+
+    def slice(self, begin_index, end_index):
+        """New columns with the rows from begin_index to end_index"""
+        columns = PhysicsResultsColumns.__new__(PhysicsResultsColumns)
+        columns._set_attributes(self.energy_flow)
+        for attribute in self.attributes:
+            setattr(columns, attribute, getattr(self, attribute)[begin_index:end_index])
+        return columns
+
+    def set_slice(self, begin_index, source):
+        """Write all rows of the columns source from row begin_index on"""
+        end_index = begin_index + len(source)
+        for attribute in self.attributes:
+            getattr(self, attribute)[begin_index:end_index] = getattr(source, attribute)
+
+    def extend(self, rows):
+        """Append rows (filled with 0), for calculations that do not know the number
+        of rows up front"""
+        for attribute in self.attributes:
+            getattr(self, attribute).extend([0.0] * rows)
+
+    def energy_flow_totals(self, sector_start_indices=None):
+        """Totals of the motor energy and of every energy flow column over all rows
+        (e.g. a lap), or over the rows of every sector.
+
+        Args:
+            sector_start_indices (list): first row of every sector, the first sector
+                                         starts at 0 (see sector_analytics.py)
+
+        Returns:
+            totals (dict): energy_differential_of_motor and every attribute of
+                           ENERGY_FLOW_ATTRIBUTES -> total (joules), a list with the
+                           total of every sector if sector_start_indices is given
+        """
+        if self.drag_energy is None:
+            raise Exception("physics results calculated without energy flow")
+        totals = {}
+        for attribute in ("energy_differential_of_motor",) + ENERGY_FLOW_ATTRIBUTES:
+            column = numpy.asarray(getattr(self, attribute), dtype=float)
+            if sector_start_indices is None:
+                totals[attribute] = float(column.sum())
+            else:
+                totals[attribute] = numpy.add.reduceat(column, sector_start_indices).tolist()
+        return totals
+
+
+class CarModel:
+    """Class that holds the characteristics of a car in the form the physics
+    calculations of a segment use them. It is built once from the car parameters
+    (ElectricCarProperties.get_car_parameters) with all constants that do not change
+    from segment to segment calculated up front:
+
+        - kinetic_energy_term: kinetic energy (linear and rotational) per velocity^2
+        - drag_term: drag force per air density and air velocity^2
+        - rolling_resistance_base and rolling_resistance_velocity_term: rolling
+          resistance force is base + velocity_term * velocity^2
+          (same as rolling_resistance_force_calculation)
+        - weight: potential energy per meter of elevation
+        - rotational_energy_ratio: rotational per linear kinetic energy (energy flow)
+
+    Args:
+        car_parameters (dict): Characteristics of car being simulated
+    """
+    __slots__ = ("mass", "rotational_inertia", "motor_power", "motor_efficiency",
+                 "battery_capacity", "drag_coefficient", "frontal_area", "wheel_radius",
+                 "wheel_pressure_bar", "powertrain", "drive_limits", "kinetic_energy_term",
+                 "drag_term", "rolling_resistance_base", "rolling_resistance_velocity_term",
+                 "weight", "rotational_energy_ratio")
+
+    def __init__(self, car_parameters):
+        self.mass = car_parameters["mass"]
+        self.rotational_inertia = car_parameters["rotational_inertia"]
+        self.motor_power = car_parameters["motor_power"]
+        self.motor_efficiency = car_parameters["motor_efficiency"]
+        self.battery_capacity = car_parameters["battery_capacity"]
+        self.drag_coefficient = car_parameters["drag_coefficient"]
+        self.frontal_area = car_parameters["frontal_area"]
+        self.wheel_radius = car_parameters["wheel_radius"]
+        self.wheel_pressure_bar = car_parameters["wheel_pressure_bar"]
+        self.powertrain = car_parameters.get("powertrain")
+        self.drive_limits = car_parameters.get("drive_limits")
+
+        self.kinetic_energy_term = 0.5 * (self.rotational_inertia * ((1 / self.wheel_radius) ** 2) +
+                                          self.mass)
+        self.drag_term = 0.5 * self.drag_coefficient * self.frontal_area
+        self.weight = self.mass * GRAVITY
+        # rotational kinetic energy of the wheels per linear kinetic energy of the car
+        self.rotational_energy_ratio = self.rotational_inertia / (self.wheel_radius ** 2 *
+                                                                  self.mass)
+        # rolling_resistance_force_calculation with the velocity in km/h / 100 = velocity / 360
+        self.rolling_resistance_base = (0.005 + 0.01 / self.wheel_pressure_bar) * self.weight
+        self.rolling_resistance_velocity_term = \
+            (0.0095 / self.wheel_pressure_bar) * self.weight / 360 ** 2
+
+    @classmethod
+    def from_car(cls, car):
+        """The car model of car, car is either a CarModel (returned as it is) or
+        the car parameters dict"""
+        if isinstance(car, cls):
+            return car
+        return cls(car)
+
+
+def max_drive_power_calculation(velocity, car):
+    """Function that calculates the highest motor power the car can use at velocity:
+    the motor power of the car, limited by its drive limits (car.drive_limits,
+    torque and traction limits, see powertrain.DriveLimits) if it has them.
+
+    Args:
+        velocity (float): velocity of the car (m/s)
+        car (CarModel): Characteristics of car being simulated
+
+    Returns:
+        max_power (float): highest motor power (Watts)
+    """
+    drive_limits = car.drive_limits
+    if drive_limits is None:
+        return car.motor_power
+    return min(car.motor_power, drive_limits.max_power(velocity))
+
+
+def powertrain_results_calculation(physics_results, car, index=0):
+    """Function that sets the battery power and battery energy of physics_results
+    with the powertrain of the car (car.powertrain, see powertrain.Powertrain).
+    Without a powertrain the battery power is the motor power.
+
+    Args:
+        physics_results (PhysicsCalculationOutput): output data of the segment, or
+                                                    PhysicsResultsColumns with the
+                                                    segment in row index
+        car (CarModel): Characteristics of car being simulated
+        index (int): row of the segment in PhysicsResultsColumns
+
+    Returns:
+        physics_results (PhysicsCalculationOutput): the same output data
+    """
+    powertrain = car.powertrain
+    if powertrain is None:
+        return physics_results
+    if physics_results.__class__ is PhysicsResultsColumns:
+        battery_power = powertrain.battery_power(physics_results.motor_power[index])
+        physics_results.battery_power[index] = battery_power
+        physics_results.battery_energy[index] = (battery_power *
+                                                 physics_results.time_of_segment[index])
+    else:
+        physics_results.battery_power = powertrain.battery_power(physics_results.motor_power)
+        physics_results.battery_energy = (physics_results.battery_power *
+                                          physics_results.time_of_segment)
+    return physics_results
+
+
+def _energy_flow_row(out, index, car, initial_velocity, final_velocity, drag_energy,
+                     rolling_resistance_energy, elevation_change):
+    # energy flow of a segment of the CarModel calculations into row index of out
+    kinetic_energy_change = 0.5 * car.mass * (final_velocity * final_velocity -
+                                              initial_velocity * initial_velocity)
+    out.set_energy_flow_row(index, drag_energy, rolling_resistance_energy, kinetic_energy_change,
+                            kinetic_energy_change * car.rotational_energy_ratio,
+                            car.weight * elevation_change)
+
+
 def rotational_inertia_calculation(rotational_mass, effective_radius):
     rotational_inertia = rotational_mass * (effective_radius ** 2)
     logger.debug("rotational inertia, {}, rot mass, {}, effective radius, {}"
@@ -45,7 +323,8 @@ def rotational_inertia_calculation(rotational_mass, effective_radius):
 
 # Copied from here: https://en.wikipedia.org/wiki/Drag_(physics)
 def drag_force_calculation(coefficient_drag, velocity, air_density, frontal_area):
-    drag_force = 0.5*air_density*(velocity ** 2) * coefficient_drag * frontal_area
+    # velocity relative to the air, a tailwind faster than the car pushes it
+    drag_force = 0.5*air_density*velocity*abs(velocity) * coefficient_drag * frontal_area
     logger.debug("drag force, {}, air_density, {}, velocity, {}, coef of drag, {}, frontal area, {}"
                  .format(drag_force, air_density, velocity, coefficient_drag, frontal_area),
                  extra={'sim_index': 'N/A'})
@@ -126,22 +405,25 @@ def free_acceleration_calculation(initial_velocity,
                                   drag_coefficient,
                                   frontal_area,
                                   wheel_pressure_bar,
-                                  air_density):
+                                  air_density,
+                                  elevation_change=0,
+                                  headwind=0,
+                                  rolling_resistance_factor=1):
     """Solve for final velocity using an energy balance.
     THIS MUST BE DONE OVER A SMALL distance_of_travel TO
     MAKE THE ASSUMPTIONS TRUE:
     Assumptions:
         - Drag force calculated using initial velocity
           because change in velocity is assumed to be small
-        - No elevation change
+        - Constant grade over the segment
 
-    TODO: add in elevation change to equations
     TODO: add in other drag losses to equations
 
     Elements included:
         - Initial and final kinetic energy
         - Initial and final rotational kinetic energy
         - Drag energy
+        - Potential energy of the elevation change
         - Motor efficiency
 
     See the e lemons google drive for proof of physics equations
@@ -158,6 +440,12 @@ def free_acceleration_calculation(initial_velocity,
         frontal_area (float): frontal area of car (meters^2)
         wheel_pressure_bar (float): wheel pressure (bar)
         air_density (float): density of air car is travling through (kg/meters^3)
+        elevation_change (float): elevation at the end minus elevation at the start
+                                  of the segment (meters)
+        headwind (float): wind velocity against the direction of travel (meters/second),
+                          negative for a tailwind
+        rolling_resistance_factor (float): factor of the rolling resistance for the
+                                           condition of the track (unitless)
 
     Returns:
         output (PhysicsCalculationOutput): output data of the segment
@@ -174,21 +462,25 @@ def free_acceleration_calculation(initial_velocity,
                                                 wheel_radius,
                                                 initial_velocity)
     drag_energy = distance_of_travel * drag_force_calculation(drag_coefficient,
-                                                              initial_velocity,
+                                                              initial_velocity + headwind,
                                                               air_density,
                                                               frontal_area)
 
-    rolling_resistance_force = \
+    rolling_resistance_force = rolling_resistance_factor * \
         rolling_resistance_force_calculation(mass, initial_velocity, wheel_pressure_bar)
-    rolling_resistance_energy = rolling_resistance_force * time_of_segment
+    rolling_resistance_energy = rolling_resistance_force * distance_of_travel
+
+    potential_energy = mass * GRAVITY * elevation_change
 
     final_kinetic_energy_term = 0.5 * (rotational_inertia * ((1/wheel_radius) ** 2) +
                                        mass)
-    # TODO: change signs to be correct in each individual term (drag forces are negative) and update signs here
+    # TODO: change signs to be correct in each individual term (drag forces are negative) and
+    # update signs here
     energy_sum = (initial_linear_kinetic_energy +
                   initial_rotational_kinetic_energy -
                   drag_energy -
-                  rolling_resistance_energy +
+                  rolling_resistance_energy -
+                  potential_energy +
                   energy_motor)
     final_velocity = sqrt(energy_sum /
                           final_kinetic_energy_term)
@@ -231,22 +523,25 @@ def reverse_dececceleration_calculation(final_velocity,
                                         drag_coefficient,
                                         frontal_area,
                                         wheel_pressure_bar,
-                                        air_density):
+                                        air_density,
+                                        elevation_change=0,
+                                        headwind=0,
+                                        rolling_resistance_factor=1):
     """Solve for initial velocity using an energy balance.
     THIS MUST BE DONE OVER A SMALL distance_of_travel TO
     MAKE THE ASSUMPTIONS TRUE:
     Assumptions:
         - Drag force calculated using final velocity
           because change in velocity is assumed to be small
-        - No elevation change
+        - Constant grade over the segment
 
-    TODO: add in elevation change to equations
     TODO: add in other drag losses to equations
 
     Elements included:
         - Initial and final kinetic energy
         - Initial and final rotational kinetic energy
         - Drag energy
+        - Potential energy of the elevation change
         - Motor efficiency
 
     See the e lemons google drive for proof of physics equations
@@ -263,6 +558,12 @@ def reverse_dececceleration_calculation(final_velocity,
         frontal_area (float): frontal area of car (meters^2)
         wheel_pressure_bar (float): wheel pressure (bar)
         air_density (float): density of air car is travling through (kg/meters^3)
+        elevation_change (float): elevation at the end minus elevation at the start
+                                  of the segment (meters)
+        headwind (float): wind velocity against the direction of travel (meters/second),
+                          negative for a tailwind
+        rolling_resistance_factor (float): factor of the rolling resistance for the
+                                           condition of the track (unitless)
 
     Returns:
         output (PhysicsCalculationOutput): output data of the segment
@@ -278,21 +579,26 @@ def reverse_dececceleration_calculation(final_velocity,
                                                 wheel_radius,
                                                 final_velocity)
     drag_energy = distance_of_travel * drag_force_calculation(drag_coefficient,
-                                                                   final_velocity,
+                                                                   final_velocity + headwind,
                                                                    air_density,
                                                                    frontal_area)
-    # -1 to reverse sign of this force because the simulation is running backwards in time
-    rolling_resistance_force = \
+    rolling_resistance_force = rolling_resistance_factor * \
         rolling_resistance_force_calculation(mass, final_velocity, wheel_pressure_bar)
-    rolling_resistance_energy = rolling_resistance_force * time_of_segment
+    rolling_resistance_energy = rolling_resistance_force * distance_of_travel
+
+    # climbing the segment takes kinetic energy, so the car enters it faster
+    potential_energy = mass * GRAVITY * elevation_change
 
     initial_kinetic_energy_term = 0.5 * (rotational_inertia * ((1/wheel_radius) ** 2) +
                                          mass)
 
+    # drag and rolling resistance take kinetic energy over the segment as well, so the
+    # car enters it faster (same energy balance as the forward calculations)
     energy_sum = (final_linear_kinetic_energy
                   + final_rotational_kinetic_energy
-                  - drag_energy
-                  - rolling_resistance_energy
+                  + drag_energy
+                  + rolling_resistance_energy
+                  + potential_energy
                   - energy_motor)
     initial_velocity = sqrt(energy_sum /
                             initial_kinetic_energy_term)
@@ -339,7 +645,10 @@ def constrained_velocity_calculation(initial_velocity,
                                      drag_coefficient,
                                      frontal_area,
                                      wheel_pressure_bar,
-                                     air_density):
+                                     air_density,
+                                     elevation_change=0,
+                                     headwind=0,
+                                     rolling_resistance_factor=1):
     """Calculate amount of energy used over a distance if the
     velocity of the car is constrained.
     TODO: if the velocity constraint results in a violation of some other
@@ -347,7 +656,7 @@ def constrained_velocity_calculation(initial_velocity,
     raise an error
 
     Assumptions:
-        - No change in elevation
+        - Constant grade over the segment
 
     Args:
         initial_velocity (float): initial velocity of car in the segment (meters/second)
@@ -361,6 +670,12 @@ def constrained_velocity_calculation(initial_velocity,
         frontal_area (float): frontal area of car (meters^2)
         wheel_pressure_bar (float): pressure of tires (bar)
         air_density (float): density of air car is travling through (kg/meters^3)
+        elevation_change (float): elevation at the end minus elevation at the start
+                                  of the segment (meters)
+        headwind (float): wind velocity against the direction of travel (meters/second),
+                          negative for a tailwind
+        rolling_resistance_factor (float): factor of the rolling resistance for the
+                                           condition of the track (unitless)
 
     Returns:
         output (PhysicsCalculationOutput): output data of the segment
@@ -374,14 +689,14 @@ def constrained_velocity_calculation(initial_velocity,
     acceleration = (final_velocity - initial_velocity) / time_of_segment
     # TODO: change signs to be correct in each individual term (drag forces are negative)
     drag_force = drag_force_calculation(drag_coefficient,
-                                        initial_velocity,
+                                        initial_velocity + headwind,
                                         air_density,
                                         frontal_area)
     drag_energy = drag_force * distance_of_travel
 
-    rolling_resistance_force = \
+    rolling_resistance_force = rolling_resistance_factor * \
         rolling_resistance_force_calculation(mass, initial_velocity, wheel_pressure_bar)
-    rolling_resistance_energy = rolling_resistance_force * time_of_segment
+    rolling_resistance_energy = rolling_resistance_force * distance_of_travel
 
     initial_linear_kinetic_energy = kinetic_energy_calculation(mass, initial_velocity)
     initial_rotational_kinetic_energy = \
@@ -391,9 +706,11 @@ def constrained_velocity_calculation(initial_velocity,
     final_rotational_kinetic_energy = \
         rotational_kinetic_energy_calculation(rotational_inertia, wheel_radius, final_velocity)
 
+    potential_energy = mass * GRAVITY * elevation_change
+
     energy_motor = (final_rotational_kinetic_energy + final_linear_kinetic_energy -
                     initial_rotational_kinetic_energy - initial_linear_kinetic_energy
-                    + drag_energy + rolling_resistance_energy)
+                    + drag_energy + rolling_resistance_energy + potential_energy)
 
     logger.debug("acc, {}, final_v, {}, initial_v, {}, time, {}, distance, {}"
                  .format(acceleration, final_velocity, initial_velocity,
@@ -410,10 +727,177 @@ def constrained_velocity_calculation(initial_velocity,
     return physics_results
 
 
+# Car model kernels: the same energy balances as the kernels above with the constants
+# of a CarModel, used by the physics simulation functions below. There is no logging
+# in them, they run once (or more) for every segment of a lap.
+
+def free_acceleration_car_model_calculation(initial_velocity,
+                                            distance_of_travel,
+                                            motor_power,
+                                            car,
+                                            air_density,
+                                            elevation_change=0,
+                                            headwind=0,
+                                            rolling_resistance_factor=1,
+                                            out=None,
+                                            index=0):
+    """free_acceleration_calculation with the car characteristics of a CarModel.
+
+    Args:
+        car (CarModel): Characteristics of car being simulated
+        out (PhysicsResultsColumns): write the output data into row index of out
+                                     instead of returning a new PhysicsCalculationOutput
+        index (int): row of the segment in out
+        others: see free_acceleration_calculation
+
+    Returns:
+        output (PhysicsCalculationOutput): output data of the segment, out if given
+    """
+    time_of_segment = distance_of_travel / initial_velocity
+    energy_motor = motor_power * time_of_segment
+
+    air_velocity = initial_velocity + headwind
+    drag_energy = (distance_of_travel * air_density * car.drag_term *
+                   air_velocity * abs(air_velocity))
+    rolling_resistance_force = (car.rolling_resistance_base +
+                                car.rolling_resistance_velocity_term *
+                                initial_velocity * initial_velocity)
+    rolling_resistance_energy = (rolling_resistance_factor * rolling_resistance_force *
+                                 distance_of_travel)
+    kinetic_energy_term = car.kinetic_energy_term
+
+    energy_sum = (kinetic_energy_term * initial_velocity * initial_velocity -
+                  drag_energy -
+                  rolling_resistance_energy -
+                  car.weight * elevation_change +
+                  energy_motor)
+    final_velocity = sqrt(energy_sum / kinetic_energy_term)
+    acceleration = (final_velocity - initial_velocity) / time_of_segment
+
+    if out is None:
+        return PhysicsCalculationOutput(initial_velocity, final_velocity, distance_of_travel,
+                                        time_of_segment, energy_motor, acceleration)
+    out.set_row(index, initial_velocity, final_velocity, distance_of_travel, time_of_segment,
+                energy_motor, acceleration)
+    if out.drag_energy is not None:
+        _energy_flow_row(out, index, car, initial_velocity, final_velocity, drag_energy,
+                         rolling_resistance_energy, elevation_change)
+    return out
+
+
+def reverse_dececceleration_car_model_calculation(final_velocity,
+                                                  distance_of_travel,
+                                                  motor_power,
+                                                  car,
+                                                  air_density,
+                                                  elevation_change=0,
+                                                  headwind=0,
+                                                  rolling_resistance_factor=1,
+                                                  out=None,
+                                                  index=0):
+    """reverse_dececceleration_calculation with the car characteristics of a CarModel.
+
+    Args:
+        car (CarModel): Characteristics of car being simulated
+        out, index: see free_acceleration_car_model_calculation
+        others: see reverse_dececceleration_calculation
+
+    Returns:
+        output (PhysicsCalculationOutput): output data of the segment, out if given
+    """
+    time_of_segment = distance_of_travel / final_velocity
+    energy_motor = motor_power * time_of_segment
+
+    air_velocity = final_velocity + headwind
+    drag_energy = (distance_of_travel * air_density * car.drag_term *
+                   air_velocity * abs(air_velocity))
+    rolling_resistance_force = (car.rolling_resistance_base +
+                                car.rolling_resistance_velocity_term *
+                                final_velocity * final_velocity)
+    rolling_resistance_energy = (rolling_resistance_factor * rolling_resistance_force *
+                                 distance_of_travel)
+    kinetic_energy_term = car.kinetic_energy_term
+
+    energy_sum = (kinetic_energy_term * final_velocity * final_velocity +
+                  drag_energy +
+                  rolling_resistance_energy +
+                  car.weight * elevation_change -
+                  energy_motor)
+    initial_velocity = sqrt(energy_sum / kinetic_energy_term)
+    acceleration = (final_velocity - initial_velocity) / time_of_segment
+
+    # developer check
+    if final_velocity > initial_velocity:
+        raise Exception("reverse physics calculation wrong! initial velocity lower than "
+                        "final velocity")
+
+    if out is None:
+        return PhysicsCalculationOutput(initial_velocity, final_velocity, distance_of_travel,
+                                        time_of_segment, energy_motor, acceleration)
+    out.set_row(index, initial_velocity, final_velocity, distance_of_travel, time_of_segment,
+                energy_motor, acceleration)
+    if out.drag_energy is not None:
+        _energy_flow_row(out, index, car, initial_velocity, final_velocity, drag_energy,
+                         rolling_resistance_energy, elevation_change)
+    return out
+
+
+def constrained_velocity_car_model_calculation(initial_velocity,
+                                               final_velocity,
+                                               distance_of_travel,
+                                               car,
+                                               air_density,
+                                               elevation_change=0,
+                                               headwind=0,
+                                               rolling_resistance_factor=1,
+                                               out=None,
+                                               index=0):
+    """constrained_velocity_calculation with the car characteristics of a CarModel.
+
+    Args:
+        car (CarModel): Characteristics of car being simulated
+        out, index: see free_acceleration_car_model_calculation
+        others: see constrained_velocity_calculation
+
+    Returns:
+        output (PhysicsCalculationOutput): output data of the segment, out if given
+    """
+    time_of_segment = distance_of_travel / ((final_velocity + initial_velocity) / 2)
+    acceleration = (final_velocity - initial_velocity) / time_of_segment
+
+    air_velocity = initial_velocity + headwind
+    drag_energy = (distance_of_travel * air_density * car.drag_term *
+                   air_velocity * abs(air_velocity))
+    rolling_resistance_force = (car.rolling_resistance_base +
+                                car.rolling_resistance_velocity_term *
+                                initial_velocity * initial_velocity)
+    rolling_resistance_energy = (rolling_resistance_factor * rolling_resistance_force *
+                                 distance_of_travel)
+
+    energy_motor = (car.kinetic_energy_term * (final_velocity * final_velocity -
+                                               initial_velocity * initial_velocity) +
+                    drag_energy + rolling_resistance_energy + car.weight * elevation_change)
+
+    if out is None:
+        return PhysicsCalculationOutput(initial_velocity, final_velocity, distance_of_travel,
+                                        time_of_segment, energy_motor, acceleration)
+    out.set_row(index, initial_velocity, final_velocity, distance_of_travel, time_of_segment,
+                energy_motor, acceleration)
+    if out.drag_energy is not None:
+        _energy_flow_row(out, index, car, initial_velocity, final_velocity, drag_energy,
+                         rolling_resistance_energy, elevation_change)
+    return out
+
+
 def reverse_max_negative_power_physics_simulation(final_velocity,
                                                   distance_of_travel,
                                                   car,
-                                                  air_density):
+                                                  air_density,
+                                                  elevation_change=0,
+                                                  headwind=0,
+                                                  rolling_resistance_factor=1,
+                                                  out=None,
+                                                  index=0):
     """Function that calculats a small portion of a lap of a car with
     car_characteristics on a track with track_characteristics. The
     calculation is done knowing the final velocity and the initial
@@ -422,31 +906,42 @@ def reverse_max_negative_power_physics_simulation(final_velocity,
     Args:
         final_velocity (float): final velocity (m/s)
         distance_of_travel (float): distance traveled for the calculation
-        car (dict): Characteristics of car being simulated
+        car (CarModel or dict): Characteristics of car being simulated
         air_density: density of air that the car is traveling through
+        elevation_change (float): elevation change over the segment (meters)
+        headwind (float): headwind velocity (m/s)
+        rolling_resistance_factor (float): factor of the rolling resistance
+        out (PhysicsResultsColumns): write the results into row index of out instead
+                                     of returning a new PhysicsCalculationOutput
+        index (int): row of the segment in out
 
     Returns:
         results (ReverseSimulationResults): results of the simulation increment
 
     """
-    results = reverse_dececceleration_calculation(final_velocity,
-                                                  distance_of_travel,
-                                                  -car["motor_power"],
-                                                  car["motor_efficiency"],
-                                                  car["wheel_radius"],
-                                                  car["rotational_inertia"],
-                                                  car["mass"],
-                                                  car["drag_coefficient"],
-                                                  car["frontal_area"],
-                                                  car["wheel_pressure_bar"],
-                                                  air_density)
-    return results
+    car = CarModel.from_car(car)
+    results = reverse_dececceleration_car_model_calculation(final_velocity,
+                                                            distance_of_travel,
+                                                            -car.motor_power,
+                                                            car,
+                                                            air_density,
+                                                            elevation_change,
+                                                            headwind,
+                                                            rolling_resistance_factor,
+                                                            out,
+                                                            index)
+    return powertrain_results_calculation(results, car, index)
 
 
 def max_positive_power_physics_simulation(initial_velocity,
                                           distance_of_travel,
                                           car,
-                                          air_density):
+                                          air_density,
+                                          elevation_change=0,
+                                          headwind=0,
+                                          rolling_resistance_factor=1,
+                                          out=None,
+                                          index=0):
     """Function that calculates a small portion of a lap
     of a car with car_characteristics on a track with track_characteristics. The
     car is applying maximum foward effort with the motor.
@@ -454,8 +949,14 @@ def max_positive_power_physics_simulation(initial_velocity,
     Args:
         initial_velocity (float): initial velocity (m/s)
         distance_of_travel (float): distance traveled for the calculation
-        car (dict): Characteristics of car being simulated
+        car (CarModel or dict): Characteristics of car being simulated
         track (TrackProperties): Characteristics of track being simulated
+        elevation_change (float): elevation change over the segment (meters)
+        headwind (float): headwind velocity (m/s)
+        rolling_resistance_factor (float): factor of the rolling resistance
+        out (PhysicsResultsColumns): write the results into row index of out instead
+                                     of returning a new PhysicsCalculationOutput
+        index (int): row of the segment in out
 
     Returns:
         results (PysicsSimultaionResults):  results of the simulation at index 'index'
@@ -463,24 +964,30 @@ def max_positive_power_physics_simulation(initial_velocity,
     """
     logger.debug("Max Positive Power Calculation",
                  extra={'sim_index': 'N/A'})
-    results = free_acceleration_calculation(initial_velocity,
-                                            distance_of_travel,
-                                            car["motor_power"],
-                                            car["motor_efficiency"],
-                                            car["wheel_radius"],
-                                            car["rotational_inertia"],
-                                            car["mass"],
-                                            car["drag_coefficient"],
-                                            car["frontal_area"],
-                                            car["wheel_pressure_bar"],
-                                            air_density)
-    return results
+    car = CarModel.from_car(car)
+    results = free_acceleration_car_model_calculation(initial_velocity,
+                                                      distance_of_travel,
+                                                      max_drive_power_calculation(initial_velocity,
+                                                                                  car),
+                                                      car,
+                                                      air_density,
+                                                      elevation_change,
+                                                      headwind,
+                                                      rolling_resistance_factor,
+                                                      out,
+                                                      index)
+    return powertrain_results_calculation(results, car, index)
 
 
 def max_negative_power_physics_simulation(initial_velocity,
                                           distance_of_travel,
                                           car,
-                                          air_density):
+                                          air_density,
+                                          elevation_change=0,
+                                          headwind=0,
+                                          rolling_resistance_factor=1,
+                                          out=None,
+                                          index=0):
     """Function that calculates a small portion of a lap
     of a car with car_characteristics on a track with track_characteristics. The
     car is applying maximum braking effort with the motor.
@@ -488,8 +995,14 @@ def max_negative_power_physics_simulation(initial_velocity,
     Args:
         initial_velocity (float): initial velocity (m/s)
         distance_of_travel (float): distance traveled for the calculation
-        car (dict): Characteristics of car being simulated
+        car (CarModel or dict): Characteristics of car being simulated
         track (TrackProperties): Characteristics of track being simulated
+        elevation_change (float): elevation change over the segment (meters)
+        headwind (float): headwind velocity (m/s)
+        rolling_resistance_factor (float): factor of the rolling resistance
+        out (PhysicsResultsColumns): write the results into row index of out instead
+                                     of returning a new PhysicsCalculationOutput
+        index (int): row of the segment in out
 
     Returns:
         results (PysicsSimultaionResults):  results of the simulation at index 'index'
@@ -497,25 +1010,30 @@ def max_negative_power_physics_simulation(initial_velocity,
     """
     logger.debug("",
                  extra={'sim_index': 'N/A'})
-    results = free_acceleration_calculation(initial_velocity,
-                                            distance_of_travel,
-                                            -car["motor_power"],
-                                            car["motor_efficiency"],
-                                            car["wheel_radius"],
-                                            car["rotational_inertia"],
-                                            car["mass"],
-                                            car["drag_coefficient"],
-                                            car["frontal_area"],
-                                            car["wheel_pressure_bar"],
-                                            air_density)
-    return results
+    car = CarModel.from_car(car)
+    results = free_acceleration_car_model_calculation(initial_velocity,
+                                                      distance_of_travel,
+                                                      -car.motor_power,
+                                                      car,
+                                                      air_density,
+                                                      elevation_change,
+                                                      headwind,
+                                                      rolling_resistance_factor,
+                                                      out,
+                                                      index)
+    return powertrain_results_calculation(results, car, index)
 
 
 def constrained_velocity_physics_simulation(initial_velocity,
                                             final_velocity,
                                             distance_of_travel,
                                             car,
-                                            air_density):
+                                            air_density,
+                                            elevation_change=0,
+                                            headwind=0,
+                                            rolling_resistance_factor=1,
+                                            out=None,
+                                            index=0):
     """Function that calculates a small portion of a lap
     of a car with car_characteristics on a track with track_characteristics.
     For this method of simulation the car is on a constrained velocity profile
@@ -526,8 +1044,14 @@ def constrained_velocity_physics_simulation(initial_velocity,
     Args:
         initial_velocity (float): initial velocity (m/s)
         final_velocity (float): initial velocity (m/s)
-        car_properties (dict): Characteristics of car being simulated
+        car_properties (CarModel or dict): Characteristics of car being simulated
         track_properites (TrackProperties): Characteristics of track being simulated
+        elevation_change (float): elevation change over the segment (meters)
+        headwind (float): headwind velocity (m/s)
+        rolling_resistance_factor (float): factor of the rolling resistance
+        out (PhysicsResultsColumns): write the results into row index of out instead
+                                     of returning a new PhysicsCalculationOutput
+        index (int): row of the segment in out
 
     Returns:
         results (PysicsSimultaionResults):  results of the simulation at index 'index'
@@ -535,15 +1059,383 @@ def constrained_velocity_physics_simulation(initial_velocity,
     """
     logger.debug("",
                  extra={'sim_index': 'N/A'})
-    results = constrained_velocity_calculation(initial_velocity,
-                                               final_velocity,
-                                               distance_of_travel,
-                                               car["motor_efficiency"],
-                                               car["rotational_inertia"],
-                                               car["mass"],
-                                               car["wheel_radius"],
-                                               car["drag_coefficient"],
-                                               car["frontal_area"],
-                                               car["wheel_pressure_bar"],
-                                               air_density)
-    return results
+    car = CarModel.from_car(car)
+    results = constrained_velocity_car_model_calculation(initial_velocity,
+                                                         final_velocity,
+                                                         distance_of_travel,
+                                                         car,
+                                                         air_density,
+                                                         elevation_change,
+                                                         headwind,
+                                                         rolling_resistance_factor,
+                                                         out,
+                                                         index)
+    return powertrain_results_calculation(results, car, index)
+
+
+def braking_distance_calculation(low_velocity,
+                                 high_velocity,
+                                 car,
+                                 air_density,
+                                 distance_step=1.0,
+                                 grade=0):
+    """Function that calculates the distance the car needs to slow down from
+    high_velocity to low_velocity with maximum braking effort. The braking
+    profile is built backwards from low_velocity the same way the simulation
+    walk back builds it, but with a coarse distance_step because only the
+    length of the braking zone is of interest.
+
+    Args:
+        low_velocity (float): velocity at the end of the braking zone (m/s)
+        high_velocity (float): velocity at the start of the braking zone (m/s)
+        car (CarModel or dict): Characteristics of car being simulated
+        air_density (float): density of air that the car is traveling through
+        distance_step (float): distance of every reverse calculation (meters)
+        grade (float): grade of the braking zone (rise over run), braking
+                       downhill takes longer
+
+    Returns:
+        braking_distance (float): length of the braking zone (meters)
+    """
+    car = CarModel.from_car(car)
+    braking_distance = 0
+    # a reverse calculation cannot start at a stand still (zero time of travel)
+    velocity = max(low_velocity, 0.1)
+    while velocity < high_velocity:
+        results = reverse_max_negative_power_physics_simulation(velocity,
+                                                                distance_step,
+                                                                car,
+                                                                air_density,
+                                                                grade * distance_step)
+        velocity = results.initial_velocity
+        braking_distance += distance_step
+    return braking_distance
+
+
+def cornering_velocity_limit_calculation(curvature,
+                                         friction_coefficient,
+                                         max_velocity,
+                                         bank_angle=0):
+    """Function that calculates the highest velocity at which the tires can hold
+    the car on a corner of the given curvature (friction circle without longitudinal
+    force, no aerodynamic downforce). On a banked corner part of the centripetal
+    force comes from the bank:
+
+        v^2 = g / |curvature| * (sin(bank) + mu * cos(bank)) / (cos(bank) - mu * sin(bank))
+
+    A bank steep enough to hold the car at any velocity, as well as a straight
+    (zero curvature), is limited by max_velocity.
+
+    Args:
+        curvature (numpy array): curvature of the raceline (radians/meter), the sign
+                                 (left or right corner) is ignored
+        friction_coefficient (float): tire friction coefficient
+        max_velocity (float): velocity limit on straights (m/s)
+        bank_angle (float or numpy array): bank angle of the track (radians),
+                                           positive towards the inside of the corner
+
+    Returns:
+        velocity_limit (numpy array): maximum velocity at every curvature (m/s)
+    """
+    curvature = numpy.abs(numpy.asarray(curvature, dtype=float))
+    sin_bank = numpy.sin(bank_angle)
+    cos_bank = numpy.cos(bank_angle)
+    numerator = sin_bank + friction_coefficient * cos_bank
+    denominator = cos_bank - friction_coefficient * sin_bank
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        velocity_squared = GRAVITY * numerator / (curvature * denominator)
+    velocity_squared = numpy.where((curvature > 0) & (denominator > 0), velocity_squared,
+                                   numpy.inf)
+    # an off camber corner steeper than the friction angle can not be driven at all
+    velocity_squared = numpy.maximum(velocity_squared, 0)
+    return numpy.minimum(numpy.sqrt(velocity_squared), max_velocity)
+
+
+# Vectorized kernels: the same energy balances as the kernels above, calculated with
+# numpy for many variants of the car (or of the air density) at once. Every argument
+# can be a float or an array with one element per variant. There is no logging in the
+# vectorized kernels, a velocity that can not be reached is nan instead of an error.
+
+def _rolling_resistance_force_vectorized(mass, velocity, wheel_pressure_bar):
+    # same conversion as rolling_resistance_force_calculation
+    velocity_km_h = velocity / 3.6
+    return ((0.005 + (1 / wheel_pressure_bar) * (0.01 + 0.0095 * (velocity_km_h / 100) ** 2)) *
+            mass * GRAVITY)
+
+
+def _energy_flow_vectorized(initial_velocity, final_velocity, mass, rotational_inertia,
+                            wheel_radius, drag_energy, rolling_resistance_energy,
+                            elevation_change):
+    # energy flow terms in the order of ENERGY_FLOW_ATTRIBUTES
+    velocity_squared_change = final_velocity ** 2 - initial_velocity ** 2
+    return (drag_energy, rolling_resistance_energy, 0.5 * mass * velocity_squared_change,
+            0.5 * rotational_inertia * velocity_squared_change / wheel_radius ** 2,
+            mass * GRAVITY * elevation_change)
+
+
+def free_acceleration_calculation_vectorized(initial_velocity,
+                                             distance_of_travel,
+                                             motor_power,
+                                             motor_efficiency,
+                                             wheel_radius,
+                                             rotational_inertia,
+                                             mass,
+                                             drag_coefficient,
+                                             frontal_area,
+                                             wheel_pressure_bar,
+                                             air_density,
+                                             elevation_change=0,
+                                             headwind=0,
+                                             rolling_resistance_factor=1,
+                                             energy_flow=False):
+    """Vectorized free_acceleration_calculation, see there for the arguments.
+
+    Args:
+        energy_flow (bool): return the energy flow of the segment as well
+
+    Returns:
+        output (PhysicsCalculationOutput): output data of the segment, every
+                                           attribute is an array with one element per variant,
+                                           an EnergyFlowCalculationOutput with energy_flow
+    """
+    time_of_segment = distance_of_travel / initial_velocity
+    energy_motor = motor_power * time_of_segment
+
+    air_velocity = initial_velocity + headwind
+    drag_energy = distance_of_travel * (0.5 * air_density * air_velocity * numpy.abs(air_velocity) *
+                                        drag_coefficient * frontal_area)
+    rolling_resistance_energy = (rolling_resistance_factor *
+                                 _rolling_resistance_force_vectorized(mass, initial_velocity,
+                                                                      wheel_pressure_bar) *
+                                 distance_of_travel)
+    kinetic_energy_term = 0.5 * (rotational_inertia * ((1 / wheel_radius) ** 2) + mass)
+
+    energy_sum = (0.5 * mass * initial_velocity ** 2 +
+                  0.5 * rotational_inertia * ((initial_velocity / wheel_radius) ** 2) -
+                  drag_energy -
+                  rolling_resistance_energy -
+                  mass * GRAVITY * elevation_change +
+                  energy_motor)
+    with numpy.errstate(invalid='ignore'):
+        final_velocity = numpy.sqrt(energy_sum / kinetic_energy_term)
+    acceleration = (final_velocity - initial_velocity) / time_of_segment
+
+    if energy_flow:
+        return EnergyFlowCalculationOutput(
+            initial_velocity, final_velocity, distance_of_travel, time_of_segment, energy_motor,
+            acceleration, _energy_flow_vectorized(initial_velocity, final_velocity, mass,
+                                                  rotational_inertia, wheel_radius, drag_energy,
+                                                  rolling_resistance_energy, elevation_change))
+    return PhysicsCalculationOutput(initial_velocity, final_velocity, distance_of_travel,
+                                    time_of_segment, energy_motor, acceleration)
+
+
+def reverse_dececceleration_calculation_vectorized(final_velocity,
+                                                   distance_of_travel,
+                                                   motor_power,
+                                                   motor_efficiency,
+                                                   wheel_radius,
+                                                   rotational_inertia,
+                                                   mass,
+                                                   drag_coefficient,
+                                                   frontal_area,
+                                                   wheel_pressure_bar,
+                                                   air_density,
+                                                   elevation_change=0,
+                                                   headwind=0,
+                                                   rolling_resistance_factor=1,
+                                                   energy_flow=False):
+    """Vectorized reverse_dececceleration_calculation, see there for the arguments.
+
+    Args:
+        energy_flow (bool): return the energy flow of the segment as well
+
+    Returns:
+        output (PhysicsCalculationOutput): output data of the segment, every
+                                           attribute is an array with one element per variant,
+                                           an EnergyFlowCalculationOutput with energy_flow
+    """
+    time_of_segment = distance_of_travel / final_velocity
+    energy_motor = motor_power * time_of_segment
+
+    air_velocity = final_velocity + headwind
+    drag_energy = distance_of_travel * (0.5 * air_density * air_velocity * numpy.abs(air_velocity) *
+                                        drag_coefficient * frontal_area)
+    rolling_resistance_energy = (rolling_resistance_factor *
+                                 _rolling_resistance_force_vectorized(mass, final_velocity,
+                                                                      wheel_pressure_bar) *
+                                 distance_of_travel)
+    kinetic_energy_term = 0.5 * (rotational_inertia * ((1 / wheel_radius) ** 2) + mass)
+
+    energy_sum = (0.5 * mass * final_velocity ** 2 +
+                  0.5 * rotational_inertia * ((final_velocity / wheel_radius) ** 2) +
+                  drag_energy +
+                  rolling_resistance_energy +
+                  mass * GRAVITY * elevation_change -
+                  energy_motor)
+    with numpy.errstate(invalid='ignore'):
+        initial_velocity = numpy.sqrt(energy_sum / kinetic_energy_term)
+    acceleration = (final_velocity - initial_velocity) / time_of_segment
+
+    if energy_flow:
+        return EnergyFlowCalculationOutput(
+            initial_velocity, final_velocity, distance_of_travel, time_of_segment, energy_motor,
+            acceleration, _energy_flow_vectorized(initial_velocity, final_velocity, mass,
+                                                  rotational_inertia, wheel_radius, drag_energy,
+                                                  rolling_resistance_energy, elevation_change))
+    return PhysicsCalculationOutput(initial_velocity, final_velocity, distance_of_travel,
+                                    time_of_segment, energy_motor, acceleration)
+
+
+def constrained_velocity_calculation_vectorized(initial_velocity,
+                                                final_velocity,
+                                                distance_of_travel,
+                                                motor_efficiency,
+                                                rotational_inertia,
+                                                mass,
+                                                wheel_radius,
+                                                drag_coefficient,
+                                                frontal_area,
+                                                wheel_pressure_bar,
+                                                air_density,
+                                                elevation_change=0,
+                                                headwind=0,
+                                                rolling_resistance_factor=1,
+                                                energy_flow=False):
+    """Vectorized constrained_velocity_calculation, see there for the arguments.
+
+    Args:
+        energy_flow (bool): return the energy flow of the segment as well
+
+    Returns:
+        output (PhysicsCalculationOutput): output data of the segment, every
+                                           attribute is an array with one element per variant,
+                                           an EnergyFlowCalculationOutput with energy_flow
+    """
+    time_of_segment = distance_of_travel / ((final_velocity + initial_velocity) / 2)
+    acceleration = (final_velocity - initial_velocity) / time_of_segment
+
+    air_velocity = initial_velocity + headwind
+    drag_energy = distance_of_travel * (0.5 * air_density * air_velocity * numpy.abs(air_velocity) *
+                                        drag_coefficient * frontal_area)
+    rolling_resistance_energy = (rolling_resistance_factor *
+                                 _rolling_resistance_force_vectorized(mass, initial_velocity,
+                                                                      wheel_pressure_bar) *
+                                 distance_of_travel)
+    kinetic_energy_term = 0.5 * (rotational_inertia * ((1 / wheel_radius) ** 2) + mass)
+
+    energy_motor = (kinetic_energy_term * (final_velocity ** 2 - initial_velocity ** 2) +
+                    drag_energy + rolling_resistance_energy + mass * GRAVITY * elevation_change)
+
+    if energy_flow:
+        return EnergyFlowCalculationOutput(
+            initial_velocity, final_velocity, distance_of_travel, time_of_segment, energy_motor,
+            acceleration, _energy_flow_vectorized(initial_velocity, final_velocity, mass,
+                                                  rotational_inertia, wheel_radius, drag_energy,
+                                                  rolling_resistance_energy, elevation_change))
+    return PhysicsCalculationOutput(initial_velocity, final_velocity, distance_of_travel,
+                                    time_of_segment, energy_motor, acceleration)
+
+
+def _powertrain_results_vectorized(physics_results, cars):
+    # vectorized powertrain_results_calculation, one powertrain shared by all variants or
+    # a list with the powertrain of every variant
+    powertrain = cars.get("powertrain")
+    if isinstance(powertrain, list):
+        motor_power = numpy.broadcast_to(physics_results.motor_power, (len(powertrain),))
+        battery_power = numpy.empty(len(powertrain))
+        # variants with the same powertrain are looked up together
+        for shared_powertrain in dict.fromkeys(powertrain):
+            variants = numpy.array([variant_powertrain is shared_powertrain
+                                    for variant_powertrain in powertrain])
+            battery_power[variants] = \
+                shared_powertrain.battery_power_vectorized(motor_power[variants])
+    elif powertrain is not None:
+        battery_power = powertrain.battery_power_vectorized(physics_results.motor_power)
+    else:
+        return physics_results
+    physics_results.battery_power = battery_power
+    physics_results.battery_energy = battery_power * physics_results.time_of_segment
+    return physics_results
+
+
+def max_positive_power_physics_simulation_vectorized(initial_velocity, distance_of_travel,
+                                                     cars, air_density, elevation_change=0,
+                                                     headwind=0, rolling_resistance_factor=1,
+                                                     energy_flow=False):
+    """Vectorized max_positive_power_physics_simulation, the values of cars are arrays
+    with one element per variant (or floats shared by all variants)."""
+    drive_limits = cars.get("drive_limits")
+    if drive_limits is None:
+        motor_power = cars["motor_power"]
+    else:
+        motor_power = numpy.minimum(cars["motor_power"],
+                                    drive_limits.max_power_vectorized(initial_velocity))
+    results = free_acceleration_calculation_vectorized(initial_velocity,
+                                                       distance_of_travel,
+                                                       motor_power,
+                                                       cars["motor_efficiency"],
+                                                       cars["wheel_radius"],
+                                                       cars["rotational_inertia"],
+                                                       cars["mass"],
+                                                       cars["drag_coefficient"],
+                                                       cars["frontal_area"],
+                                                       cars["wheel_pressure_bar"],
+                                                       air_density,
+                                                       elevation_change,
+                                                       headwind,
+                                                       rolling_resistance_factor,
+                                                       energy_flow)
+    return _powertrain_results_vectorized(results, cars)
+
+
+def reverse_max_negative_power_physics_simulation_vectorized(final_velocity, distance_of_travel,
+                                                             cars, air_density,
+                                                             elevation_change=0,
+                                                             headwind=0,
+                                                             rolling_resistance_factor=1,
+                                                             energy_flow=False):
+    """Vectorized reverse_max_negative_power_physics_simulation, the values of cars are
+    arrays with one element per variant (or floats shared by all variants)."""
+    results = reverse_dececceleration_calculation_vectorized(final_velocity,
+                                                             distance_of_travel,
+                                                             -cars["motor_power"],
+                                                             cars["motor_efficiency"],
+                                                             cars["wheel_radius"],
+                                                             cars["rotational_inertia"],
+                                                             cars["mass"],
+                                                             cars["drag_coefficient"],
+                                                             cars["frontal_area"],
+                                                             cars["wheel_pressure_bar"],
+                                                             air_density,
+                                                             elevation_change,
+                                                             headwind,
+                                                             rolling_resistance_factor,
+                                                             energy_flow)
+    return _powertrain_results_vectorized(results, cars)
+
+
+def constrained_velocity_physics_simulation_vectorized(initial_velocity, final_velocity,
+                                                       distance_of_travel, cars, air_density,
+                                                       elevation_change=0,
+                                                       headwind=0,
+                                                       rolling_resistance_factor=1,
+                                                       energy_flow=False):
+    """Vectorized constrained_velocity_physics_simulation, the values of cars are arrays
+    with one element per variant (or floats shared by all variants)."""
+    results = constrained_velocity_calculation_vectorized(initial_velocity,
+                                                          final_velocity,
+                                                          distance_of_travel,
+                                                          cars["motor_efficiency"],
+                                                          cars["rotational_inertia"],
+                                                          cars["mass"],
+                                                          cars["wheel_radius"],
+                                                          cars["drag_coefficient"],
+                                                          cars["frontal_area"],
+                                                          cars["wheel_pressure_bar"],
+                                                          air_density,
+                                                          elevation_change,
+                                                          headwind,
+                                                          rolling_resistance_factor,
+                                                          energy_flow)
+    return _powertrain_results_vectorized(results, cars)
@@ -0,0 +1,310 @@
+"""Powertrain of an electric car: from motor output power to battery power, and the
+highest motor power the car can put on the road.
+
+The physics calculations give the mechanical power of the motor, the battery has to
+supply more than that when driving and gets less back when braking:
+
+    - motor efficiency map over the motor output power (mcPwrOutPerc,
+      largeBaselineEff and smallBaselineEff of the FASTSim car file, scaled to
+      motorPeakEff the same way FASTSim does)
+    - regenerative braking recovers at most maxRegen of the braking energy
+    - auxiliary load (auxKw) is drawn all the time
+    - battery losses (essRoundTripEff), half of the round trip on charge and
+      half on discharge, charging limited to maxEssKw
+
+All of it is put into one lookup table of battery power over motor power, built
+once per car. A segment only interpolates the table, see battery_power and
+battery_power_vectorized.
+
+DriveLimits is a lookup table of the highest motor power over the velocity of the car:
+constant torque below the base velocity of the motor, constant power above it, and
+never more than the tires of the driven axle can transfer (traction limit).
+"""
+import logging
+import math
+import numpy
+from physics_equations import GRAVITY
+
+logger = logging.getLogger(__name__)
+
+# number of points of the lookup table from full braking to full power
+POWER_TABLE_POINTS = 401
+
+# FASTSim: motors up to 7.5 kW use the small baseline efficiency map, motors from
+# 75 kW the large one, sizes in between a blend of both
+SMALL_MOTOR_KW = 7.5
+LARGE_MOTOR_KW = 75.0
+
+# velocity grid of the drive limits table (m/s)
+DRIVE_LIMITS_VELOCITY_STEP = 0.25
+DRIVE_LIMITS_MAX_VELOCITY = 100.0
+MPH_TO_MPS = 0.44704
+
+
+class Powertrain:
+    """Class that maps the motor output power to the battery power.
+
+    Args:
+        max_motor_power (float): rated output power of the motor (Watts)
+        power_fractions (list): motor output power relative to max_motor_power of the
+                                points of the efficiency map, ascending from 0 to 1
+        efficiencies (list): efficiency of the motor at power_fractions
+        battery_round_trip_efficiency (float): efficiency of charging and discharging
+                                               the battery (unitless)
+        auxiliary_power (float): power of the auxiliary load (Watts)
+        max_regen (float): fraction of the braking energy that can be recovered
+        max_battery_power (float): highest charging power of the battery (Watts)
+    """
+    def __init__(self, max_motor_power, power_fractions, efficiencies,
+                 battery_round_trip_efficiency=1, auxiliary_power=0, max_regen=1,
+                 max_battery_power=math.inf):
+        if max_motor_power <= 0:
+            raise Exception("Invalid motor power {}".format(max_motor_power))
+        elif len(power_fractions) != len(efficiencies):
+            raise Exception("{} power fractions but {} efficiencies"
+                            .format(len(power_fractions), len(efficiencies)))
+        elif not all(0 < efficiency <= 1 for efficiency in efficiencies):
+            raise Exception("Invalid motor efficiencies {}".format(efficiencies))
+        elif not 0 < battery_round_trip_efficiency <= 1:
+            raise Exception("Invalid battery round trip efficiency {}"
+                            .format(battery_round_trip_efficiency))
+        elif not 0 <= max_regen <= 1:
+            raise Exception("Invalid max regen {}".format(max_regen))
+        self.max_motor_power = max_motor_power
+        self.power_fractions = list(power_fractions)
+        self.efficiencies = list(efficiencies)
+        self.battery_round_trip_efficiency = battery_round_trip_efficiency
+        self.auxiliary_power = auxiliary_power
+        self.max_regen = max_regen
+        self.max_battery_power = max_battery_power
+
+        self.motor_power_table = numpy.linspace(-max_motor_power, max_motor_power,
+                                                POWER_TABLE_POINTS)
+        self.battery_power_table = self.battery_power_calculation(self.motor_power_table)
+        # the scalar lookup works on python floats
+        self._battery_power_list = self.battery_power_table.tolist()
+        self._points_per_watt = (POWER_TABLE_POINTS - 1) / (2 * max_motor_power)
+
+        if self.battery_power_table[-1] > max_battery_power:
+            logger.info("battery power {} W at full motor power is above the battery "
+                        "limit {} W".format(self.battery_power_table[-1], max_battery_power),
+                        extra={'sim_index': 'N/A'})
+
+    @classmethod
+    def from_car_data(cls, car_data):
+        """Create the powertrain from the car data of a FASTSim car file.
+
+        Args:
+            car_data (dict): car data as read by project_argparser SingleArg.open_car_dict
+        """
+        max_motor_kw = car_data["maxMotorKw"]
+        large_motor_fraction = max(0.0, min((max_motor_kw - SMALL_MOTOR_KW) /
+                                            (LARGE_MOTOR_KW - SMALL_MOTOR_KW), 1.0))
+        efficiencies = (large_motor_fraction * numpy.asarray(car_data["largeBaselineEff"]) +
+                        (1 - large_motor_fraction) * numpy.asarray(car_data["smallBaselineEff"]))
+        efficiencies *= car_data["motorPeakEff"] / efficiencies.max()
+        return cls(max_motor_power=max_motor_kw * 1000,
+                   power_fractions=car_data["mcPwrOutPerc"],
+                   efficiencies=efficiencies.tolist(),
+                   battery_round_trip_efficiency=car_data["essRoundTripEff"],
+                   auxiliary_power=car_data["auxKw"] * 1000,
+                   max_regen=car_data["maxRegen"],
+                   max_battery_power=car_data["maxEssKw"] * 1000)
+
+    def with_peak_efficiency(self, peak_efficiency):
+        """Copy of the powertrain with the motor efficiency map scaled to a peak
+        efficiency of peak_efficiency (same scaling as from_car_data).
+
+        Args:
+            peak_efficiency (float): highest efficiency of the motor, above 0 up to 1
+        """
+        scale = peak_efficiency / max(self.efficiencies)
+        return Powertrain(self.max_motor_power, self.power_fractions,
+                          [efficiency * scale for efficiency in self.efficiencies],
+                          self.battery_round_trip_efficiency, self.auxiliary_power,
+                          self.max_regen, self.max_battery_power)
+
+    def battery_power_calculation(self, motor_power):
+        """Function that calculates the battery power from the efficiencies, used to
+        build the lookup table.
+
+        Args:
+            motor_power (numpy array): output power of the motor (Watts), negative
+                                       when braking
+
+        Returns:
+            battery_power (numpy array): power drawn from the battery (Watts), negative
+                                         when charging
+        """
+        motor_power = numpy.asarray(motor_power, dtype=float)
+        efficiency = numpy.interp(numpy.abs(motor_power) / self.max_motor_power,
+                                  self.power_fractions, self.efficiencies)
+        electric_power = numpy.where(motor_power >= 0, motor_power / efficiency,
+                                     motor_power * efficiency * self.max_regen)
+        electric_power = electric_power + self.auxiliary_power
+        battery_efficiency = math.sqrt(self.battery_round_trip_efficiency)
+        battery_power = numpy.where(electric_power >= 0, electric_power / battery_efficiency,
+                                    electric_power * battery_efficiency)
+        return numpy.maximum(battery_power, -self.max_battery_power)
+
+    def battery_power(self, motor_power):
+        """Battery power of one segment, linear interpolation of the lookup table
+        (linear extrapolation beyond the rated motor power).
+
+        Args:
+            motor_power (float): output power of the motor (Watts)
+
+        Returns:
+            battery_power (float): power drawn from the battery (Watts)
+        """
+        position = (motor_power + self.max_motor_power) * self._points_per_watt
+        index = min(max(int(position), 0), POWER_TABLE_POINTS - 2)
+        weight = position - index
+        table = self._battery_power_list
+        return table[index] + weight * (table[index + 1] - table[index])
+
+    def battery_power_vectorized(self, motor_power):
+        """Vectorized battery_power, motor_power is an array (e.g. one element per
+        variant or per segment)."""
+        position = (numpy.asarray(motor_power, dtype=float) + self.max_motor_power) * \
+            self._points_per_watt
+        # a variant that could not be calculated (nan) stays nan
+        with numpy.errstate(invalid='ignore'):
+            index = numpy.clip(numpy.floor(position).astype(int), 0, POWER_TABLE_POINTS - 2)
+        weight = position - index
+        table = self.battery_power_table
+        return table[index] + weight * (table[index + 1] - table[index])
+
+
+class DriveLimits:
+    """Class that holds the highest motor power the car can use at a velocity, as a
+    lookup table over a velocity grid from 0 to DRIVE_LIMITS_MAX_VELOCITY.
+    Above the grid the last value is used.
+
+    Args:
+        max_motor_power (float): rated output power of the motor (Watts)
+        base_velocity (float): velocity of the car at the base speed of the motor (m/s),
+                               below it the motor torque is constant
+        traction_force (float): highest force the driven wheels can transfer (Newtons)
+    """
+    def __init__(self, max_motor_power, base_velocity, traction_force):
+        if max_motor_power <= 0:
+            raise Exception("Invalid motor power {}".format(max_motor_power))
+        elif base_velocity < 0:
+            raise Exception("Invalid base velocity {}".format(base_velocity))
+        elif traction_force <= 0:
+            raise Exception("Invalid traction force {}".format(traction_force))
+        self.max_motor_power = max_motor_power
+        self.base_velocity = base_velocity
+        self.traction_force = traction_force
+
+        self.velocity_table = numpy.linspace(
+            0, DRIVE_LIMITS_MAX_VELOCITY,
+            round(DRIVE_LIMITS_MAX_VELOCITY / DRIVE_LIMITS_VELOCITY_STEP) + 1)
+        power = numpy.minimum(max_motor_power, traction_force * self.velocity_table)
+        if base_velocity > 0:
+            power = numpy.minimum(power, max_motor_power * self.velocity_table / base_velocity)
+        self.max_power_table = power
+        # the scalar lookup works on python floats
+        self._max_power_list = power.tolist()
+        self._points = len(self._max_power_list)
+
+    @classmethod
+    def from_car_data(cls, car_data, friction_factor=1):
+        """Create the drive limits from the car data of a FASTSim car file.
+
+        The traction force is the friction of the driven axle (wheelCoefOfFric times
+        the friction factor of the weather, driveAxleWeightFrac, without weight transfer).
+        The car files have no motor torque, the base velocity is the one that gives the
+        0 to 60 mph time of the car (val0To60Mph) with constant torque followed by
+        constant power, without losses:
+
+            t = mass * (v60^2 + base_velocity^2) / (2 * max_motor_power)
+
+        Args:
+            car_data (dict): car data as read by project_argparser SingleArg.open_car_dict
+            friction_factor (float): tire friction relative to a dry track
+                                     (environment.Environment.friction_factor)
+        """
+        max_motor_power = car_data["maxMotorKw"] * 1000
+        mass = car_data["vehKg"]
+        traction_force = (car_data["wheelCoefOfFric"] * friction_factor * mass * GRAVITY *
+                          car_data["driveAxleWeightFrac"])
+        base_velocity = 0
+        if car_data.get("val0To60Mph"):
+            velocity_60_mph = 60 * MPH_TO_MPS
+            base_velocity = math.sqrt(max(0, 2 * max_motor_power * car_data["val0To60Mph"] / mass
+                                          - velocity_60_mph ** 2))
+        logger.info("drive limits, base velocity: {} m/s, traction force: {} N"
+                    .format(base_velocity, traction_force),
+                    extra={'sim_index': 'N/A'})
+        return cls(max_motor_power, base_velocity, traction_force)
+
+    @classmethod
+    def unlimited(cls, max_motor_power):
+        """Drive limits that never lower the motor power below max_motor_power, e.g. the
+        table row of a car without drive limits in a stack of drive limits.
+
+        Args:
+            max_motor_power (float): rated output power of the motor (Watts)
+        """
+        if max_motor_power <= 0:
+            raise Exception("Invalid motor power {}".format(max_motor_power))
+        unlimited = cls.__new__(cls)
+        unlimited.max_motor_power = max_motor_power
+        unlimited.base_velocity = 0
+        unlimited.traction_force = math.inf
+        unlimited.velocity_table = numpy.linspace(
+            0, DRIVE_LIMITS_MAX_VELOCITY,
+            round(DRIVE_LIMITS_MAX_VELOCITY / DRIVE_LIMITS_VELOCITY_STEP) + 1)
+        unlimited.max_power_table = numpy.full(len(unlimited.velocity_table),
+                                               float(max_motor_power))
+        unlimited._max_power_list = unlimited.max_power_table.tolist()
+        unlimited._points = len(unlimited._max_power_list)
+        return unlimited
+
+    @classmethod
+    def stack(cls, drive_limits_list):
+        """Drive limits of a batch of cars, one table row per car (variant)"""
+        stacked = cls.__new__(cls)
+        stacked.max_motor_power = numpy.array([limits.max_motor_power
+                                               for limits in drive_limits_list])
+        stacked.base_velocity = numpy.array([limits.base_velocity for limits in drive_limits_list])
+        stacked.traction_force = numpy.array([limits.traction_force
+                                              for limits in drive_limits_list])
+        stacked.velocity_table = drive_limits_list[0].velocity_table
+        stacked.max_power_table = numpy.array([limits.max_power_table
+                                               for limits in drive_limits_list])
+        stacked._max_power_list = None
+        stacked._points = len(stacked.velocity_table)
+        return stacked
+
+    def max_power(self, velocity):
+        """Highest motor power at velocity, linear interpolation of the lookup table.
+
+        Args:
+            velocity (float): velocity of the car (m/s)
+
+        Returns:
+            max_power (float): highest motor power (Watts)
+        """
+        position = velocity * (1 / DRIVE_LIMITS_VELOCITY_STEP)
+        index = int(position)
+        table = self._max_power_list
+        if index >= self._points - 1:
+            return table[-1]
+        return table[index] + (position - index) * (table[index + 1] - table[index])
+
+    def max_power_vectorized(self, velocity):
+        """Vectorized max_power, velocity is an array with one element per variant.
+        A stacked table has one row per variant."""
+        velocity = numpy.asarray(velocity, dtype=float)
+        if self.max_power_table.ndim == 1:
+            return numpy.interp(velocity, self.velocity_table, self.max_power_table)
+        position = numpy.clip(velocity * (1 / DRIVE_LIMITS_VELOCITY_STEP), 0, self._points - 1)
+        # a variant that could not be calculated (nan) stays nan
+        with numpy.errstate(invalid='ignore'):
+            index = numpy.minimum(numpy.floor(position).astype(int), self._points - 2)
+        rows = numpy.arange(len(self.max_power_table))
+        lower = self.max_power_table[rows, index]
+        return lower + (position - index) * (self.max_power_table[rows, index + 1] - lower)
@@ -7,7 +7,8 @@ import ast
 class SingleArg:
 
     def __init__(self, parser, key, lng_key, help_msg, on_msg, off_msg):
-        #Adds an argument with the key (ex: -l), name (ex: --logging), and help message to be displayed when entering -h
+        #Adds an argument with the key (ex: -l), name (ex: --logging), and help message to be
+        #displayed when entering -h
         parser.add_argument(key, lng_key, type=str, help=help_msg, default=off_msg)
         #This sets the strings for which input will be checked against in arg_check()
         self.on_msg = on_msg
@@ -20,9 +21,11 @@ class SingleArg:
         elif (input == self.off_msg):
             return False
         else:
-            raise argparse.ArgumentTypeError('Invalid input — use -h for more information on arguments.') 
+            raise argparse.ArgumentTypeError('Invalid input — use -h for more information on '
+                                             'arguments.')
     
-    #opens csv and creates dict with keys corresponding to the headers of the fastsim car csv file format
+    #opens csv and creates dict with keys corresponding to the headers of the fastsim car csv file
+    #format
     def open_car_dict(self, input):
         if not os.path.exists(input):
             raise argparse.ArgumentTypeError('The file %s is not in the working directory' % input)
@@ -53,7 +56,8 @@ class SingleArg:
                     mc_mass_kg = 0.0
                 else:
                     mc_mass_kg = (car_dict["mcPeBaseKg"]+(car_dict["mcPeKgPerKw"]
-                                                    * car_dict["maxMotorKw"])) * car_dict["compMassMultiplier"]
+                                                    * car_dict["maxMotorKw"])) * \
+                        car_dict["compMassMultiplier"]
                 if car_dict["maxFuelConvKw"] == 0:
                     fc_mass_kg = 0.0
                 else:
@@ -64,8 +68,8 @@ class SingleArg:
                 else:
                     fs_mass_kg = ((1 / car_dict["fuelStorKwhPerKg"]) *
                                 car_dict["fuelStorKwh"]) * car_dict["compMassMultiplier"]
-                car_dict["vehKg"] = car_dict["cargoKg"] + car_dict["gliderKg"] + car_dict["transKg"] * \
-                    car_dict["compMassMultiplier"] + ess_mass_kg + \
+                car_dict["vehKg"] = car_dict["cargoKg"] + car_dict["gliderKg"] + \
+                    car_dict["transKg"] * car_dict["compMassMultiplier"] + ess_mass_kg + \
                     mc_mass_kg + fc_mass_kg + fs_mass_kg
             #if positive real number is specified for vehOverrideKg, use that
             else:
@@ -80,7 +84,8 @@ class SingleArg:
                 mc_mass_kg = 0.0
             else:
                 mc_mass_kg = (car_dict["mcPeBaseKg"]+(car_dict["mcPeKgPerKw"]
-                                                * car_dict["maxMotorKw"])) * car_dict["compMassMultiplier"]
+                                                * car_dict["maxMotorKw"])) * \
+                    car_dict["compMassMultiplier"]
             if car_dict["maxFuelConvKw"] == 0:
                 fc_mass_kg = 0.0
             else:
@@ -126,28 +131,46 @@ class SingleArg:
         return track_list
 
 
-#call_args() now instantiates each SingleArg object and adds them to a dictionary, as well as the data structure filled with parsed args
+#call_args() now instantiates each SingleArg object and adds them to a dictionary, as well as the
+#data structure filled with parsed args
 def call_args():
     parser = argparse.ArgumentParser(description="Electric car racing simulation")
 
     arg_dict = dict()
     arg_dict["logging_arg"] = \
         SingleArg(parser=parser, key='-l', lng_key='--logging',
-                  help_msg='''Turn logging on or off — enter either "on" or "off". 
-                           This defaults to off with no argument. Logging directory is "./results/logging_output/"''',
+                  help_msg='''Turn logging on or off — enter either "on" or "off".
+                           This defaults to off with no argument. Logging directory is
+                           "./results/logging_output/"''',
                   on_msg='on', off_msg='off')
     arg_dict["car_arg"] = \
         SingleArg(parser=parser, key='-c', lng_key='--car',
-                  help_msg='Load a custom car configuration — defaults to included file "./cars/fastsim_car_test.csv."',
+                  help_msg='Load a custom car configuration — defaults to included file '
+                           '"./cars/fastsim_car_test.csv."',
                   on_msg='void', off_msg='./cars/fastsim_car_test.csv')
     arg_dict["track_arg"] = \
         SingleArg(parser=parser, key='-t', lng_key='--track',
-                 help_msg='Load a custom track configuration — defaults to included file "./tracks/hich_plains_track.csv."', 
+                 help_msg='Load a custom track configuration — defaults to included file '
+                          '"./tracks/hich_plains_track.csv."',
                  on_msg='void', off_msg='./tracks/HPR_raceline_elevation_example.csv')
     arg_dict["output_arg"] = \
         SingleArg(parser=parser, key='-o', lng_key='--output',
-                  help_msg='Specify a name for an output file — defaults to "./results/output.csv" by default.',
+                  help_msg='''Specify a name for an output file — defaults to
+                           "./results/output.csv" by default.
+                           Files ending in ".run" are written in the binary run file format.''',
                   on_msg='void', off_msg='./results/output.csv')
+    arg_dict["compress_arg"] = \
+        SingleArg(parser=parser, key='-z', lng_key='--compress',
+                  help_msg='''Compress the columns of ".run" output files — enter either "on" or
+                           "off". This defaults to off, compressed files can not be memory
+                           mapped.''',
+                  on_msg='on', off_msg='off')
+    arg_dict["process_arg"] = \
+        SingleArg(parser=parser, key='-p', lng_key='--process',
+                  help_msg='''Run the simulation in a separate process — enter either "on" or
+                           "off". This defaults to off, the simulation then runs in a thread of
+                           the GUI process.''',
+                  on_msg='on', off_msg='off')
     arg_dict["parsed_args"] = parser.parse_args()
 
     return arg_dict
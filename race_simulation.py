@@ -0,0 +1,198 @@
+"""Multi lap race simulation with battery state of charge and pit stop strategies.
+
+A race is a sequence of laps solved with the headless lap solver, the velocity at
+the end of a lap is the velocity the next lap starts with. After a pit stop the
+battery is recharged and the next lap (out lap) starts with the pit exit velocity.
+
+The laps share one braking envelope of the closed track (see lap_solver), so the end
+of a lap is limited by braking for the start of the next lap and the next lap is never
+entered faster than the car can brake for its first constraints.
+
+A lap only depends on the velocity it starts with, so lap results are cached by
+their (rounded) initial velocity. Once the laps become periodic (a lap ends with
+the velocity it started with) every following lap is taken from the cache, so a
+100 lap race costs little more than the first few laps.
+"""
+import logging
+from lap_solver import (braking_envelope_calculation, lap_velocity_calculation,
+                        STANDING_START_VELOCITY)
+
+logger = logging.getLogger(__name__)
+
+
+class LapSummary:
+    """Class that contains the summary of one lap of a race.
+
+    Args:
+        initial_velocity (float): velocity at the start line (m/s)
+        end_velocity (float): velocity at the finish line (m/s)
+        lap_time (float): time of the lap (seconds)
+        battery_energy (float): battery energy used over the lap (joules)
+    """
+    def __init__(self, initial_velocity, end_velocity, lap_time, battery_energy):
+        self.initial_velocity = initial_velocity
+        self.end_velocity = end_velocity
+        self.lap_time = lap_time
+        self.battery_energy = battery_energy
+
+
+class RaceResults:
+    """Class that contains the results of a race simulated with one pit stop strategy.
+
+    Args:
+        pit_stop_laps (list): laps after which the car pits (1 based)
+    """
+    def __init__(self, pit_stop_laps):
+        self.pit_stop_laps = list(pit_stop_laps)
+        self.lap_summaries = []
+        self.state_of_charge_list = []  # state of charge at the end of every lap
+        self.race_time = 0
+        self.battery_energy = 0
+        # False if the battery is below the minimum state of charge at the end of a lap
+        self.feasible = True
+
+
+class RaceSimulation:
+    """Simulates races of several laps of a car on a track.
+
+    Args:
+        track (TrackProperties): track with generated track lists
+        car (dict): Characteristics of car being simulated, battery_capacity in joules
+        air_density (float): density of air that the car is traveling through
+        laps (int): number of laps of the race
+        pit_stop_time (float): time lost by a pit stop, including the pit lane (seconds)
+        pit_exit_velocity (float): velocity the car starts the lap after a pit stop with (m/s)
+        min_state_of_charge (float): lowest allowed state of charge of the battery (0 to 1)
+        max_state_of_charge (float): state of charge at the start and after a pit stop (0 to 1)
+        velocity_resolution (float): initial velocities closer than this share their
+                                     cached lap results (m/s)
+
+    Raises:
+        Exception: invalid number of laps, or a pit exit velocity above the velocity
+                   the car can enter the lap with
+    """
+    def __init__(self, track, car, air_density, laps, pit_stop_time=30,
+                 pit_exit_velocity=STANDING_START_VELOCITY, min_state_of_charge=0,
+                 max_state_of_charge=1, velocity_resolution=0.001):
+        if laps < 1:
+            raise Exception("Invalid number of laps {}".format(laps))
+        self.track = track
+        self.car = car
+        self.air_density = air_density
+        self.laps = laps
+        self.pit_stop_time = pit_stop_time
+        self.pit_exit_velocity = pit_exit_velocity
+        self.min_state_of_charge = min_state_of_charge
+        self.max_state_of_charge = max_state_of_charge
+        self.velocity_resolution = velocity_resolution
+
+        # the braking envelope only depends on the car and the track, all laps share it
+        self._envelope = braking_envelope_calculation(track, car, air_density,
+                                                      closed_track=True)
+        entry_velocity = self._envelope.braking_results.initial_velocity[0]
+        if pit_exit_velocity > entry_velocity:
+            raise Exception("pit exit velocity {} m/s is above the velocity the lap can be "
+                            "entered with ({} m/s)".format(pit_exit_velocity, entry_velocity))
+        self._lap_cache = {}
+        self.laps_calculated = 0
+
+    def lap(self, initial_velocity, lap_results=None):
+        """Return the summary of a lap starting with initial_velocity, from the cache
+        if a lap with (about) the same initial velocity was calculated before.
+
+        Args:
+            initial_velocity (float): velocity at the start line (m/s)
+            lap_results (LapVelocitySimulationResults): results of this lap if they
+                                                        are already known (no calculation)
+
+        Returns:
+            summary (LapSummary): summary of the lap
+        """
+        key = round(initial_velocity / self.velocity_resolution)
+        try:
+            return self._lap_cache[key]
+        except KeyError:
+            pass
+        if lap_results is None:
+            lap_results = lap_velocity_calculation(self.track, self.car, self.air_density,
+                                                   initial_velocity, self._envelope)
+            self.laps_calculated += 1
+        summary = LapSummary(initial_velocity, lap_results.end_velocity, lap_results.lap_time,
+                             lap_results.battery_energy_cumulative_list[-1])
+        logger.info("lap calculated, initial v: {}, end v: {}, time: {}, energy: {}"
+                    .format(initial_velocity, summary.end_velocity, summary.lap_time,
+                            summary.battery_energy),
+                    extra={'sim_index': 'N/A'})
+        self._lap_cache[key] = summary
+        return summary
+
+    def usable_battery_energy(self):
+        return self.car["battery_capacity"] * (self.max_state_of_charge - self.min_state_of_charge)
+
+    def race(self, pit_stop_laps=()):
+        """Simulate the race with pit stops after the laps in pit_stop_laps.
+
+        Args:
+            pit_stop_laps (iterable): laps after which the car pits (1 based)
+
+        Returns:
+            results (RaceResults): results of the race
+        """
+        results = RaceResults(sorted(pit_stop_laps))
+        pit_stops = set(pit_stop_laps)
+        capacity = self.car["battery_capacity"]
+        state_of_charge = self.max_state_of_charge
+        velocity = STANDING_START_VELOCITY
+
+        for lap_number in range(1, self.laps + 1):
+            summary = self.lap(velocity)
+            results.lap_summaries.append(summary)
+            results.race_time += summary.lap_time
+            results.battery_energy += summary.battery_energy
+            state_of_charge -= summary.battery_energy / capacity
+            results.state_of_charge_list.append(state_of_charge)
+            if state_of_charge < self.min_state_of_charge:
+                results.feasible = False
+
+            velocity = summary.end_velocity
+            if lap_number in pit_stops and lap_number < self.laps:
+                results.race_time += self.pit_stop_time
+                state_of_charge = self.max_state_of_charge
+                velocity = self.pit_exit_velocity
+
+        return results
+
+    def evaluate_pit_strategies(self, max_pit_stops=None):
+        """Simulate the race with 0 to max_pit_stops pit stops. For every number of
+        pit stops the stints are made as even as possible.
+
+        Args:
+            max_pit_stops (int): highest number of pit stops to evaluate,
+                                 defaults to one stop after every lap
+
+        Returns:
+            strategies (list): RaceResults of every evaluated strategy, fastest
+                               feasible strategy first, infeasible strategies last
+        """
+        if max_pit_stops is None:
+            max_pit_stops = self.laps - 1
+        strategies = []
+        for pit_stops in range(0, min(max_pit_stops, self.laps - 1) + 1):
+            stint_length = self.laps / (pit_stops + 1)
+            pit_stop_laps = [round(stint_length * (stop + 1)) for stop in range(pit_stops)]
+            strategies.append(self.race(pit_stop_laps))
+        strategies.sort(key=lambda results: (not results.feasible, results.race_time))
+        return strategies
+
+    def laps_per_pit_stop(self):
+        """Number of laps at the periodic (steady state) pace the usable battery energy lasts."""
+        summary = self.lap(STANDING_START_VELOCITY)
+        # follow the laps until they repeat, those are cache hits from then on
+        for _ in range(self.laps):
+            next_summary = self.lap(summary.end_velocity)
+            if next_summary is summary:
+                break
+            summary = next_summary
+        if summary.battery_energy <= 0:
+            return float('inf')
+        return self.usable_battery_energy() / summary.battery_energy
@@ -0,0 +1,256 @@
+"""Continuous geometry of a raceline.
+
+A raceline file (e.g. tracks/HPR_raceline_elevation_example.csv) gives the raceline at
+points: s_m, x_m, y_m, psi_rad, kappa_radpm, vx_mps, ax_mps2, elev_m. RacelineGeometry
+interpolates between the points, so the geometry can be looked up at any distance and
+not only on the distance_list of the track:
+
+    - position: cubic Hermite curve through the points with the headings of the
+      points as tangents, the curve follows the heading of the raceline
+    - heading: cubic Hermite interpolation with the curvature as derivative
+    - curvature: linear interpolation
+    - elevation: monotone cubic interpolation (Fritsch-Carlson), no overshoot
+      between the points
+
+A lookup finds the interval of the distance with a binary search (O(log n)). Every
+query has a scalar version on python floats for single lookups and a vectorized
+version for numpy arrays of distances.
+"""
+import logging
+import math
+from bisect import bisect_right
+import numpy
+
+logger = logging.getLogger(__name__)
+
+# columns of a raceline file, see initialize_race in simulation.py
+DISTANCE_COLUMN = 0
+X_COLUMN = 1
+Y_COLUMN = 2
+HEADING_COLUMN = 3
+CURVATURE_COLUMN = 4
+VELOCITY_COLUMN = 5
+ACCELERATION_COLUMN = 6
+ELEVATION_COLUMN = 7
+
+
+def _hermite(t, interval_length, value_start, value_end, slope_start, slope_end):
+    # cubic Hermite polynomial on an interval, t is 0 at the start and 1 at the end,
+    # works on floats and on numpy arrays
+    t_squared = t * t
+    t_cubed = t_squared * t
+    return ((2 * t_cubed - 3 * t_squared + 1) * value_start +
+            (t_cubed - 2 * t_squared + t) * interval_length * slope_start +
+            (3 * t_squared - 2 * t_cubed) * value_end +
+            (t_cubed - t_squared) * interval_length * slope_end)
+
+
+def monotone_slopes_calculation(distance, value):
+    """Function that calculates the slopes of a monotone cubic interpolation
+    (Fritsch-Carlson): the interpolation does not overshoot between the points,
+    the slope is 0 at a local minimum or maximum.
+
+    Args:
+        distance (numpy array): distance of every point, strictly increasing
+        value (numpy array): value at every point
+
+    Returns:
+        slopes (numpy array): slope of the interpolation at every point
+    """
+    interval_length = numpy.diff(distance)
+    secant = numpy.diff(value) / interval_length
+    slopes = numpy.empty(len(distance))
+    slopes[0] = secant[0]
+    slopes[-1] = secant[-1]
+
+    # weighted harmonic mean of the secants, 0 where the secants change sign
+    weight_before = 2 * interval_length[1:] + interval_length[:-1]
+    weight_after = interval_length[1:] + 2 * interval_length[:-1]
+    same_sign = secant[:-1] * secant[1:] > 0
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        harmonic_mean = ((weight_before + weight_after) /
+                         (weight_before / secant[:-1] + weight_after / secant[1:]))
+    slopes[1:-1] = numpy.where(same_sign, harmonic_mean, 0.0)
+    return slopes
+
+
+class RacelineGeometry:
+    """Class that holds the geometry of a raceline for lookups at any distance.
+
+    Distances outside of the raceline are clamped to the first or last point, on a
+    closed raceline they are wrapped around the lap instead.
+
+    Args:
+        distance (list): distance from the start finish line of every point (meters),
+                         strictly increasing
+        x (list): x coordinate of every point (meters)
+        y (list): y coordinate of every point (meters)
+        heading (list): heading of the raceline at every point (radians, zero is north,
+                        counterclockwise, same as the psi_rad column)
+        curvature (list): curvature of the raceline at every point (radians/meter)
+        elevation (list): elevation of the track at every point (meters), 0 if not given
+        closed (bool): the raceline is a lap, the last point is connected to the first
+    """
+    def __init__(self, distance, x, y, heading, curvature, elevation=None, closed=False):
+        distance = numpy.asarray(distance, dtype=float)
+        if elevation is None:
+            elevation = numpy.zeros(len(distance))
+        columns = [numpy.asarray(values, dtype=float)
+                   for values in (x, y, heading, curvature, elevation)]
+        if any(values.shape != distance.shape for values in columns):
+            raise Exception("raceline columns of different lengths: {}"
+                            .format([len(distance)] + [len(values) for values in columns]))
+        elif len(distance) < 2:
+            raise Exception("a raceline needs at least 2 points, got {}".format(len(distance)))
+        elif not numpy.all(numpy.diff(distance) > 0):
+            raise Exception("raceline distances are not strictly increasing")
+        x, y, heading, curvature, elevation = columns
+        # no jumps at +-pi, so the heading can be interpolated
+        heading = numpy.unwrap(heading)
+
+        self.closed = closed
+        if closed:
+            # connect the last point to the first, unless the raceline already ends
+            # on the first point
+            closing_length = math.hypot(x[0] - x[-1], y[0] - y[-1])
+            if closing_length > 0:
+                turns = round((heading[-1] - heading[0]) / (2 * math.pi))
+                distance = numpy.append(distance, distance[-1] + closing_length)
+                x = numpy.append(x, x[0])
+                y = numpy.append(y, y[0])
+                heading = numpy.append(heading, heading[0] + 2 * math.pi * turns)
+                curvature = numpy.append(curvature, curvature[0])
+                elevation = numpy.append(elevation, elevation[0])
+
+        self.distance = distance
+        self.x = x
+        self.y = y
+        self.heading = heading
+        self.curvature = curvature
+        self.elevation = elevation
+        self.start_distance = float(distance[0])
+        self.length = float(distance[-1] - distance[0])
+
+        # tangent of the raceline at every point, the derivative of the position
+        self._x_slope = -numpy.sin(heading)
+        self._y_slope = numpy.cos(heading)
+        self._elevation_slope = monotone_slopes_calculation(distance, elevation)
+        self._interval_length = numpy.diff(distance)
+        self._last_interval = len(distance) - 2
+
+        # the scalar lookups work on python floats
+        self._distance_list = distance.tolist()
+        self._interval_length_list = self._interval_length.tolist()
+        self._x_list = x.tolist()
+        self._y_list = y.tolist()
+        self._x_slope_list = self._x_slope.tolist()
+        self._y_slope_list = self._y_slope.tolist()
+        self._heading_list = heading.tolist()
+        self._curvature_list = curvature.tolist()
+        self._elevation_list = elevation.tolist()
+        self._elevation_slope_list = self._elevation_slope.tolist()
+
+        logger.info("raceline geometry, {} points, length: {} m, closed: {}"
+                    .format(len(distance), self.length, closed),
+                    extra={'sim_index': 'N/A'})
+
+    @classmethod
+    def from_track_data(cls, track_data, closed=False):
+        """Create the geometry from the rows of a raceline file.
+
+        Args:
+            track_data (list): rows of the raceline file as read by
+                               project_argparser SingleArg.open_track_dict
+            closed (bool): the raceline is a lap, the last point is connected to the first
+        """
+        elevation = None
+        if all(len(row) > ELEVATION_COLUMN and isinstance(row[ELEVATION_COLUMN], (int, float))
+               for row in track_data):
+            elevation = [row[ELEVATION_COLUMN] for row in track_data]
+        return cls([row[DISTANCE_COLUMN] for row in track_data],
+                   [row[X_COLUMN] for row in track_data],
+                   [row[Y_COLUMN] for row in track_data],
+                   [row[HEADING_COLUMN] for row in track_data],
+                   [row[CURVATURE_COLUMN] for row in track_data],
+                   elevation, closed)
+
+    def _interval(self, distance):
+        # interval of a distance and the position in it (0 to 1)
+        if self.closed:
+            distance = self.start_distance + (distance - self.start_distance) % self.length
+        index = min(max(bisect_right(self._distance_list, distance) - 1, 0), self._last_interval)
+        interval_length = self._interval_length_list[index]
+        t = min(max((distance - self._distance_list[index]) / interval_length, 0.0), 1.0)
+        return index, t, interval_length
+
+    def _interval_vectorized(self, distance):
+        distance = numpy.asarray(distance, dtype=float)
+        if self.closed:
+            distance = self.start_distance + numpy.mod(distance - self.start_distance,
+                                                       self.length)
+        index = numpy.clip(numpy.searchsorted(self.distance, distance, side='right') - 1,
+                           0, self._last_interval)
+        interval_length = self._interval_length[index]
+        t = numpy.clip((distance - self.distance[index]) / interval_length, 0.0, 1.0)
+        return index, t, interval_length
+
+    def position_at(self, distance):
+        """Position of the raceline at distance.
+
+        Args:
+            distance (float): distance from the start finish line (meters)
+
+        Returns:
+            x, y (float): coordinates of the raceline (meters)
+        """
+        index, t, interval_length = self._interval(distance)
+        return (_hermite(t, interval_length, self._x_list[index], self._x_list[index + 1],
+                         self._x_slope_list[index], self._x_slope_list[index + 1]),
+                _hermite(t, interval_length, self._y_list[index], self._y_list[index + 1],
+                         self._y_slope_list[index], self._y_slope_list[index + 1]))
+
+    def position_vectorized(self, distance):
+        """Vectorized position_at, distance is an array, returns x and y arrays"""
+        index, t, interval_length = self._interval_vectorized(distance)
+        return (_hermite(t, interval_length, self.x[index], self.x[index + 1],
+                         self._x_slope[index], self._x_slope[index + 1]),
+                _hermite(t, interval_length, self.y[index], self.y[index + 1],
+                         self._y_slope[index], self._y_slope[index + 1]))
+
+    def heading_at(self, distance):
+        """Heading of the raceline at distance (radians, unwrapped: it keeps counting
+        past +-pi)"""
+        index, t, interval_length = self._interval(distance)
+        return _hermite(t, interval_length, self._heading_list[index],
+                        self._heading_list[index + 1], self._curvature_list[index],
+                        self._curvature_list[index + 1])
+
+    def heading_vectorized(self, distance):
+        """Vectorized heading_at, distance is an array"""
+        index, t, interval_length = self._interval_vectorized(distance)
+        return _hermite(t, interval_length, self.heading[index], self.heading[index + 1],
+                        self.curvature[index], self.curvature[index + 1])
+
+    def curvature_at(self, distance):
+        """Curvature of the raceline at distance (radians/meter)"""
+        index, t, _ = self._interval(distance)
+        curvature = self._curvature_list
+        return curvature[index] + t * (curvature[index + 1] - curvature[index])
+
+    def curvature_vectorized(self, distance):
+        """Vectorized curvature_at, distance is an array"""
+        index, t, _ = self._interval_vectorized(distance)
+        return self.curvature[index] + t * (self.curvature[index + 1] - self.curvature[index])
+
+    def elevation_at(self, distance):
+        """Elevation of the track at distance (meters)"""
+        index, t, interval_length = self._interval(distance)
+        return _hermite(t, interval_length, self._elevation_list[index],
+                        self._elevation_list[index + 1], self._elevation_slope_list[index],
+                        self._elevation_slope_list[index + 1])
+
+    def elevation_vectorized(self, distance):
+        """Vectorized elevation_at, distance is an array"""
+        index, t, interval_length = self._interval_vectorized(distance)
+        return _hermite(t, interval_length, self.elevation[index], self.elevation[index + 1],
+                        self._elevation_slope[index], self._elevation_slope[index + 1])
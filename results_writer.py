@@ -0,0 +1,92 @@
+"""Streaming export of the simulation results.
+
+The SimulationThread hands rows over as soon as they are final, i.e. they can no
+longer be rewritten by a walk back, and a background writer thread puts them on disk.
+This way the output file does not depend on the MainWindow being attached, writing
+never blocks the GUI thread, and only a bounded number of rows is held in memory.
+
+Output files ending in run_file.RUN_FILE_EXTENSION are written in the binary run
+file format (see run_file.py) instead of csv.
+"""
+import csv
+import logging
+import queue
+import threading
+from run_file import (RunFileWriter, RUN_FILE_EXTENSION)
+
+logger = logging.getLogger(__name__)
+
+RESULTS_HEADER = ['SimulationIndex', 'Time', 'Distance', 'Velocity',
+                  'Max Velocity', 'Acceleration', 'Motor Power',
+                  'Battery Power', 'Battery Energy']
+RESULTS_DTYPES = ['int64'] + ['float64'] * (len(RESULTS_HEADER) - 1)
+
+
+class ResultsStreamWriter(threading.Thread):
+    """Background thread that writes chunks of result rows to a csv or run file.
+
+    Chunks are passed through a bounded queue, when the writer falls behind
+    the producer (SimulationThread) blocks in write_rows() instead of
+    buffering an unbounded amount of rows.
+
+    Args:
+        output_filename (string): name of the csv or run file to write
+        metadata (dict): metadata of the run, only stored in run files
+        compress (bool): compress the columns of run files
+        max_queued_chunks (int): maximum number of chunks waiting to be written
+    """
+    def __init__(self, output_filename, metadata=None, compress=False, max_queued_chunks=16):
+        threading.Thread.__init__(self, name="ResultsStreamWriter", daemon=True)
+        self.output_filename = output_filename
+        self.metadata = dict(metadata) if metadata is not None else {}
+        self.compress = compress
+        self.rows_written = 0
+        self._queue = queue.Queue(maxsize=max_queued_chunks)
+
+    def write_rows(self, rows):
+        """Queue a chunk of rows (list of lists in RESULTS_HEADER order) for writing."""
+        if rows:
+            self._queue.put(rows)
+
+    def close(self, metadata=None):
+        """Write out everything that is queued and wait for the file to be closed.
+
+        Args:
+            metadata (dict): metadata only known at the end of the run (e.g. timing)
+        """
+        if metadata is not None:
+            self.metadata.update(metadata)
+        self._queue.put(None)
+        self.join()
+        logger.info("results stream closed, {} rows written to {}"
+                    .format(self.rows_written, self.output_filename),
+                    extra={'sim_index': 'N/A'})
+
+    def run(self):
+        if self.output_filename.endswith(RUN_FILE_EXTENSION):
+            self._write_run_file()
+        else:
+            self._write_csv_file()
+
+    def _write_run_file(self):
+        writer = RunFileWriter(self.output_filename, list(zip(RESULTS_HEADER, RESULTS_DTYPES)),
+                               compress=self.compress)
+        while True:
+            rows = self._queue.get()
+            if rows is None:
+                break
+            writer.append(dict(zip(RESULTS_HEADER, zip(*rows))))
+            self.rows_written += len(rows)
+        # the metadata is complete once close() queued the end of the stream
+        writer.close(self.metadata)
+
+    def _write_csv_file(self):
+        with open(self.output_filename, 'w', newline='') as csvfile:
+            writer = csv.writer(csvfile, delimiter=',', quoting=csv.QUOTE_MINIMAL)
+            writer.writerow(RESULTS_HEADER)
+            while True:
+                rows = self._queue.get()
+                if rows is None:
+                    break
+                writer.writerows(rows)
+                self.rows_written += len(rows)
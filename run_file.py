@@ -0,0 +1,192 @@
+"""Native binary file format for simulation runs.
+
+A run file holds typed column arrays together with the metadata of the run
+(car parameters, track source, environment, solver settings, timing).
+
+File layout:
+    - MAGIC (8 bytes)
+    - column data, every column is one contiguous block that starts on a
+      COLUMN_ALIGNMENT byte boundary. Uncompressed columns are raw little endian
+      arrays that can be memory mapped, compressed columns are one zlib stream.
+    - footer, utf-8 json with the metadata and the column table
+      (name, dtype, length, offset, nbytes, compression)
+    - footer length (uint64, little endian)
+    - MAGIC (8 bytes)
+
+Columns are read lazily, opening a run file only reads the footer, so reloading
+and comparing very long runs does not depend on the number of rows.
+"""
+import json
+import logging
+import os
+import struct
+import tempfile
+import zlib
+import numpy
+
+logger = logging.getLogger(__name__)
+
+RUN_FILE_EXTENSION = ".run"
+MAGIC = b"ECRRUN01"
+COLUMN_ALIGNMENT = 64
+_FOOTER_LENGTH = struct.Struct("<Q")
+_COPY_BLOCK_SIZE = 1 << 20
+
+
+class RunFileWriter:
+    """Writes a run file from chunks of column data.
+
+    Every column is spooled to its own temporary file while chunks are appended,
+    so memory use does not depend on the length of the run. The columns are
+    put together (and compressed if requested) in close().
+
+    Args:
+        filename (string): name of the run file
+        column_dtypes (list): list of (column name, numpy dtype) tuples
+        metadata (dict): json serializable metadata of the run
+        compress (bool): compress the columns with zlib, compressed columns
+                         can not be memory mapped
+    """
+    def __init__(self, filename, column_dtypes, metadata=None, compress=False):
+        self.filename = filename
+        self.metadata = dict(metadata) if metadata is not None else {}
+        self.compress = compress
+        self._column_dtypes = [(name, numpy.dtype(dtype).newbyteorder("<"))
+                               for name, dtype in column_dtypes]
+        self._lengths = {name: 0 for name, _ in self._column_dtypes}
+        spool_dir = os.path.dirname(os.path.abspath(filename))
+        self._spools = {name: tempfile.TemporaryFile(dir=spool_dir)
+                        for name, _ in self._column_dtypes}
+
+    def append(self, columns):
+        """Append a chunk of data.
+
+        Args:
+            columns (dict): column name -> sequence of values, all columns of the
+                            writer must be present
+        """
+        for name, dtype in self._column_dtypes:
+            values = numpy.asarray(columns[name], dtype=dtype)
+            self._spools[name].write(values.tobytes())
+            self._lengths[name] += len(values)
+
+    def close(self, metadata=None):
+        """Write the run file and remove the spool files.
+
+        Args:
+            metadata (dict): metadata that is only known at the end of the run,
+                             it is merged into the metadata given at construction
+        """
+        if metadata is not None:
+            self.metadata.update(metadata)
+
+        column_table = []
+        with open(self.filename, 'wb') as run_file:
+            run_file.write(MAGIC)
+            for name, dtype in self._column_dtypes:
+                spool = self._spools[name]
+                spool.seek(0)
+                run_file.write(b"\0" * (-run_file.tell() % COLUMN_ALIGNMENT))
+                offset = run_file.tell()
+                compressor = zlib.compressobj() if self.compress else None
+                for block in iter(lambda: spool.read(_COPY_BLOCK_SIZE), b""):
+                    run_file.write(compressor.compress(block) if compressor else block)
+                if compressor:
+                    run_file.write(compressor.flush())
+                spool.close()
+                column_table.append({'name': name,
+                                     'dtype': dtype.str,
+                                     'length': self._lengths[name],
+                                     'offset': offset,
+                                     'nbytes': run_file.tell() - offset,
+                                     'compression': "zlib" if self.compress else None})
+
+            footer = json.dumps({'metadata': self.metadata,
+                                 'columns': column_table}).encode('utf-8')
+            run_file.write(footer)
+            run_file.write(_FOOTER_LENGTH.pack(len(footer)))
+            run_file.write(MAGIC)
+        logger.info("run file written: {}, {} columns".format(self.filename, len(column_table)),
+                    extra={'sim_index': 'N/A'})
+
+
+def write_run_file(filename, columns, metadata=None, compress=False):
+    """Write complete columns to a run file in one go.
+
+    Args:
+        filename (string): name of the run file
+        columns (dict): column name -> array like (dtype is kept)
+        metadata (dict): json serializable metadata of the run
+        compress (bool): compress the columns with zlib
+    """
+    arrays = {name: numpy.asarray(values) for name, values in columns.items()}
+    writer = RunFileWriter(filename, [(name, array.dtype) for name, array in arrays.items()],
+                           metadata, compress)
+    writer.append(arrays)
+    writer.close()
+
+
+class RunFile:
+    """Read access to a run file. Columns are loaded lazily on first access,
+    uncompressed columns are memory mapped (read only) instead of read.
+
+    Usage: run = RunFile("results/output.run"); run["Velocity"]; run.metadata
+
+    Args:
+        filename (string): name of the run file
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        self._columns = {}
+        with open(filename, 'rb') as run_file:
+            if run_file.read(len(MAGIC)) != MAGIC:
+                raise Exception("Not a run file: {}".format(filename))
+            run_file.seek(-(len(MAGIC) + _FOOTER_LENGTH.size), os.SEEK_END)
+            footer_length, = _FOOTER_LENGTH.unpack(run_file.read(_FOOTER_LENGTH.size))
+            if run_file.read(len(MAGIC)) != MAGIC:
+                raise Exception("Run file is truncated: {}".format(filename))
+            run_file.seek(-(len(MAGIC) + _FOOTER_LENGTH.size + footer_length), os.SEEK_END)
+            footer = json.loads(run_file.read(footer_length).decode('utf-8'))
+        self.metadata = footer['metadata']
+        self._column_table = {column['name']: column for column in footer['columns']}
+
+    @property
+    def column_names(self):
+        return list(self._column_table)
+
+    def keys(self):
+        return self._column_table.keys()
+
+    def __contains__(self, name):
+        return name in self._column_table
+
+    def __len__(self):
+        lengths = [column['length'] for column in self._column_table.values()]
+        return max(lengths) if lengths else 0
+
+    def __getitem__(self, name):
+        try:
+            return self._columns[name]
+        except KeyError:
+            pass
+        column = self._column_table[name]
+        dtype = numpy.dtype(column['dtype'])
+        if column['length'] == 0:
+            values = numpy.empty(0, dtype=dtype)
+        elif column['compression'] is None:
+            values = numpy.memmap(self.filename, dtype=dtype, mode='r',
+                                  offset=column['offset'], shape=(column['length'],))
+        elif column['compression'] == "zlib":
+            with open(self.filename, 'rb') as run_file:
+                run_file.seek(column['offset'])
+                values = numpy.frombuffer(zlib.decompress(run_file.read(column['nbytes'])),
+                                          dtype=dtype)
+        else:
+            raise Exception("Unknown compression {} of column {}"
+                            .format(column['compression'], name))
+        self._columns[name] = values
+        return values
+
+    def to_dict(self):
+        """Return all columns in a dictionary (column name -> array)"""
+        return {name: self[name] for name in self._column_table}
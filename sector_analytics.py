@@ -0,0 +1,380 @@
+"""Sector and split analytics of a lap.
+
+The lap is split into sectors, defined in the SECTORS section of the init file with
+either option:
+
+    - distances: start distance of every sector (meters), e.g. "0, 1000, 2600"
+    - critical_points: number of the critical point (row of the track file) every
+      sector starts at, e.g. "0, 6, 12", a sector groups the critical points from
+      its first one up to the first one of the next sector
+
+The first sector always starts at the start finish line. Without a SECTORS section
+the whole lap is one sector.
+
+SectorAnalytics keeps the time, distance, motor and battery energy, peak motor power
+and minimum velocity (the corner speed) of every sector while the simulation runs.
+Every physics result added to the lap results updates the sector of its segment:
+the sums subtract the result that is overwritten (walk back) and add the new one,
+the peak power and minimum velocity only have to be searched again when the
+overwritten result was the extreme of the sector, and then only over that sector
+when the results are read. Nothing rescans the whole lap.
+"""
+import csv
+import logging
+import os
+from bisect import (bisect_left, bisect_right)
+
+logger = logging.getLogger(__name__)
+
+SECTORS_SECTION = "SECTORS"
+# the sectors of a results file are written next to it, output.csv -> output_sectors.csv
+SECTOR_RESULTS_SUFFIX = "_sectors.csv"
+
+SECTOR_RESULTS_HEADER = ['Sector', 'Start Distance', 'End Distance', 'Segments', 'Complete',
+                         'Time', 'Split Time', 'Motor Energy', 'Battery Energy',
+                         'Peak Motor Power', 'Min Velocity']
+
+
+def _parse_list(text):
+    # comma separated numbers of the init file
+    return [float(value) for value in text.split(",") if value.strip()]
+
+
+class SectorDefinition:
+    """Class that holds the start distances of the sectors of a lap.
+
+    Args:
+        start_distances (list): distance from the start finish line where every sector
+                                starts (meters), a sector at 0 is added if missing
+    """
+    def __init__(self, start_distances):
+        start_distances = sorted(set(float(distance) for distance in start_distances))
+        if start_distances and start_distances[0] < 0:
+            raise Exception("sector starts before the start finish line: {}"
+                            .format(start_distances[0]))
+        if not start_distances or start_distances[0] > 0:
+            start_distances.insert(0, 0.0)
+        self.start_distances = start_distances
+
+    @classmethod
+    def from_critical_point_groups(cls, critical_point_distances, group_start_points):
+        """Create the sectors from groups of critical points.
+
+        Args:
+            critical_point_distances (list): distance of every critical point (meters),
+                                             see TrackProperties.get_critical_point_distances
+            group_start_points (list): number of the first critical point of every sector
+        """
+        start_distances = []
+        for point in group_start_points:
+            point = int(point)
+            if not 0 <= point < len(critical_point_distances):
+                raise Exception("sector starts at critical point {}, the track has {}"
+                                .format(point, len(critical_point_distances)))
+            start_distances.append(critical_point_distances[point])
+        return cls(start_distances)
+
+    @classmethod
+    def from_ini(cls, init_vals, critical_point_distances):
+        """Create the sectors from the SECTORS section of the init file.
+
+        Args:
+            init_vals (ConfigParser): init file, see project_argparser.call_ini
+            critical_point_distances (list): distance of every critical point (meters)
+        """
+        if not init_vals.has_section(SECTORS_SECTION):
+            return cls([])
+        distances = init_vals.get(SECTORS_SECTION, "distances", fallback="")
+        critical_points = init_vals.get(SECTORS_SECTION, "critical_points", fallback="")
+        if distances.strip() and critical_points.strip():
+            raise Exception("sectors defined by distances and by critical points, use one")
+        if critical_points.strip():
+            return cls.from_critical_point_groups(critical_point_distances,
+                                                  _parse_list(critical_points))
+        return cls(_parse_list(distances))
+
+    def sector_start_indices(self, distance_list):
+        """Index of the first segment of every sector on the track lists.
+
+        Args:
+            distance_list (list): distance at every index of the track (track.distance_list)
+
+        Returns:
+            sector_start_indices (list): index of the first segment of every sector, sectors
+                                         without a segment of their own are dropped
+        """
+        segments = len(distance_list) - 1
+        indices = []
+        for distance in self.start_distances:
+            index = bisect_left(distance_list, distance)
+            if index >= segments:
+                logger.warning("sector start {} m is past the end of the track, ignored"
+                               .format(distance), extra={'sim_index': 'N/A'})
+            elif not indices or index > indices[-1]:
+                indices.append(index)
+        return indices
+
+
+class SectorResults:
+    """Class that contains the aggregates of one sector.
+
+    Args:
+        sector (int): number of the sector, from 0
+        start_distance, end_distance (float): distances the sector starts and ends at (meters)
+        segments (int): number of segments of the sector
+        segments_completed (int): number of segments with results
+        time (float): time of the sector (seconds)
+        split_time (float): time from the start finish line to the end of the sector
+        distance (float): distance traveled in the sector (meters)
+        motor_energy (float): energy of the motor in the sector (joules)
+        battery_energy (float): energy drawn from the battery in the sector (joules)
+        peak_motor_power (float): highest motor power in the sector (watts)
+        min_velocity (float): lowest velocity in the sector (m/s)
+    """
+    def __init__(self, sector, start_distance, end_distance, segments, segments_completed, time,
+                 split_time, distance, motor_energy, battery_energy, peak_motor_power,
+                 min_velocity):
+        self.sector = sector
+        self.start_distance = start_distance
+        self.end_distance = end_distance
+        self.segments = segments
+        self.segments_completed = segments_completed
+        self.time = time
+        self.split_time = split_time
+        self.distance = distance
+        self.motor_energy = motor_energy
+        self.battery_energy = battery_energy
+        self.peak_motor_power = peak_motor_power
+        self.min_velocity = min_velocity
+
+    @property
+    def complete(self):
+        return self.segments_completed == self.segments
+
+    def to_row(self):
+        """The sector as a row in the order of SECTOR_RESULTS_HEADER"""
+        return [self.sector, self.start_distance, self.end_distance, self.segments,
+                self.complete, self.time, self.split_time, self.motor_energy,
+                self.battery_energy, self.peak_motor_power, self.min_velocity]
+
+
+class SectorAnalytics:
+    """Aggregates of every sector, updated with every physics result of the lap.
+
+    Results have to be added in the order of the simulation: a segment after the last
+    one with results is new, a segment before it is overwritten (walk back).
+
+    Args:
+        distance_list (list): distance at every index of the track (track.distance_list)
+        sector_start_indices (list): index of the first segment of every sector,
+                                     see SectorDefinition.sector_start_indices
+    """
+    def __init__(self, distance_list, sector_start_indices):
+        segments = len(distance_list) - 1
+        if not sector_start_indices or sector_start_indices[0] != 0:
+            raise Exception("the first sector has to start at index 0, got {}"
+                            .format(sector_start_indices[:1]))
+        self.sector_start_indices = list(sector_start_indices)
+        self.sector_end_indices = self.sector_start_indices[1:] + [segments]
+        self.start_distances = [float(distance_list[i]) for i in self.sector_start_indices]
+        self.end_distances = [float(distance_list[i]) for i in self.sector_end_indices]
+
+        sectors = len(self.sector_start_indices)
+        self._time = [0.0] * sectors
+        self._distance = [0.0] * sectors
+        self._motor_energy = [0.0] * sectors
+        self._battery_energy = [0.0] * sectors
+        self._peak_motor_power = [float('-inf')] * sectors
+        self._min_velocity = [float('inf')] * sectors
+        self._segments_completed = [0] * sectors
+        # the extreme of the sector was overwritten, search the sector again when read
+        self._stale = [False] * sectors
+        # streaming mode: extremes of the segments of a sector that were discarded
+        self._discarded_peak_motor_power = [float('-inf')] * sectors
+        self._discarded_min_velocity = [float('inf')] * sectors
+
+        # index after the last segment with results
+        self._results_end_index = 0
+        # bounds of the sector of the last result, results come mostly in index order
+        self._sector = 0
+        self._sector_start = 0
+        self._sector_end = self.sector_end_indices[0]
+
+    def _sector_of_index(self, index):
+        if not self._sector_start <= index < self._sector_end:
+            self._sector = bisect_right(self.sector_start_indices, index) - 1
+            self._sector_start = self.sector_start_indices[self._sector]
+            self._sector_end = self.sector_end_indices[self._sector]
+        return self._sector
+
+    def add_physics_results(self, physics_results, index, physics_results_profile):
+        """Function that updates the sector of index with new physics results.
+        Call before the results are put into physics_results_profile.
+
+        Args:
+            physics_results (PhysicsResults): physics results of the segment at index
+            index (int): index of the segment
+            physics_results_profile (list): physics results of every segment so far, the
+                                            results at index are replaced if there are any
+        """
+        sector = self._sector_of_index(index)
+        if index < self._results_end_index:
+            replaced_results = physics_results_profile[index]
+            self._remove(sector, replaced_results.time_of_segment,
+                         replaced_results.distance_traveled,
+                         replaced_results.energy_differential_of_motor,
+                         replaced_results.battery_energy, replaced_results.motor_power,
+                         replaced_results.final_velocity)
+        else:
+            self._segments_completed[sector] += 1
+            self._results_end_index = index + 1
+        self._add(sector, physics_results.time_of_segment, physics_results.distance_traveled,
+                  physics_results.energy_differential_of_motor, physics_results.battery_energy,
+                  physics_results.motor_power, physics_results.final_velocity)
+
+    def remove_physics_results_row(self, index, physics_results_columns):
+        """Function that takes the results at index out of its sector, if there are any.
+        Call before a physics calculation writes new results into the row, then
+        add_physics_results_row.
+
+        Args:
+            index (int): index of the segment
+            physics_results_columns (PhysicsResultsColumns): physics results of every segment
+        """
+        if index < self._results_end_index:
+            columns = physics_results_columns
+            self._remove(self._sector_of_index(index), columns.time_of_segment[index],
+                         columns.distance_traveled[index],
+                         columns.energy_differential_of_motor[index],
+                         columns.battery_energy[index], columns.motor_power[index],
+                         columns.final_velocity[index])
+
+    def add_physics_results_row(self, index, physics_results_columns):
+        """Function that updates the sector of index with the results in row index of
+        physics_results_columns.
+
+        Args:
+            index (int): index of the segment
+            physics_results_columns (PhysicsResultsColumns): physics results of every segment
+        """
+        sector = self._sector_of_index(index)
+        if index >= self._results_end_index:
+            self._segments_completed[sector] += 1
+            self._results_end_index = index + 1
+        columns = physics_results_columns
+        self._add(sector, columns.time_of_segment[index], columns.distance_traveled[index],
+                  columns.energy_differential_of_motor[index], columns.battery_energy[index],
+                  columns.motor_power[index], columns.final_velocity[index])
+
+    def _remove(self, sector, time_of_segment, distance_traveled, motor_energy, battery_energy,
+                motor_power, final_velocity):
+        self._time[sector] -= time_of_segment
+        self._distance[sector] -= distance_traveled
+        self._motor_energy[sector] -= motor_energy
+        self._battery_energy[sector] -= battery_energy
+        if (motor_power == self._peak_motor_power[sector] or
+                final_velocity == self._min_velocity[sector]):
+            self._stale[sector] = True
+
+    def _add(self, sector, time_of_segment, distance_traveled, motor_energy, battery_energy,
+             motor_power, final_velocity):
+        self._time[sector] += time_of_segment
+        self._distance[sector] += distance_traveled
+        self._motor_energy[sector] += motor_energy
+        self._battery_energy[sector] += battery_energy
+        if motor_power > self._peak_motor_power[sector]:
+            self._peak_motor_power[sector] = motor_power
+        if final_velocity < self._min_velocity[sector]:
+            self._min_velocity[sector] = final_velocity
+
+    def _sector_range(self, sector, lap_results):
+        # indexes of the sector that have results and are still held by lap_results
+        return (max(self.sector_start_indices[sector], lap_results.first_available_index),
+                min(self.sector_end_indices[sector], self._results_end_index))
+
+    def _refresh_sector(self, sector, lap_results):
+        # search the extremes of a stale sector again, only over the sector
+        begin_index, end_index = self._sector_range(sector, lap_results)
+        self._peak_motor_power[sector] = max(
+            lap_results.motor_power_list[begin_index:end_index],
+            default=float('-inf'))
+        self._min_velocity[sector] = min(lap_results.velocity_list[begin_index:end_index],
+                                         default=float('inf'))
+        self._peak_motor_power[sector] = max(self._peak_motor_power[sector],
+                                             self._discarded_peak_motor_power[sector])
+        self._min_velocity[sector] = min(self._min_velocity[sector],
+                                         self._discarded_min_velocity[sector])
+        self._stale[sector] = False
+
+    def discard_before(self, index, lap_results):
+        """Streaming mode only: keep the extremes of the segments of lap_results before
+        index, they are about to be discarded. Called before the lists are cut.
+
+        Args:
+            index (int): first index that is kept
+            lap_results (LapVelocitySimulationResults): results holding the segments
+        """
+        begin_index = lap_results.first_available_index
+        if index <= begin_index:
+            return
+        first_sector = bisect_right(self.sector_start_indices, begin_index) - 1
+        last_sector = bisect_right(self.sector_start_indices, index - 1) - 1
+        for sector in range(first_sector, last_sector + 1):
+            if self._stale[sector]:
+                self._refresh_sector(sector, lap_results)
+            discard_begin = max(self.sector_start_indices[sector], begin_index)
+            discard_end = min(self.sector_end_indices[sector], index)
+            self._discarded_peak_motor_power[sector] = max(
+                self._discarded_peak_motor_power[sector],
+                max(lap_results.motor_power_list[discard_begin:discard_end]))
+            self._discarded_min_velocity[sector] = min(
+                self._discarded_min_velocity[sector],
+                min(lap_results.velocity_list[discard_begin:discard_end]))
+
+    def sector_results(self, lap_results):
+        """Function that returns the aggregates of every sector, sectors without any
+        results yet included.
+
+        Args:
+            lap_results (LapVelocitySimulationResults): results the analytics were added to,
+                                                        stale sectors are searched in them
+
+        Returns:
+            sector_results (list): SectorResults of every sector
+        """
+        results = []
+        split_time = 0
+        for sector in range(len(self.sector_start_indices)):
+            if self._stale[sector]:
+                self._refresh_sector(sector, lap_results)
+            split_time += self._time[sector]
+            completed = self._segments_completed[sector] > 0
+            results.append(SectorResults(
+                sector, self.start_distances[sector], self.end_distances[sector],
+                self.sector_end_indices[sector] - self.sector_start_indices[sector],
+                self._segments_completed[sector], self._time[sector], split_time,
+                self._distance[sector], self._motor_energy[sector],
+                self._battery_energy[sector],
+                self._peak_motor_power[sector] if completed else 0.0,
+                self._min_velocity[sector] if completed else 0.0))
+        return results
+
+
+def sector_results_filename(output_filename):
+    """Name of the sector csv file that goes with the results file output_filename"""
+    return os.path.splitext(output_filename)[0] + SECTOR_RESULTS_SUFFIX
+
+
+def write_sector_results_csv(filename, sector_results):
+    """Function that writes the aggregates of every sector to a csv file.
+
+    Args:
+        filename (string): name of the csv file
+        sector_results (list): SectorResults of every sector
+    """
+    with open(filename, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile, delimiter=',', quoting=csv.QUOTE_MINIMAL)
+        writer.writerow(SECTOR_RESULTS_HEADER)
+        writer.writerows(sector.to_row() for sector in sector_results)
+    logger.info("{} sectors written to {}".format(len(sector_results), filename),
+                extra={'sim_index': 'N/A'})
@@ -5,6 +5,7 @@
 
 # USE ONLY SI UNITS
 import time
+import math
 import logging
 # from project_argparser import SingleArg
 from PyQt5.QtCore import (QThread, pyqtSignal, pyqtSlot)
@@ -12,13 +13,21 @@ import cProfile
 #import ptvsd
 from datastore import (DataStore, RacingSimulationResults)
 from logging_config import configure_logging
-from physics_equations import (max_negative_power_physics_simulation,
+from physics_equations import (CarModel,
+                               max_negative_power_physics_simulation,
                                max_positive_power_physics_simulation,
                                constrained_velocity_physics_simulation,
-                               reverse_max_negative_power_physics_simulation
+                               reverse_max_negative_power_physics_simulation,
+                               braking_distance_calculation
                                )
-from electric_car_properties import ElectricCarProperties
+from results_writer import ResultsStreamWriter
+from sector_analytics import (SectorDefinition, SECTOR_RESULTS_HEADER, sector_results_filename,
+                              write_sector_results_csv)
+from race_simulation import RaceSimulation
+from lap_solver import STANDING_START_VELOCITY
+from electric_car_properties import car_properties_from_car_data
 from track_properties import (TrackProperties)
+from environment import Environment
 # from track_properties import (TrackProperties,
 #                              simple_track)
 
@@ -29,11 +38,23 @@ class SimulationThread(QThread):
     simulationThreadWalkBackCompleteSignal = pyqtSignal(int)  # sim_index where walkback completed
     breakpointDistance = 0
 
-    def __init__(self, passed_data_store, logger, track_data, car_data, init_vals, parent=None):
+    # number of finalized rows that are collected before handing them to the results writer
+    RESULTS_FLUSH_CHUNK = 1000
+
+    def __init__(self, passed_data_store, logger, track_data, car_data, init_vals,
+                 output_filename=None, input_files=None, compress_output=False, parent=None):
         QThread.__init__(self, parent)
         
         self.logger = logger
 
+        # results are streamed to output_filename while the simulation runs (if given)
+        # input_files (dict of "car" and "track" file names) is stored as run file metadata
+        self.output_filename = output_filename
+        self.input_files = input_files if input_files is not None else {}
+        self.compress_output = compress_output
+        self._results_writer = None
+        self._results_flushed_index = 0
+
         self.exiting = False
         self.setObjectName("SimulationThread")
 
@@ -44,6 +65,10 @@ class SimulationThread(QThread):
         self.simulationComputing = False
         self.breakpointDistance = 0
 
+        # called with every status update in addition to the signal, used when the
+        # simulation runs without a Qt event loop (see simulation_process.py)
+        self.status_callback = None
+
         # Initialize the simulation universe
         self._data_store = passed_data_store
         self.initialize_race(track_data, car_data, init_vals)
@@ -67,28 +92,114 @@ class SimulationThread(QThread):
 
     def initialize_race(self, track_data, car_data, init_vals):
 
-        segment_distance = 0.005  # meters, this must be very very small
+        # meters, this must be very very small
+        segment_distance = init_vals.getfloat("SIMULATION", "segment_distance", fallback=0.005)
         wheel_radius = 0.25  # m, ~20 in OD on tires
+        # streaming mode: number of simulation indexes kept in memory, 0 keeps the whole lap
+        self.streaming_window = init_vals.getint("SIMULATION", "streaming_window", fallback=0)
+        # keep where the motor energy of every segment goes (drag, rolling resistance, ...)
+        self.energy_flow = init_vals.getboolean("SIMULATION", "energy_flow", fallback=False)
+
+        # race settings, laps after the first one are simulated by the RaceSimulation
+        self.race_laps = init_vals.getint("RACE", "laps", fallback=1)
+        self.pit_stop_time = init_vals.getfloat("RACE", "pit_stop_time", fallback=30)
+        self.pit_exit_velocity = init_vals.getfloat("RACE", "pit_exit_velocity", fallback=1)
+        self.min_state_of_charge = car_data["minSoc"]
+        self.max_state_of_charge = car_data["maxSoc"]
 
         track = TrackProperties()
-        track.set_air_density(float(init_vals["ENVIRONMENT"]["air_density"]))
+        environment = Environment.from_ini(init_vals)
 
         for i in range(len(track_data)):
             track.add_critical_point(track_data[i][0], track_data[i][5], track.FREE_ACCELERATION)
 
-        track.generate_track_list(segment_distance)
-
-        car = ElectricCarProperties()
-        car.set_car_parameters(mass=car_data["vehKg"], rotational_inertia=car_data["wheelInertiaKgM2"],
-                               motor_power=(car_data["maxMotorKw"] * 1000), motor_efficiency=car_data["motorPeakEff"],
-                               battery_capacity=10, drag_coefficient=car_data["dragCoef"],
-                               frontal_area=car_data["frontalAreaM2"], wheel_radius=wheel_radius,
-                               wheel_pressure_bar=car_data["wheelRrCoef"])
+        # elevation of the raceline (elev_m column), read once here, the physics
+        # calculations use the elevation change of every segment of the track list
+        if all(len(row) > 7 and isinstance(row[7], (int, float)) for row in track_data):
+            track.add_raceline_elevation([row[0] for row in track_data],
+                                         [row[7] for row in track_data])
+        # heading of the raceline (psi_rad column) for the wind
+        if all(len(row) > 3 and isinstance(row[3], (int, float)) for row in track_data):
+            track.add_raceline_heading([row[0] for row in track_data],
+                                       [row[3] for row in track_data])
 
-        self._data_store.initialize_lap_lists(len(track.distance_list))
+        track.generate_track_list(segment_distance)
+        environment.apply(track)
+
+        # max velocities from the raceline curvature: "file" uses the vx_mps column,
+        # "curvature" the cornering velocity of the kappa_radpm column, "both" the lower
+        velocity_constraints = init_vals.get("TRACK", "velocity_constraints", fallback="file")
+        if velocity_constraints not in ("file", "curvature", "both"):
+            raise Exception("Invalid velocity_constraints {}".format(velocity_constraints))
+        if velocity_constraints != "file":
+            track.add_raceline_curvature(
+                [row[0] for row in track_data], [row[4] for row in track_data],
+                math.radians(init_vals.getfloat("TRACK", "bank_angle", fallback=0)))
+            track.generate_curvature_constraints(
+                car_data["wheelCoefOfFric"] * environment.friction_factor,
+                init_vals.getfloat("TRACK", "straight_max_velocity", fallback=80),
+                replace_max_velocity=(velocity_constraints == "curvature"))
+
+        car = car_properties_from_car_data(car_data, wheel_radius, environment.friction_factor)
+
+        # A walk back never reaches further back than the longest braking zone on the track,
+        # which is braking from the highest to the lowest max velocity (on the steepest
+        # downhill grade of the track). Results older than that can not be rewritten
+        # anymore and are final.
+        braking_zone = braking_distance_calculation(min(track.max_velocity_list),
+                                                    max(track.max_velocity_list),
+                                                    car.get_car_model(),
+                                                    track.get_air_density(),
+                                                    grade=min(track.grade_list))
+        self.finalized_results_lag = math.ceil(braking_zone / segment_distance) + 2
+        self.logger.info("longest braking zone: {} m, {} segments"
+                         .format(braking_zone, self.finalized_results_lag),
+                         extra={'sim_index': 'N/A'})
+
+        if self.streaming_window:
+            # the window has to hold everything a walk back can reach plus the results
+            # that are waiting to be flushed
+            minimum_window = self.finalized_results_lag + 2 * self.RESULTS_FLUSH_CHUNK
+            if self.streaming_window < minimum_window:
+                self.logger.warning("streaming window {} shorter than the longest braking zone, "
+                                    "using {}"
+                                    .format(self.streaming_window, minimum_window),
+                                    extra={'sim_index': 'N/A'})
+                self.streaming_window = minimum_window
+            self._data_store.initialize_lap_lists(len(track.distance_list), self.streaming_window,
+                                                  self.energy_flow)
+        else:
+            self._data_store.initialize_lap_lists(len(track.distance_list),
+                                                  energy_flow=self.energy_flow)
+        sectors = SectorDefinition.from_ini(init_vals, track.get_critical_point_distances())
+        self._data_store.set_sector_analytics(track.distance_list,
+                                              sectors.sector_start_indices(track.distance_list))
         self._data_store.set_car_properties(car)
         self._data_store.set_track_properties(track)
 
+        # description of the run, stored with the results in run files
+        self.run_metadata = {
+            'car': {'name': car_data.get("Scenario name"),
+                    'source': self.input_files.get("car"),
+                    # the powertrain and drive limits are objects, only the numbers are stored
+                    'parameters': {name: value for name, value in car.get_car_parameters().items()
+                                   if isinstance(value, (int, float, str))}},
+            'track': {'source': self.input_files.get("track"),
+                      'length': track.distance_list[-1]},
+            'environment': dict(init_vals["ENVIRONMENT"]),
+            'solver': {'segment_distance': segment_distance,
+                       'segments': len(track.distance_list),
+                       'streaming_window': self.streaming_window,
+                       'energy_flow': self.energy_flow,
+                       'finalized_results_lag': self.finalized_results_lag},
+        }
+
+    def status_update(self, text):
+        """Send a status update (e.g. "Paused") to the MainWindow"""
+        self.simulationThreadStatusUpdateSignal.emit(text)
+        if self.status_callback is not None:
+            self.status_callback(text)
+
     """ SimulationThread signal handling routines. This is the collection of SLOTS
         that get signaled (emitted) from the MainWindow and tell the SimulationThread
         what to do, like change states and start calculating, pause, etc.
@@ -118,7 +229,7 @@ class SimulationThread(QThread):
             # set the breakpoint to be a very large number to indicate run to completion
             self.breakpointDistance = 9999999
             # (re)start computing and acknowledge to MainWindow by sending a signal back
-            self.simulationThreadStatusUpdateSignal.emit("Calculating...")
+            self.status_update("Calculating...")
             # "state" variable indicating thread should be calculating
             self.simulationComputing = True
         else:
@@ -130,7 +241,7 @@ class SimulationThread(QThread):
                 # requested breakpoint is further down the track
                 self.breakpointDistance = distance_value
                 # Start computing and acknowledge to MainWindow by sending a signal back
-                self.simulationThreadStatusUpdateSignal.emit("Calculating...")
+                self.status_update("Calculating...")
                 # "state" variable indicating thread should be calculating
                 self.simulationComputing = True
             else:
@@ -144,7 +255,7 @@ class SimulationThread(QThread):
         self.logger.info('Slot:thread_stop_calculating :',
                     extra={'sim_index': self._data_store.get_simulation_index()})
         # Now send a signal back to the main window
-        self.simulationThreadStatusUpdateSignal.emit("Paused")
+        self.status_update("Paused")
 
         # "state" variable indicating thread should stop calculating
         self.simulationComputing = False
@@ -163,15 +274,46 @@ class SimulationThread(QThread):
         """
         results = RacingSimulationResults()
 
-        self.lap_velocity_simulation()
+        self._start_time = time.time()
+        if self.output_filename is not None:
+            self._results_writer = ResultsStreamWriter(self.output_filename, self.run_metadata,
+                                                       self.compress_output)
+            self._results_writer.start()
+
         # only calculate results if the simulation ran through without an interruption
-        if not self._data_store.exit_event.is_set():
+        if self.lap_velocity_simulation():
             lap_results = self._data_store.get_lap_results()
-
-            # TODO fix this
-            # results.laps_per_pit_stop = car["battery_capacity"]/lap_results.motor_energy_list[-1]
-            results.lap_time = lap_results.end_velocity
+            end_index = self._data_store.get_simulation_index() - 1
+            first_index = lap_results.first_available_index
+            lap_results.regenerate_cumulative_lists(first_index + 1 if first_index > 0 else 0,
+                                                    end_index + 1)
+            lap_results.lap_time = lap_results.time_cumulative_list[end_index]
+            lap_results.end_velocity = lap_results.velocity_list[end_index]
+
+            car = self._data_store.get_car_properties()
+            usable_battery_energy = (car["battery_capacity"] *
+                                     (self.max_state_of_charge - self.min_state_of_charge))
+            results.laps_per_pit_stop = \
+                usable_battery_energy / lap_results.battery_energy_cumulative_list[end_index]
+            results.lap_time = lap_results.lap_time
             results.lap_results = lap_results
+            results.sector_results = self._data_store.get_sector_results()
+
+            if self.race_laps > 1:
+                track = self._data_store.get_track_properties()
+                race = RaceSimulation(track, car, track.get_air_density(), self.race_laps,
+                                      self.pit_stop_time, self.pit_exit_velocity,
+                                      self.min_state_of_charge, self.max_state_of_charge)
+                results.pit_strategies = race.evaluate_pit_strategies()
+                results.race_results = results.pit_strategies[0]
+                # laps after a pit stop start slower, use the periodic lap for the pit window
+                results.laps_per_pit_stop = race.laps_per_pit_stop()
+                self.logger.info("race of {} laps: {} s, pit stops after laps {}, feasible: {}, "
+                                 "{} laps calculated"
+                                 .format(self.race_laps, results.race_results.race_time,
+                                         results.race_results.pit_stop_laps,
+                                         results.race_results.feasible, race.laps_calculated),
+                                 extra={'sim_index': 'N/A'})
             self._data_store.set_race_results(results)
 
     def lap_velocity_simulation(self):
@@ -183,16 +325,18 @@ class SimulationThread(QThread):
             data_store (DataStore): Thread safe storage for all simulation data
 
         Returns:
-            Nothing (all data saved in the datastore)
+            completed (bool): True if the lap was simulated to the end, False if it was
+                              interrupted (all data saved in the datastore)
         """
         # performance increases by assigning local functions
         # https://towardsdatascience.com/10-techniques-to-speed-up-python-runtime-95e213e925dc
-        add_physics_result_to_datastore = self._data_store.add_physics_results_to_lap_results
+        calculate_lap_results = self._data_store.calculate_lap_results
         get_final_velocity = self._data_store.get_final_velocity_at_index
 
         track = self._data_store.get_track_properties()
         air_density = track.get_air_density()
-        car = self._data_store.get_car_properties()
+        # the car constants of the physics calculations are calculated once per lap
+        car = CarModel(self._data_store.get_car_properties())
 
         # need to populate the time profile be the same length as the distance list
         # to complete a lap of simulation
@@ -212,24 +356,39 @@ class SimulationThread(QThread):
                                   track.distance_list[sim_index])
 
             # only continue simulation computing if the GUI says to do so.
-            if (self.simulationComputing is True and self.breakpointDistance > track.distance_list[sim_index]): 
-                initial_velocity = get_final_velocity(sim_index - 1)
-                physics_results = max_positive_power_physics_simulation(initial_velocity,
-                                                                        distance_of_travel,
-                                                                        car,
-                                                                        air_density)
-                add_physics_result_to_datastore(physics_results, sim_index)
+            if (self.simulationComputing is True and
+                    self.breakpointDistance > track.distance_list[sim_index]):
+                if sim_index > 0:
+                    initial_velocity = get_final_velocity(sim_index - 1)
+                else:
+                    initial_velocity = STANDING_START_VELOCITY
+                # the results are calculated into the lap results of the datastore
+                calculate_lap_results(
+                    max_positive_power_physics_simulation, sim_index,
+                    initial_velocity, distance_of_travel, car,
+                    air_density * track.air_density_factor_list[sim_index],
+                    track.elevation_change_list[sim_index], track.headwind_list[sim_index],
+                    track.rolling_resistance_factor_list[sim_index])
                 # check if velocity constraints are violated
-                if get_final_velocity(sim_index) > track.max_velocity_list[sim_index]:
+                final_velocity = get_final_velocity(sim_index)
+                if final_velocity > track.max_velocity_list[sim_index]:
                     # velocity constraint violated!!
                     # start walking back until velocity constraint at sim_index is met
-                    self.logger.debug("velocity constraint violated starting walk back, current v: {}, max: {}"
-                        .format(physics_results.final_velocity, track.max_velocity_list[sim_index]),
-                        extra={'sim_index': self._data_store.get_simulation_index()})
+                    self.logger.debug("velocity constraint violated starting walk back, "
+                                      "current v: {}, max: {}"
+                                      .format(final_velocity, track.max_velocity_list[sim_index]),
+                                      extra={'sim_index': self._data_store.get_simulation_index()})
                     self.walk_back(track.max_velocity_list[sim_index], track, car)
 
                 # completed calculation for the latest simulation index,
                 self._data_store.increment_simulation_index()
+
+                # hand results that can not be rewritten by a walk back anymore to the writer
+                # and drop them from memory in streaming mode
+                if ((self._results_writer is not None or self.streaming_window) and
+                        sim_index - self.finalized_results_lag >=
+                        self._results_flushed_index + self.RESULTS_FLUSH_CHUNK):
+                    self.flush_results(sim_index - self.finalized_results_lag)
             else:
                 # self.simulationComputing is False or we've reached a breakpoint,
                 # so wait for GUI user to indicate proceed
@@ -237,7 +396,7 @@ class SimulationThread(QThread):
                 if self.simulationComputing is True:
                     # if we're computing and got here, must have hit a breakpoint, therefore pause
                     # Now send a signal back to the main window
-                    self.simulationThreadStatusUpdateSignal.emit("Paused")
+                    self.status_update("Paused")
 
                     # "state" variable indicating thread should stop calculating
                     self.simulationComputing = False
@@ -253,8 +412,55 @@ class SimulationThread(QThread):
         # end of while data_store.get_simulation_index() < list_len:
 
         self.logger.info("SIMULATION COMPLETE!", extra={'sim_index': 'N/A'})
-        self.simulationThreadStatusUpdateSignal.emit("Complete!")
+        # nothing is recalculated anymore, everything up to the simulation index is final
+        end_index = self._data_store.get_simulation_index()
+        if self._results_writer is not None or self.streaming_window:
+            # the last window stays in memory, the MainWindow or the results publisher
+            # may not have read it yet
+            self.flush_results(end_index, discard=False)
+        energy_flow_totals = None
+        if self.energy_flow:
+            energy_flow_totals = self._data_store.get_energy_flow_totals()
+            self.logger.info("energy flow (J): {}".format(energy_flow_totals),
+                             extra={'sim_index': 'N/A'})
+        if self._results_writer is not None:
+            sector_results = self._data_store.get_sector_results()
+            write_sector_results_csv(sector_results_filename(self.output_filename), sector_results)
+            metadata = {'timing': {
+                'start_time': time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self._start_time)),
+                'wall_time': time.time() - self._start_time,
+                'lap_time': self._data_store.get_time_at_index(end_index - 1)},
+                'sectors': [dict(zip(SECTOR_RESULTS_HEADER, sector.to_row()))
+                            for sector in sector_results]}
+            if energy_flow_totals is not None:
+                metadata['energy_flow'] = energy_flow_totals
+            self._results_writer.close(metadata)
+            self._results_writer = None
+        self.status_update("Complete!")
         self._data_store.exit_event.set()
+        return end_index >= list_len - 1
+
+    def flush_results(self, end_index, discard=True):
+        """Hand the results from the last flushed index up to end_index to the
+        results writer and, in streaming mode, drop them from the live window.
+        Only indexes that can no longer be rewritten by a walk back may be flushed.
+
+        Args:
+            end_index (int): index after the last finalized index
+            discard (bool): drop the flushed results from the live window (streaming mode)
+
+        Returns:
+            Nothing
+        """
+        if end_index <= self._results_flushed_index:
+            return
+        if self._results_writer is not None:
+            rows = self._data_store.get_results_rows_in_range(self._results_flushed_index,
+                                                              end_index)
+            self._results_writer.write_rows(rows)
+        if self.streaming_window and discard:
+            self._data_store.discard_lap_results_before(self._results_flushed_index, end_index)
+        self._results_flushed_index = end_index
 
     def walk_back(self, velocity_from_constraint, passed_track, passed_car):
         """This functions purpose is to correct some of the track calculations after
@@ -277,7 +483,7 @@ class SimulationThread(QThread):
         #ptvsd.debug_this_thread()
         # performance increases by assigning local functions
         # https://towardsdatascience.com/10-techniques-to-speed-up-python-runtime-95e213e925dc
-        add_physics_result_to_datastore = self._data_store.add_physics_results_to_lap_results
+        calculate_lap_results = self._data_store.calculate_lap_results
         get_initial_velocity = self._data_store.get_initial_velocity_at_index
         get_final_velocity = self._data_store.get_final_velocity_at_index
 
@@ -296,14 +502,15 @@ class SimulationThread(QThread):
             1. a "walk back" index is used to track how far back the recalculation occurs
             2. The simulation is run backward on the track, and back in time
             3. The calculation that occurs is a maximum deceleration calculation
-            4. Once the calculation occurs the velocity at (sim_index - walk_back_index) is compared
-            to the velocity in the datastore at (sim_index - walk_back_index) and the following happens
-                a. if the calculated velocity is lower than the datastore velocity the walk_back_index
-                is incremented and the calculation is run again
-                b.  if the caluclated velocity is higher than the datastore velocity then the calculation 
-                is thrown out and a constrained velocity calculation is made 
+            4. Once the calculation occurs the velocity at (sim_index - walk_back_index) is
+            compared to the velocity in the datastore at (sim_index - walk_back_index) and the
+            following happens
+                a. if the calculated velocity is lower than the datastore velocity the
+                walk_back_index is incremented and the calculation is run again
+                b.  if the caluclated velocity is higher than the datastore velocity then the
+                calculation is thrown out and a constrained velocity calculation is made
                 c.  if the velocity is the same then the calculation is accepted
-            5. Once b. or c. is executed the walkback is complete and all variables are reset, the 
+            5. Once b. or c. is executed the walkback is complete and all variables are reset, the
             walk back calculations are committed to the datastore and the simulation continues
 
             """
@@ -324,7 +531,11 @@ class SimulationThread(QThread):
 
             # we need to compare the velocity that is in the datastore from the final velocity at 
             # the previous index
-            comparison_velocity = get_final_velocity(walk_back_index - 1)  # comparing against the final v
+            # comparing against the final v
+            if walk_back_index > 0:
+                comparison_velocity = get_final_velocity(walk_back_index - 1)
+            else:
+                comparison_velocity = STANDING_START_VELOCITY
 
             self.logger.debug("walk_back_index: {}, end_v: {}, start_v: {}"
                         .format(walk_back_index, current_velocity, comparison_velocity),
@@ -334,35 +545,40 @@ class SimulationThread(QThread):
                          .format(current_velocity),
                          extra={'sim_index': walk_back_index})
 
-            # run reverse max decleration equation
-            physics_results = reverse_max_negative_power_physics_simulation(current_velocity,
-                                                                            distance_of_travel,
-                                                                            car,
-                                                                            air_density)
-            self.logger.debug("physics.initial_v: {}, current_v: {}, comparison_v: {}, walk_indx: {}, walk_cnt: {}"
-                        .format(physics_results.initial_velocity, current_velocity, comparison_velocity, walk_back_index, self._data_store.get_walk_back_counter()),
-                        extra={'sim_index': self._data_store.get_simulation_index()})                                                            
+            # run reverse max decleration equation, into the lap results of the datastore
+            calculate_lap_results(
+                reverse_max_negative_power_physics_simulation, walk_back_index,
+                current_velocity, distance_of_travel, car,
+                air_density * track.air_density_factor_list[walk_back_index],
+                track.elevation_change_list[walk_back_index], track.headwind_list[walk_back_index],
+                track.rolling_resistance_factor_list[walk_back_index])
+            initial_velocity = get_initial_velocity(walk_back_index)
+            self.logger.debug("physics.initial_v: {}, current_v: {}, comparison_v: {}, "
+                              "walk_indx: {}, walk_cnt: {}"
+                              .format(initial_velocity, current_velocity, comparison_velocity,
+                                      walk_back_index, self._data_store.get_walk_back_counter()),
+                              extra={'sim_index': self._data_store.get_simulation_index()})
             # compare resulting velocity against datastore velocity
-            if(physics_results.initial_velocity < comparison_velocity):
-                #commit results, increment walkback counter and continue
-                add_physics_result_to_datastore(physics_results, walk_back_index)
+            if(initial_velocity < comparison_velocity):
+                # keep the results, increment walkback counter and continue
                 self._data_store.increment_walk_back_counter()
-            elif(physics_results.initial_velocity == comparison_velocity):
-                add_physics_result_to_datastore(physics_results, walk_back_index)
+            elif(initial_velocity == comparison_velocity):
                 walk_back_status = "walk back complete"
-            elif(physics_results.initial_velocity > comparison_velocity):
-                physics_results = \
-                    constrained_velocity_physics_simulation(current_velocity,
-                                                            comparison_velocity,
-                                                            distance_of_travel,
-                                                            car,
-                                                            air_density)
-                add_physics_result_to_datastore(physics_results, walk_back_index)
+            elif(initial_velocity > comparison_velocity):
+                # the reverse results are overwritten
+                calculate_lap_results(
+                    constrained_velocity_physics_simulation, walk_back_index,
+                    current_velocity, comparison_velocity, distance_of_travel, car,
+                    air_density * track.air_density_factor_list[walk_back_index],
+                    track.elevation_change_list[walk_back_index],
+                    track.headwind_list[walk_back_index],
+                    track.rolling_resistance_factor_list[walk_back_index])
                 walk_back_status = "walk back complete"
                 self.logger.debug("walkback complete, constrained physics",
                         extra={'sim_index': self._data_store.get_simulation_index()})
             else:
-                raise("Something wrong in walk back! Please contact you local dev for more information")
+                raise Exception("Something wrong in walk back! Please contact you local dev for "
+                                "more information")
 
         # walk back complete, let the main graphing entity know where we ended up
         # refresh_index = self._data_store.get_simulation_index()-walk_back_index
@@ -385,4 +601,5 @@ class SimulationThread(QThread):
         # I have only been able to get the runsnake files to work on linux
         # alternative profile results viewer for windows (untried):
         # https://sourceforge.net/projects/qcachegrindwin/
-        cProfile.runctx("self.racing_simulation()", globals(), locals(), './results/cProfile-results/profile-simulation.out')
+        cProfile.runctx("self.racing_simulation()", globals(), locals(),
+                        './results/cProfile-results/profile-simulation.out')
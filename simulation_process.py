@@ -0,0 +1,326 @@
+"""Simulation engine in a separate process.
+
+In the default setup the SimulationThread is a QThread of the GUI process, the python
+physics calculations and the MainWindow rendering share one interpreter (and its GIL).
+With SimulationProcess the SimulationThread runs in a child process instead:
+
+    - results are published into a SharedResultsBuffer, a shared memory block with
+      one float64 column per plotted value. The MainWindow plots numpy views of the
+      columns, no data is copied or pickled between the processes.
+    - control messages (start, pause, breakpoint, exit) go from the GUI to the child
+      over a pipe, status updates ("Calculating...", "Paused", "Complete!") and the
+      sector aggregates (a few rows, see sector_analytics.py) come back over the
+      same pipe.
+
+The SimulationThread runs in the main thread of the child, a listener thread receives
+the control messages and a publisher thread copies new results from the DataStore of
+the child into the shared buffer.
+"""
+import logging
+import threading
+import multiprocessing
+from multiprocessing import (shared_memory, resource_tracker)
+import numpy
+from PyQt5.QtCore import (QObject, QTimer, pyqtSignal)
+
+logger = logging.getLogger(__name__)
+
+# columns of the shared buffer, same keys as DataStore.get_new_data_values
+SHARED_RESULTS_COLUMNS = ('time', 'distance', 'velocity', 'max_velocity', 'acceleration',
+                          'motor_power', 'battery_power', 'battery_energy')
+
+# header fields of the shared buffer (int64)
+_SIMULATION_INDEX = 0
+_PUBLISHED_LENGTH = 1
+_HEADER_LENGTH = 2
+
+# control messages
+START = "start"
+BREAKPOINT = "breakpoint"
+PAUSE = "pause"
+EXIT = "exit"
+# messages from the simulation process
+READY = "ready"
+STATUS = "status"
+SECTORS = "sectors"
+
+# seconds between two publications of new results
+PUBLISH_INTERVAL = 0.1
+
+
+class SharedResultsBuffer:
+    """Columnar results of a simulation in shared memory.
+
+    The simulation process writes rows and then the published length, the reader
+    gets numpy views of the first published length rows of every column.
+    Rows that are rewritten by a walk back are overwritten in place.
+
+    The buffer holds length rows, a ring: the row of simulation index i is
+    i % length. Sized to the track every row has its own place, in streaming mode
+    the buffer is sized to the streaming window and only the last length published
+    rows are kept (get_window).
+
+    A buffer is created with create() by the simulation process, the GUI process
+    attaches to it by name with attach(), until then the buffer is empty.
+    """
+    def __init__(self):
+        self._shared_memory = None
+        self._header = None
+        self._columns = {}
+        self.length = 0
+        # aggregates of every sector, received over the control pipe
+        self.sector_results = []
+
+    @classmethod
+    def create(cls, length):
+        buffer = cls()
+        nbytes = 8 * (_HEADER_LENGTH + length * len(SHARED_RESULTS_COLUMNS))
+        buffer._map(shared_memory.SharedMemory(create=True, size=nbytes), length)
+        buffer._header[:] = 0
+        return buffer
+
+    def attach(self, name, length):
+        """Attach to the buffer name created by another process"""
+        self._map(shared_memory.SharedMemory(name=name), length)
+
+    def _map(self, block, length):
+        self._shared_memory = block
+        self.length = length
+        self._header = numpy.ndarray((_HEADER_LENGTH,), dtype=numpy.int64, buffer=block.buf)
+        for number, column in enumerate(SHARED_RESULTS_COLUMNS):
+            self._columns[column] = numpy.ndarray(
+                (length,), dtype=numpy.float64, buffer=block.buf,
+                offset=8 * (_HEADER_LENGTH + number * length))
+
+    @property
+    def name(self):
+        return self._shared_memory.name
+
+    @property
+    def attached(self):
+        return self._shared_memory is not None
+
+    def publish(self, new_data_values, simulation_index):
+        """Write the result of DataStore.get_new_data_values into the buffer.
+
+        Args:
+            new_data_values (dict): new and rewritten data from the refresh index on
+            simulation_index (int): simulation index of the DataStore
+        """
+        end_index = new_data_values['refresh_index'] + len(new_data_values['time'])
+        published_length = max(int(self._header[_PUBLISHED_LENGTH]), end_index)
+        # rows discarded by a streaming DataStore before they were published are unknown
+        gap_begin = max(int(self._header[_PUBLISHED_LENGTH]),
+                        new_data_values['refresh_index'] - self.length)
+        if gap_begin < new_data_values['refresh_index']:
+            rows = numpy.arange(gap_begin, new_data_values['refresh_index']) % self.length
+            for column in SHARED_RESULTS_COLUMNS:
+                self._columns[column][rows] = numpy.nan
+        # rows before the last length published rows are not held, their place in the
+        # ring belongs to a later row
+        begin_index = max(new_data_values['refresh_index'], published_length - self.length)
+        if begin_index < end_index:
+            rows = numpy.arange(begin_index, end_index) % self.length
+            for column in SHARED_RESULTS_COLUMNS:
+                values = new_data_values[column]
+                self._columns[column][rows] = values[len(values) - len(rows):]
+        # the rows have to be written before the reader is told about them
+        self._header[_PUBLISHED_LENGTH] = published_length
+        self._header[_SIMULATION_INDEX] = simulation_index
+
+    def get_simulation_index(self):
+        if not self.attached:
+            return 0
+        return int(self._header[_SIMULATION_INDEX])
+
+    def get_window(self):
+        """Published rows held in the buffer.
+
+        Returns:
+            first_index (int): simulation index of the first row
+            columns (dict): column name -> numpy array of the rows, in simulation index
+                order. Views of the buffer (no copy) until the ring wraps around.
+        """
+        if not self.attached:
+            return 0, {column: numpy.empty(0) for column in SHARED_RESULTS_COLUMNS}
+        published_length = int(self._header[_PUBLISHED_LENGTH])
+        first_index = max(0, published_length - self.length)
+        start = first_index % self.length
+        if start == 0:
+            return first_index, {column: values[:published_length - first_index]
+                                 for column, values in self._columns.items()}
+        return first_index, {column: numpy.concatenate((values[start:], values[:start]))
+                             for column, values in self._columns.items()}
+
+    def get_columns(self):
+        """Published rows held in the buffer, column name -> numpy array (see get_window)"""
+        return self.get_window()[1]
+
+    def get_sector_results(self):
+        """Aggregates of every sector (list of SectorResults), same as
+        DataStore.get_sector_results"""
+        return self.sector_results
+
+    def close(self, unlink=False):
+        if self._shared_memory is None:
+            return
+        self._header = None
+        self._columns = {}
+        self._shared_memory.close()
+        if unlink:
+            self._shared_memory.unlink()
+        self._shared_memory = None
+
+
+def simulation_process_main(connection, track_data, car_data, init_vals, output_filename,
+                            input_files, compress_output, logging_enabled):
+    """Entry point of the simulation process.
+
+    Args:
+        connection (Connection): child end of the control pipe
+        others: see SimulationThread
+        logging_enabled (bool): configure logging in the simulation process
+    """
+    # imported here, the GUI process only needs the client side of this module
+    from datastore import DataStore
+    from logging_config import configure_logging
+    from simulation import SimulationThread
+
+    if logging_enabled:
+        configure_logging()
+
+    data_store = DataStore()
+    simulation = SimulationThread(data_store, logger, track_data, car_data, init_vals,
+                                  output_filename, input_files, compress_output)
+    track = data_store.get_track_properties()
+    # in streaming mode only the window is kept, same as the lap lists of the DataStore
+    results_buffer = SharedResultsBuffer.create(data_store.get_window_length()
+                                                or len(track.distance_list))
+
+    send_lock = threading.Lock()
+
+    def send(message):
+        with send_lock:
+            try:
+                connection.send(message)
+            except (BrokenPipeError, EOFError):
+                pass
+
+    send((READY, results_buffer.name, results_buffer.length))
+    simulation.status_callback = lambda text: send((STATUS, text))
+
+    def listen():
+        while True:
+            try:
+                message = connection.recv()
+            except EOFError:
+                message = (EXIT,)
+            if message[0] == START:
+                simulation.thread_start_calculating(-1)
+            elif message[0] == BREAKPOINT:
+                simulation.thread_start_calculating(message[1])
+            elif message[0] == PAUSE:
+                simulation.thread_stop_calculating()
+            elif message[0] == EXIT:
+                data_store.exit_event.set()
+                return
+            else:
+                logger.error("unknown control message {}".format(message),
+                             extra={'sim_index': 'N/A'})
+
+    def publish():
+        while not data_store.exit_event.wait(PUBLISH_INTERVAL):
+            simulation_index = data_store.get_simulation_index()
+            # same as the MainWindow, there is nothing to get before the first index
+            if simulation_index > 0:
+                results_buffer.publish(data_store.get_new_data_values(), simulation_index)
+                send((SECTORS, data_store.get_sector_results()))
+
+    threading.Thread(target=listen, name="SimulationProcessListener", daemon=True).start()
+    publisher = threading.Thread(target=publish, name="SimulationProcessPublisher", daemon=True)
+    publisher.start()
+
+    simulation.racing_simulation()
+
+    publisher.join()
+    results_buffer.publish(data_store.get_new_data_values(), data_store.get_simulation_index())
+    send((SECTORS, data_store.get_sector_results()))
+    # the GUI process owns the shared memory from here on, it is unlinked there
+    results_buffer.close()
+    connection.close()
+
+
+class SimulationProcess(QObject):
+    """Runs the SimulationThread in a child process, used by the MainWindow in place
+    of the SimulationThread (same signal and slots). The results are read from
+    the shared buffer in results.
+
+    Args:
+        track_data, car_data, init_vals, output_filename, input_files, compress_output:
+            see SimulationThread
+        logging_enabled (bool): configure logging in the simulation process
+    """
+    simulationThreadStatusUpdateSignal = pyqtSignal(str)
+
+    def __init__(self, track_data, car_data, init_vals, output_filename=None, input_files=None,
+                 compress_output=False, logging_enabled=False, parent=None):
+        QObject.__init__(self, parent)
+        self.results = SharedResultsBuffer()
+        self._connection, child_connection = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(
+            target=simulation_process_main, name="SimulationProcess",
+            args=(child_connection, track_data, car_data, init_vals, output_filename,
+                  input_files, compress_output, logging_enabled))
+
+        # status messages are received in the GUI thread
+        self._receive_timer = QTimer()
+        self._receive_timer.setInterval(50)
+        self._receive_timer.timeout.connect(self.receive_messages)
+
+    def start(self):
+        # the simulation process has to share the resource tracker of this process, the
+        # shared memory is created there and unlinked here
+        resource_tracker.ensure_running()
+        self._process.start()
+        self._receive_timer.start()
+
+    def receive_messages(self):
+        try:
+            while self._connection.poll():
+                message = self._connection.recv()
+                if message[0] == READY:
+                    self.results.attach(message[1], message[2])
+                elif message[0] == STATUS:
+                    self.simulationThreadStatusUpdateSignal.emit(message[1])
+                elif message[0] == SECTORS:
+                    self.results.sector_results = message[1]
+        except (EOFError, OSError):
+            # the simulation process is done, nothing more to receive
+            self._receive_timer.stop()
+
+    def _send(self, message):
+        try:
+            self._connection.send(message)
+        except (BrokenPipeError, OSError):
+            logger.warning("simulation process is not running, {} not sent".format(message),
+                           extra={'sim_index': 'N/A'})
+
+    def thread_start_calculating(self, distance_value):
+        """Same distance_value meanings as SimulationThread.thread_start_calculating"""
+        if distance_value == -1:
+            self._send((START,))
+        else:
+            self._send((BREAKPOINT, distance_value))
+
+    def thread_stop_calculating(self):
+        self._send((PAUSE,))
+
+    def stop(self):
+        """Stop the simulation process (the results file is closed) and release the
+        shared memory"""
+        self._receive_timer.stop()
+        if self._process.is_alive():
+            self._send((EXIT,))
+            self._process.join()
+        if self.results.attached:
+            self.results.close(unlink=True)
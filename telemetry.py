@@ -0,0 +1,362 @@
+"""Ingest of car telemetry and alignment to the track distance.
+
+Telemetry logs are too long to be loaded at once, every stage works on chunks of
+rows and keeps only the state it needs to continue with the next chunk:
+
+    - read_telemetry_chunks reads a csv file (numpy.loadtxt, chunk_rows lines at a
+      time) or a run file (run_file.py, memory mapped columns are sliced)
+    - TelemetryMatcher map matches the position of every row to the distance along
+      the raceline (raceline_geometry.RacelineGeometry). The distance of a row is
+      predicted from the distance of the previous match and the velocity, only the
+      raceline within MATCH_SEARCH_DISTANCE of the prediction is searched, so a row
+      can not jump to a part of the track that passes close by. Distances keep
+      counting over the laps of the session.
+    - TelemetryResampler interpolates the time, velocity and energies at the
+      distances of the track lists (track.distance_list) of every lap
+
+Every complete lap comes out as LapVelocitySimulationResults with the same columns
+as the lap solver results, so a measured lap compares column by column with a
+simulated one. See align_telemetry for the whole pipeline.
+"""
+import csv
+import logging
+import math
+import warnings
+import numpy
+from lap_solver import lap_results_calculation
+from physics_equations import PhysicsResultsColumns
+from run_file import (RunFile, RUN_FILE_EXTENSION)
+
+logger = logging.getLogger(__name__)
+
+# telemetry data -> column of the telemetry file, motor and battery power are optional
+TELEMETRY_COLUMNS = {'time': 'time_s',
+                     'x': 'x_m',
+                     'y': 'y_m',
+                     'velocity': 'vx_mps',
+                     'motor_power': 'motor_power_w',
+                     'battery_power': 'battery_power_w'}
+OPTIONAL_TELEMETRY_DATA = ('motor_power', 'battery_power')
+
+TELEMETRY_CHUNK_ROWS = 100000
+# distance between the raceline points the telemetry is matched to (meters)
+MATCH_SAMPLE_STEP = 1.0
+# the raceline is searched up to this distance before and after the predicted distance
+# of a row (meters)
+MATCH_SEARCH_DISTANCE = 25.0
+# rows matched at once, the prediction of a block starts from the last match
+MATCH_BLOCK_ROWS = 1024
+
+
+def read_telemetry_chunks(filename, columns=None, chunk_rows=TELEMETRY_CHUNK_ROWS,
+                          delimiter=','):
+    """Generator that reads a telemetry file in chunks of rows.
+
+    Args:
+        filename (string): csv file with a header line or run file (RUN_FILE_EXTENSION)
+        columns (dict): telemetry data -> column of the file, TELEMETRY_COLUMNS by default
+        chunk_rows (int): number of rows of a chunk
+        delimiter (string): delimiter of the csv file
+
+    Yields:
+        chunk (dict): telemetry data -> numpy array of the rows of the chunk, optional
+                      data that is not in the file is left out
+    """
+    if columns is None:
+        columns = TELEMETRY_COLUMNS
+
+    if filename.endswith(RUN_FILE_EXTENSION):
+        run = RunFile(filename)
+        names = _telemetry_column_names(columns, run.column_names, filename)
+        for begin_index in range(0, len(run), chunk_rows):
+            yield {data: numpy.array(run[name][begin_index:begin_index + chunk_rows],
+                                     dtype=float)
+                   for data, name in names.items()}
+        return
+
+    with open(filename, newline='') as telemetry_file:
+        header = [name.strip() for name in next(csv.reader([telemetry_file.readline()],
+                                                           delimiter=delimiter))]
+        names = _telemetry_column_names(columns, header, filename)
+        use_columns = [header.index(name) for name in names.values()]
+        while True:
+            with warnings.catch_warnings():
+                # loadtxt warns when the file ends exactly at the end of a chunk
+                warnings.simplefilter('ignore', UserWarning)
+                rows = numpy.loadtxt(telemetry_file, delimiter=delimiter, max_rows=chunk_rows,
+                                     usecols=use_columns, ndmin=2)
+            if len(rows):
+                yield {data: rows[:, column] for column, data in enumerate(names)}
+            if len(rows) < chunk_rows:
+                return
+
+
+def _telemetry_column_names(columns, file_column_names, filename):
+    # columns of the file to read, optional data that is not in the file is left out
+    names = {}
+    for data, name in columns.items():
+        if name in file_column_names:
+            names[data] = name
+        elif data not in OPTIONAL_TELEMETRY_DATA:
+            raise Exception("column {} ({}) missing in telemetry file {}"
+                            .format(name, data, filename))
+    return names
+
+
+class TelemetryMatcher:
+    """Class that map matches telemetry positions to the distance along a raceline,
+    chunk after chunk.
+
+    The raceline is sampled every sample_step meters, a position is projected on the
+    closest line between two samples within search_distance of its predicted distance.
+
+    Args:
+        geometry (RacelineGeometry): raceline the telemetry was recorded on
+        sample_step (float): distance between the raceline samples (meters)
+        search_distance (float): distance searched before and after the predicted
+                                 distance of a row (meters)
+    """
+    def __init__(self, geometry, sample_step=MATCH_SAMPLE_STEP,
+                 search_distance=MATCH_SEARCH_DISTANCE):
+        self.geometry = geometry
+        self._segments = max(1, math.ceil(geometry.length / sample_step))
+        self._step = geometry.length / self._segments
+        sample_distance = geometry.start_distance + self._step * numpy.arange(self._segments + 1)
+        sample_x, sample_y = geometry.position_vectorized(sample_distance)
+        self._x = sample_x[:-1]
+        self._y = sample_y[:-1]
+        self._delta_x = numpy.diff(sample_x)
+        self._delta_y = numpy.diff(sample_y)
+        self._length_squared = numpy.maximum(self._delta_x ** 2 + self._delta_y ** 2, 1e-12)
+        search_segments = math.ceil(search_distance / self._step)
+        self._search_offsets = numpy.arange(-search_segments, search_segments + 1)
+
+        # state of the last match, carried to the next chunk
+        self._distance = None
+        self._time = None
+        self._velocity = None
+
+    def _project(self, x, y, segments):
+        # projection of every position (rows) on candidate segments (columns)
+        # -> index of the closest candidate, fraction of that segment, lateral offset
+        if not self.geometry.closed:
+            segments = numpy.clip(segments, 0, self._segments - 1)
+        wrapped = segments % self._segments
+        relative_x = x[:, None] - self._x[wrapped]
+        relative_y = y[:, None] - self._y[wrapped]
+        delta_x = self._delta_x[wrapped]
+        delta_y = self._delta_y[wrapped]
+        length_squared = self._length_squared[wrapped]
+        fraction = numpy.clip((relative_x * delta_x + relative_y * delta_y) / length_squared,
+                              0.0, 1.0)
+        distance_squared = ((relative_x - fraction * delta_x) ** 2 +
+                            (relative_y - fraction * delta_y) ** 2)
+        rows = numpy.arange(len(x))
+        best = numpy.argmin(distance_squared, axis=1)
+        # left of the raceline is positive
+        lateral_offset = ((delta_x * relative_y - delta_y * relative_x)[rows, best] /
+                          numpy.sqrt(length_squared[rows, best]))
+        return segments[rows, best], fraction[rows, best], lateral_offset
+
+    def match(self, time, x, y, velocity):
+        """Function that matches the rows of a chunk to the raceline.
+
+        Args:
+            time (numpy array): time of every row (seconds)
+            x, y (numpy array): position of every row (meters)
+            velocity (numpy array): velocity of every row (m/s)
+
+        Returns:
+            distance (numpy array): distance along the raceline of every row (meters),
+                                    on a closed raceline it keeps counting over the laps
+            lateral_offset (numpy array): distance of every row from the raceline (meters),
+                                          positive to the left
+        """
+        distance = numpy.empty(len(time))
+        lateral_offset = numpy.empty(len(time))
+        for begin_index in range(0, len(time), MATCH_BLOCK_ROWS):
+            block = slice(begin_index, begin_index + MATCH_BLOCK_ROWS)
+            block_time = time[block]
+            block_x = x[block]
+            block_y = y[block]
+            block_velocity = velocity[block]
+
+            if self._distance is None:
+                # first row of the session, search the whole raceline
+                segment, fraction, _ = self._project(block_x[:1], block_y[:1],
+                                                     numpy.arange(self._segments)[None, :])
+                self._distance = self.geometry.start_distance + (segment[0] + fraction[0]) * \
+                    self._step
+                self._time = block_time[0]
+                self._velocity = block_velocity[0]
+
+            # distance traveled since the last match, trapezoid of the velocity
+            previous_time = numpy.concatenate(([self._time], block_time[:-1]))
+            previous_velocity = numpy.concatenate(([self._velocity], block_velocity[:-1]))
+            predicted = self._distance + numpy.cumsum(
+                0.5 * (previous_velocity + block_velocity) * (block_time - previous_time))
+            center = numpy.rint((predicted - self.geometry.start_distance) /
+                                self._step).astype(int)
+            segment, fraction, block_offset = self._project(
+                block_x, block_y, center[:, None] + self._search_offsets[None, :])
+
+            distance[block] = self.geometry.start_distance + (segment + fraction) * self._step
+            lateral_offset[block] = block_offset
+            self._distance = distance[block][-1]
+            self._time = block_time[-1]
+            self._velocity = block_velocity[-1]
+        return distance, lateral_offset
+
+
+class TelemetryResampler:
+    """Class that resamples matched telemetry at the distances of the track lists,
+    chunk after chunk, and puts every complete lap together.
+
+    Args:
+        distance_list (list): distances of the track lists (track.distance_list)
+        lap_length (float): length of a lap (meters), the length of the raceline
+    """
+    def __init__(self, distance_list, lap_length):
+        self.distance_list = numpy.asarray(distance_list, dtype=float)
+        self.lap_length = lap_length
+        self._segment_distance = numpy.diff(self.distance_list)
+        self._points = len(self.distance_list)
+        # lap -> data -> value at every distance of the lap (nan until it is reached)
+        self._laps = {}
+
+        # last row of the previous chunk and the energies up to it
+        self._distance = None
+        self._time = None
+        self._velocity = None
+        self._motor_power = None
+        self._battery_power = None
+        self._motor_energy = 0.0
+        self._battery_energy = 0.0
+
+    def add(self, distance, time, velocity, motor_power=None, battery_power=None):
+        """Function that adds a chunk of matched telemetry.
+
+        Args:
+            distance (numpy array): matched distance of every row (TelemetryMatcher)
+            time (numpy array): time of every row (seconds)
+            velocity (numpy array): velocity of every row (m/s)
+            motor_power (numpy array): motor power of every row (Watts), nan if not given
+            battery_power (numpy array): battery power of every row (Watts), nan if not given
+
+        Returns:
+            laps (list): LapVelocitySimulationResults of the laps completed by the chunk
+        """
+        if motor_power is None:
+            motor_power = numpy.full(len(time), numpy.nan)
+        if battery_power is None:
+            battery_power = numpy.full(len(time), numpy.nan)
+        if self._distance is None:
+            self._distance = distance[0]
+            self._time = time[0]
+            self._velocity = velocity[0]
+            self._motor_power = motor_power[0]
+            self._battery_power = battery_power[0]
+
+        # the previous row is the start of the chunk, the distance does not go back
+        # (a car that stands still or noise on the position)
+        distance = numpy.maximum.accumulate(numpy.concatenate(([self._distance], distance)))
+        time = numpy.concatenate(([self._time], time))
+        velocity = numpy.concatenate(([self._velocity], velocity))
+        motor_power = numpy.concatenate(([self._motor_power], motor_power))
+        battery_power = numpy.concatenate(([self._battery_power], battery_power))
+        time_step = numpy.diff(time)
+        motor_energy = numpy.concatenate(([self._motor_energy], self._motor_energy + numpy.cumsum(
+            0.5 * (motor_power[:-1] + motor_power[1:]) * time_step)))
+        battery_energy = numpy.concatenate(([self._battery_energy],
+                                            self._battery_energy + numpy.cumsum(
+            0.5 * (battery_power[:-1] + battery_power[1:]) * time_step)))
+
+        completed_laps = []
+        first_lap = math.floor((distance[0] - self.distance_list[0]) / self.lap_length)
+        last_lap = math.floor((distance[-1] - self.distance_list[0]) / self.lap_length)
+        for lap in range(first_lap, last_lap + 1):
+            lap_distance = lap * self.lap_length + self.distance_list
+            reached = (lap_distance > distance[0]) & (lap_distance <= distance[-1])
+            if not reached.any():
+                continue
+            targets = lap_distance[reached]
+            values = self._laps.setdefault(
+                lap, {data: numpy.full(self._points, numpy.nan)
+                      for data in ('time', 'velocity', 'motor_energy', 'battery_energy')})
+            values['time'][reached] = numpy.interp(targets, distance, time)
+            values['velocity'][reached] = numpy.interp(targets, distance, velocity)
+            values['motor_energy'][reached] = numpy.interp(targets, distance, motor_energy)
+            values['battery_energy'][reached] = numpy.interp(targets, distance, battery_energy)
+            if reached[-1]:
+                completed_laps.append(self._lap_results(lap, self._laps.pop(lap)))
+
+        self._distance = distance[-1]
+        self._time = time[-1]
+        self._velocity = velocity[-1]
+        self._motor_power = motor_power[-1]
+        self._battery_power = battery_power[-1]
+        self._motor_energy = motor_energy[-1]
+        self._battery_energy = battery_energy[-1]
+        return [results for results in completed_laps if results is not None]
+
+    def finish(self):
+        """Function to call after the last chunk, drops the lap that was not completed."""
+        for lap in self._laps:
+            logger.info("telemetry lap {} not completed, dropped".format(lap),
+                        extra={'sim_index': 'N/A'})
+        self._laps = {}
+
+    def _lap_results(self, lap, values):
+        if numpy.isnan(values['time'][0]):
+            # the session started during the lap
+            logger.info("telemetry lap {} started before the session, dropped".format(lap),
+                        extra={'sim_index': 'N/A'})
+            return None
+        time_of_segment = numpy.diff(values['time'])
+        motor_energy = numpy.diff(values['motor_energy'])
+        battery_energy = numpy.diff(values['battery_energy'])
+        velocity = values['velocity']
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            segment_columns = {
+                'initial_velocity': velocity[:-1],
+                'final_velocity': velocity[1:],
+                'distance_traveled': self._segment_distance,
+                'time_of_segment': time_of_segment,
+                'energy_differential_of_motor': motor_energy,
+                'acceleration': numpy.diff(velocity) / time_of_segment,
+                'motor_power': motor_energy / time_of_segment,
+                'battery_power': battery_energy / time_of_segment,
+                'battery_energy': battery_energy,
+            }
+        physics_results = PhysicsResultsColumns(0)
+        for attribute, values_of_segments in segment_columns.items():
+            setattr(physics_results, attribute, values_of_segments.tolist())
+        results = lap_results_calculation(physics_results)
+        logger.info("telemetry lap {}, lap time: {} s".format(lap, results.lap_time),
+                    extra={'sim_index': 'N/A'})
+        return results
+
+
+def align_telemetry(filename, geometry, track, columns=None, chunk_rows=TELEMETRY_CHUNK_ROWS):
+    """Generator that aligns a telemetry file to the track lists, lap after lap.
+    Only chunk_rows rows of the file are in memory at a time.
+
+    Args:
+        filename (string): telemetry csv or run file, see read_telemetry_chunks
+        geometry (RacelineGeometry): raceline the telemetry was recorded on
+        track (TrackProperties): track with generated track lists
+        columns (dict): telemetry data -> column of the file, TELEMETRY_COLUMNS by default
+        chunk_rows (int): number of rows read at a time
+
+    Yields:
+        results (LapVelocitySimulationResults): results of every complete lap of the
+                                                session, comparable with the results of
+                                                lap_solver.lap_velocity_calculation
+    """
+    matcher = TelemetryMatcher(geometry)
+    resampler = TelemetryResampler(track.distance_list, geometry.length)
+    for chunk in read_telemetry_chunks(filename, columns, chunk_rows):
+        distance, _ = matcher.match(chunk['time'], chunk['x'], chunk['y'], chunk['velocity'])
+        yield from resampler.add(distance, chunk['time'], chunk['velocity'],
+                                 chunk.get('motor_power'), chunk.get('battery_power'))
+    resampler.finish()
@@ -0,0 +1,86 @@
+import argparse
+import logging
+import os
+import pytest
+from datastore import DataStore
+from project_argparser import SingleArg, call_ini
+from simulation import SimulationThread
+
+REPO_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# segment length of the tests, long enough that a simulation of a test track takes seconds
+TEST_SEGMENT_DISTANCE = 0.05
+
+
+def track_rows(length=300.0, corners=((100.0, 10.0), (220.0, 15.0)), max_velocity=40.0):
+    """Rows of a flat track in the raceline file layout, a straight with corners.
+
+    Args:
+        length (float): length of the track (meters)
+        corners (tuple): (distance, max velocity) of every corner, a corner is 0.5 m long
+        max_velocity (float): max velocity of the straights (m/s)
+
+    Returns:
+        rows (list): rows as read by SingleArg.open_track_dict
+    """
+    rows = [[0.0, 0, 0, 0, 0, max_velocity, 0, 0]]
+    for distance, velocity in corners:
+        rows.append([distance, 0, 0, 0, 0, velocity, 0, 0])
+        rows.append([distance + 0.5, 0, 0, 0, 0, max_velocity, 0, 0])
+    rows.append([length, 0, 0, 0, 0, max_velocity, 0, 0])
+    return rows
+
+
+@pytest.fixture(autouse=True)
+def repo_directory(monkeypatch):
+    # cars, tracks and the init file are opened relative to the repo
+    monkeypatch.chdir(REPO_DIRECTORY)
+
+
+@pytest.fixture
+def car_data():
+    car_arg = SingleArg(argparse.ArgumentParser(), '-c', '--car', 'car', None, 'car')
+    return car_arg.open_car_dict('./cars/fastsim_car_test.csv')
+
+
+@pytest.fixture
+def init_vals():
+    init_vals = call_ini()
+    init_vals['SIMULATION']['segment_distance'] = str(TEST_SEGMENT_DISTANCE)
+    return init_vals
+
+
+@pytest.fixture
+def run_simulation(car_data, init_vals):
+    """Runs a SimulationThread without a Qt event loop, returns its DataStore."""
+    def run(rows, output_filename=None, **simulation_values):
+        for name, value in simulation_values.items():
+            init_vals['SIMULATION'][name] = str(value)
+        data_store = DataStore()
+        simulation = SimulationThread(data_store, logging.getLogger(__name__), rows, car_data,
+                                      init_vals, output_filename)
+        simulation.simulationComputing = True
+        simulation.breakpointDistance = float('inf')
+        simulation.racing_simulation()
+        return data_store
+    return run
+
+
+def track_and_car(rows, car_data, init_vals):
+    """TrackProperties and car parameters of a track, as set up by the SimulationThread.
+
+    Args:
+        rows (list): rows of the track, see track_rows
+        car_data (dict): car file as read by SingleArg.open_car_dict
+        init_vals (ConfigParser): init file, see project_argparser.call_ini
+
+    Returns:
+        track (TrackProperties), car (dict)
+    """
+    data_store = DataStore()
+    SimulationThread(data_store, logging.getLogger(__name__), rows, car_data, init_vals)
+    return data_store.get_track_properties(), data_store.get_car_properties()
+
+
+@pytest.fixture
+def track(car_data, init_vals):
+    return track_and_car(track_rows(), car_data, init_vals)
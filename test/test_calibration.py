@@ -0,0 +1,64 @@
+import numpy
+import pytest
+from calibration import calibrate
+from conftest import track_and_car, track_rows
+from lap_solver import lap_velocity_calculation
+
+
+@pytest.fixture
+def measured_lap(car_data, init_vals):
+    """Velocity trace of a lap driven by a car with known parameters."""
+    # the straights are long enough that the motor power and not the drive limits bounds
+    # the acceleration, below that speed the motor efficiency can not be told apart
+    track, car = track_and_car(track_rows(600.0, ((200.0, 10.0), (450.0, 15.0)), 45.0),
+                               car_data, init_vals)
+    car = dict(car)
+    truth = dict(car)
+    truth['drag_coefficient'] = car['drag_coefficient'] * 1.3
+    truth['wheel_pressure_bar'] = car['wheel_pressure_bar'] * 0.6
+    # the motor_efficiency of the fit is the share of the motor power on the road
+    truth['motor_power'] = car['motor_power'] * 0.9
+    lap_results = lap_velocity_calculation(track, truth, track.get_air_density())
+    velocity = numpy.concatenate(([lap_results.physics_results_profile.initial_velocity[0]],
+                                  lap_results.velocity_list))
+    return track, car, truth, lap_results, numpy.array(track.distance_list), velocity
+
+
+def test_calibration_recovers_known_parameters(measured_lap):
+    track, car, truth, _, distance, velocity = measured_lap
+    results = calibrate(distance, velocity, car, track.get_air_density())
+
+    assert results.parameters['drag_coefficient'] == pytest.approx(truth['drag_coefficient'],
+                                                                   rel=1e-6)
+    assert results.parameters['wheel_pressure_bar'] == pytest.approx(
+        truth['wheel_pressure_bar'], rel=1e-6)
+    assert results.parameters['motor_efficiency'] == pytest.approx(0.9, rel=1e-6)
+    assert results.rms < 1e-6
+    assert all(sector_fit.segments > 0 for sector_fit in results.sector_fits)
+
+
+def test_calibrated_car_drives_the_measured_lap(measured_lap):
+    track, car, _, lap_results, distance, velocity = measured_lap
+    results = calibrate(distance, velocity, car, track.get_air_density())
+
+    calibrated_lap = lap_velocity_calculation(track, results.calibrated_car(car),
+                                              track.get_air_density())
+    assert calibrated_lap.lap_time == pytest.approx(lap_results.lap_time, rel=1e-6)
+
+
+def test_calibration_of_one_parameter(measured_lap):
+    track, car, truth, _, distance, velocity = measured_lap
+    car['wheel_pressure_bar'] = truth['wheel_pressure_bar']
+    car['motor_power'] = truth['motor_power']
+    results = calibrate(distance, velocity, car, track.get_air_density(),
+                        parameters=('drag_coefficient',))
+
+    assert list(results.parameters) == ['drag_coefficient']
+    assert results.parameters['drag_coefficient'] == pytest.approx(truth['drag_coefficient'],
+                                                                   rel=1e-6)
+
+
+def test_invalid_calibration_parameter(measured_lap):
+    track, car, _, _, distance, velocity = measured_lap
+    with pytest.raises(Exception, match="Invalid calibration parameter"):
+        calibrate(distance, velocity, car, track.get_air_density(), parameters=('mass',))
@@ -0,0 +1,86 @@
+import numpy
+import pytest
+from drive_cycle import (DRIVE_CYCLE_HEADER, DriveCycle, cycle_energy_calculation,
+                         drive_cycle_validation)
+from lap_solver import lap_velocity_calculation
+from powertrain import Powertrain
+
+
+@pytest.fixture
+def lap_results(track):
+    track, car = track
+    return lap_velocity_calculation(track, car, track.get_air_density())
+
+
+def test_cycle_of_a_lap(lap_results):
+    cycle = DriveCycle.from_lap_results(lap_results)
+
+    assert cycle.time[-1] == pytest.approx(lap_results.lap_time)
+    numpy.testing.assert_allclose(numpy.diff(cycle.time)[:-1], 1.0)
+    # the cycle drives the distance of the lap, up to the resampling of the velocity
+    distance = numpy.sum(0.5 * (cycle.velocity[1:] + cycle.velocity[:-1]) * numpy.diff(cycle.time))
+    assert distance == pytest.approx(lap_results.distance_cumulative_list[-1], rel=0.05)
+    numpy.testing.assert_array_equal(cycle.grade, 0.0)
+
+
+def test_write_cycle_csv(tmp_path, lap_results):
+    filename = str(tmp_path / "cycle.csv")
+    cycle = DriveCycle.from_lap_results(lap_results)
+    cycle.write_csv(filename)
+
+    with open(filename) as csvfile:
+        assert csvfile.readline().strip() == ','.join(DRIVE_CYCLE_HEADER)
+    written = numpy.loadtxt(filename, delimiter=',', skiprows=1)
+    numpy.testing.assert_allclose(written[:, 0], cycle.time)
+    numpy.testing.assert_allclose(written[:, 1], cycle.velocity)
+
+
+def test_constant_velocity_cycle(car_data):
+    velocity = 20.0
+    cycle = DriveCycle(numpy.arange(11.0), numpy.full(11, velocity))
+    results = cycle_energy_calculation([cycle], car_data, air_density=1.2)
+
+    # only drag and rolling resistance at the wheels, no acceleration
+    wheel_power = (0.5 * 1.2 * car_data["dragCoef"] * car_data["frontalAreaM2"] * velocity ** 3 +
+                   9.81 * car_data["wheelRrCoef"] * car_data["vehKg"] * velocity)
+    motor_power = wheel_power / car_data["transEff"]
+    powertrain = Powertrain.from_car_data(car_data)
+    efficiency = numpy.interp(motor_power / (car_data["maxMotorKw"] * 1000),
+                              powertrain.power_fractions, powertrain.efficiencies)
+    battery_power = ((motor_power / efficiency + car_data["auxKw"] * 1000) /
+                     numpy.sqrt(car_data["essRoundTripEff"]))
+    assert results.battery_energy[0] == pytest.approx(battery_power * 10, rel=1e-3)
+    assert results.trace_missed[0] == 0
+
+
+def test_batch_of_cycles_of_different_lengths(car_data, lap_results):
+    long_cycle = DriveCycle.from_lap_results(lap_results)
+    short_cycle = DriveCycle([0.0, 1.0, 2.0], [10.0, 12.0, 11.0], [0.0, 0.01, 0.01])
+    batch = cycle_energy_calculation([long_cycle, short_cycle], car_data)
+
+    # the padding of the short cycle does not count
+    for number, cycle in enumerate((long_cycle, short_cycle)):
+        single = cycle_energy_calculation([cycle], car_data)
+        assert batch.battery_energy[number] == pytest.approx(single.battery_energy[0])
+        assert batch.final_state_of_charge[number] == pytest.approx(
+            single.final_state_of_charge[0])
+    assert numpy.isnan(batch.battery_power[1, len(short_cycle) - 1:]).all()
+
+
+def test_drive_cycle_validation(car_data, lap_results):
+    validation = drive_cycle_validation([lap_results, lap_results], car_data)
+
+    assert validation.cycle_energy[0] == validation.cycle_energy[1]
+    numpy.testing.assert_allclose(validation.relative_error,
+                                  (validation.simulated_energy - validation.cycle_energy) /
+                                  numpy.abs(validation.cycle_energy))
+
+
+def test_invalid_drive_cycles(car_data):
+    with pytest.raises(Exception, match="different lengths"):
+        DriveCycle([0.0, 1.0], [10.0])
+    with pytest.raises(Exception, match="at least 2 points"):
+        DriveCycle([0.0], [10.0])
+    cycle = DriveCycle([0.0, 1.0], [10.0, 10.0])
+    with pytest.raises(Exception, match="1 cars for 2 drive cycles"):
+        cycle_energy_calculation([cycle, cycle], [car_data])
@@ -0,0 +1,45 @@
+import numpy
+import pytest
+from driver_tracking import driver_tracking_calculation
+from lap_solver import lap_velocity_calculation
+
+
+def _solver_profile(track, car):
+    lap_results = lap_velocity_calculation(track, car, track.get_air_density())
+    velocity = numpy.concatenate(([lap_results.physics_results_profile.initial_velocity[0]],
+                                  lap_results.velocity_list))
+    return lap_results, velocity
+
+
+def test_tracking_the_solver_profile_is_feasible(track):
+    track, car = track
+    lap_results, velocity = _solver_profile(track, car)
+    results = driver_tracking_calculation(track, car, track.get_air_density(), velocity)
+
+    assert results.feasible.all()
+    assert results.infeasible_segments() == []
+    assert len(results.lap_results.velocity_list) == len(track.distance_list) - 1
+    numpy.testing.assert_allclose(results.lap_results.velocity_list, lap_results.velocity_list)
+    # the solver times a segment from its initial velocity, tracking from the mean velocity
+    assert results.lap_results.lap_time == pytest.approx(lap_results.lap_time, rel=1e-2)
+
+
+def test_faster_profile_is_flagged(track):
+    track, car = track
+    _, velocity = _solver_profile(track, car)
+    results = driver_tracking_calculation(track, car, track.get_air_density(), velocity * 1.2)
+
+    assert results.over_drive_power.any()
+    assert results.over_braking_power.any()
+    assert results.over_max_velocity.any()
+    assert results.infeasible_segments() == numpy.flatnonzero(~results.feasible).tolist()
+
+
+def test_invalid_velocity_profile(track):
+    track, car = track
+    velocity = numpy.full(len(track.distance_list), 10.0)
+    with pytest.raises(Exception, match="velocity profile of length"):
+        driver_tracking_calculation(track, car, track.get_air_density(), velocity[1:])
+    velocity[0] = 0.0
+    with pytest.raises(Exception, match="stops the car"):
+        driver_tracking_calculation(track, car, track.get_air_density(), velocity)
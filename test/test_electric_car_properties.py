@@ -0,0 +1,21 @@
+import logging
+import pytest
+from electric_car_properties import MAX_WHEEL_PRESSURE_BAR, car_properties_from_car_data
+
+
+def test_rolling_resistance_coefficient_is_converted_to_a_tire_pressure(car_data):
+    car_data["wheelRrCoef"] = 0.008
+    car = car_properties_from_car_data(car_data).get_car_parameters()
+
+    assert car["wheel_pressure_bar"] == pytest.approx(0.01 / 0.003)
+
+
+@pytest.mark.parametrize("rolling_resistance_coefficient", [0.005, 0.0055, 0.0])
+def test_low_rolling_resistance_coefficient_is_clamped(car_data, caplog,
+                                                       rolling_resistance_coefficient):
+    car_data["wheelRrCoef"] = rolling_resistance_coefficient
+    with caplog.at_level(logging.WARNING):
+        car = car_properties_from_car_data(car_data).get_car_parameters()
+
+    assert car["wheel_pressure_bar"] == MAX_WHEEL_PRESSURE_BAR
+    assert "rolling resistance coefficient" in caplog.text
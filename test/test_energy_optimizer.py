@@ -0,0 +1,70 @@
+import numpy
+import pytest
+from energy_optimizer import EnergyLimitedLapOptimizer
+from lap_solver import lap_velocity_calculation
+
+
+@pytest.fixture
+def optimizer(track):
+    track, car = track
+    return EnergyLimitedLapOptimizer(track, car, track.get_air_density())
+
+
+@pytest.fixture
+def full_power_lap(track):
+    track, car = track
+    return lap_velocity_calculation(track, car, track.get_air_density())
+
+
+def test_full_power_lap_matches_the_lap_solver(optimizer, full_power_lap):
+    sectors = len(optimizer.sector_start_indices)
+    lap_results = optimizer.lap([optimizer.car["motor_power"]] * sectors)
+
+    assert sectors > 1
+    assert lap_results.lap_time == pytest.approx(full_power_lap.lap_time)
+    numpy.testing.assert_allclose(lap_results.velocity_list, full_power_lap.velocity_list)
+
+
+def test_power_cap_meets_the_energy_budget(optimizer, full_power_lap):
+    energy_budget = 0.9 * full_power_lap.battery_energy_cumulative_list[-1]
+    results = optimizer.optimize_power_cap(energy_budget)
+
+    assert results.feasible
+    assert results.battery_energy == pytest.approx(energy_budget, rel=0.01)
+    assert results.lap_time > full_power_lap.lap_time
+    assert max(results.power_caps) < optimizer.car["motor_power"]
+
+
+@pytest.mark.parametrize("budget_fraction", [0.9, 0.8, 0.7])
+def test_sector_power_caps_meet_the_energy_budget(optimizer, full_power_lap, budget_fraction):
+    energy_budget = budget_fraction * full_power_lap.battery_energy_cumulative_list[-1]
+    results = optimizer.optimize_sector_power_caps(energy_budget)
+    power_cap_results = optimizer.optimize_power_cap(energy_budget)
+
+    assert results.feasible
+    assert len(results.power_caps) == len(optimizer.sector_start_indices)
+    assert results.lap_time > full_power_lap.lap_time
+    # the caps between the tabulated ones use the budget, the lap is never slower than
+    # the one with one power cap
+    assert results.battery_energy == pytest.approx(energy_budget, rel=0.01)
+    assert results.lap_time <= power_cap_results.lap_time
+
+
+def test_sector_power_caps_are_interpolated(optimizer, full_power_lap):
+    energy_budget = 0.8 * full_power_lap.battery_energy_cumulative_list[-1]
+    results = optimizer.optimize_sector_power_caps(energy_budget)
+    power_fractions = [power_cap / optimizer.car["motor_power"]
+                       for power_cap in results.power_caps]
+
+    assert len(set(power_fractions)) > 1
+    assert any(min(abs(fraction - tabulated) for tabulated in optimizer.power_fractions) > 1e-6
+               for fraction in power_fractions)
+    assert results.lap_time < optimizer.optimize_power_cap(energy_budget).lap_time
+
+
+def test_budget_above_the_full_power_lap(optimizer, full_power_lap):
+    energy_budget = 2 * full_power_lap.battery_energy_cumulative_list[-1]
+    results = optimizer.optimize_power_cap(energy_budget)
+
+    assert results.iterations == 1
+    assert results.lap_time == pytest.approx(full_power_lap.lap_time)
@@ -0,0 +1,62 @@
+import math
+import pytest
+from environment import Environment, air_density_calculation, headwind_calculation
+from lap_solver import lap_velocity_calculation
+from track_properties import TrackProperties
+
+NORTH = math.pi / 2  # wind direction of a wind from the north
+
+
+def test_headwind_sign():
+    # heading 0 is north, the wind from the north blows against a car going north
+    assert headwind_calculation(0.0, 5.0, NORTH) == pytest.approx(5.0)
+    assert headwind_calculation(math.pi, 5.0, NORTH) == pytest.approx(-5.0)
+    # heading pi / 2 is west (counterclockwise), a crosswind
+    assert headwind_calculation(math.pi / 2, 5.0, NORTH) == pytest.approx(0.0, abs=1e-12)
+
+
+def test_air_density():
+    assert air_density_calculation(15.0, 0.0) == pytest.approx(1.225, rel=1e-3)
+    # standard atmosphere pressure at 1000 m, the temperature is the one at the track
+    assert air_density_calculation(15.0, 1000.0) == pytest.approx(1.0865, rel=1e-3)
+    assert air_density_calculation(35.0, 0.0) < air_density_calculation(15.0, 0.0)
+
+
+def _north_south_track():
+    track = TrackProperties()
+    track.add_critical_point(0.0, 30.0, track.FREE_ACCELERATION)
+    track.add_critical_point(100.0, 30.0, track.FREE_ACCELERATION)
+    # north for the first half, then south
+    track.add_raceline_heading([0.0, 49.0, 51.0, 100.0], [0.0, 0.0, math.pi, math.pi])
+    track.add_raceline_elevation([0.0, 100.0], [0.0, 0.0])
+    track.generate_track_list(1.0)
+    return track
+
+
+def test_environment_lists_of_the_track():
+    track = _north_south_track()
+    Environment(ambient_temperature=15.0, wind_speed=5.0, wind_direction=NORTH,
+                rain=True, rain_amount=0.5).apply(track)
+
+    assert track.get_air_density() == pytest.approx(1.225, rel=1e-3)
+    assert track.headwind_list[10] == pytest.approx(5.0)
+    assert track.headwind_list[90] == pytest.approx(-5.0)
+    assert set(track.air_density_factor_list) == {1.0}
+    assert set(track.rolling_resistance_factor_list) == {1.1}
+
+
+def test_headwind_slows_the_car(track):
+    track, car = track
+    air_density = track.get_air_density()
+    calm_lap = lap_velocity_calculation(track, car, air_density)
+    track.set_environment_lists(track.air_density_factor_list,
+                                [10.0] * len(track.distance_list),
+                                track.rolling_resistance_factor_list)
+    headwind_lap = lap_velocity_calculation(track, car, air_density)
+
+    assert headwind_lap.lap_time > calm_lap.lap_time
+
+
+def test_invalid_precipitation():
+    with pytest.raises(Exception, match="Invalid rain_amount"):
+        Environment(rain=True, rain_amount=2)
@@ -0,0 +1,64 @@
+import numpy
+import pytest
+from fleet_simulation import FleetSimulation
+from lap_solver import lap_velocity_calculation
+from run_file import RunFile
+
+
+@pytest.fixture
+def fleet(track):
+    track, car = track
+    cars = [dict(car, mass=car['mass'] * 1.2), car]
+    return FleetSimulation(track, cars, track.get_air_density(), ["heavy", "nominal"])
+
+
+def test_fleet_matches_the_scalar_laps(fleet):
+    results = fleet.run()
+
+    for name, car in zip(fleet.car_names, fleet.cars):
+        lap_results = lap_velocity_calculation(fleet.track, car, fleet.air_density)
+        car_results = results.car_results(name)
+        assert car_results['Time'][-1] == pytest.approx(lap_results.lap_time, rel=1e-9)
+        numpy.testing.assert_allclose(car_results['Velocity'], lap_results.velocity_list,
+                                      rtol=1e-9)
+    assert [name for name, _, _ in results.ranking()] == ["nominal", "heavy"]
+
+
+def test_mixed_fleet_keeps_the_drive_limits(track):
+    track, car = track
+    cars = [car, dict(car, drive_limits=None)]
+    fleet = FleetSimulation(track, cars, track.get_air_density(), ["limited", "unlimited"])
+    results = fleet.run()
+
+    for name, car in zip(fleet.car_names, fleet.cars):
+        lap_results = lap_velocity_calculation(fleet.track, car, fleet.air_density)
+        assert results.car_results(name)['Time'][-1] == pytest.approx(lap_results.lap_time,
+                                                                      rel=1e-9)
+    # the drive limits hold the limited car back from the start
+    assert results.car_results("limited")['Time'][-1] > results.car_results("unlimited")['Time'][-1]
+
+
+def test_car_results_by_numpy_index(fleet):
+    results = fleet.run()
+    fastest = numpy.argmin(results['Time'][:, -1])
+
+    numpy.testing.assert_array_equal(results.car_results(fastest)['Velocity'],
+                                     results.car_results("nominal")['Velocity'])
+
+
+def test_fleet_run_file_export(tmp_path, fleet):
+    filename = str(tmp_path / "fleet.run")
+    results = fleet.run()
+    results.write_run_file(filename)
+
+    run_file = RunFile(filename)
+    segments = results['Velocity'].shape[1]
+    assert run_file.metadata['fleet']['car_names'] == ["heavy", "nominal"]
+    numpy.testing.assert_array_equal(run_file['CarIndex'], numpy.repeat([0, 1], segments))
+    numpy.testing.assert_array_equal(run_file['Velocity'], results['Velocity'].ravel())
+
+
+def test_fleet_needs_a_name_per_car(track):
+    track, car = track
+    with pytest.raises(Exception, match="car names"):
+        FleetSimulation(track, [car], track.get_air_density(), ["one", "two"])
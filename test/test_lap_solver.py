@@ -0,0 +1,128 @@
+import numpy
+import pytest
+from conftest import track_and_car
+from lap_solver import (STANDING_START_VELOCITY, braking_envelope_calculation,
+                        lap_time_domain_calculation, lap_velocity_calculation)
+from physics_equations import ENERGY_FLOW_ATTRIBUTES, PHYSICS_RESULTS_ATTRIBUTES
+
+
+def _row(distance, max_velocity):
+    return [distance, 0, 0, 0, 0, max_velocity, 0, 0]
+
+
+@pytest.fixture
+def closed_track(car_data, init_vals):
+    # the start finish line is in a corner, the end of the lap brakes for it
+    rows = [_row(0.0, 15.0), _row(0.5, 40.0), _row(150.0, 20.0), _row(150.5, 40.0),
+            _row(300.0, 40.0)]
+    return track_and_car(rows, car_data, init_vals)
+
+
+def _profile_array(lap_results, attribute):
+    return numpy.array(getattr(lap_results.physics_results_profile, attribute))
+
+
+def test_lap_velocity_carries_over_to_the_next_lap(closed_track):
+    track, car = closed_track
+    air_density = track.get_air_density()
+    envelope = braking_envelope_calculation(track, car, air_density, closed_track=True)
+    # the end of the lap is braked down to the velocity the lap can be entered with
+    assert envelope.velocity_list[-1] <= envelope.braking_results.initial_velocity[0]
+
+    first_lap = lap_velocity_calculation(track, car, air_density, envelope=envelope)
+    second_lap = lap_velocity_calculation(track, car, air_density, first_lap.end_velocity,
+                                          envelope)
+    third_lap = lap_velocity_calculation(track, car, air_density, second_lap.end_velocity,
+                                         envelope)
+
+    assert first_lap.physics_results_profile.initial_velocity[0] == STANDING_START_VELOCITY
+    assert second_lap.physics_results_profile.initial_velocity[0] == first_lap.end_velocity
+    assert third_lap.physics_results_profile.initial_velocity[0] == second_lap.end_velocity
+    assert first_lap.end_velocity > STANDING_START_VELOCITY
+    # a flying start is faster, from then on every lap is the same
+    assert second_lap.lap_time < first_lap.lap_time
+    assert third_lap.lap_time == pytest.approx(second_lap.lap_time)
+    numpy.testing.assert_allclose(third_lap.velocity_list, second_lap.velocity_list)
+
+
+def test_flying_start_needs_a_closed_track_envelope(closed_track):
+    track, car = closed_track
+    air_density = track.get_air_density()
+    open_lap = lap_velocity_calculation(track, car, air_density)
+    assert open_lap.end_velocity > 15.0
+    with pytest.raises(Exception, match="closed_track"):
+        lap_velocity_calculation(track, car, air_density, open_lap.end_velocity,
+                                 braking_envelope_calculation(track, car, air_density))
+
+
+def test_time_domain_lap_matches_the_distance_solver(track):
+    track, car = track
+    air_density = track.get_air_density()
+    lap_results = lap_velocity_calculation(track, car, air_density)
+    time_domain_results = lap_time_domain_calculation(track, car, air_density, time_step=0.01)
+
+    assert time_domain_results.lap_time == pytest.approx(lap_results.lap_time, rel=1e-3)
+    assert time_domain_results.distance_cumulative_list[-1] == pytest.approx(
+        track.distance_list[-1] - track.distance_list[0])
+    # the steps are about one time step, the ones that end at a corner or at the end of
+    # the track are shorter
+    time_of_segment = _profile_array(time_domain_results, 'time_of_segment')
+    assert numpy.median(time_of_segment) == pytest.approx(0.01)
+    assert numpy.all(time_of_segment <= 0.01 * 1.1)
+
+
+def test_time_domain_lap_brakes_for_the_corners(track):
+    track, car = track
+    time_domain_results = lap_time_domain_calculation(track, car, track.get_air_density(),
+                                                      time_step=0.1)
+    distance = numpy.array(time_domain_results.distance_cumulative_list) + track.distance_list[0]
+    velocity = numpy.array(time_domain_results.velocity_list)
+
+    for corner_distance, max_velocity in ((100.0, 10.0), (220.0, 15.0)):
+        # the corners are shorter than a step, a step ends in every corner
+        in_corner = (distance >= corner_distance) & (distance <= corner_distance + 0.5)
+        assert in_corner.any()
+        assert velocity[in_corner].max() <= max_velocity * (1 + 1e-6)
+
+
+def test_smaller_time_step_converges(track):
+    track, car = track
+    air_density = track.get_air_density()
+    lap_time = lap_velocity_calculation(track, car, air_density).lap_time
+    errors = [abs(lap_time_domain_calculation(track, car, air_density,
+                                              time_step=time_step).lap_time - lap_time)
+              for time_step in (0.2, 0.05)]
+    assert errors[1] < errors[0]
+
+
+def test_energy_flow_closes_every_segment(track):
+    track, car = track
+    lap_results = lap_velocity_calculation(track, car, track.get_air_density(),
+                                           energy_flow=True)
+
+    motor_energy = _profile_array(lap_results, 'energy_differential_of_motor')
+    energy_flow = sum(_profile_array(lap_results, attribute)
+                      for attribute in ENERGY_FLOW_ATTRIBUTES)
+    assert len(motor_energy) == len(track.distance_list) - 1
+    numpy.testing.assert_allclose(energy_flow, motor_energy, rtol=1e-9, atol=1e-6)
+    # the lap brakes for the corners, those segments close as well
+    assert numpy.any(motor_energy < 0)
+
+    totals = lap_results.energy_flow_totals()
+    assert totals['energy_differential_of_motor'] == pytest.approx(
+        sum(totals[attribute] for attribute in ENERGY_FLOW_ATTRIBUTES))
+    assert totals['drag_energy'] > 0
+    assert totals['rolling_resistance_energy'] > 0
+
+
+def test_energy_flow_does_not_change_the_lap(track):
+    track, car = track
+    air_density = track.get_air_density()
+    lap_results = lap_velocity_calculation(track, car, air_density)
+    energy_flow_lap_results = lap_velocity_calculation(track, car, air_density,
+                                                       energy_flow=True)
+
+    assert energy_flow_lap_results.lap_time == lap_results.lap_time
+    for attribute in PHYSICS_RESULTS_ATTRIBUTES:
+        numpy.testing.assert_array_equal(_profile_array(energy_flow_lap_results, attribute),
+                                         _profile_array(lap_results, attribute))
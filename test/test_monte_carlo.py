@@ -0,0 +1,75 @@
+import numpy
+import pytest
+from conftest import track_and_car, track_rows
+from monte_carlo import MonteCarloAnalysis, ParameterDistribution, RunningStatistics
+
+
+@pytest.fixture
+def short_track(car_data, init_vals):
+    return track_and_car(track_rows(60.0, ((30.0, 10.0),)), car_data, init_vals)
+
+
+def _analysis(short_track, workers):
+    track, car = short_track
+    distributions = {'mass': ParameterDistribution("normal", car['mass'], 50.0),
+                     'air_density': ParameterDistribution("uniform", 1.1, 1.3)}
+    return MonteCarloAnalysis(track, car, track.get_air_density(), distributions, seed=42,
+                              workers=workers, samples_per_task=2)
+
+
+def test_samples_are_identical_for_any_number_of_workers(short_track):
+    serial = _analysis(short_track, 1).run(7)
+    parallel = _analysis(short_track, 2).run(7)
+
+    assert serial.complete and parallel.complete
+    assert serial.failed_samples == 0
+    assert [sample.sample_index for sample in parallel.samples] == list(range(7))
+    for serial_sample, parallel_sample in zip(serial.samples, parallel.samples):
+        assert parallel_sample.parameters == serial_sample.parameters
+        assert parallel_sample.lap_time == serial_sample.lap_time
+        assert parallel_sample.battery_energy == serial_sample.battery_energy
+    assert len({sample.lap_time for sample in serial.samples}) == 7
+
+
+def test_sampled_motor_efficiency_changes_the_battery_energy(short_track):
+    track, car = short_track
+    distributions = {'motor_efficiency': ParameterDistribution("uniform", 0.7, 0.95)}
+    results = MonteCarloAnalysis(track, car, track.get_air_density(), distributions,
+                                 seed=42).run(5)
+
+    samples = sorted(results.samples, key=lambda sample: sample.parameters['motor_efficiency'])
+    battery_energy = [sample.battery_energy for sample in samples]
+    # a more efficient motor draws less from the battery for the same lap
+    assert battery_energy == sorted(battery_energy, reverse=True)
+    assert len(set(battery_energy)) == 5
+    assert len({sample.lap_time for sample in samples}) == 1
+
+
+def test_invalid_monte_carlo_runs(short_track):
+    track, car = short_track
+    with pytest.raises(Exception, match="Invalid number of samples"):
+        _analysis(short_track, 1).run(0)
+    distributions = {'motor_efficiency': ParameterDistribution("uniform", 0.7, 0.95)}
+    with pytest.raises(Exception, match="no powertrain"):
+        MonteCarloAnalysis(track, dict(car, powertrain=None), track.get_air_density(),
+                           distributions)
+
+
+def test_running_statistics():
+    values = numpy.random.default_rng(1).normal(10.0, 2.0, 100)
+    running_statistics = RunningStatistics()
+    for value in values:
+        running_statistics.add(value)
+
+    assert running_statistics.mean == pytest.approx(values.mean())
+    assert running_statistics.variance == pytest.approx(values.var(ddof=1))
+    low, high = running_statistics.confidence_interval()
+    assert low < values.mean() < high
+    assert running_statistics.percentiles([50]) == pytest.approx([numpy.median(values)])
+
+
+def test_invalid_distribution():
+    with pytest.raises(Exception, match="Invalid distribution"):
+        ParameterDistribution("cauchy", 0, 1)
+    with pytest.raises(Exception, match="takes 3 parameters"):
+        ParameterDistribution("triangular", 0, 1)
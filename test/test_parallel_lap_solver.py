@@ -0,0 +1,37 @@
+import numpy
+import pytest
+from conftest import track_and_car, track_rows
+from lap_solver import lap_velocity_calculation
+from parallel_lap_solver import SectorParallelLapSolver
+
+
+def _assert_same_lap(lap_results, serial_lap_results):
+    assert lap_results.lap_time == serial_lap_results.lap_time
+    assert lap_results.end_velocity == serial_lap_results.end_velocity
+    numpy.testing.assert_array_equal(lap_results.velocity_list, serial_lap_results.velocity_list)
+    numpy.testing.assert_array_equal(lap_results.battery_energy_cumulative_list,
+                                     serial_lap_results.battery_energy_cumulative_list)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_parallel_lap_equals_the_serial_lap(track, workers):
+    track, car = track
+    serial_lap_results = lap_velocity_calculation(track, car, track.get_air_density())
+    with SectorParallelLapSolver(track, car, track.get_air_density(), workers,
+                                 chunks_per_worker=2) as solver:
+        assert len(solver.chunk_start_indices) > 1
+        _assert_same_lap(solver.solve(), serial_lap_results)
+        # the pool is kept for the next lap
+        _assert_same_lap(solver.solve(), serial_lap_results)
+
+
+def test_chunk_not_started_on_the_envelope_is_solved_again(car_data, init_vals):
+    # the car can not reach the velocity of the first corner, the chunk starting
+    # there is solved again from the velocity the car really has
+    track, car = track_and_car(track_rows(corners=((20.0, 35.0), (150.0, 10.0))),
+                               car_data, init_vals)
+    serial_lap_results = lap_velocity_calculation(track, car, track.get_air_density())
+    with SectorParallelLapSolver(track, car, track.get_air_density(), 2,
+                                 chunks_per_worker=8) as solver:
+        _assert_same_lap(solver.solve(), serial_lap_results)
+        assert solver.chunks_resolved > 0
@@ -0,0 +1,73 @@
+import numpy
+import pytest
+from lap_solver import lap_velocity_calculation, lap_velocity_calculation_vectorized
+from parameter_gradients import parameter_gradients
+
+
+def test_batch_matches_the_scalar_laps(track):
+    track, car = track
+    masses = numpy.array([car['mass'] * 0.9, car['mass'], car['mass'] * 1.2])
+    cars = dict(car)
+    cars['mass'] = masses
+    results = lap_velocity_calculation_vectorized(track, cars, track.get_air_density())
+
+    for variant, mass in enumerate(masses):
+        lap_results = lap_velocity_calculation(track, dict(car, mass=mass),
+                                               track.get_air_density())
+        assert results.lap_time[variant] == pytest.approx(lap_results.lap_time, rel=1e-9)
+        assert results.battery_energy[variant] == pytest.approx(
+            lap_results.battery_energy_cumulative_list[-1], rel=1e-9)
+
+
+def test_gradients_match_scalar_finite_differences(track):
+    track, car = track
+    air_density = track.get_air_density()
+    gradients = parameter_gradients(track, car, air_density, parameters=('mass', 'air_density'))
+
+    step = 1e-3 * car['mass']
+    lap_time_up = lap_velocity_calculation(track, dict(car, mass=car['mass'] + step),
+                                           air_density).lap_time
+    lap_time_down = lap_velocity_calculation(track, dict(car, mass=car['mass'] - step),
+                                             air_density).lap_time
+    assert gradients.lap_time_gradients['mass'] == pytest.approx(
+        (lap_time_up - lap_time_down) / (2 * step), rel=1e-6)
+    # a heavier car and thicker air are slower
+    assert gradients.lap_time_gradients['mass'] > 0
+    assert gradients.lap_time_gradients['air_density'] > 0
+    ranking = gradients.ranking()
+    assert [abs(elasticity) for _, elasticity in ranking] == sorted(
+        (abs(elasticity) for elasticity in gradients.elasticities().values()), reverse=True)
+
+
+def test_invalid_gradient_parameter(track):
+    track, car = track
+    with pytest.raises(Exception, match="Invalid parameter"):
+        parameter_gradients(track, car, track.get_air_density(), parameters=('color',))
+
+
+def test_motor_efficiency_gradient_scales_the_powertrain(track):
+    track, car = track
+    air_density = track.get_air_density()
+    gradients = parameter_gradients(track, car, air_density, parameters=('motor_efficiency',))
+
+    step = 1e-3 * car['motor_efficiency']
+    battery_energy = {}
+    for sign in (1, -1):
+        efficiency = car['motor_efficiency'] + sign * step
+        powertrain = car['powertrain'].with_peak_efficiency(efficiency)
+        battery_energy[sign] = lap_velocity_calculation(
+            track, dict(car, motor_efficiency=efficiency, powertrain=powertrain),
+            air_density).battery_energy_cumulative_list[-1]
+    assert gradients.battery_energy_gradients['motor_efficiency'] == pytest.approx(
+        (battery_energy[1] - battery_energy[-1]) / (2 * step), rel=1e-6)
+    # a more efficient motor draws less from the battery on the same lap
+    assert gradients.battery_energy_gradients['motor_efficiency'] < 0
+    assert gradients.lap_time_gradients['motor_efficiency'] == 0
+
+
+def test_motor_efficiency_gradient_needs_a_powertrain(track):
+    track, car = track
+    car = dict(car, powertrain=None)
+    with pytest.raises(Exception, match="no powertrain"):
+        parameter_gradients(track, car, track.get_air_density(),
+                            parameters=('motor_efficiency',))
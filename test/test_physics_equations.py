@@ -0,0 +1,126 @@
+import pytest
+from physics_equations import (GRAVITY, PHYSICS_RESULTS_ATTRIBUTES, CarModel,
+                               PhysicsResultsColumns, constrained_velocity_calculation,
+                               constrained_velocity_car_model_calculation,
+                               constrained_velocity_physics_simulation,
+                               free_acceleration_calculation,
+                               free_acceleration_car_model_calculation,
+                               max_negative_power_physics_simulation,
+                               max_positive_power_physics_simulation,
+                               reverse_dececceleration_calculation,
+                               reverse_dececceleration_car_model_calculation,
+                               reverse_max_negative_power_physics_simulation)
+
+AIR_DENSITY = 1.2
+
+
+def test_climb_takes_the_potential_energy(track):
+    _, car = track
+    flat = constrained_velocity_physics_simulation(10.0, 10.0, 1.0, car, AIR_DENSITY)
+    uphill = constrained_velocity_physics_simulation(10.0, 10.0, 1.0, car, AIR_DENSITY, 0.05)
+
+    assert (uphill.energy_differential_of_motor - flat.energy_differential_of_motor ==
+            pytest.approx(car['mass'] * GRAVITY * 0.05))
+
+
+def test_grade_changes_the_velocity(track):
+    _, car = track
+    flat = max_positive_power_physics_simulation(10.0, 1.0, car, AIR_DENSITY)
+    uphill = max_positive_power_physics_simulation(10.0, 1.0, car, AIR_DENSITY, 0.05)
+    downhill = max_positive_power_physics_simulation(10.0, 1.0, car, AIR_DENSITY, -0.05)
+    assert uphill.final_velocity < flat.final_velocity < downhill.final_velocity
+
+    # braking downhill takes longer, the segment has to be entered slower
+    flat = reverse_max_negative_power_physics_simulation(10.0, 1.0, car, AIR_DENSITY)
+    downhill = reverse_max_negative_power_physics_simulation(10.0, 1.0, car, AIR_DENSITY, -0.05)
+    assert downhill.initial_velocity < flat.initial_velocity
+
+
+def test_braking_closes_the_energy_balance(track):
+    _, car = track
+    braking = reverse_max_negative_power_physics_simulation(20.0, 1.0, car, AIR_DENSITY)
+    constrained = constrained_velocity_physics_simulation(braking.initial_velocity, 20.0, 1.0,
+                                                          car, AIR_DENSITY)
+
+    # driving the braking segment forward from the velocity the reverse calculation enters
+    # it with takes the same braking energy
+    assert braking.initial_velocity > 20.0
+    assert constrained.energy_differential_of_motor == pytest.approx(
+        braking.energy_differential_of_motor, rel=1e-3)
+
+
+def _car_values(car):
+    return (car['mass'], car['drag_coefficient'], car['frontal_area'],
+            car['wheel_pressure_bar'])
+
+
+def _assert_same_results(results, expected_results):
+    for attribute in ('initial_velocity', 'final_velocity', 'time_of_segment',
+                      'energy_differential_of_motor'):
+        assert getattr(results, attribute) == pytest.approx(getattr(expected_results, attribute),
+                                                            rel=1e-12)
+
+
+# (elevation change, headwind, rolling resistance factor) of a segment
+SEGMENT_CONDITIONS = [(0, 0, 1), (0.02, 3.0, 1.2), (-0.03, -2.0, 1)]
+
+
+@pytest.mark.parametrize("elevation_change, headwind, rolling_resistance_factor",
+                         SEGMENT_CONDITIONS)
+def test_car_model_kernels_match_the_parameter_kernels(track, elevation_change, headwind,
+                                                       rolling_resistance_factor):
+    _, car = track
+    car_model = CarModel(car)
+    mass, drag_coefficient, frontal_area, wheel_pressure_bar = _car_values(car)
+    conditions = (elevation_change, headwind, rolling_resistance_factor)
+
+    _assert_same_results(
+        free_acceleration_car_model_calculation(12.0, 0.5, car['motor_power'], car_model,
+                                                AIR_DENSITY, *conditions),
+        free_acceleration_calculation(12.0, 0.5, car['motor_power'], car['motor_efficiency'],
+                                      car['wheel_radius'], car['rotational_inertia'], mass,
+                                      drag_coefficient, frontal_area, wheel_pressure_bar,
+                                      AIR_DENSITY, *conditions))
+    _assert_same_results(
+        reverse_dececceleration_car_model_calculation(12.0, 0.5, -car['motor_power'], car_model,
+                                                      AIR_DENSITY, *conditions),
+        reverse_dececceleration_calculation(12.0, 0.5, -car['motor_power'],
+                                            car['motor_efficiency'], car['wheel_radius'],
+                                            car['rotational_inertia'], mass, drag_coefficient,
+                                            frontal_area, wheel_pressure_bar, AIR_DENSITY,
+                                            *conditions))
+    _assert_same_results(
+        constrained_velocity_car_model_calculation(12.0, 12.5, 0.5, car_model, AIR_DENSITY,
+                                                   *conditions),
+        constrained_velocity_calculation(12.0, 12.5, 0.5, car['motor_efficiency'],
+                                         car['rotational_inertia'], mass, car['wheel_radius'],
+                                         drag_coefficient, frontal_area, wheel_pressure_bar,
+                                         AIR_DENSITY, *conditions))
+
+
+def test_car_model_of_the_car_properties(track):
+    _, car = track
+    car_model = CarModel.from_car(car)
+    assert CarModel.from_car(car_model) is car_model
+    assert car_model.drive_limits is car['drive_limits']
+    _assert_same_results(max_positive_power_physics_simulation(5.0, 0.5, car_model, AIR_DENSITY),
+                         max_positive_power_physics_simulation(5.0, 0.5, car, AIR_DENSITY))
+
+
+def test_column_output_matches_the_results_objects(track):
+    _, car = track
+    car_model = CarModel(car)
+    columns = PhysicsResultsColumns(4)
+    calculations = [
+        (max_positive_power_physics_simulation, (5.0, 0.5, car_model, AIR_DENSITY, 0.01)),
+        (reverse_max_negative_power_physics_simulation, (12.0, 0.5, car_model, AIR_DENSITY)),
+        (constrained_velocity_physics_simulation, (12.0, 12.5, 0.5, car_model, AIR_DENSITY)),
+        (max_negative_power_physics_simulation, (12.0, 0.5, car_model, AIR_DENSITY, -0.01)),
+    ]
+    for index, (calculation, arguments) in enumerate(calculations):
+        physics_results = calculation(*arguments)
+        calculation(*arguments, out=columns, index=index)
+        # the powertrain is applied to the row as well
+        for attribute in PHYSICS_RESULTS_ATTRIBUTES:
+            assert getattr(columns, attribute)[index] == getattr(physics_results, attribute)
+        assert columns[index].battery_energy == physics_results.battery_energy
@@ -0,0 +1,123 @@
+import numpy
+import pytest
+from conftest import track_and_car, track_rows
+from environment import Environment
+from lap_solver import lap_velocity_calculation
+from physics_equations import max_positive_power_physics_simulation
+from powertrain import DriveLimits, Powertrain
+
+
+@pytest.fixture
+def powertrain():
+    return Powertrain(100e3, [0.0, 0.5, 1.0], [0.8, 0.9, 0.9], battery_round_trip_efficiency=0.81,
+                      auxiliary_power=1e3, max_regen=0.5, max_battery_power=20e3)
+
+
+def test_battery_power(powertrain):
+    # driving: motor and battery losses and the auxiliary load
+    assert powertrain.battery_power(50e3) == pytest.approx((50e3 / 0.9 + 1e3) / 0.9)
+    # braking: half of the braking energy is recovered, less the losses
+    assert powertrain.battery_power(-50e3) == pytest.approx((-50e3 * 0.9 * 0.5 + 1e3) * 0.9)
+    # charging is limited by the battery
+    assert powertrain.battery_power(-100e3) == -20e3
+
+
+def test_vectorized_battery_power_matches_the_scalar_one(powertrain):
+    motor_power = numpy.linspace(-120e3, 120e3, 97)
+    battery_power = powertrain.battery_power_vectorized(motor_power)
+
+    numpy.testing.assert_allclose(battery_power,
+                                  [powertrain.battery_power(power) for power in motor_power],
+                                  rtol=1e-12)
+    # the table is exact at its points
+    motor_power_table = powertrain.motor_power_table
+    numpy.testing.assert_allclose(powertrain.battery_power_vectorized(motor_power_table),
+                                  powertrain.battery_power_calculation(motor_power_table))
+
+
+def test_powertrain_with_peak_efficiency(powertrain):
+    scaled = powertrain.with_peak_efficiency(0.72)
+
+    assert scaled.efficiencies == pytest.approx([0.64, 0.72, 0.72])
+    assert scaled.battery_power(50e3) == pytest.approx((50e3 / 0.72 + 1e3) / 0.9)
+    # the original powertrain is not changed
+    assert powertrain.efficiencies == [0.8, 0.9, 0.9]
+
+
+def test_powertrain_of_the_car_file(car_data, track):
+    track, car = track
+    powertrain = Powertrain.from_car_data(car_data)
+    assert max(powertrain.efficiencies) == pytest.approx(car_data["motorPeakEff"])
+    assert powertrain.max_motor_power == car_data["maxMotorKw"] * 1000
+
+    # the battery has to supply more than the motor puts on the road
+    lap_results = lap_velocity_calculation(track, car, track.get_air_density())
+    motor_energy = sum(physics_results.energy_differential_of_motor
+                       for physics_results in lap_results.physics_results_profile)
+    assert lap_results.battery_energy_cumulative_list[-1] > motor_energy
+
+
+def test_invalid_powertrain():
+    with pytest.raises(Exception, match="Invalid motor efficiencies"):
+        Powertrain(100e3, [0.0, 1.0], [0.0, 0.9])
+    with pytest.raises(Exception, match="power fractions but"):
+        Powertrain(100e3, [0.0, 1.0], [0.9])
+
+
+@pytest.fixture
+def drive_limits():
+    # constant torque up to 20 m/s, traction for 5 kN
+    return DriveLimits(100e3, 20.0, 5e3)
+
+
+def test_drive_limits(drive_limits):
+    # traction limit at low velocity, then constant torque, then constant power
+    assert drive_limits.max_power(4.0) == pytest.approx(20e3)
+    assert drive_limits.max_power(10.0) == pytest.approx(50e3)
+    assert drive_limits.max_power(30.0) == pytest.approx(100e3)
+    assert drive_limits.max_power(1000.0) == pytest.approx(100e3)
+
+
+def test_stacked_drive_limits_match_every_car(drive_limits):
+    other_drive_limits = DriveLimits(200e3, 0.0, 8e3)
+    stacked = DriveLimits.stack([drive_limits, other_drive_limits])
+    velocity = numpy.array([12.3, 12.3])
+
+    numpy.testing.assert_allclose(stacked.max_power_vectorized(velocity),
+                                  [drive_limits.max_power(12.3),
+                                   other_drive_limits.max_power(12.3)])
+    numpy.testing.assert_allclose(drive_limits.max_power_vectorized([4.0, 10.0]),
+                                  [20e3, 50e3])
+
+
+def test_drive_limits_of_the_car_file(car_data):
+    drive_limits = DriveLimits.from_car_data(car_data)
+    # constant torque to the base velocity and constant power from there, without
+    # losses, take the car to 60 mph in val0To60Mph
+    velocity_60_mph = 60 * 0.44704
+    assert (car_data["vehKg"] * (velocity_60_mph ** 2 + drive_limits.base_velocity ** 2) /
+            (2 * drive_limits.max_motor_power) == pytest.approx(car_data["val0To60Mph"]))
+    assert drive_limits.traction_force == pytest.approx(
+        car_data["wheelCoefOfFric"] * car_data["vehKg"] * 9.81 * car_data["driveAxleWeightFrac"])
+
+
+def test_rain_lowers_the_traction_limit(car_data, init_vals):
+    init_vals['ENVIRONMENT']['rain'] = 'True'
+    init_vals['ENVIRONMENT']['rain_amount'] = '0.5'
+    friction_factor = Environment.from_ini(init_vals).friction_factor
+    _, car = track_and_car(track_rows(), car_data, init_vals)
+
+    assert friction_factor < 1
+    assert car["drive_limits"].traction_force == pytest.approx(
+        DriveLimits.from_car_data(car_data).traction_force * friction_factor)
+
+
+def test_drive_limits_slow_the_launch(track):
+    _, car = track
+    unlimited_car = dict(car)
+    del unlimited_car["drive_limits"]
+    limited = max_positive_power_physics_simulation(1.0, 1.0, car, 1.2)
+    unlimited = max_positive_power_physics_simulation(1.0, 1.0, unlimited_car, 1.2)
+
+    assert limited.final_velocity < unlimited.final_velocity
+    assert limited.motor_power <= car["drive_limits"].max_power(1.0)
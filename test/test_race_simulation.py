@@ -0,0 +1,53 @@
+import pytest
+from race_simulation import RaceSimulation
+
+
+@pytest.fixture
+def race(track):
+    track, car = track
+    return RaceSimulation(track, car, track.get_air_density(), laps=6, pit_stop_time=30,
+                          pit_exit_velocity=10.0)
+
+
+def test_periodic_laps_come_from_the_cache(race):
+    results = race.race()
+
+    assert len(results.lap_summaries) == 6
+    assert results.race_time == pytest.approx(sum(summary.lap_time
+                                                  for summary in results.lap_summaries))
+    # the laps after the first one start with the velocity the lap before ended with
+    for lap_summary, next_summary in zip(results.lap_summaries, results.lap_summaries[1:]):
+        assert next_summary.initial_velocity == lap_summary.end_velocity
+    assert race.laps_calculated < 6
+
+
+def test_pit_stop_recharges_the_battery(race):
+    no_stop = race.race()
+    one_stop = race.race([3])
+
+    assert one_stop.state_of_charge_list[2] == no_stop.state_of_charge_list[2]
+    assert one_stop.state_of_charge_list[-1] > no_stop.state_of_charge_list[-1]
+    assert one_stop.lap_summaries[3].initial_velocity == 10.0
+    assert one_stop.race_time > no_stop.race_time + 30
+
+
+def test_pit_strategies_fastest_feasible_first(race):
+    # the battery does not last the race without a pit stop
+    race.min_state_of_charge = (race.race().state_of_charge_list[-1] +
+                                min(race.race([3]).state_of_charge_list)) / 2
+    strategies = race.evaluate_pit_strategies()
+
+    assert len(strategies) == 6
+    feasible = [results for results in strategies if results.feasible]
+    assert feasible == strategies[:len(feasible)]
+    assert [results.race_time for results in feasible] == sorted(results.race_time
+                                                                 for results in feasible)
+    assert strategies[0].pit_stop_laps == [3]
+    assert strategies[-1].pit_stop_laps == []
+    assert not strategies[-1].feasible
+
+
+def test_pit_exit_velocity_above_the_lap_entry(track):
+    track, car = track
+    with pytest.raises(Exception, match="pit exit velocity"):
+        RaceSimulation(track, car, track.get_air_density(), laps=2, pit_exit_velocity=100.0)
@@ -0,0 +1,57 @@
+import math
+import numpy
+import pytest
+from raceline_geometry import RacelineGeometry
+
+RADIUS = 50.0
+
+
+@pytest.fixture
+def circle():
+    """Counterclockwise circle starting at the origin heading north, a point every 10 degrees."""
+    angle = numpy.radians(numpy.arange(0, 360, 10))
+    return RacelineGeometry(RADIUS * angle, RADIUS * (numpy.cos(angle) - 1),
+                            RADIUS * numpy.sin(angle), angle, numpy.full(len(angle), 1 / RADIUS),
+                            closed=True)
+
+
+def test_circle_between_the_points(circle):
+    distance = numpy.linspace(0, 2 * math.pi * RADIUS, 1000, endpoint=False)
+    x, y = circle.position_vectorized(distance)
+
+    numpy.testing.assert_allclose(numpy.hypot(x + RADIUS, y), RADIUS, atol=1e-3)
+    # the raceline is closed with a straight line, a little shorter than the arc
+    numpy.testing.assert_allclose(circle.heading_vectorized(distance), distance / RADIUS,
+                                  atol=1e-3)
+    numpy.testing.assert_allclose(circle.curvature_vectorized(distance), 1 / RADIUS)
+
+
+def test_scalar_lookups_match_the_vectorized_ones(circle):
+    for distance in (0.0, 12.3, 100.0, 311.0):
+        x, y = circle.position_vectorized(numpy.array([distance]))
+        assert circle.position_at(distance) == pytest.approx((x[0], y[0]))
+        assert circle.heading_at(distance) == pytest.approx(
+            circle.heading_vectorized(numpy.array([distance]))[0])
+
+
+def test_closed_raceline_wraps_around_the_lap(circle):
+    assert circle.length == pytest.approx(2 * math.pi * RADIUS, rel=1e-3)
+    assert circle.position_at(20.0 + circle.length) == pytest.approx(circle.position_at(20.0))
+    assert circle.position_at(-5.0) == pytest.approx(circle.position_at(circle.length - 5.0))
+
+
+def test_elevation_does_not_overshoot():
+    distance = [0.0, 10.0, 20.0, 30.0]
+    geometry = RacelineGeometry(distance, [0.0] * 4, distance, [0.0] * 4, [0.0] * 4,
+                                elevation=[0.0, 0.0, 5.0, 5.0])
+    elevation = geometry.elevation_vectorized(numpy.linspace(0, 30, 301))
+
+    assert elevation.min() == pytest.approx(0.0)
+    assert elevation.max() == pytest.approx(5.0)
+    assert numpy.all(numpy.diff(elevation) >= -1e-12)
+    assert geometry.elevation_at(20.0) == pytest.approx(5.0)
+
+
+def test_invalid_raceline():
+    with pytest.raises(Exception, match="strictly increasing"):
+        RacelineGeometry([0.0, 0.0], [0.0, 1.0], [0.0, 0.0], [0.0, 0.0], [0.0, 0.0])
@@ -0,0 +1,35 @@
+import csv
+from conftest import track_rows
+from results_writer import RESULTS_HEADER, ResultsStreamWriter
+
+
+def _read_rows(filename):
+    with open(filename, newline='') as csv_file:
+        return list(csv.reader(csv_file))
+
+
+def test_writer_writes_the_chunks_in_order(tmp_path):
+    filename = str(tmp_path / "output.csv")
+    writer = ResultsStreamWriter(filename, max_queued_chunks=1)
+    writer.start()
+    for chunk in range(5):
+        writer.write_rows([[chunk * 2 + row, 0.5 * row] for row in range(2)])
+    writer.write_rows([])
+    writer.close()
+
+    rows = _read_rows(filename)
+    assert rows[0] == RESULTS_HEADER
+    assert [int(row[0]) for row in rows[1:]] == list(range(10))
+    assert writer.rows_written == 10
+
+
+def test_simulation_streams_the_final_results(tmp_path, run_simulation):
+    filename = str(tmp_path / "output.csv")
+    data_store = run_simulation(track_rows(), filename)
+
+    rows = _read_rows(filename)
+    end_index = data_store.get_simulation_index()
+    expected_rows = data_store.get_results_rows_in_range(0, end_index)
+    assert rows[0] == RESULTS_HEADER
+    assert len(rows) - 1 == end_index == len(data_store.get_track_properties().distance_list) - 1
+    assert [[float(value) for value in row] for row in rows[1:]] == expected_rows
@@ -0,0 +1,65 @@
+import csv
+import numpy
+import pytest
+from conftest import track_rows
+from results_writer import RESULTS_HEADER
+from run_file import RunFile, RunFileWriter, write_run_file
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_write_run_file_round_trip(tmp_path, compress):
+    filename = str(tmp_path / "columns.run")
+    columns = {'index': numpy.arange(10, dtype='int64'),
+               'velocity': numpy.linspace(0.0, 40.0, 10),
+               'power': numpy.linspace(1e5, 2e5, 10, dtype='float32')}
+    metadata = {'car': {'parameters': {'mass': 1500.0}}, 'laps': 1}
+    write_run_file(filename, columns, metadata, compress)
+
+    run_file = RunFile(filename)
+    assert run_file.metadata == metadata
+    assert run_file.column_names == list(columns)
+    assert len(run_file) == 10
+    for name, values in columns.items():
+        assert run_file[name].dtype == values.dtype
+        numpy.testing.assert_array_equal(run_file[name], values)
+
+
+def test_run_file_writer_appends_chunks(tmp_path):
+    filename = str(tmp_path / "chunks.run")
+    writer = RunFileWriter(filename, [('index', 'int64'), ('velocity', 'float64')],
+                           {'solver': 'test'})
+    writer.append({'index': [0, 1, 2], 'velocity': [1.0, 2.0, 3.0]})
+    writer.append({'index': [], 'velocity': []})
+    writer.append({'index': [3], 'velocity': [4.0]})
+    writer.close({'timing': 1.5})
+
+    run_file = RunFile(filename)
+    assert run_file.metadata == {'solver': 'test', 'timing': 1.5}
+    numpy.testing.assert_array_equal(run_file['index'], [0, 1, 2, 3])
+    numpy.testing.assert_array_equal(run_file['velocity'], [1.0, 2.0, 3.0, 4.0])
+
+
+def test_not_a_run_file(tmp_path):
+    filename = tmp_path / "results.csv"
+    filename.write_text("SimulationIndex,Time\n")
+    with pytest.raises(Exception, match="Not a run file"):
+        RunFile(str(filename))
+
+
+def test_simulation_run_file_matches_csv(tmp_path, run_simulation):
+    run_filename = str(tmp_path / "output.run")
+    csv_filename = str(tmp_path / "output.csv")
+    run_simulation(track_rows(), run_filename)
+    run_simulation(track_rows(), csv_filename)
+
+    run_file = RunFile(run_filename)
+    with open(csv_filename, newline='') as csv_file:
+        rows = list(csv.reader(csv_file))
+    assert rows[0] == RESULTS_HEADER
+    assert run_file.column_names == RESULTS_HEADER
+    assert len(run_file) == len(rows) - 1
+    for number, name in enumerate(RESULTS_HEADER):
+        numpy.testing.assert_array_equal(
+            run_file[name], numpy.array([row[number] for row in rows[1:]], dtype=float))
+    assert run_file.metadata['car']['parameters']
+    assert run_file.metadata['timing']['lap_time'] == pytest.approx(float(rows[-1][1]))
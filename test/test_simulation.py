@@ -0,0 +1,112 @@
+from bisect import bisect_left
+import numpy
+import pytest
+from conftest import track_rows
+from datastore import DiscardedIndexError
+from lap_solver import STANDING_START_VELOCITY, lap_velocity_calculation
+from physics_equations import ENERGY_FLOW_ATTRIBUTES
+from sector_analytics import sector_results_filename
+
+SECTOR_DISTANCES = "0, 150"
+
+
+def _read(filename):
+    with open(filename) as output_file:
+        return output_file.read()
+
+
+def _profile_array(data_store, attribute):
+    return numpy.array(getattr(data_store.get_lap_results().physics_results_profile,
+                               attribute))
+
+
+def test_streaming_output_is_identical(tmp_path, run_simulation, init_vals):
+    init_vals['SECTORS']['distances'] = SECTOR_DISTANCES
+    output_filenames = []
+    for streaming_window in (0, 1):
+        output_filename = str(tmp_path / "output_{}.csv".format(streaming_window))
+        run_simulation(track_rows(), output_filename, streaming_window=streaming_window)
+        output_filenames.append(output_filename)
+
+    assert _read(output_filenames[1]) == _read(output_filenames[0])
+    assert (_read(sector_results_filename(output_filenames[1])) ==
+            _read(sector_results_filename(output_filenames[0])))
+
+
+def test_streaming_keeps_a_window(run_simulation):
+    data_store = run_simulation(track_rows(), streaming_window=1)
+    lap_results = data_store.get_lap_results()
+    segments = len(data_store.get_track_properties().distance_list) - 1
+
+    assert data_store.get_window_length() < segments
+    assert lap_results.first_available_index > 0
+    assert len(lap_results.velocity_list._data) <= data_store.get_window_length()
+    # the velocities of discarded indexes are not replaced by the ones held
+    with pytest.raises(DiscardedIndexError):
+        data_store.get_final_velocity_at_index(0)
+
+
+def test_walk_back_matches_the_lap_solver(run_simulation):
+    data_store = run_simulation(track_rows())
+    track = data_store.get_track_properties()
+    lap_results = lap_velocity_calculation(track, data_store.get_car_properties(),
+                                           track.get_air_density())
+    segments = len(lap_results.velocity_list)
+    velocity = _profile_array(data_store, 'final_velocity')[:segments]
+
+    # the walk back brakes for the corners the same way the braking envelope does
+    numpy.testing.assert_allclose(velocity, lap_results.velocity_list, atol=1e-2)
+    assert _profile_array(data_store, 'time_of_segment')[:segments].sum() == pytest.approx(
+        lap_results.lap_time, rel=1e-4)
+    for distance, max_velocity in ((100.0, 10.0), (220.0, 15.0)):
+        index = bisect_left(track.distance_list, distance)
+        assert velocity[index] <= max_velocity * (1 + 1e-6)
+
+
+def test_lap_starts_with_the_standing_start_velocity(run_simulation):
+    data_store = run_simulation(track_rows())
+    assert data_store.get_initial_velocity_at_index(0) == STANDING_START_VELOCITY
+    assert _profile_array(data_store, 'initial_velocity')[0] == STANDING_START_VELOCITY
+
+
+def test_sector_aggregates_after_walk_back(run_simulation, init_vals):
+    init_vals['SECTORS']['distances'] = SECTOR_DISTANCES
+    data_store = run_simulation(track_rows())
+    distance_list = data_store.get_track_properties().distance_list
+    time_of_segment = _profile_array(data_store, 'time_of_segment')
+    motor_energy = _profile_array(data_store, 'energy_differential_of_motor')
+    battery_energy = _profile_array(data_store, 'battery_energy')
+    motor_power = _profile_array(data_store, 'motor_power')
+    velocity = _profile_array(data_store, 'final_velocity')
+
+    sector_results = data_store.get_sector_results()
+    assert [sector.start_distance for sector in sector_results] == [0.0, 150.0]
+    split_time = 0
+    for sector in sector_results:
+        begin = bisect_left(distance_list, sector.start_distance)
+        end = bisect_left(distance_list, sector.end_distance)
+        split_time += time_of_segment[begin:end].sum()
+        # segments overwritten by a walk back count once, with their last results
+        assert sector.complete
+        assert sector.segments == end - begin
+        assert sector.time == pytest.approx(time_of_segment[begin:end].sum())
+        assert sector.split_time == pytest.approx(split_time)
+        assert sector.motor_energy == pytest.approx(motor_energy[begin:end].sum())
+        assert sector.battery_energy == pytest.approx(battery_energy[begin:end].sum())
+        assert sector.peak_motor_power == motor_power[begin:end].max()
+        assert sector.min_velocity == velocity[begin:end].min()
+
+
+@pytest.mark.parametrize("streaming_window", [0, 1])
+def test_energy_flow_closes_in_the_data_store(run_simulation, streaming_window):
+    data_store = run_simulation(track_rows(), energy_flow=True,
+                                streaming_window=streaming_window)
+    totals = data_store.get_energy_flow_totals()
+
+    assert totals['energy_differential_of_motor'] == pytest.approx(
+        sum(totals[attribute] for attribute in ENERGY_FLOW_ATTRIBUTES))
+    track = data_store.get_track_properties()
+    lap_results = lap_velocity_calculation(track, data_store.get_car_properties(),
+                                           track.get_air_density(), energy_flow=True)
+    for attribute, total in lap_results.energy_flow_totals().items():
+        assert totals[attribute] == pytest.approx(total, rel=1e-3, abs=1.0)
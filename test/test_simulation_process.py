@@ -0,0 +1,64 @@
+import numpy
+import pytest
+from simulation_process import SHARED_RESULTS_COLUMNS, SharedResultsBuffer
+
+
+def _new_data_values(refresh_index, values):
+    new_data_values = {column: numpy.asarray(values, dtype=float) * (number + 1)
+                       for number, column in enumerate(SHARED_RESULTS_COLUMNS)}
+    new_data_values['refresh_index'] = refresh_index
+    return new_data_values
+
+
+@pytest.fixture
+def shared_buffers():
+    buffer = SharedResultsBuffer.create(10)
+    reader = SharedResultsBuffer()
+    yield buffer, reader
+    reader.close()
+    buffer.close(unlink=True)
+
+
+def test_reader_sees_the_published_rows(shared_buffers):
+    buffer, reader = shared_buffers
+    assert reader.get_columns()['time'].size == 0
+    reader.attach(buffer.name, buffer.length)
+
+    buffer.publish(_new_data_values(0, [1.0, 2.0, 3.0]), 3)
+    assert reader.get_simulation_index() == 3
+    numpy.testing.assert_array_equal(reader.get_columns()['time'], [1.0, 2.0, 3.0])
+    numpy.testing.assert_array_equal(reader.get_columns()['velocity'], [3.0, 6.0, 9.0])
+
+
+def test_rewritten_rows_are_overwritten_in_place(shared_buffers):
+    buffer, reader = shared_buffers
+    reader.attach(buffer.name, buffer.length)
+    buffer.publish(_new_data_values(0, [1.0, 2.0, 3.0, 4.0]), 4)
+    # a walk back rewrote the rows 1 and 2, the published length stays
+    buffer.publish(_new_data_values(1, [5.0, 6.0]), 4)
+
+    numpy.testing.assert_array_equal(reader.get_columns()['time'], [1.0, 5.0, 6.0, 4.0])
+
+
+def test_ring_buffer_keeps_the_last_rows(shared_buffers):
+    buffer, reader = shared_buffers
+    reader.attach(buffer.name, buffer.length)
+    buffer.publish(_new_data_values(0, numpy.arange(8.0)), 8)
+    buffer.publish(_new_data_values(8, numpy.arange(8.0, 14.0)), 14)
+
+    first_index, columns = reader.get_window()
+    assert first_index == 4
+    numpy.testing.assert_array_equal(columns['time'], numpy.arange(4.0, 14.0))
+
+
+def test_rows_discarded_before_they_were_published_are_nan(shared_buffers):
+    buffer, reader = shared_buffers
+    reader.attach(buffer.name, buffer.length)
+    buffer.publish(_new_data_values(0, [1.0, 2.0, 3.0, 4.0]), 4)
+    # the rows 4 to 19 were discarded by a streaming DataStore before they were published
+    buffer.publish(_new_data_values(20, [5.0, 6.0, 7.0]), 23)
+
+    first_index, columns = reader.get_window()
+    assert first_index == 13
+    assert numpy.isnan(columns['time'][:7]).all()
+    numpy.testing.assert_array_equal(columns['time'][7:], [5.0, 6.0, 7.0])
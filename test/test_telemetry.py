@@ -0,0 +1,80 @@
+import math
+import numpy
+import pytest
+from raceline_geometry import RacelineGeometry
+from run_file import write_run_file
+from telemetry import align_telemetry
+from track_properties import TrackProperties
+
+RADIUS = 50.0
+VELOCITY = 10.0
+BATTERY_POWER = 5e3
+LAP_LENGTH = 2 * math.pi * RADIUS
+
+
+@pytest.fixture
+def circle():
+    """Counterclockwise circle starting at the origin heading north, a point every 2 degrees,
+    the last point is the first one."""
+    angle = numpy.radians(numpy.arange(0, 362, 2))
+    return RacelineGeometry(RADIUS * angle, RADIUS * (numpy.cos(angle) - 1),
+                            RADIUS * numpy.sin(angle), angle, numpy.full(len(angle), 1 / RADIUS),
+                            closed=True)
+
+
+@pytest.fixture
+def circle_track():
+    track = TrackProperties()
+    track.add_critical_point(0.0, VELOCITY, track.FREE_ACCELERATION)
+    track.add_critical_point(LAP_LENGTH, VELOCITY, track.FREE_ACCELERATION)
+    track.generate_track_list(1.0)
+    return track
+
+
+def _telemetry_columns(laps=3.5, rate=20.0, start_distance=-5.0):
+    """Telemetry of a car driving the circle at constant velocity, the session starts
+    before the start finish line."""
+    time = numpy.arange(0, laps * LAP_LENGTH / VELOCITY, 1 / rate)
+    angle = (start_distance + VELOCITY * time) / RADIUS
+    return {'time_s': time,
+            'x_m': RADIUS * (numpy.cos(angle) - 1),
+            'y_m': RADIUS * numpy.sin(angle),
+            'vx_mps': numpy.full(len(time), VELOCITY),
+            'battery_power_w': numpy.full(len(time), BATTERY_POWER)}
+
+
+def _write_csv(filename, columns):
+    numpy.savetxt(filename, numpy.column_stack(list(columns.values())), delimiter=',',
+                  header=','.join(columns), comments='')
+
+
+@pytest.mark.parametrize("extension", [".csv", ".run"])
+def test_circle_laps_are_recovered(tmp_path, circle, circle_track, extension):
+    filename = str(tmp_path / ("telemetry" + extension))
+    columns = _telemetry_columns()
+    if extension == ".csv":
+        _write_csv(filename, columns)
+    else:
+        write_run_file(filename, columns)
+    laps = list(align_telemetry(filename, circle, circle_track, chunk_rows=500))
+
+    # the laps before the start finish line and after the last one are not complete
+    assert len(laps) == 3
+    segments = len(circle_track.distance_list) - 1
+    lap_time = circle_track.distance_list[-1] / VELOCITY
+    for lap_results in laps:
+        assert len(lap_results.velocity_list) == segments
+        assert lap_results.lap_time == pytest.approx(lap_time, rel=1e-4)
+        numpy.testing.assert_allclose(lap_results.velocity_list, VELOCITY)
+        assert lap_results.battery_energy_cumulative_list[-1] == pytest.approx(
+            BATTERY_POWER * lap_time, rel=1e-4)
+
+
+def test_missing_telemetry_column(tmp_path, circle, circle_track):
+    filename = str(tmp_path / "telemetry.csv")
+    columns = _telemetry_columns(laps=0.1)
+    del columns['vx_mps']
+    _write_csv(filename, columns)
+
+    with pytest.raises(Exception, match="column vx_mps"):
+        list(align_telemetry(filename, circle, circle_track))
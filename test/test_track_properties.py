@@ -0,0 +1,82 @@
+import math
+import numpy
+import pytest
+from physics_equations import GRAVITY, cornering_velocity_limit_calculation
+from track_properties import TrackProperties
+
+
+def test_cornering_velocity_limit():
+    velocity_limit = cornering_velocity_limit_calculation([0.0, 0.01, -0.01, 0.1], 1.0, 40.0)
+
+    # a straight is limited by max_velocity, the sign of the curvature is ignored
+    assert velocity_limit[0] == 40.0
+    assert velocity_limit[1] == pytest.approx(math.sqrt(GRAVITY * 100))
+    assert velocity_limit[2] == velocity_limit[1]
+    assert velocity_limit[3] == pytest.approx(math.sqrt(GRAVITY * 10))
+
+
+def test_cornering_velocity_limit_on_a_bank():
+    flat, banked, off_camber = cornering_velocity_limit_calculation(
+        [0.1, 0.1, 0.1], 0.5, 100.0, numpy.array([0.0, 0.2, -0.2]))
+    assert flat < banked
+    assert banked == pytest.approx(math.sqrt(GRAVITY * 10 * math.tan(0.2 + math.atan(0.5))))
+    assert off_camber < flat
+    # a bank steeper than the friction angle holds the car at any velocity
+    assert cornering_velocity_limit_calculation(0.1, 0.5, 100.0, 1.2) == 100.0
+    # an off camber corner steeper than the friction angle can not be driven
+    assert cornering_velocity_limit_calculation(0.1, 0.5, 100.0, -0.5) == 0.0
+
+
+def test_curvature_constraints_limit_the_max_velocity():
+    track = TrackProperties()
+    track.add_critical_point(0.0, 30.0, track.FREE_ACCELERATION)
+    track.add_critical_point(100.0, 30.0, track.FREE_ACCELERATION)
+    track.generate_track_list(1.0)
+    # a corner of 25 m radius between 40 m and 60 m
+    track.add_raceline_curvature([0.0, 39.0, 40.0, 60.0, 61.0, 100.0],
+                                 [0.0, 0.0, 0.04, 0.04, 0.0, 0.0])
+    track.generate_curvature_constraints(1.0, 50.0)
+
+    max_velocity = numpy.array(track.max_velocity_list)
+    corner_velocity = math.sqrt(GRAVITY * 25)
+    assert max_velocity.min() == pytest.approx(corner_velocity)
+    # the segment ending at 50 m is in the corner, the one ending at 10 m on the straight
+    assert max_velocity[49] == pytest.approx(corner_velocity)
+    assert max_velocity[9] == 30.0
+
+    track.generate_curvature_constraints(1.0, 50.0, replace_max_velocity=True)
+    assert track.max_velocity_list[9] == 50.0
+
+
+def test_curvature_constraints_need_the_curvature():
+    track = TrackProperties()
+    with pytest.raises(Exception, match="No raceline curvature"):
+        track.generate_curvature_constraints(1.0, 50.0)
+    with pytest.raises(Exception, match="curvatures"):
+        track.add_raceline_curvature([0.0, 1.0], [0.0])
+
+
+def test_elevation_is_interpolated_onto_the_track_list():
+    track = TrackProperties()
+    track.add_critical_point(0.0, 30.0, track.FREE_ACCELERATION)
+    track.add_critical_point(100.0, 30.0, track.FREE_ACCELERATION)
+    # 2% up to the top at 50 m, 4% down from there
+    track.add_raceline_elevation([0.0, 50.0, 100.0], [10.0, 11.0, 9.0])
+    track.generate_track_list(1.0)
+
+    segments = len(track.distance_list) - 1
+    assert len(track.elevation_change_list) == len(track.distance_list)
+    assert track.elevation_list[0] == 10.0
+    assert sum(track.elevation_change_list) == pytest.approx(track.elevation_list[-1] - 10.0)
+    assert track.grade_list[10] == pytest.approx(0.02)
+    assert track.grade_list[segments - 10] == pytest.approx(-0.04)
+
+
+def test_flat_track_without_elevation():
+    track = TrackProperties()
+    track.add_critical_point(0.0, 30.0, track.FREE_ACCELERATION)
+    track.add_critical_point(10.0, 30.0, track.FREE_ACCELERATION)
+    track.generate_track_list(1.0)
+
+    assert set(track.elevation_change_list) == {0.0}
+    assert set(track.grade_list) == {0.0}
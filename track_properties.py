@@ -1,6 +1,7 @@
 import collections
 import numpy
 import logging
+from physics_equations import cornering_velocity_limit_calculation
 
 logger = logging.getLogger(__name__)
 
@@ -38,6 +39,29 @@ class TrackProperties:
         self.distance_list = []
         self.velocity_constraint_list = []
         self.max_velocity_list = []
+        # elevation at the start of every segment and elevation change over every
+        # segment (meters), grade of every segment (rise over run), all 0 without
+        # a raceline elevation
+        self.elevation_list = []
+        self.elevation_change_list = []
+        self.grade_list = []
+        # heading of the raceline at the start of every segment (radians, zero is
+        # north, same as the psi_rad column), 0 without a raceline heading
+        self.heading_list = []
+        # weather of every segment, see environment.Environment: air density relative
+        # to get_air_density(), headwind (m/s) and factor of the rolling resistance
+        self.air_density_factor_list = []
+        self.headwind_list = []
+        self.rolling_resistance_factor_list = []
+
+        # raceline geometry for the curvature constraints, see add_raceline_curvature
+        self._raceline_distance = None
+        self._raceline_curvature = None
+        self._raceline_bank_angle = None
+        self._raceline_elevation_distance = None
+        self._raceline_elevation = None
+        self._raceline_heading_distance = None
+        self._raceline_heading = None
 
         # Constants
         self.FREE_ACCELERATION = "free"
@@ -75,6 +99,193 @@ class TrackProperties:
         self._critical_point_dict[distance_from_start_finish] = (max_velocity,
                                                                  velocity_constraint)
 
+    def get_critical_point_distances(self):
+        """Distance from the start finish line of every critical point (meters),
+        in distance order"""
+        return sorted(self._critical_point_dict)
+
+    def add_raceline_curvature(self, distance_list, curvature_list, bank_angle_list=None):
+        """Function that sets the curvature of the raceline, e.g. the s_m and
+        kappa_radpm columns of a raceline file. The points do not have to match
+        the critical points or the generated track list, the curvature is
+        interpolated onto the generated track list.
+
+        Args:
+            distance_list (list): distance from the start finish line of every point (meters)
+            curvature_list (list): curvature of the raceline at every point (radians/meter)
+            bank_angle_list (list or float): bank angle of the track at every point, or one
+                                             bank angle for the whole track (radians)
+
+        Returns:
+            Nothing
+
+        Raises:
+            Exception: the lists do not have the same length
+        """
+        distance = numpy.asarray(distance_list, dtype=float)
+        curvature = numpy.asarray(curvature_list, dtype=float)
+        if distance.shape != curvature.shape:
+            raise Exception("{} raceline distances but {} curvatures"
+                            .format(len(distance), len(curvature)))
+        if bank_angle_list is None:
+            bank_angle_list = 0
+        bank_angle = numpy.broadcast_to(numpy.asarray(bank_angle_list, dtype=float),
+                                        distance.shape)
+
+        order = numpy.argsort(distance, kind='stable')
+        self._raceline_distance = distance[order]
+        self._raceline_curvature = curvature[order]
+        self._raceline_bank_angle = bank_angle[order]
+
+    def add_raceline_elevation(self, distance_list, elevation_list):
+        """Function that sets the elevation of the raceline, e.g. the s_m and
+        elev_m columns of a raceline file. It has to be called before
+        generate_track_list, which interpolates the elevation onto the track list.
+
+        Args:
+            distance_list (list): distance from the start finish line of every point (meters)
+            elevation_list (list): elevation of the track at every point (meters)
+
+        Returns:
+            Nothing
+
+        Raises:
+            Exception: the lists do not have the same length
+        """
+        distance = numpy.asarray(distance_list, dtype=float)
+        elevation = numpy.asarray(elevation_list, dtype=float)
+        if distance.shape != elevation.shape:
+            raise Exception("{} raceline distances but {} elevations"
+                            .format(len(distance), len(elevation)))
+        order = numpy.argsort(distance, kind='stable')
+        self._raceline_elevation_distance = distance[order]
+        self._raceline_elevation = elevation[order]
+
+    def add_raceline_heading(self, distance_list, heading_list):
+        """Function that sets the heading of the raceline, e.g. the s_m and
+        psi_rad columns of a raceline file. It has to be called before
+        generate_track_list, which interpolates the heading onto the track list.
+
+        Args:
+            distance_list (list): distance from the start finish line of every point (meters)
+            heading_list (list): heading of the raceline at every point (radians, zero is north)
+
+        Returns:
+            Nothing
+
+        Raises:
+            Exception: the lists do not have the same length
+        """
+        distance = numpy.asarray(distance_list, dtype=float)
+        heading = numpy.asarray(heading_list, dtype=float)
+        if distance.shape != heading.shape:
+            raise Exception("{} raceline distances but {} headings"
+                            .format(len(distance), len(heading)))
+        order = numpy.argsort(distance, kind='stable')
+        self._raceline_heading_distance = distance[order]
+        # no jumps at +-pi, so the heading can be interpolated
+        self._raceline_heading = numpy.unwrap(heading[order])
+
+    def set_environment_lists(self, air_density_factor_list, headwind_list,
+                              rolling_resistance_factor_list):
+        """Function that sets the weather of every segment of the track list,
+        see environment.Environment.apply.
+
+        Args:
+            air_density_factor_list (list): air density relative to get_air_density()
+            headwind_list (list): wind velocity against the direction of travel (m/s)
+            rolling_resistance_factor_list (list): factor of the rolling resistance
+
+        Returns:
+            Nothing
+
+        Raises:
+            Exception: a list does not have the length of the track list
+        """
+        for values in (air_density_factor_list, headwind_list, rolling_resistance_factor_list):
+            if len(values) != len(self.distance_list):
+                raise Exception("environment list of length {} for a track list of length {}"
+                                .format(len(values), len(self.distance_list)))
+        self.air_density_factor_list = list(air_density_factor_list)
+        self.headwind_list = list(headwind_list)
+        self.rolling_resistance_factor_list = list(rolling_resistance_factor_list)
+
+    def _generate_segment_lists(self):
+        # the raceline is interpolated once for the whole track, the physics
+        # calculations only look up the values of a segment
+        distance = numpy.asarray(self.distance_list, dtype=float)
+        segment_length = numpy.diff(distance)
+        if self._raceline_elevation is None:
+            elevation = numpy.zeros(len(distance))
+        else:
+            elevation = numpy.interp(distance, self._raceline_elevation_distance,
+                                     self._raceline_elevation)
+        elevation_change = numpy.diff(elevation)
+
+        self.elevation_list = elevation.tolist()
+        # same length as the other track lists, the last distance is the end of the track
+        self.elevation_change_list = elevation_change.tolist() + [0.0]
+        self.grade_list = (elevation_change / segment_length).tolist() + [0.0]
+        logger.info("elevation lists, highest grade: {}, lowest grade: {}"
+                    .format(max(self.grade_list), min(self.grade_list)),
+                    extra={'sim_index': 'N/A'})
+
+        if self._raceline_heading is None:
+            self.heading_list = [0.0] * len(distance)
+        else:
+            self.heading_list = numpy.interp(distance, self._raceline_heading_distance,
+                                             self._raceline_heading).tolist()
+
+        # no weather until the environment is applied
+        self.air_density_factor_list = [1.0] * len(distance)
+        self.headwind_list = [0.0] * len(distance)
+        self.rolling_resistance_factor_list = [1.0] * len(distance)
+
+    def generate_curvature_constraints(self, friction_coefficient, max_velocity,
+                                       replace_max_velocity=False):
+        """Function that limits the max velocity list to the cornering velocity of
+        the raceline curvature, see physics_equations.cornering_velocity_limit_calculation.
+        It has to be called after generate_track_list, the whole track list is
+        calculated at once with numpy.
+
+        The max velocity of a segment applies to its final velocity, so the
+        curvature is taken at the end of every segment.
+
+        Args:
+            friction_coefficient (float): tire friction coefficient of the car
+            max_velocity (float): velocity limit on straights (m/s)
+            replace_max_velocity (bool): replace the max velocities of the critical
+                                         points instead of limiting them
+
+        Returns:
+            Nothing
+
+        Raises:
+            Exception: no raceline curvature or no generated track list
+        """
+        if self._raceline_curvature is None:
+            raise Exception("No raceline curvature, call add_raceline_curvature first")
+        if not self.distance_list:
+            raise Exception("No track list, call generate_track_list first")
+
+        distance = numpy.asarray(self.distance_list, dtype=float)
+        segment_end = numpy.empty_like(distance)
+        segment_end[:-1] = distance[1:]
+        segment_end[-1] = distance[-1] + (distance[-1] - distance[-2] if len(distance) > 1 else 0)
+
+        curvature = numpy.interp(segment_end, self._raceline_distance, self._raceline_curvature)
+        bank_angle = numpy.interp(segment_end, self._raceline_distance, self._raceline_bank_angle)
+        velocity_limit = cornering_velocity_limit_calculation(curvature, friction_coefficient,
+                                                              max_velocity, bank_angle)
+        if not replace_max_velocity:
+            velocity_limit = numpy.minimum(velocity_limit, self.max_velocity_list)
+
+        # the simulation works on python floats
+        self.max_velocity_list = velocity_limit.tolist()
+        logger.info("curvature constraints, friction coefficient: {}, lowest max velocity: {}"
+                    .format(friction_coefficient, min(self.max_velocity_list)),
+                    extra={'sim_index': 'N/A'})
+
     def generate_track_list(self, delta_distance):
         """Function for generating a list that represents the track properties
         and car constraints at every delta_distance interval around the track.
@@ -118,7 +329,10 @@ class TrackProperties:
             self.velocity_constraint_list.append(velocity_constraint)
             self.max_velocity_list.append(max_velocity)
         logger.info("list type: {}".format(type(self.distance_list)), extra={'sim_index': 'N/A'})
-        logger.info("list length: {}".format(len(self.max_velocity_list)), extra={'sim_index': 'N/A'})
+        logger.info("list length: {}".format(len(self.max_velocity_list)),
+                    extra={'sim_index': 'N/A'})
         logger.info("last distance: {}".format(self.distance_list[-1]), extra={'sim_index': 'N/A'})
 
+        self._generate_segment_lists()
+
                         
@@ -29,16 +29,18 @@
 import sys
 import time
 import logging
-import csv
 from project_argparser import *
 from PyQt5.QtCore import (QTimer, pyqtSignal, pyqtSlot)
 from PyQt5.QtWidgets import (QWidget, QHBoxLayout, QLabel, QLineEdit, QCheckBox, QPushButton)
 from PyQt5.QtWidgets import (QApplication, QGridLayout, QGroupBox, QDoubleSpinBox)
+from PyQt5.QtWidgets import (QTableWidget, QTableWidgetItem)
 import pyqtgraph as pg
+import numpy
 import cProfile
 from datastore import (DataStore)
 from logging_config import configure_logging
 from simulation import SimulationThread
+from simulation_process import SharedResultsBuffer
 
 
 class MainWindow(QWidget):
@@ -46,13 +48,17 @@ class MainWindow(QWidget):
     # define the SIGNALs that MainWindow will send to other threads
     mainWindowStartCalculatingSignal = pyqtSignal(int)
 
-    def __init__(self, data_store, simulationThread, logger, output_filename, *args, **kwargs):
+    def __init__(self, data_store, simulationThread, logger, *args, **kwargs):
+        """
+        data_store is the DataStore of the SimulationThread, or the shared results buffer
+        (SimulationProcess.results) when the simulation runs in a separate process, then
+        simulationThread is the SimulationProcess.
+        """
         QWidget.__init__(self, parent=None)
 
         self.data_store = data_store
         self.simulationThread = simulationThread
         self.logger = logger
-        self.output_filename = output_filename
 
         # Create GUI related resources
         self.setWindowTitle('Race Simulation')
@@ -111,6 +117,10 @@ class MainWindow(QWidget):
         # shared via data_store
 
         self.last_plotted_index = 0
+        # in streaming mode only the streaming window of the lap is kept (the same
+        # window as the lap lists of the DataStore), _first_index is the simulation
+        # index of the first value held
+        self._first_index = 0
         self._X = [0]   # our private x values for x-axis plotting
         self._time = [0]
         self._distance = [0]
@@ -139,7 +149,8 @@ class MainWindow(QWidget):
                                                      name="Plot7", title="Battery Energy")
 
         # Setup the SIGNALs to be received from the worker threads
-        self.simulationThread.simulationThreadStatusUpdateSignal.connect(self.signalRcvFromSimulationThread)
+        self.simulationThread.simulationThreadStatusUpdateSignal.connect(
+            self.signalRcvFromSimulationThread)
 
         # internal timer for refreshing the plots
         self.plotRefreshTimer = QTimer()
@@ -281,6 +292,16 @@ class MainWindow(QWidget):
         self.userDisplayControlsLayout.addWidget(self.spinboxBatteryPower,          9, 1)
         self.userDisplayControlsLayout.addWidget(self.checkboxBatteryEnergy,        10, 0)
         self.userDisplayControlsLayout.addWidget(self.spinboxBatteryEnergy,         10, 1)
+
+        # aggregates of every sector, see sector_analytics.py
+        self.labelSectors = QLabel("Sectors")
+        self.tableSectors = QTableWidget(0, 6, self)
+        self.tableSectors.setHorizontalHeaderLabels(['Time (s)', 'Split (s)', 'Battery Energy (j)',
+                                                     'Peak Motor Power (W)', 'Min Velocity (m/s)',
+                                                     'Complete'])
+        self.tableSectors.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.userDisplayControlsLayout.addWidget(self.labelSectors,                 11, 0)
+        self.userDisplayControlsLayout.addWidget(self.tableSectors,                 12, 0, 1, 2)
         self.userDisplayControlsGroup.setFixedWidth(350)
         self.userDisplayControlsGroup.setLayout(self.userDisplayControlsLayout)
 
@@ -309,30 +330,14 @@ class MainWindow(QWidget):
     def signalRcvFromSimulationThread(self, text):
         """
         We received the simulation thread signal with a update of it's computing status.
-        If the signal indicates the simulation is complete, dump the results to a .csv file
         Inputs:
             text - a string value that is written into the user GUI status textbox.
-     
-        Outputs:
-            if "text" is "Complete" output a csv file of results found in the DataStore
-        Assumption if "Complete" the simulation is no longer writing values to DataStore
+
+        Note: the results file is written by the SimulationThread while it is computing,
+        see results_writer.py
         """
         self.textboxStatus.setText(text)
-        if text == 'Complete!':
-            with open(self.output_filename, 'w', newline='') as csvfile:
-                spamwriter = csv.writer(csvfile, delimiter=',', quoting=csv.QUOTE_MINIMAL)
-                spamwriter.writerow(['SimulationIndex', 'Time', 'Distance', 'Velocity',
-                                     'Max Velocity', 'Acceleration', 'Motor Power',
-                                     'Battery Power', 'Battery Energy'])
-                #i = self.data_store.get_simulation_index()
-                x = 0
-                for i in self._time:
-                    spamwriter.writerow([x, self._time[x], self._distance[x], self._velocity[x],
-                                        self._max_velocity[x], self._acceleration[x],
-                                        self._motor_power[x], self._battery_power[x],
-                                        self._battery_energy[x]])
-                    x = x+1
-                    
+
     @pyqtSlot()
     def signalPlotRefresh(self):
         # Update the GUI window to display computation status, data, and plots selected by the user
@@ -351,7 +356,26 @@ class MainWindow(QWidget):
         simulation_index and not all lists # have been calculated, so we should
         just plot upto the last complete record.
         """
-        if current_sim_index > 0:
+        if current_sim_index > 0 and isinstance(self.data_store, SharedResultsBuffer):
+            """ The simulation runs in a separate process, plot views of the shared buffer,
+            rows rewritten by a walk back are already updated in place.
+            """
+            first_index, columns = self.data_store.get_window()
+            if len(columns['time']) == 0:
+                return
+            self._time = columns['time']
+            self._distance = columns['distance']
+            self._velocity = columns['velocity']
+            self._max_velocity = columns['max_velocity']
+            self._acceleration = columns['acceleration']
+            self._motor_power = columns['motor_power']
+            self._battery_power = columns['battery_power']
+            self._battery_energy = columns['battery_energy']
+            self._X = numpy.arange(first_index, first_index + len(self._velocity))
+            self.updatePlots()
+            self.updateSectorTable()
+
+        elif current_sim_index > 0:
             """ Refresh our private data to plot from the new (and updated/rewritten) data since
             the last time we were here.
             """
@@ -387,77 +411,102 @@ class MainWindow(QWidget):
             #                                                    len(updated_velocity), new_rfi))
 
             # remove any old data that was recalculated during walk back before appending
-            # that refreshed data and any new, additional data
-            self._time = self._time[0:new_rfi]
-            self._distance = self._distance[0:new_rfi]
-            self._velocity = self._velocity[0:new_rfi]
-            self._max_velocity = self._max_velocity[0:new_rfi]
-            self._acceleration = self._acceleration[0:new_rfi]
-            self._motor_power = self._motor_power[0:new_rfi]
-            self._battery_power = self._battery_power[0:new_rfi]
-            self._battery_energy = self._battery_energy[0:new_rfi]
-            # print('After resizing _velocity is len={}'.format(len(self._velocity)))
-
-            # append on newly retrieved data
-            self._time = self._time + updated_time
-            self._distance = self._distance + updated_distance
-            self._velocity = self._velocity + updated_velocity
-            self._max_velocity = self._max_velocity + updated_max_velocity
-            self._acceleration = self._acceleration + updated_acceleration
-            self._motor_power = self._motor_power + updated_motor_power
-            self._battery_power = self._battery_power + updated_battery_power
-            self._battery_energy = self._battery_energy + updated_battery_energy
-            self._X = list(range(0, len(self._velocity)))
-
-            # update GUI with the last (current) data
-            self.spinboxTime.setValue(self._time[-1])
-            self.spinboxDistance.setValue(self._distance[-1])
-            self.spinboxVelocity.setValue(self._velocity[-1])
-            self.spinboxAcceleration.setValue(self._acceleration[-1])
-            self.spinboxMotorPower.setValue(self._motor_power[-1])
-            self.spinboxBatteryPower.setValue(self._battery_power[-1])
-            self.spinboxBatteryEnergy.setValue(self._battery_energy[-1])
-
-            # alway plot/show the Time plot because the other plots are "linked" to it
-            # so user can scroll around
-            self.time_data_line.setData(self._X, self._time)
-
-            # selectively display the plots based on the checkboxes
-            if self.checkboxDistance.isChecked() is True:
-                self.p2.show()
-                self.distance_data_line.setData(self._X, self._distance)
-            else:
-                self.p2.hide()
-
-            if self.checkboxVelocity.isChecked() is True:
-                self.p3.show()
-                self.max_velocity_data_line.setData(self._X, self._max_velocity)
-                self.velocity_data_line.setData(self._X, self._velocity)
-
-            else:
-                self.p3.hide()
-
-            if self.checkboxAcceleration.isChecked() is True:
-                self.p4.show()
-                self.acceleration_data_line.setData(self._X, self._acceleration)
-            else:
-                self.p4.hide()
-
-            if self.checkboxMotorPower.isChecked() is True:
-                self.p5.show()
-                self.motor_power_data_line.setData(self._X, self._motor_power)
-            else:
-                self.p5.hide()
-
-            if self.checkboxBatteryPower.isChecked() is True:
-                self.p6.show()
-                self.battery_power_data_line.setData(self._X, self._battery_power)
-            else:
-                self.p6.hide()
-
-
-            if self.checkboxBatteryEnergy.isChecked() is True:
-                self.p7.show()
-                self.battery_energy_data_line.setData(self._X, self._battery_energy)
-            else:
-                self.p7.hide()
+            # that refreshed data and any new, additional data, the lists are updated in
+            # place (no copy of the whole lap on every refresh)
+            kept_length = new_rfi - self._first_index
+            if not 0 <= kept_length <= len(self._time):
+                # not adjacent to the values held (streaming mode), start over at new_rfi
+                if len(updated_time) == 0:
+                    return
+                kept_length = 0
+                self._first_index = new_rfi
+            # drop the values that went out of the streaming window
+            window_length = self.data_store.get_window_length()
+            discarded_length = 0
+            if window_length is not None:
+                discarded_length = max(0, kept_length + len(updated_time) - window_length)
+            for values, updated_values in ((self._time, updated_time),
+                                           (self._distance, updated_distance),
+                                           (self._velocity, updated_velocity),
+                                           (self._max_velocity, updated_max_velocity),
+                                           (self._acceleration, updated_acceleration),
+                                           (self._motor_power, updated_motor_power),
+                                           (self._battery_power, updated_battery_power),
+                                           (self._battery_energy, updated_battery_energy)):
+                del values[kept_length:]
+                values.extend(updated_values)
+                del values[:discarded_length]
+            self._first_index += discarded_length
+            if len(self._velocity) == 0:
+                return
+            self._X = numpy.arange(self._first_index, self._first_index + len(self._velocity))
+            self.updatePlots()
+            self.updateSectorTable()
+
+    def updateSectorTable(self):
+        # the sector aggregates are kept up to date by the simulation, only a few rows
+        # are copied here, one per sector
+        sector_results = self.data_store.get_sector_results()
+        self.tableSectors.setRowCount(len(sector_results))
+        for row, sector in enumerate(sector_results):
+            values = ["{:.3f}".format(sector.time), "{:.3f}".format(sector.split_time),
+                      "{:.0f}".format(sector.battery_energy),
+                      "{:.0f}".format(sector.peak_motor_power),
+                      "{:.2f}".format(sector.min_velocity),
+                      "{}/{}".format(sector.segments_completed, sector.segments)]
+            for column, value in enumerate(values):
+                self.tableSectors.setItem(row, column, QTableWidgetItem(value))
+
+    def updatePlots(self):
+        # update GUI with the last (current) data
+        self.spinboxTime.setValue(self._time[-1])
+        self.spinboxDistance.setValue(self._distance[-1])
+        self.spinboxVelocity.setValue(self._velocity[-1])
+        self.spinboxAcceleration.setValue(self._acceleration[-1])
+        self.spinboxMotorPower.setValue(self._motor_power[-1])
+        self.spinboxBatteryPower.setValue(self._battery_power[-1])
+        self.spinboxBatteryEnergy.setValue(self._battery_energy[-1])
+
+        # alway plot/show the Time plot because the other plots are "linked" to it
+        # so user can scroll around
+        self.time_data_line.setData(self._X, self._time)
+
+        # selectively display the plots based on the checkboxes
+        if self.checkboxDistance.isChecked() is True:
+            self.p2.show()
+            self.distance_data_line.setData(self._X, self._distance)
+        else:
+            self.p2.hide()
+
+        if self.checkboxVelocity.isChecked() is True:
+            self.p3.show()
+            self.max_velocity_data_line.setData(self._X, self._max_velocity)
+            self.velocity_data_line.setData(self._X, self._velocity)
+
+        else:
+            self.p3.hide()
+
+        if self.checkboxAcceleration.isChecked() is True:
+            self.p4.show()
+            self.acceleration_data_line.setData(self._X, self._acceleration)
+        else:
+            self.p4.hide()
+
+        if self.checkboxMotorPower.isChecked() is True:
+            self.p5.show()
+            self.motor_power_data_line.setData(self._X, self._motor_power)
+        else:
+            self.p5.hide()
+
+        if self.checkboxBatteryPower.isChecked() is True:
+            self.p6.show()
+            self.battery_power_data_line.setData(self._X, self._battery_power)
+        else:
+            self.p6.hide()
+
+
+        if self.checkboxBatteryEnergy.isChecked() is True:
+            self.p7.show()
+            self.battery_energy_data_line.setData(self._X, self._battery_energy)
+        else:
+            self.p7.hide()